@@ -12,16 +12,15 @@ from loguru import logger
 
 # imports locaux
 from panelia.core.driver import WebSession
+from panelia.core.driver_manager import get_driver_manager
 from panelia.scrapers.factory import (
     discover_chapters_flamecomics,
-    discover_chapters_madara_theme,
-    discover_chapters_asuracomic,
     discover_chapters_mangadex,
     discover_chapters_raijin_scans,
     scrape_images_mangadex,
     detect_site_type
 )
-from panelia.scrapers.config import SUPPORTED_SITES
+from panelia.scrapers.discovery import discover_chapters as discover_series_chapters, site_config, site_needs_selenium
 from panelia.core.engine import ScraperEngine
 from panelia.utils.http import download_all_images, download_image_smart
 from panelia.utils.validation import get_validator, ValidationError
@@ -74,6 +73,10 @@ with st.sidebar:
         st.session_state.min_image_width_value = st.number_input("Largeur minimale (px)", 200, 800, st.session_state.get("min_image_width_value", 400))
         st.session_state.timeout_setting_value = st.number_input("Timeout (sec)", 10, 60, st.session_state.get("timeout_setting_value", 30))
         st.session_state.custom_output_dir = st.text_input("Dossier de sortie (Optionnel)", value=st.session_state.get("custom_output_dir", "output"), help="Chemin vers votre Google Drive ou dossier local.")
+        st.session_state.mangadex_data_saver = st.checkbox("MangaDex : mode économie de données", value=st.session_state.get("mangadex_data_saver", False), help="Télécharge le rendu dataSaver (images compressées, bien plus légères) au lieu des originaux.")
+        st.session_state.download_cache_enabled = st.checkbox("Cache des téléchargements", value=st.session_state.get("download_cache_enabled", True), help="Garde les images sur disque (cache/downloads) : relancer un lot ne retélécharge que ce qui a changé.")
+        st.session_state.prefetch_depth = st.slider("Chapitres extraits en avance", 0, 5, value=st.session_state.get("prefetch_depth", 2), help="Pendant qu'un chapitre télécharge, le navigateur récupère déjà la liste d'images des chapitres suivants.")
+        st.session_state.process_pool_enabled = st.checkbox("Découpage multi-processus", value=st.session_state.get("process_pool_enabled", False), help="Découpe et encode les planches dans des processus séparés : utilise tous les cœurs CPU au lieu d'un seul.")
         
         st.markdown("---")
         st.markdown("**🛡️ Anti-Bot & Cloudflare**")
@@ -108,47 +111,32 @@ if "persistent_session" not in st.session_state:
     st.session_state.persistent_session = False
 
 # Helper functions
-def extract_series_title_from_html(page_html: str) -> str:
-    try:
-        from bs4 import BeautifulSoup
-        soup = BeautifulSoup(page_html, 'html.parser')
-        h1_tag = soup.find('h1')
-        return h1_tag.text.strip() if h1_tag else None
-    except Exception:
-        return None
-
 def discover_chapters(series_url: str, session: WebSession):
-    logger.info(f"Découverte pour : {series_url}")
-    scraper_function, needs_selenium, strategy_found = (None, True, False)
-    for domain, cfg in SUPPORTED_SITES.items():
-        if domain in series_url:
-            scraper_function = cfg[0]
-            needs_selenium = cfg[1]
-            strategy_found = True
-            break
-
-    if not strategy_found:
+    # Découverte partagée avec la ligne de commande (panelia/scrapers/discovery.py)
+    if site_config(series_url) is None:
         st.warning("Aucun scraper spécialisé. Lancement de la cascade de repli...")
-        page_html = session.page_source
-        fallback_strategies = [("Madara", discover_chapters_madara_theme), ("AsuraComic", discover_chapters_asuracomic)]
-        for name, func in fallback_strategies:
-            try:
-                chapters = func(page_html, series_url)
-                if chapters:
-                    st.success(f"La stratégie de repli '{name}' a fonctionné !")
-                    return chapters, extract_series_title_from_html(page_html)
-            except Exception:
-                continue
-        st.error("Toutes les stratégies de repli ont échoué.")
-        return {}, None
+    chapters, title = discover_series_chapters(series_url, session)
+    if site_config(series_url) is None:
+        if chapters:
+            st.success("Une stratégie de repli a fonctionné !")
+        else:
+            st.error("Toutes les stratégies de repli ont échoué.")
+    return chapters, title
+
+def driver_settings():
+    # Réglage de la flotte chaude partagée entre découverte et traitement
+    return {
+        "headless": st.session_state.get("headless_mode", True),
+        "profile_id": "default" if st.session_state.get("persistent_session", False) else None,
+    }
 
-    if not needs_selenium:
-        chapters = scraper_function(series_url)
-        return chapters, None
-    else:
-        chapters = scraper_function(session, series_url)
-        title = extract_series_title_from_html(session.page_source)
-        return chapters, title
+def discover_with_warm_driver(series_url: str):
+    # Driver emprunté à la flotte du processus : pas de démarrage à froid de Chrome
+    # par découverte, et les drivers restent chauds pour le lot qui suit
+    if not site_needs_selenium(series_url):
+        return discover_chapters(series_url, None)
+    with get_driver_manager().lease(**driver_settings()) as session:
+        return discover_chapters(series_url, session)
 
 def create_zip_on_disk(folder_path, zip_name):
     """
@@ -186,7 +174,7 @@ def cleanup_session():
                 d.quit()
             except Exception:
                 pass
-    keys_to_reset = ['web_session', 'app_state', 'chapters_discovered', 'title_discovered', 'last_url_searched', 'chapters_to_process', 'final_manhwa_name', 'safe_manhwa_name', 'driver_pool', 'series_url_input']
+    keys_to_reset = ['web_session', 'app_state', 'chapters_discovered', 'title_discovered', 'last_url_searched', 'chapters_to_process', 'final_manhwa_name', 'safe_manhwa_name', 'driver_pool', 'series_url_input', 'sync_mode']
     for key in keys_to_reset:
         if key in st.session_state: del st.session_state[key]
 
@@ -231,10 +219,11 @@ if st.session_state.app_state == 'INPUT':
 
 elif st.session_state.app_state == 'DISCOVERING':
     is_interactive = st.session_state.get('is_interactive', False)
-    if 'web_session' not in st.session_state or st.session_state.web_session is None:
+    # CAPTCHA : navigateur visible dédié, gardé ouvert entre les reruns
+    if is_interactive and st.session_state.get('web_session') is None:
         with st.spinner("Démarrage de la session de navigation..."):
             try:
-                st.session_state.web_session = WebSession(headless=not is_interactive)
+                st.session_state.web_session = WebSession(headless=False)
             except Exception as e:
                 context = classify_and_log_error(e)
                 st.error(f"❌ {context.user_message}")
@@ -249,7 +238,7 @@ elif st.session_state.app_state == 'DISCOVERING':
     else:
         with st.spinner("Découverte des chapitres..."):
             try:
-                chapters, title = discover_chapters(st.session_state.last_url_searched, st.session_state.web_session)
+                chapters, title = discover_with_warm_driver(st.session_state.last_url_searched)
                 st.session_state.chapters_discovered = chapters
                 st.session_state.title_discovered = title
             except Exception as e:
@@ -360,12 +349,21 @@ elif st.session_state.app_state in ['READY_TO_PROCESS', 'PROCESSING_DONE']:
         end_ch_opts = [c for c in chapters_list if c >= start_ch]
         end_ch = col2.selectbox("Fin", end_ch_opts, index=len(end_ch_opts)-1, key="end_chapter_sel")
 
-        if st.button("🚀 Lancer le Traitement du Lot", type="primary", use_container_width=True):
+        launch_batch = st.button("🚀 Lancer le Traitement du Lot", type="primary", use_container_width=True)
+        launch_sync = st.button(
+            "🔁 Synchroniser (nouveaux chapitres seulement)", use_container_width=True,
+            help="Ignore la plage : ne traite que les chapitres absents ou modifiés dans le dossier de sortie. Série sautée si sa liste n'a pas changé depuis la dernière synchronisation."
+        )
+        if launch_batch or launch_sync:
             # Valider la plage de chapitres
             validator = get_validator()
             try:
                 validated_start, validated_end = validator.validate_chapter_range(start_ch, end_ch)
-                st.session_state.chapters_to_process = {n: u for n, u in available_chapters.items() if validated_start <= n <= validated_end}
+                if launch_sync:
+                    st.session_state.chapters_to_process = dict(available_chapters)
+                else:
+                    st.session_state.chapters_to_process = {n: u for n, u in available_chapters.items() if validated_start <= n <= validated_end}
+                st.session_state.sync_mode = launch_sync
 
                 # Valider le nom du manhwa choisi par l'utilisateur
                 raw_name = st.session_state.get('custom_series_name') or st.session_state.get('title_discovered') or "Manhwa_Unknown"
@@ -407,11 +405,15 @@ elif st.session_state.app_state == 'PROCESSING':
             work_dir=st.session_state.get("custom_output_dir", "output"),
             num_drivers=1 if not st.session_state.get("headless_mode", True) else num_drivers_validated,
             image_workers_per_chap=max_workers_validated,
-            throttle_min=0.08,
-            throttle_max=0.15,
             driver_start_delay=0.8,
-            headless=st.session_state.get("headless_mode", True),
-            profile_id="default" if st.session_state.get("persistent_session", False) else None
+            **driver_settings(),
+            cache_dir="cache/downloads" if st.session_state.get("download_cache_enabled", True) else None,
+            prefetch_depth=st.session_state.get("prefetch_depth", 2),
+            processing_backend="process" if st.session_state.get("process_pool_enabled", False) else "thread",
+            # Point de départ seulement : la concurrence par hôte s'ajuste pendant le lot
+            autotune=True,
+            # Drivers de la flotte chaude : engine.shutdown() ne les ferme pas
+            driver_manager=get_driver_manager()
         )
     except ValidationError as e:
         st.error(f"❌ Configuration moteur invalide : {e}")
@@ -422,6 +424,7 @@ elif st.session_state.app_state == 'PROCESSING':
     total_chapters = len(chapters_to_process)
     overall_progress = st.progress(0)
     status_box = st.empty()
+    activity_box = st.empty()
 
     # IMPORTANT : déclarer juste ici
     completed_counter = 0
@@ -439,24 +442,42 @@ elif st.session_state.app_state == 'PROCESSING':
         st.session_state.session_stats['chapters_processed'] += 1
         st.session_state.session_stats['images_downloaded'] += result.get('panels_saved', 0)
 
+    def ui_event_callback(event):
+        # Progression image par image, dans l'ordre où elle arrive (tous chapitres confondus)
+        if event.kind == "images_found":
+            activity_box.caption(f"Chapitre {event.chap_num} : {event.data['count']} images trouvées")
+        elif event.kind == "image_downloaded":
+            activity_box.caption(f"Chapitre {event.chap_num} : image {event.data['downloaded']}/{event.data['found']} téléchargée")
+        elif event.kind == "image_saved":
+            activity_box.caption(f"Chapitre {event.chap_num} : image {event.data['index']} -> {event.data['panels']} planche(s)")
 
     params = {
         "min_image_width_value": min_width_value,
         "quality_value": quality_value,
         "timeout_value": timeout_value,
         "final_manhwa_name": final_manhwa_name,
-        "enable_cleaning": st.session_state.get("enable_cleaning", False)
+        "enable_cleaning": st.session_state.get("enable_cleaning", False),
+        "mangadex_data_saver": st.session_state.get("mangadex_data_saver", False)
     }
 
     try:
         st.info(f"🟢 Lancement du traitement parallèle ({total_chapters} chapitres)...")
-        results = engine.run_chapter_batch(chapters_to_process, params, ui_progress_callback=ui_progress_callback)
+        # Le bouton Stop de Streamlit interrompt ce thread : le lot est alors annulé
+        callbacks = {"ui_progress_callback": ui_progress_callback, "event_callback": ui_event_callback}
+        if st.session_state.get("sync_mode"):
+            plan, results = engine.sync_series(chapters_to_process, params, **callbacks)
+            if not plan.to_process:
+                st.info("✅ Série déjà à jour : aucun chapitre nouveau ou modifié.")
+            else:
+                st.info(f"🔁 Synchronisation : {len(plan.missing)} nouveau(x), {len(plan.changed)} modifié(s), {len(plan.up_to_date) + len(plan.untracked)} déjà présent(s).")
+        else:
+            results = engine.run_chapter_batch(chapters_to_process, params, **callbacks)
     except Exception as e:
         logger.error("Erreur critique lors du run_chapter_batch: %s", e, exc_info=True)
         st.error("Erreur critique lors du traitement. Voir logs.")
     finally:
         try:
-            engine.stop_driver_pool()
+            engine.shutdown()
         except Exception:
             pass
 
@@ -0,0 +1,6 @@
+# __main__.py
+"""Point d'entrée : python -m panelia (voir panelia/cli.py)."""
+
+from panelia.cli import main
+
+raise SystemExit(main())
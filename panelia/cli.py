@@ -0,0 +1,363 @@
+# cli.py
+"""
+Ligne de commande PANELia (python -m panelia)
+
+Avant : ScraperEngine ne se pilotait que depuis la branche PROCESSING
+d'app.py : le lot bloquait l'exécution du script Streamlit et mourait avec
+l'onglet du navigateur.
+
+Maintenant :
+- Découverte + run_chapter_batch (ou sync_series) sans interface, pour
+  une ou plusieurs séries, sous systemd ou cron
+- Progression lisible par machine : un objet JSON par ligne sur stdout
+  (événements du moteur + début/fin de série et de lancement) ; les logs
+  vont sur stderr
+- Plusieurs séries en parallèle sur un seul moteur (--parallel-series,
+  core/jobs.py) : découverte de la suivante pendant le traitement des
+  précédentes, quotas par série (--series-chapters, --series-downloads)
+- SIGINT / SIGTERM annulent proprement les lots en cours (CancellationToken)
+- Découverte et lots empruntent à la même flotte de drivers chaude
+  (core/driver_manager.py) : pas de Chrome à froid par série découverte
+- --queue : découverte seulement, chapitres mis dans une file partagée
+  (core/workqueue.py) que des workers traitent sur d'autres machines
+  (python -m panelia.worker, voir worker.py)
+- Code de sortie : 0 tout réussi, 1 chapitre(s) en échec, 2 arguments
+  invalides, 130 lancement annulé
+
+Usage:
+    python -m panelia https://mangadex.org/title/<uuid>/solo-leveling --chapters 1-10,12
+    python -m panelia URL1 URL2 --sync --output /srv/manhwa --drivers 3 --quality 90
+
+Auteur: PANELia Team
+Date: 2025-12-18
+"""
+
+import argparse
+import json
+import signal
+import sys
+import threading
+import time
+from concurrent.futures import as_completed
+from functools import partial
+from typing import Any, Dict, List, Optional, TextIO, Tuple
+
+from loguru import logger
+
+from panelia.core.driver_manager import get_driver_manager
+from panelia.core.engine import DOWNLOAD_BACKENDS, PROCESSING_BACKENDS, ScraperEngine
+from panelia.core.events import ProgressEvent
+from panelia.core.jobs import SeriesJob, SeriesScheduler
+from panelia.core.journal import VERIFY_MODES
+from panelia.core.workqueue import WorkQueue, open_work_queue
+from panelia.scrapers.discovery import discover_chapters, series_name_from_url, site_needs_selenium
+from panelia.utils.cancellation import CancellationToken
+from panelia.utils.validation import ValidationError, get_validator
+
+EXIT_OK = 0
+EXIT_FAILED_CHAPTERS = 1
+EXIT_USAGE = 2
+EXIT_CANCELLED = 130
+
+# Priorité d'emprunt d'un driver pour la découverte (les chapitres sont à --priority)
+DISCOVERY_PRIORITY = 1000
+
+
+def parse_chapter_ranges(spec: str) -> List[Tuple[float, float]]:
+    """
+    "1-10,12,20.5-" -> [(1, 10), (12, 12), (20.5, inf)].
+
+    Raises:
+        ValueError: Plage illisible ou inversée
+    """
+    ranges = []
+    for part in (p.strip() for p in spec.split(",")):
+        if not part:
+            continue
+        low, sep, high = part.partition("-")
+        start = float(low) if low else 0.0
+        end = (float(high) if high else float("inf")) if sep else start
+        if end < start:
+            raise ValueError(f"Plage inversée : {part}")
+        ranges.append((start, end))
+    if not ranges:
+        raise ValueError(f"Aucune plage dans {spec!r}")
+    return ranges
+
+
+def select_chapters(chapters: Dict[float, str], ranges: Optional[List[Tuple[float, float]]]) -> Dict[float, str]:
+    if not ranges:
+        return dict(chapters)
+    return {n: u for n, u in chapters.items() if any(start <= n <= end for start, end in ranges)}
+
+
+class JsonLinesReporter:
+    """
+    Progression machine : un objet JSON par ligne, vidé à chaque écriture.
+    Appelé depuis les threads des séries actives : une ligne n'est jamais coupée.
+    """
+
+    def __init__(self, stream: Optional[TextIO] = None, enabled: bool = True):
+        self.stream = stream or sys.stdout
+        self.enabled = enabled
+        self._lock = threading.Lock()
+
+    def emit(self, event: str, series: Optional[str] = None, **data) -> None:
+        if not self.enabled:
+            return
+        record = {"event": event, "ts": round(time.time(), 3)}
+        if series is not None:
+            record["series"] = series
+        record.update(data)
+        line = json.dumps(record, ensure_ascii=False, default=str) + "\n"
+        with self._lock:
+            self.stream.write(line)
+            self.stream.flush()
+
+    def on_engine_event(self, series: str, event: ProgressEvent) -> None:
+        self.emit(event.kind, series, chap=event.chap_num, **event.data)
+
+
+def build_parser() -> argparse.ArgumentParser:
+    parser = argparse.ArgumentParser(
+        prog="python -m panelia",
+        description="Découverte et téléchargement de séries sans interface (JSON lines sur stdout).",
+    )
+    parser.add_argument("series_urls", nargs="+", metavar="URL", help="URL(s) de la page principale de la série")
+    parser.add_argument("--chapters", help="Plages de chapitres, ex: 1-10,12,20- (défaut : tous)")
+    parser.add_argument("--sync", action="store_true", help="Seulement les chapitres absents ou modifiés localement")
+    parser.add_argument("--force", action="store_true", help="Avec --sync : ignore l'empreinte de la dernière synchronisation")
+    parser.add_argument("--name", help="Nom de la série (une seule URL) ; défaut : titre découvert ou URL")
+    parser.add_argument("--parallel-series", type=int, default=1, help="Séries traitées en même temps (défaut : 1)")
+    parser.add_argument("--series-chapters", type=int, help="Quota : chapitres simultanés par série")
+    parser.add_argument("--series-downloads", type=int, help="Quota : téléchargements simultanés par série")
+    parser.add_argument("--queue", help="File de travail partagée (sqlite:///chemin.db) : met les chapitres en file pour les workers (python -m panelia.worker) au lieu de les traiter")
+    parser.add_argument("--priority", type=int, default=0, help="Avec --queue : priorité des chapitres en file")
+
+    # Paramètres de lot : voyagent avec les chapitres (aussi en file, vers les workers)
+    panels = parser.add_argument_group("planches")
+    panels.add_argument("--quality", type=int, default=92, help="Qualité JPEG (défaut : 92)")
+    panels.add_argument("--min-width", type=int, default=400, help="Largeur minimale des images (px)")
+    panels.add_argument("--timeout", type=int, default=30, help="Timeout réseau (s)")
+    panels.add_argument("--data-saver", action="store_true", help="MangaDex : images compressées")
+    add_engine_arguments(parser)
+    add_output_arguments(parser)
+    return parser
+
+
+def add_engine_arguments(parser: argparse.ArgumentParser) -> None:
+    """Options du ScraperEngine, communes à la CLI et au worker de file."""
+    engine = parser.add_argument_group("moteur")
+    engine.add_argument("--output", default="output", help="Dossier de sortie (défaut : output)")
+    engine.add_argument("--drivers", type=int, default=2, help="Drivers Selenium (défaut : 2)")
+    engine.add_argument("--workers", type=int, default=4, help="Téléchargements simultanés par chapitre (défaut : 4)")
+    engine.add_argument("--headed", action="store_true", help="Navigateur visible (défaut : headless)")
+    engine.add_argument("--profile", help="Profil Chrome persistant (cookies)")
+    engine.add_argument("--cache-dir", default="cache/downloads", help="Cache des téléchargements")
+    engine.add_argument("--no-cache", action="store_true", help="Désactive le cache des téléchargements")
+    engine.add_argument("--prefetch-depth", type=int, default=2, help="Chapitres extraits en avance")
+    engine.add_argument("--download-backend", choices=DOWNLOAD_BACKENDS, default="threaded")
+    engine.add_argument("--processing-backend", choices=PROCESSING_BACKENDS, default="thread")
+    engine.add_argument("--process-workers", type=int, help="Processus de découpage (mode process)")
+    engine.add_argument("--no-journal", action="store_true", help="Désactive le journal de reprise")
+    engine.add_argument("--journal-verify", choices=VERIFY_MODES, default="size")
+    engine.add_argument("--no-autotune", action="store_true", help="Concurrence par hôte fixe (défaut : auto-réglée)")
+    engine.add_argument("--autotune-state", default="cache/autotune.json", help="Meilleurs réglages par domaine")
+
+
+def add_output_arguments(parser: argparse.ArgumentParser) -> None:
+    output = parser.add_argument_group("sortie")
+    output.add_argument("--progress", choices=("jsonl", "none"), default="jsonl", help="Progression sur stdout")
+    output.add_argument("--log-level", default="INFO", help="Niveau des logs sur stderr")
+    output.add_argument("--log-file", help="Fichier de logs supplémentaire (rotation 10 MB)")
+
+
+def make_engine(args) -> ScraperEngine:
+    validator = get_validator()
+    return ScraperEngine(
+        work_dir=args.output,
+        num_drivers=validator.validate_num_drivers(args.drivers),
+        image_workers_per_chap=validator.validate_max_workers(args.workers),
+        headless=not args.headed,
+        profile_id=args.profile,
+        download_backend=args.download_backend,
+        cache_dir=None if args.no_cache else args.cache_dir,
+        prefetch_depth=args.prefetch_depth,
+        processing_backend=args.processing_backend,
+        process_workers=args.process_workers,
+        journal=not args.no_journal,
+        journal_verify=args.journal_verify,
+        autotune=not args.no_autotune,
+        autotune_state=args.autotune_state,
+        driver_manager=get_driver_manager(),
+    )
+
+
+def discover(series_url: str, headless: bool, profile: Optional[str]) -> Tuple[Dict[float, str], Optional[str]]:
+    """Découverte avec un driver de la flotte chaude du processus, partagée avec le moteur."""
+    if not site_needs_selenium(series_url):
+        return discover_chapters(series_url)
+    # Servie avant l'extraction des chapitres déjà en cours : la série suivante démarre vite
+    with get_driver_manager().lease(headless=headless, profile_id=profile, priority=DISCOVERY_PRIORITY) as session:
+        return discover_chapters(series_url, session)
+
+
+def submit_series(jobs: SeriesScheduler, series_url: str, args, base_params: Dict[str, Any], ranges, reporter: JsonLinesReporter, token: CancellationToken) -> Optional[SeriesJob]:
+    """Découverte d'une série puis mise en file de ses chapitres (None si aucun)."""
+    validator = get_validator()
+    chapters, title = discover(series_url, headless=not args.headed, profile=args.profile)
+    name = validator.validate_filename(args.name or title or series_name_from_url(series_url), allow_path=False)
+    selected = select_chapters(chapters, ranges)
+    reporter.emit("series_discovered", name, url=series_url, title=title, found=len(chapters), selected=len(selected))
+    if not selected:
+        logger.warning(f"[CLI] {name} : aucun chapitre à traiter")
+        reporter.emit("series_finished", name, ok=0, failed=0, panels=0)
+        return None
+
+    return jobs.submit(
+        selected,
+        dict(base_params, final_manhwa_name=name),
+        sync=args.sync,
+        force=args.force,
+        event_callback=partial(reporter.on_engine_event, name),
+        # Jeton commun : un signal arrête toutes les séries
+        cancel_token=token,
+    )
+
+
+def enqueue_series(queue: WorkQueue, urls: List[str], args, base_params: Dict[str, Any], ranges, reporter: JsonLinesReporter) -> int:
+    """Mode --queue : découverte puis mise en file partagée ; les workers traitent."""
+    validator = get_validator()
+    totals = {"enqueued": 0, "series_failed": 0}
+    for url in urls:
+        try:
+            chapters, title = discover(url, headless=not args.headed, profile=args.profile)
+            name = validator.validate_filename(args.name or title or series_name_from_url(url), allow_path=False)
+            selected = select_chapters(chapters, ranges)
+            reporter.emit("series_discovered", name, url=url, title=title, found=len(chapters), selected=len(selected))
+            added = queue.enqueue(name, selected, dict(base_params, final_manhwa_name=name), priority=args.priority)
+        except Exception as e:
+            logger.error(f"[CLI] Série {url} en échec : {e}", exc_info=True)
+            totals["series_failed"] += 1
+            reporter.emit("series_failed", url=url, error=str(e))
+            continue
+        totals["enqueued"] += added
+        reporter.emit("series_enqueued", name, enqueued=added, already_queued=len(selected) - added)
+    reporter.emit("run_finished", queue=queue.get_stats(), **totals)
+    return EXIT_FAILED_CHAPTERS if totals["series_failed"] else EXIT_OK
+
+
+def cancel_on_signals(token: CancellationToken) -> Dict[int, Any]:
+    """SIGINT / SIGTERM annulent `token` (un second signal interrompt) ; retourne les anciens gestionnaires."""
+    def on_signal(signum, frame):
+        # Deuxième signal : arrêt immédiat
+        if token.cancelled:
+            raise KeyboardInterrupt
+        token.cancel(f"Signal {signal.Signals(signum).name}")
+
+    return {sig: signal.signal(sig, on_signal) for sig in (signal.SIGINT, signal.SIGTERM)}
+
+
+def restore_signals(previous: Dict[int, Any]) -> None:
+    for sig, handler in previous.items():
+        signal.signal(sig, handler)
+
+
+def configure_logging(args) -> None:
+    """Logs sur stderr : stdout reste réservé à la progression JSON."""
+    logger.remove()
+    logger.add(sys.stderr, level=args.log_level.upper())
+    if args.log_file:
+        logger.add(args.log_file, rotation="10 MB", retention="7 days", level="INFO")
+
+
+def main(argv: Optional[List[str]] = None) -> int:
+    parser = build_parser()
+    args = parser.parse_args(argv)
+    configure_logging(args)
+
+    validator = get_validator()
+    try:
+        if args.name and len(args.series_urls) > 1:
+            raise ValidationError("--name n'a de sens qu'avec une seule URL")
+        if args.queue and args.sync:
+            raise ValidationError("--sync compare au disque local : incompatible avec --queue")
+        ranges = parse_chapter_ranges(args.chapters) if args.chapters else None
+        urls = [validator.validate_url(url, allow_any_domain=True) for url in args.series_urls]
+        base_params = {
+            "min_image_width_value": validator.validate_min_width(args.min_width),
+            "quality_value": validator.validate_quality(args.quality),
+            "timeout_value": validator.validate_timeout(args.timeout),
+            "enable_cleaning": False,
+            "mangadex_data_saver": args.data_saver,
+        }
+        queue = open_work_queue(args.queue) if args.queue else None
+        engine = make_engine(args) if queue is None else None
+    except (ValidationError, ValueError) as e:
+        parser.print_usage(sys.stderr)
+        print(f"{parser.prog}: erreur : {e}", file=sys.stderr)
+        return EXIT_USAGE
+
+    reporter = JsonLinesReporter(enabled=args.progress == "jsonl")
+    if queue is not None:
+        try:
+            return enqueue_series(queue, urls, args, base_params, ranges, reporter)
+        finally:
+            queue.close()
+            get_driver_manager().close_all()
+
+    token = CancellationToken()
+    previous = cancel_on_signals(token)
+    totals = {"ok": 0, "failed": 0, "resumed": 0, "series_failed": 0}
+    start = time.monotonic()
+    jobs = SeriesScheduler(
+        engine,
+        max_active_series=args.parallel_series,
+        max_parallel_chapters=args.series_chapters,
+        max_downloads=args.series_downloads,
+    )
+    try:
+        submitted = []
+        for url in urls:
+            if token.cancelled:
+                break
+            try:
+                job = submit_series(jobs, url, args, base_params, ranges, reporter, token)
+            except Exception as e:
+                # Une série en panne (découverte...) n'arrête pas les suivantes
+                logger.error(f"[CLI] Série {url} en échec : {e}", exc_info=True)
+                totals["series_failed"] += 1
+                reporter.emit("series_failed", url=url, error=str(e))
+                continue
+            if job is not None:
+                submitted.append(job)
+
+        by_future = {job.future: job for job in submitted}
+        for future in as_completed(by_future):
+            job = by_future[future]
+            if future.cancelled():
+                reporter.emit("series_cancelled", job.name)
+                continue
+            try:
+                results = future.result()
+            except Exception as e:
+                totals["series_failed"] += 1
+                reporter.emit("series_failed", job.name, error=str(e))
+                continue
+            if job.plan is not None:
+                reporter.emit("series_synced", job.name, **job.plan.summary())
+            ok = sum(1 for r in results if not r.get("error") and r.get("panels_saved"))
+            totals["ok"] += ok
+            totals["failed"] += len(results) - ok
+            totals["resumed"] += sum(1 for r in results if r.get("resumed"))
+            reporter.emit("series_finished", job.name, ok=ok, failed=len(results) - ok, panels=sum(r.get("panels_saved", 0) for r in results))
+    finally:
+        restore_signals(previous)
+        jobs.shutdown()
+        engine.shutdown()
+        get_driver_manager().close_all()
+
+    reporter.emit("run_finished", cancelled=token.cancelled, seconds=round(time.monotonic() - start, 1), **totals)
+    if token.cancelled:
+        return EXIT_CANCELLED
+    return EXIT_FAILED_CHAPTERS if totals["failed"] or totals["series_failed"] else EXIT_OK
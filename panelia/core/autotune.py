@@ -0,0 +1,292 @@
+# autotune.py
+"""
+Auto-réglage de la concurrence de téléchargement par hôte PANELia
+
+Avant : app.py fixait validate_max_workers(4) / validate_num_drivers(2) et
+l'ordonnanceur un plafond par hôte unique (per_host_limit=8), alors que le
+bon réglage varie du tout au tout entre le CDN MangaDex et un Madara derrière
+Cloudflare : trop bas = lot lent, trop haut = rafales de 429.
+
+Maintenant :
+- Un contrôleur par hôte, branché sur DownloadScheduler (observer +
+  set_host_limit) : il mesure par fenêtre le débit (téléchargements réussis
+  par seconde) et le taux d'erreur, puis fait du hill-climbing sur le
+  plafond de téléchargements simultanés de l'hôte
+- 429/503 (lus dans le limiteur de débit, ratelimit.py) : plafond abaissé et
+  mémorisé comme « plafond de throttling » ; plus de hausse au-delà (une
+  sonde prudente le relève après une longue période saine). Les réponses
+  des hôtes qui servent réellement un hôte canonique (nœuds MD@Home pour
+  uploads.mangadex.org, voir host_aliases) lui sont attribuées
+- Taux d'erreur au-dessus du seuil : recul d'un cran
+- Meilleur réglage par domaine gardé entre les runs (JSON) : le lot suivant
+  part directement de la bonne valeur
+
+Ne concerne que le moteur "threaded" (l'ordonnanceur partagé).
+
+Usage:
+    tuner = ConcurrencyTuner(max_limit=16, state_path="cache/autotune.json")
+    tuner.attach(scheduler)
+    ...
+    tuner.save()
+    print(tuner.get_stats())
+
+Auteur: PANELia Team
+Date: 2025-12-18
+"""
+
+import json
+import os
+import threading
+import time
+from dataclasses import dataclass, field
+from pathlib import Path
+from typing import Any, Callable, Dict, Iterable, Optional
+
+from loguru import logger
+
+from panelia.utils.ratelimit import get_rate_limiter
+
+
+def download_succeeded(result: Any, error: Optional[BaseException]) -> bool:
+    """
+    Issue d'une tentative _ImageJob.step : (True, contenu) = image obtenue ;
+    (True, None) abandon, (False, délai) tentative ratée, exception = échec.
+    """
+    if error is not None or not isinstance(result, tuple) or len(result) != 2:
+        return False
+    done, value = result
+    return bool(done) and value is not None
+
+
+@dataclass
+class HostTuning:
+    """État du contrôleur d'un hôte."""
+    limit: int
+    # Au-delà, l'hôte a répondu 429/503 (None = jamais vu)
+    ceiling: Optional[int] = None
+    best_limit: Optional[int] = None
+    best_throughput: float = 0.0
+    direction: int = 1
+    last_throughput: Optional[float] = None
+    window_start: float = 0.0
+    successes: int = 0
+    errors: int = 0
+    # Compteurs de 429/503 déjà vus, par hôte contacté (hôte + alias)
+    throttled_seen: Dict[str, int] = field(default_factory=dict)
+    windows: int = 0
+    healthy_windows: int = 0
+
+
+class ConcurrencyTuner:
+    """
+    Hill-climbing du plafond de concurrence par hôte, thread-safe.
+
+    Chaque fin de tâche de l'ordonnanceur est comptée dans la fenêtre de son
+    hôte ; une fenêtre close (durée et échantillons suffisants) décide du
+    prochain plafond.
+    """
+
+    def __init__(
+        self,
+        min_limit: int = 1,
+        max_limit: int = 16,
+        initial_limit: int = 4,
+        window_seconds: float = 5.0,
+        min_samples: int = 8,
+        max_error_rate: float = 0.2,
+        tolerance: float = 0.05,
+        probe_after_windows: int = 12,
+        state_path: Optional[str] = None,
+        host_aliases: Optional[Callable[[str], Iterable[str]]] = None,
+    ):
+        """
+        Args:
+            min_limit / max_limit: Bornes du plafond par hôte
+            initial_limit: Plafond de départ d'un hôte jamais vu
+            window_seconds: Durée minimale d'une fenêtre de mesure
+            min_samples: Tentatives minimales par fenêtre
+            max_error_rate: Taux d'erreur au-delà duquel on recule
+            tolerance: Variation relative de débit considérée comme du bruit
+            probe_after_windows: Fenêtres saines avant de relever un plafond de throttling
+            state_path: JSON des meilleurs réglages par domaine (None = pas de mémoire)
+            host_aliases: hôte -> hôtes réellement contactés pour lui (ex: nœuds MD@Home)
+        """
+        self.min_limit = max(1, min_limit)
+        self.max_limit = max(self.min_limit, max_limit)
+        self.initial_limit = min(self.max_limit, max(self.min_limit, initial_limit))
+        self.window_seconds = window_seconds
+        self.min_samples = max(1, min_samples)
+        self.max_error_rate = max_error_rate
+        self.tolerance = tolerance
+        self.probe_after_windows = probe_after_windows
+        self.state_path = Path(state_path) if state_path else None
+        self.host_aliases = host_aliases
+
+        self._hosts: Dict[str, HostTuning] = {}
+        self._lock = threading.Lock()
+        self._scheduler = None
+        self._saved = self._load()
+
+    def _load(self) -> Dict[str, Dict[str, Any]]:
+        if self.state_path is None:
+            return {}
+        try:
+            return json.loads(self.state_path.read_text(encoding="utf-8"))
+        except (OSError, ValueError):
+            return {}
+
+    def attach(self, scheduler) -> None:
+        """Se branche sur un DownloadScheduler et lui applique les réglages mémorisés."""
+        self._scheduler = scheduler
+        scheduler.observer = self.observe
+        for host in self._saved:
+            scheduler.set_host_limit(host, self._state(host).limit)
+        if self._saved:
+            logger.info(f"[TUNE] Réglages mémorisés : { {h: s.get('limit') for h, s in self._saved.items()} }")
+
+    def _clamp(self, limit: int, ceiling: Optional[int] = None) -> int:
+        upper = self.max_limit if ceiling is None else min(self.max_limit, ceiling)
+        return max(self.min_limit, min(upper, limit))
+
+    def _state(self, host: str) -> HostTuning:
+        state = self._hosts.get(host)
+        if state is None:
+            saved = self._saved.get(host, {})
+            ceiling = saved.get("ceiling")
+            state = HostTuning(
+                limit=self._clamp(saved.get("limit", self.initial_limit), ceiling),
+                ceiling=ceiling,
+                best_limit=saved.get("limit"),
+                window_start=time.monotonic(),
+                throttled_seen=self._throttled_counts(host),
+            )
+            self._hosts[host] = state
+        return state
+
+    def _throttled_counts(self, host: str) -> Dict[str, int]:
+        """429/503 cumulés par hôte contacté pour `host` (lui-même et ses alias)."""
+        hosts = {host}
+        if self.host_aliases is not None:
+            try:
+                hosts.update(self.host_aliases(host))
+            except Exception as e:
+                logger.debug(f"[TUNE] Alias de {host} indisponibles : {e}")
+        rates = get_rate_limiter().get_rates()
+        return {h: rates.get(h, {}).get("throttled", 0) for h in hosts}
+
+    def limit_for(self, host: str) -> int:
+        with self._lock:
+            return self._state(host).limit
+
+    def observe(self, host: str, result: Any, error: Optional[BaseException], duration: float) -> None:
+        """Observateur de DownloadScheduler : compte la tentative, clôt la fenêtre si due."""
+        with self._lock:
+            state = self._state(host)
+            if download_succeeded(result, error):
+                state.successes += 1
+            else:
+                state.errors += 1
+            elapsed = time.monotonic() - state.window_start
+            if elapsed < self.window_seconds or state.successes + state.errors < self.min_samples:
+                return
+            new_limit = self._close_window(host, state, elapsed)
+        if new_limit is not None and self._scheduler is not None:
+            self._scheduler.set_host_limit(host, new_limit)
+
+    def _close_window(self, host: str, state: HostTuning, elapsed: float) -> Optional[int]:
+        """Décide du plafond suivant (verrou tenu) ; None s'il ne change pas."""
+        attempts = state.successes + state.errors
+        throughput = state.successes / elapsed
+        error_rate = state.errors / attempts
+        throttled_now = self._throttled_counts(host)
+        # Par hôte : un alias apparu en cours de route part de zéro
+        throttled = any(count > state.throttled_seen.get(h, 0) for h, count in throttled_now.items())
+        old = state.limit
+        state.windows += 1
+        forced = throttled or error_rate > self.max_error_rate
+
+        if throttled:
+            # L'hôte limite : ce plafond est trop haut, on ne le retentera pas de sitôt
+            state.ceiling = max(self.min_limit, old - 1)
+            state.direction = 0
+            state.healthy_windows = 0
+            state.limit = self._clamp(old - 1, state.ceiling)
+            reason = "429/503"
+        elif forced:
+            state.direction = 0
+            state.healthy_windows = 0
+            state.limit = self._clamp(old - 1, state.ceiling)
+            reason = f"erreurs {error_rate:.0%}"
+        else:
+            state.healthy_windows += 1
+            if throughput > state.best_throughput:
+                state.best_throughput = throughput
+                state.best_limit = old
+            last = state.last_throughput
+            if last is not None and throughput < last * (1 - self.tolerance):
+                # Pire qu'avant le dernier pas : on repart dans l'autre sens
+                state.direction = -state.direction or -1
+            elif last is not None and throughput <= last * (1 + self.tolerance) and state.direction > 0:
+                # Monter n'a rien apporté : on reste (inutile de charger l'hôte)
+                state.direction = 0
+            elif state.direction == 0 and last is not None and throughput > last * (1 + self.tolerance):
+                state.direction = 1
+            if state.direction == 0 and state.healthy_windows >= self.probe_after_windows:
+                # Longue période saine à réglage fixe : on sonde un cran au-dessus
+                # (le throttling a peut-être cessé)
+                if state.ceiling is not None:
+                    state.ceiling += 1
+                state.healthy_windows = 0
+                state.direction = 1
+            state.limit = self._clamp(old + state.direction, state.ceiling)
+            reason = f"{throughput:.1f} img/s"
+
+        # Après un recul forcé, la fenêtre suivante sert de nouvelle référence
+        state.last_throughput = None if forced else throughput
+        state.window_start = time.monotonic()
+        state.successes = state.errors = 0
+        state.throttled_seen.update(throttled_now)
+        if state.limit == old:
+            return None
+        logger.info(f"[TUNE] {host} : concurrence {old} -> {state.limit} ({reason})")
+        return state.limit
+
+    def get_stats(self) -> Dict[str, Dict[str, Any]]:
+        """Plafond courant, meilleur réglage mesuré et plafond de throttling par hôte."""
+        with self._lock:
+            return {
+                host: {
+                    "limit": s.limit,
+                    "best_limit": s.best_limit,
+                    "best_throughput": round(s.best_throughput, 2),
+                    "ceiling": s.ceiling,
+                    "windows": s.windows,
+                }
+                for host, s in self._hosts.items()
+            }
+
+    def save(self) -> None:
+        """Mémorise le meilleur réglage par domaine (écriture atomique)."""
+        if self.state_path is None:
+            return
+        with self._lock:
+            measured = {host: s for host, s in self._hosts.items() if s.windows}
+            if not measured:
+                return
+            state = dict(self._saved)
+            for host, s in measured.items():
+                limit = s.best_limit if s.best_limit is not None else s.limit
+                state[host] = {
+                    "limit": self._clamp(limit, s.ceiling),
+                    "ceiling": s.ceiling,
+                    "throughput": round(s.best_throughput, 2),
+                    "updated_at": time.time(),
+                }
+            self._saved = state
+        try:
+            self.state_path.parent.mkdir(parents=True, exist_ok=True)
+            tmp = self.state_path.with_suffix(".tmp")
+            tmp.write_text(json.dumps(state, indent=2), encoding="utf-8")
+            os.replace(tmp, self.state_path)
+        except OSError as e:
+            logger.warning(f"[TUNE] Réglages non sauvegardés ({self.state_path}) : {e}")
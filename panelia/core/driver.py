@@ -17,7 +17,6 @@ Dernière mise à jour: 2025-12-03
 import os
 import platform
 import random
-import time
 import tempfile
 from pathlib import Path
 from typing import Optional
@@ -28,6 +27,36 @@ from selenium.webdriver.chrome.service import Service
 from webdriver_manager.chrome import ChromeDriverManager
 from webdriver_manager.core.os_manager import ChromeType
 
+from panelia.utils.ratelimit import get_rate_limiter
+
+# Selenium n'expose pas le code HTTP : pages de blocage reconnues à leur titre
+BLOCK_PAGE_TITLES = (
+    ("too many requests", 429),
+    ("rate limited", 429),
+    ("used cloudflare to restrict access", 429),  # Cloudflare 1015
+    ("just a moment", 503),  # challenge Cloudflare
+    ("attention required", 503),
+    ("service unavailable", 503),
+    ("service temporarily unavailable", 503),
+)
+
+
+def page_status(title) -> Optional[int]:
+    """
+    Code HTTP déduit du titre d'une page chargée par Selenium.
+
+    Returns:
+        429/503 pour une page de blocage, 200 pour une page ordinaire,
+        None si le titre est illisible (issue inconnue)
+    """
+    if not isinstance(title, str):
+        return None
+    lowered = title.lower()
+    for marker, status in BLOCK_PAGE_TITLES:
+        if marker in lowered:
+            return status
+    return 200
+
 
 class WebSession:
     """
@@ -217,19 +246,32 @@ class WebSession:
 
     def get(self, url: str, timeout: int = 25):
         """
-        Navigue vers une URL avec délai aléatoire pour simuler un comportement humain.
+        Navigue vers une URL en respectant le limiteur adaptatif du domaine
+        (partagé avec les téléchargements HTTP, voir ratelimit.py).
 
         Args:
             url (str): URL de destination
             timeout (int): Timeout de chargement en secondes (défaut: 25)
         """
+        limiter = get_rate_limiter()
+        waited = limiter.acquire(url)
+        if waited > 0:
+            logger.debug(f"Navigation retardée de {waited:.2f}s (limiteur {url})")
+
         self.driver.set_page_load_timeout(timeout)
         logger.info(f"Navigation vers : {url}")
         self.driver.get(url)
 
-        # Délai aléatoire pour anti-détection
-        delay = random.uniform(0.5, 1.5)
-        time.sleep(delay)
+        try:
+            status = page_status(self.driver.title)
+        except Exception as e:
+            logger.debug(f"Titre de page illisible ({url}) : {e}")
+            status = None
+        if status is None:
+            return
+        if status != 200:
+            logger.warning(f"Page de blocage détectée ({status}) : {url}")
+        limiter.record_response(url, status)
 
     @property
     def page_source(self) -> str:
@@ -0,0 +1,200 @@
+# driver_manager.py
+"""
+Gestionnaire de drivers Selenium durables PANELia
+
+Avant : app.py fermait le pool de drivers après chaque lot
+(engine.shutdown()) et recréait un ScraperEngine au lot suivant ; la
+découverte ouvrait en plus sa propre WebSession. Chaque lot payait plusieurs
+démarrages à froid de Chrome (plusieurs secondes chacun).
+
+Maintenant :
+- Un gestionnaire par processus (get_driver_manager) garde, par réglage
+  (headless, profil), une flotte DriverPool chaude entre les lots et les
+  reruns Streamlit
+- Découverte et traitement empruntent à la même flotte : la découverte
+  chauffe les drivers du lot qui suit
+- Fermeture d'une flotte inutilisée depuis idle_timeout secondes (thread de
+  ménage), recyclage d'un driver plus vieux que max_age à l'emprunt
+- Le moteur qui reçoit une flotte partagée ne la ferme pas à son arrêt ;
+  close_all() (appelé aussi à la sortie du processus) ferme tout
+
+Usage:
+    manager = get_driver_manager()
+    with manager.lease(headless=True) as session:
+        chapters, title = discover_chapters(url, session)
+    engine = ScraperEngine(num_drivers=2, driver_manager=manager)
+    print(manager.get_stats())
+
+Auteur: PANELia Team
+Date: 2025-12-18
+"""
+
+import atexit
+import threading
+from contextlib import contextmanager
+from typing import Any, Callable, Dict, Iterator, Optional, Tuple
+
+from loguru import logger
+
+from panelia.core.driver_pool import DriverPool, driver_is_alive
+
+PoolKey = Tuple[bool, Optional[str]]
+
+
+def default_session_factory(headless: bool, profile_id: Optional[str]) -> Callable[[], Any]:
+    def factory():
+        from panelia.core.driver import WebSession
+
+        return WebSession(headless=headless, profile_id=profile_id)
+    return factory
+
+
+class WarmDriverManager:
+    """
+    Flottes de drivers partagées par réglage (headless, profil), gardées
+    chaudes entre les lots. Thread-safe.
+    """
+
+    def __init__(
+        self,
+        idle_timeout: Optional[float] = 600,
+        max_age: Optional[float] = 1800,
+        start_delay: float = 0.8,
+        reap_interval: float = 30,
+        session_factory: Callable[[bool, Optional[str]], Callable[[], Any]] = default_session_factory,
+        health_check: Optional[Callable[[Any], bool]] = driver_is_alive,
+    ):
+        """
+        Args:
+            idle_timeout: Flotte fermée après N secondes sans emprunt (None = jamais)
+            max_age: Âge (s) au-delà duquel un driver est recyclé à l'emprunt (None = jamais)
+            start_delay: Pause avant chaque création de driver
+            reap_interval: Période (s) du thread de ménage
+            session_factory: (headless, profil) -> fabrique de sessions
+            health_check: Contrôle de santé à l'emprunt (voir DriverPool)
+        """
+        self.idle_timeout = idle_timeout
+        self.max_age = max_age
+        self.start_delay = start_delay
+        self.reap_interval = reap_interval
+        self.session_factory = session_factory
+        self.health_check = health_check
+
+        self._pools: Dict[PoolKey, DriverPool] = {}
+        self._lock = threading.Lock()
+        self._stop = threading.Event()
+        self._reaper: Optional[threading.Thread] = None
+
+    def pool(self, headless: bool = True, profile_id: Optional[str] = None, size: int = 1) -> DriverPool:
+        """
+        Flotte partagée pour ce réglage, agrandie à `size` drivers si besoin.
+        Elle n'est pas démarrée ici : ensure_started() (ou lease()) s'en charge.
+        """
+        key = (headless, profile_id)
+        with self._lock:
+            pool = self._pools.get(key)
+            if pool is None:
+                pool = DriverPool(
+                    self.session_factory(headless, profile_id),
+                    size=size,
+                    start_delay=self.start_delay,
+                    health_check=self.health_check,
+                    max_age=self.max_age,
+                )
+                self._pools[key] = pool
+            self._start_reaper()
+        pool.ensure_size(size)
+        return pool
+
+    @contextmanager
+    def lease(self, headless: bool = True, profile_id: Optional[str] = None, priority: int = 0, timeout: Optional[float] = None) -> Iterator[Any]:
+        """with manager.lease() as session : emprunt d'un driver chaud (démarre la flotte au besoin)."""
+        pool = self.pool(headless, profile_id)
+        pool.ensure_started()
+        with pool.lease(timeout, priority=priority) as session:
+            yield session
+
+    def _start_reaper(self) -> None:
+        if self.idle_timeout is None or self._reaper is not None:
+            return
+        self._reaper = threading.Thread(target=self._reap_loop, name="panelia-driver-reaper", daemon=True)
+        self._reaper.start()
+
+    def _reap_loop(self) -> None:
+        stop = self._stop
+        while not stop.wait(self.reap_interval):
+            self.reap()
+
+    def reap(self) -> int:
+        """Ferme les flottes inactives depuis idle_timeout ; retourne leur nombre."""
+        if self.idle_timeout is None:
+            return 0
+        with self._lock:
+            pools = list(self._pools.items())
+        closed = 0
+        for key, pool in pools:
+            try:
+                closed += int(pool.close_if_idle(self.idle_timeout))
+            except Exception as e:
+                logger.warning(f"[DRIVERS] Fermeture de la flotte {key} sur inactivité en échec : {e}")
+        return closed
+
+    def get_stats(self) -> Dict[str, Dict[str, Any]]:
+        """Statistiques DriverPool par réglage ("headless/profil")."""
+        with self._lock:
+            pools = list(self._pools.items())
+        return {
+            f"{'headless' if headless else 'visible'}/{profile_id or 'temp'}": pool.get_stats()
+            for (headless, profile_id), pool in pools
+        }
+
+    def close_all(self) -> None:
+        """
+        Ferme toutes les flottes et arrête le ménage. Elles restent
+        enregistrées : un emprunt ultérieur les redémarre.
+        """
+        with self._lock:
+            pools = list(self._pools.values())
+            self._stop.set()
+            self._stop, self._reaper = threading.Event(), None
+        for pool in pools:
+            if pool.started:
+                pool.close()
+
+
+# Instance globale (singleton)
+_global_manager: Optional[WarmDriverManager] = None
+_global_manager_lock = threading.Lock()
+
+
+def get_driver_manager() -> WarmDriverManager:
+    """
+    Retourne le gestionnaire global de drivers (fermé à la sortie du processus).
+
+    Returns:
+        WarmDriverManager: Instance singleton
+    """
+    global _global_manager
+    if _global_manager is None:
+        with _global_manager_lock:
+            if _global_manager is None:
+                _global_manager = WarmDriverManager()
+                atexit.register(_close_global_manager)
+    return _global_manager
+
+
+def _close_global_manager() -> None:
+    if _global_manager is not None:
+        _global_manager.close_all()
+
+
+def reset_driver_manager(**kwargs) -> WarmDriverManager:
+    """Ferme toutes les flottes et repart d'un gestionnaire neuf."""
+    global _global_manager
+    with _global_manager_lock:
+        if _global_manager is not None:
+            _global_manager.close_all()
+        else:
+            atexit.register(_close_global_manager)
+        _global_manager = WarmDriverManager(**kwargs)
+    return _global_manager
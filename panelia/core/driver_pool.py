@@ -0,0 +1,361 @@
+# driver_pool.py
+"""
+Pool de drivers Selenium à bail exclusif PANELia
+
+Avant : chaque chapitre recevait driver_pool[idx % nb_drivers] à la soumission
+(puis une voie fixe par driver) : un driver lent bloquait tous les chapitres
+de sa voie pendant que les autres drivers restaient inactifs, et rien ne
+disait si ajouter des drivers aurait aidé.
+
+Maintenant :
+- Emprunt bloquant / restitution : un driver n'est piloté que par le
+  détenteur du bail, et seulement le temps de l'extraction des URLs
+- Attribution du driver le moins récemment utilisé (LRU) : la charge et les
+  cookies/caches se répartissent sur toute la flotte
+- Contrôle de santé à l'emprunt : un driver mort (Chrome planté, session
+  perdue) est fermé et remplacé avant d'être prêté
+- Métriques d'attente (moyenne, p95, max) et taux d'occupation : une attente
+  élevée avec occupation proche de 100 % = ajouter des drivers aide
+- Emprunteurs en attente servis par priorité décroissante, puis dans l'ordre
+  d'arrivée (plusieurs séries sur la même flotte, voir core/jobs.py)
+- Flotte durable (voir core/driver_manager.py) : âge max d'un driver
+  (recyclé à l'emprunt), démarrage et agrandissement à la demande,
+  fermeture si inutilisée depuis N secondes
+
+Usage:
+    pool = DriverPool(lambda: WebSession(headless=True), size=3)
+    pool.start()
+    with pool.lease() as driver_ws:
+        urls = scrape_images_smart(driver_ws, chap_url)
+    print(pool.get_stats())
+    pool.close()
+
+Auteur: PANELia Team
+Date: 2025-12-18
+"""
+
+import heapq
+import itertools
+import threading
+import time
+from collections import deque
+from contextlib import contextmanager
+from typing import Any, Callable, Deque, Dict, Iterator, List, Optional
+
+from loguru import logger
+
+
+def driver_is_alive(driver_ws: Any) -> bool:
+    """
+    Contrôle de santé par défaut : un aller-retour WebDriver léger.
+    Un Chrome planté ou une session invalide lève ici.
+    """
+    try:
+        driver = getattr(driver_ws, "driver", None)
+        return driver is not None and bool(driver.window_handles)
+    except Exception:
+        return False
+
+
+class DriverPool:
+    """
+    Flotte fixe de sessions Selenium prêtées une à la fois.
+
+    `factory()` crée une session (WebSession) ; elle est appelée au démarrage
+    puis pour remplacer un driver qui échoue au contrôle de santé.
+    """
+
+    def __init__(
+        self,
+        factory: Callable[[], Any],
+        size: int = 3,
+        start_delay: float = 0.0,
+        health_check: Optional[Callable[[Any], bool]] = driver_is_alive,
+        max_age: Optional[float] = None,
+    ):
+        """
+        Args:
+            factory: Crée une nouvelle session
+            size: Nombre de drivers de la flotte
+            start_delay: Pause avant chaque création (patch undetected_chromedriver)
+            health_check: driver -> bool, appelé à chaque emprunt (None = aucun)
+            max_age: Âge (s) au-delà duquel un driver est remplacé à l'emprunt (None = jamais)
+        """
+        self.factory = factory
+        self.size = max(1, size)
+        self.start_delay = start_delay
+        self.health_check = health_check
+        self.max_age = max_age
+
+        self._idle: Deque[Any] = deque()
+        self._all: List[Any] = []
+        # id(driver) -> création (recyclage par âge)
+        self._created_at: Dict[int, float] = {}
+        # id(driver) -> début du bail en cours
+        self._leased_at: Dict[int, float] = {}
+        # Tas des emprunteurs en attente : (-priorité, ordre d'arrivée)
+        self._waiters: List[tuple] = []
+        self._seq = itertools.count()
+        self._cond = threading.Condition()
+        self._start_lock = threading.Lock()
+        self._closed = False
+        # Dernier emprunt ou restitution (fermeture sur inactivité)
+        self._last_activity = time.monotonic()
+
+        self._started_at: Optional[float] = None
+        self._checkouts = 0
+        self._blocked = 0
+        self._wait_total = 0.0
+        self._wait_max = 0.0
+        self._recent_waits: Deque[float] = deque(maxlen=1000)
+        self._busy_total = 0.0
+        self._health_failures = 0
+        self._replaced = 0
+        self._recycled = 0
+        self._starts = 0
+
+    def __len__(self) -> int:
+        return len(self._all)
+
+    @property
+    def started(self) -> bool:
+        return bool(self._all)
+
+    def _create(self, count: int) -> List[Any]:
+        """Crée `count` drivers, ou aucun : en cas d'échec les drivers créés sont fermés."""
+        drivers = []
+        for i in range(count):
+            try:
+                # small delay to reduce race conditions during undetected_chromedriver patching
+                time.sleep(self.start_delay)
+                drivers.append(self.factory())
+                logger.info(f"Driver {i} initialisé.")
+            except Exception as e:
+                logger.error(f"Erreur création driver {i} : {e}", exc_info=True)
+                for d in drivers:
+                    self._quit(d)
+                raise
+        with self._cond:
+            now = time.monotonic()
+            for d in drivers:
+                self._created_at[id(d)] = now
+        return drivers
+
+    def start(self) -> None:
+        """Crée toute la flotte, ou aucune : en cas d'échec les drivers créés sont fermés."""
+        logger.info(f"Initialisation du pool de {self.size} drivers Selenium...")
+        drivers = self._create(self.size)
+        with self._cond:
+            self._all = list(drivers)
+            self._idle = deque(drivers)
+            self._closed = False
+            self._started_at = time.monotonic()
+            self._last_activity = self._started_at
+            self._starts += 1
+            self._cond.notify_all()
+        logger.info("Pool de drivers initialisé.")
+
+    def ensure_started(self) -> bool:
+        """Démarre la flotte si besoin (un seul démarrage si plusieurs lots arrivent ensemble)."""
+        with self._start_lock:
+            if self.started:
+                with self._cond:
+                    # Emprunt imminent : la fermeture sur inactivité attendra
+                    self._last_activity = time.monotonic()
+                return False
+            self.start()
+            return True
+
+    def ensure_size(self, size: int) -> None:
+        """Agrandit la flotte à `size` drivers (créés tout de suite si elle tourne)."""
+        with self._start_lock:
+            missing = size - self.size
+            if missing <= 0:
+                return
+            self.size = size
+            if not self.started:
+                return
+            logger.info(f"[DRIVERS] Agrandissement du pool : +{missing} driver(s)")
+            drivers = self._create(missing)
+            with self._cond:
+                self._all.extend(drivers)
+                self._idle.extend(drivers)
+                self._cond.notify_all()
+
+    def acquire(self, timeout: Optional[float] = None, priority: int = 0) -> Any:
+        """
+        Emprunte le driver libre le moins récemment utilisé (bloque s'il n'y en a pas).
+        Un driver libéré va à l'emprunteur en attente de plus haute priorité.
+
+        Raises:
+            TimeoutError: Aucun driver libéré dans `timeout` secondes
+            RuntimeError: Pool fermé, ou plus aucun driver utilisable
+        """
+        start = time.monotonic()
+        deadline = None if timeout is None else start + timeout
+        with self._cond:
+            blocked = False
+            ticket = (-priority, next(self._seq))
+            heapq.heappush(self._waiters, ticket)
+            try:
+                while not self._idle or self._waiters[0] != ticket:
+                    if self._closed or not self._all:
+                        raise RuntimeError("Pool de drivers fermé ou vide")
+                    remaining = None if deadline is None else deadline - time.monotonic()
+                    if remaining is not None and remaining <= 0:
+                        raise TimeoutError(f"Aucun driver libre après {timeout}s")
+                    blocked = True
+                    self._cond.wait(remaining)
+                if self._closed:
+                    raise RuntimeError("Pool de drivers fermé")
+                driver_ws = self._idle.popleft()
+            finally:
+                self._waiters.remove(ticket)
+                heapq.heapify(self._waiters)
+                # Le suivant dans le tas est peut-être servable
+                self._cond.notify_all()
+
+        driver_ws = self._ensure_healthy(driver_ws)
+
+        waited = time.monotonic() - start
+        with self._cond:
+            self._checkouts += 1
+            self._blocked += int(blocked)
+            self._wait_total += waited
+            self._wait_max = max(self._wait_max, waited)
+            self._recent_waits.append(waited)
+            self._leased_at[id(driver_ws)] = time.monotonic()
+            self._last_activity = time.monotonic()
+        return driver_ws
+
+    def release(self, driver_ws: Any) -> None:
+        """Rend un driver emprunté : il passe en fin de file (le plus récemment utilisé)."""
+        with self._cond:
+            leased_at = self._leased_at.pop(id(driver_ws), None)
+            if leased_at is not None:
+                self._busy_total += time.monotonic() - leased_at
+            self._last_activity = time.monotonic()
+            if self._closed or driver_ws not in self._all:
+                return
+            self._idle.append(driver_ws)
+            # Tous réveillés : seul l'emprunteur prioritaire le prend
+            self._cond.notify_all()
+
+    @contextmanager
+    def lease(self, timeout: Optional[float] = None, priority: int = 0) -> Iterator[Any]:
+        """with pool.lease() as driver_ws : emprunt exclusif, restitution garantie."""
+        driver_ws = self.acquire(timeout, priority=priority)
+        try:
+            yield driver_ws
+        finally:
+            self.release(driver_ws)
+
+    def _ensure_healthy(self, driver_ws: Any) -> Any:
+        """Driver sain et pas trop vieux, ou son remplaçant (hors verrou : Chrome peut mettre des secondes)."""
+        with self._cond:
+            created_at = self._created_at.get(id(driver_ws))
+        if self.max_age is not None and created_at is not None and time.monotonic() - created_at > self.max_age:
+            # Longue session Chrome : mémoire et cookies accumulés, on repart d'un driver neuf
+            with self._cond:
+                self._recycled += 1
+            logger.info("[DRIVERS] Driver trop ancien, recyclage...")
+        elif self.health_check is None or self.health_check(driver_ws):
+            return driver_ws
+        else:
+            with self._cond:
+                self._health_failures += 1
+            logger.warning("[DRIVERS] Driver en échec au contrôle de santé, remplacement...")
+        with self._cond:
+            self._created_at.pop(id(driver_ws), None)
+        self._quit(driver_ws)
+        try:
+            replacement = self.factory()
+        except Exception as e:
+            # La flotte rétrécit ; si elle est vide, les emprunteurs en attente échouent
+            with self._cond:
+                self._all.remove(driver_ws)
+                self._cond.notify_all()
+            logger.error(f"[DRIVERS] Remplacement impossible ({len(self._all)} driver(s) restant(s)) : {e}")
+            raise
+        with self._cond:
+            self._all[self._all.index(driver_ws)] = replacement
+            self._created_at[id(replacement)] = time.monotonic()
+            self._replaced += 1
+        logger.info("[DRIVERS] Driver remplacé.")
+        return replacement
+
+    @staticmethod
+    def _quit(driver_ws: Any) -> None:
+        try:
+            driver_ws.quit()
+        except Exception:
+            pass
+
+    def get_stats(self) -> Dict[str, Any]:
+        """Emprunts, attentes (ms), occupation de la flotte et remplacements."""
+        with self._cond:
+            waits = sorted(self._recent_waits)
+            p95 = waits[min(len(waits) - 1, int(len(waits) * 0.95))] if waits else 0.0
+            elapsed = time.monotonic() - self._started_at if self._started_at is not None else 0.0
+            capacity = elapsed * len(self._all)
+            return {
+                "size": len(self._all),
+                "idle": len(self._idle),
+                "waiting": len(self._waiters),
+                "in_use": len(self._all) - len(self._idle),
+                "checkouts": self._checkouts,
+                "blocked_checkouts": self._blocked,
+                "avg_wait_ms": round(self._wait_total / self._checkouts * 1000, 1) if self._checkouts else 0.0,
+                "p95_wait_ms": round(p95 * 1000, 1),
+                "max_wait_ms": round(self._wait_max * 1000, 1),
+                # Part du temps où les drivers étaient prêtés (temps des baux terminés)
+                "utilisation": round(min(1.0, self._busy_total / capacity), 3) if capacity > 0 else 0.0,
+                "health_failures": self._health_failures,
+                "replaced": self._replaced,
+                "recycled": self._recycled,
+                "starts": self._starts,
+                "idle_for_s": round(self.idle_for(), 1),
+            }
+
+    def idle_for(self) -> float:
+        """Secondes sans emprunt ni driver prêté (0 si la flotte sert ou est arrêtée)."""
+        with self._cond:
+            if not self._all or self._leased_at or self._waiters:
+                return 0.0
+            return time.monotonic() - self._last_activity
+
+    def close_if_idle(self, idle_timeout: float) -> bool:
+        """Ferme la flotte si personne ne l'a utilisée depuis `idle_timeout` s (vérifié sous verrou)."""
+        # Démarrage ou agrandissement en cours : ce n'est pas le moment
+        if not self._start_lock.acquire(blocking=False):
+            return False
+        try:
+            with self._cond:
+                if not self._all or self._leased_at or self._waiters:
+                    return False
+                if time.monotonic() - self._last_activity < idle_timeout:
+                    return False
+                drivers, self._all, self._idle = self._all, [], deque()
+                self._created_at.clear()
+                self._cond.notify_all()
+        finally:
+            self._start_lock.release()
+        logger.info(f"[DRIVERS] Pool inactif depuis {idle_timeout:.0f}s : fermeture de {len(drivers)} driver(s)")
+        for d in drivers:
+            self._quit(d)
+        return True
+
+    def close(self) -> None:
+        """Ferme tous les drivers (les emprunteurs en attente reçoivent RuntimeError)."""
+        logger.info("Fermeture du driver pool...")
+        with self._cond:
+            self._closed = True
+            drivers, self._all, self._idle = self._all, [], deque()
+            self._created_at.clear()
+            self._cond.notify_all()
+        for idx, d in enumerate(drivers):
+            try:
+                d.quit()
+                logger.info(f"Driver pool: instance {idx} fermée.")
+            except Exception:
+                logger.warning(f"Driver pool: échec fermeture instance {idx}.")
@@ -6,93 +6,304 @@ les résultats via une callback exécutée côté UI (streamlit).
 """
 
 import time
-import random
 import os
 from pathlib import Path
-from concurrent.futures import ThreadPoolExecutor
+from collections import deque
+from concurrent.futures import Future, ThreadPoolExecutor
+from functools import partial
 from typing import List, Dict, Any, Optional
 import threading
+from contextlib import contextmanager, nullcontext
 
 from loguru import logger
+from panelia.core.autotune import ConcurrencyTuner
 from panelia.core.driver import WebSession
+from panelia.core.driver_manager import WarmDriverManager
+from panelia.core.driver_pool import DriverPool
+from panelia.core.events import (
+    CHAPTER_FINISHED,
+    CHAPTER_STARTED,
+    IMAGE_DOWNLOADED,
+    IMAGE_SAVED,
+    IMAGES_FOUND,
+    EventStream,
+    emit_nothing,
+)
+from panelia.core.journal import JOURNAL_FILENAME, VERIFY_MODES, BatchJournal, content_digest, journal_url
+from panelia.core.pipeline import StagedPipeline
+from panelia.core.process_pool import PanelInfo, ProcessImageWorkers
+from panelia.core.prefetch import ImageListPrefetcher
+from panelia.core.scheduler import DownloadScheduler
+from panelia.core.sync import SeriesSync
 from panelia.scrapers.factory import (
     scrape_images_mangadex,
     scrape_images_smart,
     process_image_smart
 )
 
+from panelia.scrapers.incremental import IncrementalSlicer, SlicedImage
+from panelia.scrapers.mangadex import get_mangadex_home, reset_mangadex_home
 from panelia.utils.http import stream_download_images
+from panelia.utils.async_http import (
+    AsyncImageDownloader,
+    configure_async_downloader,
+    stream_download_images_async,
+    warm_up_async_downloader,
+)
+from panelia.utils.cache import DownloadCache
+from panelia.utils.cancellation import CancellationToken, OperationCancelled
+from panelia.utils.http_pool import get_client_pool, origin_of
+from panelia.utils.ratelimit import get_rate_limiter
 from panelia.utils.metrics import get_collector
 from panelia.utils.validation import get_validator, ValidationError
 from panelia.utils.errors import get_error_handler, classify_and_log_error, ErrorCategory
 
+# Moteurs de téléchargement disponibles (même contrat générateur de bytes) :
+# "threaded" = ThreadPoolExecutor par chapitre, "async" = boucle asyncio partagée
+DOWNLOAD_BACKENDS = ("threaded", "async")
+# Découpage + encodage : "thread" = étages du pipeline, "process" = ProcessPoolExecutor
+PROCESSING_BACKENDS = ("thread", "process")
+# Erreur rapportée pour un chapitre arrêté par un CancellationToken
+CANCELLED_MESSAGE = "Annulé"
+# Paramètres qui changent les planches produites : un chapitre journalisé avec
+# d'autres valeurs est refait à la reprise
+OUTPUT_SETTINGS = ("quality_value", "min_image_width_value", "enable_cleaning", "mangadex_data_saver")
+
+
+def output_settings(params: Dict[str, Any]) -> Dict[str, Any]:
+    return {key: params.get(key) for key in OUTPUT_SETTINGS}
+
+
 class ScraperEngine:
     def __init__(
         self,
         work_dir: str = "output",
         num_drivers: int = 3,
         image_workers_per_chap: int = 4,
-        throttle_min: float = 0.08,
-        throttle_max: float = 0.15,
         driver_start_delay: float = 0.8,
         headless: bool = True,
-        profile_id: Optional[str] = None
+        profile_id: Optional[str] = None,
+        download_backend: str = "threaded",
+        reorder_window: Optional[int] = None,
+        cache_dir: Optional[str] = None,
+        cache_max_mb: int = 2048,
+        spool_threshold_mb: Optional[float] = 8,
+        prefetch_depth: int = 2,
+        prefetch_max_age: Optional[float] = 600,
+        warm_connections: bool = True,
+        per_host_limit: int = 8,
+        incremental_decode: bool = True,
+        cpu_workers: Optional[int] = None,
+        clean_workers: int = 2,
+        stage_queue_size: Optional[int] = None,
+        processing_backend: str = "thread",
+        process_workers: Optional[int] = None,
+        journal: bool = True,
+        journal_verify: str = "size",
+        autotune: bool = False,
+        autotune_max_limit: int = 16,
+        autotune_state: Optional[str] = "cache/autotune.json",
+        driver_manager: Optional[WarmDriverManager] = None
     ):
         # Valider les paramètres d'entrée
         validator = get_validator()
         num_drivers = validator.validate_num_drivers(num_drivers)
         image_workers_per_chap = validator.validate_max_workers(image_workers_per_chap)
+        if download_backend not in DOWNLOAD_BACKENDS:
+            raise ValidationError(f"Moteur de téléchargement inconnu : {download_backend} (attendu : {', '.join(DOWNLOAD_BACKENDS)})")
+        if processing_backend not in PROCESSING_BACKENDS:
+            raise ValidationError(f"Moteur de traitement inconnu : {processing_backend} (attendu : {', '.join(PROCESSING_BACKENDS)})")
+        if journal_verify not in VERIFY_MODES:
+            raise ValidationError(f"Vérification du journal inconnue : {journal_verify} (attendu : {', '.join(VERIFY_MODES)})")
 
         self.work_dir = Path(work_dir)
         self.num_drivers = max(1, num_drivers)
         self.image_workers_per_chap = max(1, image_workers_per_chap)
-        self.throttle_min = throttle_min
-        self.throttle_max = throttle_max
         self.driver_start_delay = driver_start_delay
         self.headless = headless
         self.profile_id = profile_id
-
-        self.driver_pool: List[WebSession] = []
-        self.global_download_slots = threading.Semaphore(self.num_drivers * self.image_workers_per_chap)
-
-        logger.info(f"ScraperEngine initialisé avec validation - Drivers: {self.num_drivers}, Workers: {self.image_workers_per_chap}")
+        self.download_backend = download_backend
+        # Images max en RAM par chapitre (en vol + en attente de découpage)
+        self.reorder_window = reorder_window
+        # Cache disque des téléchargements (None = désactivé)
+        self.download_cache = DownloadCache(cache_dir, max_bytes=cache_max_mb * 1024 * 1024) if cache_dir else None
+        # Au-delà de ce seuil, une image téléchargée part sur disque (None = tout en RAM)
+        self.spool_threshold = int(spool_threshold_mb * 1024 * 1024) if spool_threshold_mb else None
+        # Décodage et découpage pendant le téléchargement (moteur threadé, mode spool)
+        self.incremental_decode = incremental_decode
+        # Chapitres dont la liste d'images est extraite en avance, au-delà des
+        # chapitres en cours (0 = désactivé)
+        self.prefetch_depth = max(0, prefetch_depth)
+        # Âge max d'une liste extraite en avance avant ré-extraction (URLs à jeton)
+        self.prefetch_max_age = prefetch_max_age
+        # Pré-chauffage DNS + connexions vers chaque nouvel hôte d'images du lot
+        self.warm_connections = warm_connections
+        # Journal par série (output/<série>/.panelia_journal.jsonl) : reprise
+        # d'un lot interrompu en sautant les chapitres déjà vérifiés sur disque
+        self.journal_enabled = journal
+        self.journal_verify = journal_verify
+        self._warmed_origins = set()
+        self._warmup_lock = threading.Lock()
+        # Lots en cours sur ce moteur (plusieurs séries en parallèle, voir core/jobs.py)
+        self._active_batches = 0
+
+        # Drivers prêtés un à un, le temps d'extraire les URLs d'un chapitre ;
+        # flotte du gestionnaire (chaude entre les lots, non fermée par ce moteur) si fourni
+        self.shared_driver_pool = driver_manager is not None
+        if self.shared_driver_pool:
+            self.driver_pool = driver_manager.pool(self.headless, self.profile_id, size=self.num_drivers)
+        else:
+            self.driver_pool = DriverPool(
+                factory=lambda: WebSession(headless=self.headless, profile_id=self.profile_id),
+                size=self.num_drivers,
+                start_delay=driver_start_delay
+            )
+        # Téléchargements simultanés : plafond global strict et par hôte, partagés
+        # à tour de rôle entre les chapitres actifs
+        self.scheduler = None
+        # Auto-réglage de la concurrence par hôte (moteur threadé uniquement) :
+        # chaque hôte part de l'ancien réglage, le plafond global reste celui demandé
+        self.tuner = None
+        if self.download_backend == "async":
+            configure_async_downloader(AsyncImageDownloader(per_host_limit=per_host_limit))
+        else:
+            max_concurrency = self.num_drivers * self.image_workers_per_chap
+            if autotune:
+                max_limit = min(autotune_max_limit, max_concurrency)
+                per_host_limit = min(per_host_limit, max_limit)
+                self.tuner = ConcurrencyTuner(
+                    max_limit=max_limit,
+                    initial_limit=per_host_limit,
+                    state_path=autotune_state,
+                    # 429 des nœuds MD@Home attribués à uploads.mangadex.org
+                    host_aliases=lambda host: get_mangadex_home().served_hosts(host)
+                )
+            self.scheduler = DownloadScheduler(
+                max_concurrency=max_concurrency,
+                per_host_limit=per_host_limit
+            )
+            if self.tuner is not None:
+                self.tuner.attach(self.scheduler)
+
+        # Étages après téléchargement, chacun son pool : découpage (CPU), nettoyage IA
+        # (sidecar HTTP), encodage JPEG + écriture (CPU) ; files bornées entre eux
+        cpu_workers = cpu_workers or max(1, (os.cpu_count() or 2) - 1)
+        # Mode processus : découpage + encodage hors GIL ; les threads des étages
+        # slice/encode ne font plus que transmettre aux processus (démarrés et
+        # pré-chauffés dès maintenant)
+        self.processing_backend = processing_backend
+        self.process_workers = None
+        if processing_backend == "process":
+            self.process_workers = ProcessImageWorkers(process_workers)
+            cpu_workers = self.process_workers.workers
+        self.pipeline = StagedPipeline(
+            {"slice": cpu_workers, "clean": max(1, clean_workers), "encode": cpu_workers},
+            queue_size=stage_queue_size
+        )
+        self.pipeline.attach("browser", self.driver_pool.get_stats)
+        if self.scheduler is not None:
+            self.pipeline.attach("network", self.scheduler.get_stats)
+        if self.tuner is not None:
+            self.pipeline.attach("tuning", self.tuner.get_stats)
+        if self.process_workers is not None:
+            self.pipeline.attach("process", self.process_workers.get_stats)
+
+        logger.info(f"ScraperEngine initialisé avec validation - Drivers: {self.num_drivers}, Workers: {self.image_workers_per_chap}, Téléchargement: {self.download_backend}")
 
     def start_driver_pool(self):
-        logger.info(f"Initialisation du pool de {self.num_drivers} drivers Selenium...")
-        drivers = []
-        for i in range(self.num_drivers):
-            try:
-                # small delay to reduce race conditions during undetected_chromedriver patching
-                time.sleep(self.driver_start_delay)
-                ws = WebSession(headless=self.headless, profile_id=self.profile_id)
-                drivers.append(ws)
-                logger.info(f"Driver {i} initialisé.")
-            except Exception as e:
-                logger.error(f"Erreur création driver {i} : {e}", exc_info=True)
-                # cleanup
-                for d in drivers:
-                    try: d.quit()
-                    except: pass
-                raise
-        self.driver_pool = drivers
-        logger.info("Pool de drivers initialisé.")
+        self.driver_pool.ensure_started()
 
     def stop_driver_pool(self):
-        logger.info("Fermeture du driver pool...")
-        for idx, d in enumerate(self.driver_pool):
-            try:
-                d.quit()
-                logger.info(f"Driver pool: instance {idx} fermée.")
-            except Exception:
-                logger.warning(f"Driver pool: échec fermeture instance {idx}.")
-        self.driver_pool = []
+        if self.shared_driver_pool:
+            # Rendue au gestionnaire, qui la garde chaude pour le lot suivant
+            return
+        self.driver_pool.close()
+
+    def shutdown(self):
+        """Libère drivers, threads des étages, ordonnanceur et processus de travail."""
+        self.stop_driver_pool()
+        if self.scheduler is not None:
+            self.scheduler.shutdown()
+        self.pipeline.shutdown()
+        if self.process_workers is not None:
+            self.process_workers.shutdown()
+
+    def sync_series(self, discovered: Dict[float, str], params: Dict[str, Any], force: bool = False, **batch_kwargs):
+        """
+        Synchronisation incrémentale : ne traite que les chapitres découverts
+        manquants ou modifiés localement (voir core/sync.py). batch_kwargs
+        est transmis à run_chapter_batch (callbacks, cancel_token).
 
-    def _throttle_short(self):
-        time.sleep(random.uniform(self.throttle_min, self.throttle_max))
+        Returns:
+            (SyncPlan, résultats des chapitres traités)
+        """
+        validated_params = get_validator().validate_params_dict(params)
+        sync = SeriesSync(
+            self.series_dir(validated_params.get("final_manhwa_name", "unknown")),
+            output_settings(params),
+            verify=self.journal_verify
+        )
+        plan = sync.plan(discovered, force=force)
+        if plan.unchanged:
+            return plan, []
+        results = self.run_chapter_batch(plan.to_process, params, **batch_kwargs) if plan.to_process else []
+        sync.record(plan, results)
+        return plan, results
+
+    def _extract_image_urls(self, chap_url: str, driver_ws: Optional[WebSession], validated_params: Dict[str, Any]):
+        """
+        Extrait les URLs d'images d'un chapitre.
+        Retourne (image_urls, url_resolver) ; url_resolver est None hors MangaDex.
+        """
+        if "mangadex" in chap_url:
+            image_urls = scrape_images_mangadex(chap_url, data_saver=bool(validated_params.get("mangadex_data_saver")))
+            # Failover MD@Home : nœud résolu à chaque tentative, stats partagées par le lot
+            return image_urls, get_mangadex_home()
+        return scrape_images_smart(driver_ws, chap_url, min_width=validated_params.get("min_image_width_value", 400)), None
 
-    def _process_single_chapter(self, chap_num: float, chap_url: str, driver_ws: WebSession, params: Dict[str, Any]) -> Dict[str, Any]:
+    def _warm_up_hosts(self, image_urls: List[str], url_resolver=None) -> None:
+        """
+        Pré-chauffe (DNS + connexions en parallèle) les hôtes d'images pas
+        encore vus dans ce lot, avant le gros des téléchargements du chapitre.
+        """
+        samples = {}
+        for url in image_urls:
+            samples.setdefault(origin_of(url), url)
+        # MangaDex : on chauffe le nœud MD@Home réellement contacté, pas l'origine canonique
+        targets = [url_resolver.resolve(url) if url_resolver is not None else url for url in samples.values()]
+
+        with self._warmup_lock:
+            targets = [url for url in targets if origin_of(url) not in self._warmed_origins]
+            self._warmed_origins.update(origin_of(url) for url in targets)
+        if not targets:
+            return
+
+        start = time.perf_counter()
+        try:
+            if self.download_backend == "async":
+                report = warm_up_async_downloader(targets, connections=self.image_workers_per_chap)
+            else:
+                report = get_client_pool().warm_up(targets, connections=self.image_workers_per_chap)
+        except Exception as e:
+            # Simple optimisation : les téléchargements ouvriront leurs connexions eux-mêmes
+            logger.warning(f"[POOL] Pré-chauffage impossible : {e}")
+            return
+        logger.info(f"[POOL] {len(targets)} hôte(s) pré-chauffé(s) en {time.perf_counter() - start:.2f}s : {report}")
+
+    def series_dir(self, manhwa_name: str) -> Path:
+        """Dossier de sortie d'une série : work_dir/<nom assaini>."""
+        safe_manhwa_name = ''.join(c for c in manhwa_name if c.isalnum() or c in (' ', '-', '_')).strip().replace(' ', '_')
+        return Path(self.work_dir) / safe_manhwa_name
+
+    def _process_single_chapter(self, chap_num: float, chap_url: str, driver_ws: WebSession, params: Dict[str, Any], image_urls_provider=None, emit=emit_nothing, cancel_token: Optional[CancellationToken] = None, journal: Optional[BatchJournal] = None, scheduler=None) -> Dict[str, Any]:
         """
         Process un seul chapitre. driver_ws peut être None pour les sites 'driverless'.
+        image_urls_provider() -> (image_urls, url_resolver) remplace l'extraction
+        directe quand la liste a été extraite en avance (ImageListPrefetcher).
+        emit(kind, chap_num, **data) publie la progression (voir core/events.py) ;
+        cancel_token interrompt extraction et téléchargements (erreur "Annulé").
+        journal (BatchJournal) reçoit l'avancement : URLs, empreintes, planches.
+        scheduler : voie du lot dans l'ordonnanceur (priorité, quota) ; défaut self.scheduler.
         """
         # Valider les entrées
         validator = get_validator()
@@ -110,8 +321,13 @@ class ScraperEngine:
         # Démarrer le tracking des métriques
         collector = get_collector()
         collector.start_chapter(chap_num, chap_url)
+        emit(CHAPTER_STARTED, chap_num, chap_url=chap_url)
+        if journal is not None:
+            journal.chapter_started(chap_num, chap_url)
 
         try:
+            if cancel_token is not None:
+                cancel_token.raise_if_cancelled()
             site_type = "mangadex" if "mangadex" in chap_url else "madara"
             logger.info(f"{prefix} Détection site -> {site_type}")
 
@@ -119,99 +335,292 @@ class ScraperEngine:
             validated_params = validator.validate_params_dict(params)
 
             # extraction des URLs images
-            if site_type == "mangadex":
-                image_urls = scrape_images_mangadex(chap_url)
+            if image_urls_provider is not None:
+                # Liste extraite en avance (ré-extraite si ses URLs ont expiré)
+                image_urls, url_resolver = image_urls_provider()
             else:
-                if driver_ws is None:
+                if site_type != "mangadex" and driver_ws is None:
                     # Sécurité si on arrive ici sans driver pour un site qui en a besoin
                     logger.error(f"{prefix} Site non-MangaDex demande driverless mais driver_ws est None.")
                     return {"chap_num": chap_num, "chap_url": chap_url, "found_count": 0, "downloaded_count": 0, "panels_saved": 0, "error": "Driver manquant pour ce site"}
-                
-                image_urls = scrape_images_smart(driver_ws, chap_url, min_width=validated_params.get("min_image_width_value", 400))
+
+                image_urls, url_resolver = self._extract_image_urls(chap_url, driver_ws, validated_params)
 
             result["found_count"] = len(image_urls)
             logger.info(f"{prefix} {result['found_count']} images trouvées.")
+            emit(IMAGES_FOUND, chap_num, count=len(image_urls))
+            if journal is not None:
+                journal.images_found(chap_num, image_urls)
 
             # Mettre à jour les métriques avec le nombre d'images trouvées
             collector.update_chapter(chap_num, images_found=len(image_urls))
 
             if not image_urls:
                 collector.end_chapter(chap_num, success=False, error_message="Aucune image trouvée")
+                if journal is not None:
+                    journal.chapter_failed(chap_num, "Aucune image trouvée")
                 return result
 
-            # throttle court avant download
-            self._throttle_short()
+            if self.warm_connections:
+                self._warm_up_hosts(image_urls, url_resolver)
 
             # Création du dossier de sortie à l'avance
-            manhwa_name = validated_params.get("final_manhwa_name", "unknown")
-            safe_manhwa_name = ''.join(c for c in manhwa_name if c.isalnum() or c in (' ', '-', '_')).strip().replace(' ', '_')
             safe_chap = str(chap_num).replace('.', '_')
-            output_dir = Path(self.work_dir) / safe_manhwa_name / safe_chap
+            output_dir = self.series_dir(validated_params.get("final_manhwa_name", "unknown")) / safe_chap
             output_dir.mkdir(parents=True, exist_ok=True)
 
             # --- LOOP DE STREAMING ---
-            acquired = self.global_download_slots.acquire(timeout=10)
-            try:
-                # On itère sur le générateur pour traiter les images une par une
-                generator = stream_download_images(
-                    image_urls,
-                    chapter_num=chap_num,
-                    referer=chap_url,
-                    timeout=validated_params.get("timeout_value", 30),
-                    max_workers=self.image_workers_per_chap
+            # On itère sur le générateur pour traiter les images une par une
+            if self.download_backend == "async":
+                # Plafond par hôte déjà partagé par tous les chapitres (boucle unique)
+                download_images = stream_download_images_async
+            else:
+                # Chaque tentative passe par l'ordonnanceur global (plafonds stricts, tour de rôle)
+                # Découpage pendant le transfert : réseau et CPU se chevauchent par image
+                download_images = partial(
+                    stream_download_images,
+                    scheduler=scheduler or self.scheduler,
+                    # (pas en mode processus : le décodage y part avec le découpage)
+                    slicer_factory=IncrementalSlicer if self.incremental_decode and self.process_workers is None else None
                 )
-
-                panels_saved_total = 0
-                downloaded_count = 0
-
-                for img_bytes in generator:
-                    downloaded_count += 1
-                    # Traitement et sauvegarde immédiate d'une image
-                    saved_count = process_and_save_single_image(
-                        img_bytes,
-                        output_dir,
-                        current_panel_index=panels_saved_total,
-                        chap_num=chap_num,
-                        quality=validated_params.get("quality_value", 92),
-                        cleaner=params.get("cleaner_instance") if validated_params.get("enable_cleaning") else None
-                    )
-                    panels_saved_total += saved_count
-                    
-                    # Mise à jour des métriques au fil de l'eau
-                    collector.update_chapter(chap_num, images_downloaded=downloaded_count, images_processed=panels_saved_total)
-
+            generator = download_images(
+                image_urls,
+                chapter_num=chap_num,
+                referer=chap_url,
+                timeout=validated_params.get("timeout_value", 30),
+                max_workers=self.image_workers_per_chap,
+                # Ordre source : la numérotation ChXX_PXXX suit l'ordre des pages
+                ordered=True,
+                window=self.reorder_window,
+                cache=self.download_cache,
+                spool_threshold=self.spool_threshold,
+                url_resolver=url_resolver,
+                cancel_token=cancel_token,
+                # Index source : les images échouées sont sautées par le flux
+                with_index=True
+            )
+
+            downloaded_count = 0
+            quality = validated_params.get("quality_value", 92)
+            cleaner = params.get("cleaner_instance") if validated_params.get("enable_cleaning") else None
+            # Découpages en cours, dans l'ordre source : la numérotation ChXX_PXXX
+            # n'est attribuée qu'aux découpages de tête terminés
+            slicing = deque()
+            max_slicing = self.reorder_window or self.pipeline["slice"].workers * 2
+            panel_futures: List[Future] = []
+            # Images découpées dont les planches s'encodent : (rang, futures, chemins), dans l'ordre
+            saving = deque()
+
+            def queue_panels(index, panels):
+                futures, paths = [], []
+                for img in panels:
+                    panel_path = output_dir / panel_filename(chap_num, len(panel_futures) + 1)
+                    if isinstance(img, PanelInfo):
+                        # Déjà encodée par un processus : renommage dans l'ordre des pages
+                        futures.append(commit_panel(img, panel_path))
+                    else:
+                        futures.append(self._submit_panel(img, panel_path, quality, cleaner))
+                    paths.append(panel_path)
+                    panel_futures.append(futures[-1])
+                saving.append((index, futures, paths))
+
+            def report_saved(wait=False):
+                # Émis depuis ce thread : image_saved précède toujours chapter_finished
+                while saving and (wait or all(f.done() for f in saving[0][1])):
+                    index, futures, paths = saving.popleft()
+                    saved = [path for path, future in zip(paths, futures) if count_saved([future], wait=True)]
+                    emit(IMAGE_SAVED, chap_num, index=index, panels=len(saved))
+                    if journal is not None:
+                        journal.image_saved(chap_num, index, saved)
+
+            for source_index, img_source in generator:
+                image_index = source_index + 1
+                downloaded_count += 1
                 result["downloaded_count"] = downloaded_count
-                result["panels_saved"] = panels_saved_total
-                
-            finally:
-                if acquired:
-                    self.global_download_slots.release()
+                emit(IMAGE_DOWNLOADED, chap_num, index=image_index, downloaded=downloaded_count, found=len(image_urls))
+                # L'image part à l'étage de découpage ; ce thread retourne aussitôt au réseau
+                slice_args = (img_source, output_dir, quality, cleaner is None)
+                if journal is not None:
+                    sliced = self.pipeline["slice"].submit(self._journal_and_slice, journal, chap_num, image_index, *slice_args)
+                else:
+                    sliced = self.pipeline["slice"].submit(self._slice_image, *slice_args)
+                slicing.append((image_index, sliced))
+                while slicing and (slicing[0][1].done() or len(slicing) > max_slicing):
+                    index, sliced = slicing.popleft()
+                    queue_panels(index, sliced.result())
+                report_saved()
+
+                # Mise à jour des métriques au fil de l'eau
+                collector.update_chapter(chap_num, images_downloaded=downloaded_count, images_processed=count_saved(panel_futures))
+
+            while slicing:
+                index, sliced = slicing.popleft()
+                queue_panels(index, sliced.result())
+            report_saved(wait=True)
+            panels_saved_total = count_saved(panel_futures, wait=True)
+            collector.update_chapter(chap_num, images_downloaded=downloaded_count, images_processed=panels_saved_total)
+
+            result["downloaded_count"] = downloaded_count
+            result["panels_saved"] = panels_saved_total
 
             if result["panels_saved"] == 0 and result["downloaded_count"] > 0:
                 logger.warning(f"{prefix} Aucune planche n'a pu être sauvée malgré les téléchargements.")
 
             # Terminer le tracking avec succès
             collector.end_chapter(chap_num, success=True)
+            if journal is not None:
+                if result["panels_saved"]:
+                    journal.chapter_done(chap_num, chap_url, result, output_settings(params))
+                else:
+                    journal.chapter_failed(chap_num, "Aucune planche sauvée")
             return result
 
         except Exception as e:
+            if isinstance(e, OperationCancelled) or (cancel_token is not None and cancel_token.cancelled):
+                # Arrêt demandé (ou effet de l'arrêt : prefetcher fermé...) : pas une erreur du site
+                logger.info(f"{prefix} Chapitre annulé après {result['downloaded_count']} image(s) téléchargée(s)")
+                result["error"] = CANCELLED_MESSAGE
+                collector.end_chapter(chap_num, success=False, error_message=CANCELLED_MESSAGE)
+                if journal is not None:
+                    journal.chapter_failed(chap_num, CANCELLED_MESSAGE)
+                return result
             context = classify_and_log_error(e, chapter_num=chap_num, url=chap_url)
             logger.error(f"{prefix} Erreur critique: {context.user_message}", exc_info=True)
             result["error"] = context.user_message
             collector.end_chapter(chap_num, success=False, error_message=context.user_message)
+            if journal is not None:
+                journal.chapter_failed(chap_num, context.user_message)
             return result
 
-    def run_chapter_batch(self, chapters: Dict[float, str], params: Dict[str, Any], ui_progress_callback=None) -> List[Dict[str, Any]]:
+    def _journal_and_slice(self, journal: BatchJournal, chap_num: float, index: int, img_source, *slice_args) -> List[Any]:
+        """Étage de découpage avec journal : empreinte SHA-256 de l'image téléchargée, puis découpage."""
+        try:
+            journal.image_downloaded(chap_num, index, content_digest(img_source))
+        except Exception as e:
+            logger.warning(f"[JOURNAL][CHAP {chap_num}] Empreinte de l'image {index} impossible : {e}")
+        return self._slice_image(img_source, *slice_args)
+
+    def _slice_image(self, img_source, output_dir: Optional[Path] = None, quality: int = 92, encode: bool = False) -> List[Any]:
+        """
+        Étage de découpage : planches d'une image téléchargée. La source
+        (fichier spoolé) est libérée dès le découpage terminé.
+        En mode processus avec encode=True (pas de nettoyage IA à intercaler),
+        découpage et encodage se font d'un bloc : PanelInfo sous noms temporaires.
+        """
+        try:
+            if isinstance(img_source, SlicedImage):
+                # Déjà découpée pendant le téléchargement
+                return img_source.panels
+            if self.process_workers is not None and encode:
+                return self.process_workers.submit_image(img_source, output_dir, quality).result()
+            return process_image_smart(img_source)
+        except Exception as e:
+            logger.warning(f"Erreur processing image individuelle: {e}")
+            return []
+        finally:
+            if hasattr(img_source, "close"):
+                img_source.close()
+
+    def _submit_panel(self, img, panel_path: Path, quality: int, cleaner=None) -> Future:
+        """Nettoyage IA éventuel puis encodage JPEG, chacun sur son étage."""
+        if cleaner is None:
+            return self.pipeline["encode"].submit(self._encode_panel, img, panel_path, quality)
+        cleaned = self.pipeline["clean"].submit(cleaner.process_pil, img)
+        return self.pipeline["encode"].chain(cleaned, partial(self._encode_panel, panel_path=panel_path, quality=quality))
+
+    def _encode_panel(self, img, panel_path: Path, quality: int):
+        """Encodage JPEG dans ce thread, ou dans un processus (pixels en mémoire partagée)."""
+        if self.process_workers is not None:
+            return self.process_workers.submit_panel(img, panel_path, quality).result()
+        return save_panel(img, panel_path, quality)
+
+    @contextmanager
+    def _batch_slot(self):
+        """
+        Compte les lots en cours. Le premier remet à zéro l'état par lot (stats
+        de nœuds MD@Home, hôtes à re-chauffer) ; pas les suivants, qui tournent
+        sur les mêmes nœuds et connexions qu'un lot déjà en cours.
+        """
+        with self._warmup_lock:
+            self._active_batches += 1
+            first_batch = self._active_batches == 1
+            if first_batch:
+                self._warmed_origins.clear()
+        if first_batch:
+            reset_mangadex_home()
+        try:
+            yield
+        finally:
+            with self._warmup_lock:
+                self._active_batches -= 1
+
+    def _open_journal(self, params: Dict[str, Any]) -> Optional[BatchJournal]:
+        """Journal de la série du lot ; None (lot sans reprise) s'il est inaccessible."""
+        validated_params = get_validator().validate_params_dict(params)
+        path = self.series_dir(validated_params.get("final_manhwa_name", "unknown")) / JOURNAL_FILENAME
+        try:
+            return BatchJournal(path, verify=self.journal_verify)
+        except OSError as e:
+            logger.warning(f"[JOURNAL] Journal {path} inaccessible, lot sans reprise : {e}")
+            return None
+
+    def _extract_with_lease(self, chap_num: float, chap_url: str, params: Dict[str, Any], priority: int = 0):
+        """
+        Extraction des URLs d'un chapitre Selenium avec un driver emprunté au
+        pool : bail exclusif, rendu dès la fin de l'extraction (le chapitre
+        télécharge ensuite sans bloquer de driver). Entre lots concurrents,
+        le driver libéré va au lot de plus haute priorité.
+        """
+        validator = get_validator()
+        validated_params = validator.validate_params_dict(params)
+        chap_url = validator.validate_url(chap_url, allow_any_domain=True)
+        with self.driver_pool.lease(priority=priority) as driver_ws:
+            return self._extract_image_urls(chap_url, driver_ws, validated_params)
+
+    def run_chapter_batch(
+        self,
+        chapters: Dict[float, str],
+        params: Dict[str, Any],
+        ui_progress_callback=None,
+        event_callback=None,
+        cancel_token: Optional[CancellationToken] = None,
+        priority: int = 0,
+        max_parallel_chapters: Optional[int] = None,
+        max_downloads: Optional[int] = None,
+    ) -> List[Dict[str, Any]]:
         """
         Exécute les chapitres en parallèle en utilisant un ThreadPoolExecutor
         (max_workers = num_drivers).
-        ui_progress_callback(completed, total, result) est appelé dans le thread principal.
+
+        Callbacks appelés dans le thread principal, dans l'ordre où les choses
+        arrivent (un chapitre rapide n'attend pas un chapitre lent soumis avant) :
+        - ui_progress_callback(completed, total, result) à chaque fin de chapitre
+        - event_callback(ProgressEvent) pour chaque événement (voir core/events.py)
+
+        cancel_token : CancellationToken ; son annulation (depuis un autre
+        thread) retire les chapitres en file et interrompt les extractions et
+        téléchargements en cours (résultats en erreur "Annulé"). Une exception
+        dans le thread principal (arrêt Streamlit...) annule aussi le lot.
+
+        Avec le journal activé, les chapitres déjà terminés et vérifiés sur
+        disque par un lot précédent (même interrompu) ne sont pas refaits :
+        leur résultat journalisé est rendu avec resumed=True.
+
+        Plusieurs lots peuvent tourner en même temps sur le moteur (un par
+        thread, voir core/jobs.py) : drivers, ordonnanceur de téléchargements et
+        étages CPU sont partagés. priority départage les lots (emprunt de
+        driver, file de téléchargements) ; max_parallel_chapters et
+        max_downloads plafonnent la part d'un lot (None = pas de quota ;
+        max_downloads ne s'applique qu'au moteur "threaded").
+
+        Retourne les résultats dans l'ordre de soumission (chapitres repris d'abord).
         """
         from panelia.scrapers.config import SUPPORTED_SITES
         
         sorted_chaps = sorted(chapters.items())
         total = len(sorted_chaps)
-        results = []
+        token = cancel_token or CancellationToken()
+        events = EventStream()
 
         # ... (IA Setup logic kept later)
         cleaner_instance = None
@@ -220,12 +629,29 @@ class ScraperEngine:
             cleaner_instance = ManhwaCleaner()
             params["cleaner_instance"] = cleaner_instance
 
+        # Reprise : chapitres terminés et vérifiés d'après le journal de la série
+        journal = self._open_journal(params) if self.journal_enabled else None
+        resumed_results = []
+        to_process = sorted_chaps
+        if journal is not None:
+            settings = output_settings(params)
+            to_process = []
+            for chap_num, chap_url in sorted_chaps:
+                resumed = journal.verified_result(chap_num, journal_url(chap_url), settings)
+                if resumed is not None:
+                    resumed_results.append((chap_num, chap_url, resumed))
+                else:
+                    to_process.append((chap_num, chap_url))
+            journal.begin_batch(sorted_chaps, settings)
+            if resumed_results:
+                logger.info(f"[JOURNAL] {len(resumed_results)}/{total} chapitre(s) déjà terminé(s) et vérifié(s), non refait(s)")
+
         # ANALYSE DU MÉLANGE SELENIUM / DRIVERLESS
         # MangaDex supporte le driverless. Pour les autres, on force Selenium.
         driverless_tasks = []
         selenium_tasks = []
         
-        for chap_num, chap_url in sorted_chaps:
+        for chap_num, chap_url in to_process:
             is_driverless = False
             for domain, cfg in SUPPORTED_SITES.items():
                 if domain in chap_url:
@@ -240,64 +666,186 @@ class ScraperEngine:
                 selenium_tasks.append((chap_num, chap_url))
 
         # On démarre le driver pool seulement si nécessaire
-        if selenium_tasks and not self.driver_pool:
+        if selenium_tasks:
             self.start_driver_pool()
 
+        # Extraction des listes d'images Selenium : un thread par driver, chacun
+        # empruntant le driver libre le moins récemment utilisé ; jusqu'à
+        # prefetch_depth chapitres extraits en avance sur les chapitres en cours
+        prefetcher = None
+        if selenium_tasks:
+            prefetcher = ImageListPrefetcher(
+                selenium_tasks,
+                lambda chap_num, chap_url: self._extract_with_lease(chap_num, chap_url, params, priority),
+                depth=self.prefetch_depth,
+                max_age=self.prefetch_max_age,
+                urls_of=lambda value: value[0],
+                name="prefetch",
+                workers=len(self.driver_pool)
+            )
+            prefetcher.start()
+
         # On utilise un pool de threads global dimensionné pour absorber le driverless
-        # (Pool Selenium + 10 workers driverless fixe par sécurité)
-        max_total_workers = self.num_drivers + 10
-        
-        with ThreadPoolExecutor(max_workers=max_total_workers) as executor:
-            futures = []
-            
-            # 1. Soumission des tâches Selenium (consomment le pool limité)
+        # (10 workers driverless fixe par sécurité) ; les chapitres Selenium ont le
+        # leur, un chapitre en cours par driver, démarrés dans l'ordre
+        max_total_workers = 10
+        selenium_workers = self.num_drivers
+        if max_parallel_chapters:
+            max_total_workers = min(max_total_workers, max_parallel_chapters)
+            selenium_workers = min(selenium_workers, max_parallel_chapters)
+        lane = None
+        if self.scheduler is not None and (priority or max_downloads):
+            lane = self.scheduler.lane(priority=priority, limit=max_downloads)
+
+        futures = []
+        results: Dict[Future, Dict[str, Any]] = {}
+
+        def on_chapter_done(chap_num, chap_url, future: Future) -> None:
+            # Aussi appelé pour un chapitre retiré de la file avant d'avoir démarré
+            if future.cancelled():
+                result = {"chap_num": chap_num, "chap_url": chap_url, "found_count": 0, "downloaded_count": 0, "panels_saved": 0, "error": CANCELLED_MESSAGE}
+            else:
+                try:
+                    result = future.result()
+                except Exception as e:
+                    result = {"chap_num": chap_num, "chap_url": chap_url, "found_count": 0, "downloaded_count": 0, "panels_saved": 0, "error": str(e)}
+            results[future] = result
+            events.emit(CHAPTER_FINISHED, chap_num, result=result)
+
+        def cancel_batch() -> None:
+            for future in futures:
+                future.cancel()
+            if prefetcher is not None:
+                # Les chapitres qui attendent leur liste échouent tout de suite
+                prefetcher.close(wait=False)
+
+        # Le journal se ferme après les executors : plus aucun chapitre n'y écrit
+        with self._batch_slot(), (journal or nullcontext()), \
+                ThreadPoolExecutor(max_workers=max_total_workers) as executor, \
+                ThreadPoolExecutor(max_workers=selenium_workers, thread_name_prefix="panelia-chap") as selenium_executor:
+            chapter_kwargs = {"emit": events.emit, "cancel_token": token, "journal": journal, "scheduler": lane}
+
+            # 0. Chapitres repris du journal : terminés d'emblée
+            for chap_num, chap_url, resumed in resumed_results:
+                future = Future()
+                future.set_result(resumed)
+                future.add_done_callback(partial(on_chapter_done, chap_num, chap_url))
+                futures.append(future)
+
+            # 1. Tâches Selenium : le driver n'est tenu que pendant l'extraction
             for idx, (chap_num, chap_url) in enumerate(selenium_tasks):
-                driver_ws = self.driver_pool[idx % len(self.driver_pool)]
-                future = executor.submit(self._process_single_chapter, chap_num, chap_url, driver_ws, params)
+                future = selenium_executor.submit(
+                    self._process_single_chapter, chap_num, chap_url, None, params,
+                    image_urls_provider=partial(prefetcher.get, idx), **chapter_kwargs
+                )
+                future.add_done_callback(partial(on_chapter_done, chap_num, chap_url))
                 futures.append(future)
 
             # 2. Soumission des tâches Driverless (volent de leurs propres ailes)
             for chap_num, chap_url in driverless_tasks:
-                future = executor.submit(self._process_single_chapter, chap_num, chap_url, None, params)
+                future = executor.submit(self._process_single_chapter, chap_num, chap_url, None, params, **chapter_kwargs)
+                future.add_done_callback(partial(on_chapter_done, chap_num, chap_url))
                 futures.append(future)
 
-            completed = 0
-            for fut in futures:
-                res = fut.result()
-                results.append(res)
-                completed += 1
-                if ui_progress_callback:
-                    try:
-                        ui_progress_callback(completed, total, res)
-                    except Exception:
-                        pass
-
-        return results
-
-# petit wrapper local pour utiliser process_image_smart (qui retourne PIL images)
-def process_and_save_single_image(image_bytes: bytes, output_dir: Path, current_panel_index: int, chap_num: float, quality=92, cleaner=None):
-    """
-    Traite une SEULE image téléchargée (découpage + IA) et la sauvegarde dans output_dir.
-    Retourne le nombre de planches générées.
-    Nomenclature : ChXX_PXX.jpg
-    """
-    from panelia.scrapers.factory import process_image_smart
-    
-    saved_count = 0
+            # Après la soumission : un jeton déjà annulé retire tout de suite tous les chapitres
+            unregister = token.add_callback(cancel_batch)
+            try:
+                # Un chapter_finished par chapitre, garanti par on_chapter_done
+                completed = 0
+                while completed < total:
+                    event = events.get()
+                    if event_callback:
+                        try:
+                            event_callback(event)
+                        except Exception:
+                            pass
+                    if event.kind != CHAPTER_FINISHED:
+                        continue
+                    completed += 1
+                    if ui_progress_callback:
+                        try:
+                            ui_progress_callback(completed, total, event.data["result"])
+                        except Exception:
+                            pass
+            except BaseException:
+                # Thread principal interrompu : les workers s'arrêtent au lieu de finir le lot
+                token.cancel("Lot interrompu")
+                raise
+            finally:
+                unregister()
+                if lane is not None:
+                    self.scheduler.release_lane(lane)
+
+        if token.cancelled:
+            logger.warning(f"[CANCEL] Lot annulé ({token.reason}) : {sum(1 for r in results.values() if r['error'] == CANCELLED_MESSAGE)}/{total} chapitre(s) interrompu(s)")
+        if journal is not None:
+            logger.info(f"[JOURNAL] Journal {journal.path} : {journal.get_stats()}")
+        if prefetcher is not None:
+            prefetcher.close()
+            logger.info(f"[PREFETCH] Listes Selenium du lot : {prefetcher.get_stats()}")
+            # Attente élevée + occupation proche de 100 % : ajouter des drivers aiderait
+            logger.info(f"[DRIVERS] Pool de drivers : {self.driver_pool.get_stats()}")
+        # Débits appris par domaine : explique un lot lent (429/503, Retry-After)
+        logger.info(f"[RATE] Débits par domaine en fin de lot : {get_rate_limiter().get_rates()}")
+        if self.scheduler is not None:
+            logger.info(f"[SCHED] Ordonnanceur de téléchargements : {self.scheduler.get_stats()}")
+        if self.tuner is not None:
+            # Meilleur réglage mesuré par domaine : point de départ du prochain lot
+            logger.info(f"[TUNE] Concurrence par hôte : {self.tuner.get_stats()}")
+            self.tuner.save()
+        # Occupation par étage : le plus proche de 100 % (ou le plus bloquant) est le goulot
+        logger.info(f"[PIPE] Étages du pipeline : {self.pipeline.get_stats()}")
+        ttfb = get_client_pool().get_ttfb_report()
+        if ttfb:
+            # Connexion neuve (froide) vs connexion ouverte (chaude) : gain du pré-chauffage
+            logger.info(f"[POOL] TTFB par hôte (froid / chaud) : {ttfb}")
+        node_stats = get_mangadex_home().get_node_stats()
+        if node_stats:
+            logger.info(f"[MDH] Nœuds MangaDex@Home du lot : {node_stats}")
+        open_hosts = {h: st for h, st in get_error_handler().get_host_breaker_states().items() if st != "CLOSED"}
+        if open_hosts:
+            logger.warning(f"[BREAKER] Hôtes encore en panne en fin de lot : {open_hosts}")
+        return [results[future] for future in futures]
+
+def panel_filename(chap_num: float, index: int) -> str:
+    """Nomenclature demandée : ChXX_PXXX.jpg (index à partir de 1)."""
+    safe_chap = str(chap_num).replace('.', '_')
+    return f"Ch{safe_chap}_P{index:03d}.jpg"
+
+
+def save_panel(img, panel_path: Path, quality=92) -> int:
+    """Encode une planche en JPEG ; 1 si sauvée, 0 sinon."""
     try:
-        images_to_save = process_image_smart(image_bytes)
-        safe_chap = str(chap_num).replace('.', '_')
-        for img in images_to_save:
-            # Nettoyage IA
-            if cleaner:
-                img = cleaner.process_pil(img)
-
-            # Nomenclature demandée : ChXX_PXX
-            filename = f"Ch{safe_chap}_P{current_panel_index + saved_count + 1:03d}.jpg"
-            panel_path = output_dir / filename
-            img.convert('RGB').save(panel_path, "JPEG", quality=quality, optimize=True)
-            saved_count += 1
+        img.convert('RGB').save(panel_path, "JPEG", quality=quality, optimize=True)
+        return 1
     except Exception as e:
-        logger.warning(f"Erreur processing image individuelle: {e}")
-    
-    return saved_count
+        logger.warning(f"Erreur sauvegarde planche {panel_path.name}: {e}")
+        return 0
+
+
+def commit_panel(info: PanelInfo, panel_path: Path) -> Future:
+    """Planche encodée par un processus -> nom définitif ; future déjà résolue (1 ou 0)."""
+    future: Future = Future()
+    try:
+        info.commit(panel_path)
+        future.set_result(1)
+    except OSError as e:
+        logger.warning(f"Erreur renommage planche {panel_path.name}: {e}")
+        future.set_result(0)
+    return future
+
+
+def count_saved(panel_futures: List[Future], wait: bool = False) -> int:
+    """
+    Planches sauvées parmi des futures d'encodage (terminées seulement, sauf
+    wait). Résultat 1/0 (save_panel) ou PanelInfo/None (processus).
+    """
+    saved = 0
+    for future in panel_futures:
+        if not wait and not future.done():
+            continue
+        try:
+            saved += 1 if future.result() else 0
+        except Exception as e:
+            logger.warning(f"Erreur processing planche: {e}")
+    return saved
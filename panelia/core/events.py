@@ -0,0 +1,77 @@
+# events.py
+"""
+Flux d'événements de progression PANELia
+
+Avant : run_chapter_batch attendait fut.result() dans l'ordre de soumission :
+un premier chapitre lent retenait l'affichage de tous ceux déjà finis, et
+l'interface ne voyait rien entre le début et la fin d'un chapitre.
+
+Maintenant :
+- Les threads de travail publient des ProgressEvent dans un EventStream
+  (file thread-safe) au moment où les choses arrivent : chapitre démarré,
+  images trouvées, image téléchargée, image sauvée, chapitre terminé
+- Le thread principal les consomme dans l'ordre d'arrivée (complétion) et
+  les remet aux callbacks de l'interface
+
+Usage:
+    events = EventStream()
+    events.emit(CHAPTER_STARTED, chap_num=12.0, chap_url=url)
+    event = events.get(timeout=0.1)  # None si rien d'arrivé
+    print(event.kind, event.chap_num, event.data)
+
+Auteur: PANELia Team
+Date: 2025-12-18
+"""
+
+import queue
+import time
+from dataclasses import dataclass, field
+from typing import Any, Dict, Optional
+
+# Types d'événements, dans l'ordre de vie d'un chapitre
+CHAPTER_STARTED = "chapter_started"
+IMAGES_FOUND = "images_found"
+IMAGE_DOWNLOADED = "image_downloaded"
+IMAGE_SAVED = "image_saved"
+CHAPTER_FINISHED = "chapter_finished"
+EVENT_KINDS = (CHAPTER_STARTED, IMAGES_FOUND, IMAGE_DOWNLOADED, IMAGE_SAVED, CHAPTER_FINISHED)
+
+
+@dataclass
+class ProgressEvent:
+    """
+    Un événement de progression. data selon le type :
+    - chapter_started : chap_url
+    - images_found : count
+    - image_downloaded : index (ordre source, à partir de 1), downloaded, found
+    - image_saved : index, panels (planches sauvées pour cette image)
+    - chapter_finished : result (dict rendu par run_chapter_batch)
+    """
+    kind: str
+    chap_num: Optional[float]
+    data: Dict[str, Any] = field(default_factory=dict)
+    timestamp: float = field(default_factory=time.time)
+
+
+class EventStream:
+    """File d'événements multi-producteurs, un consommateur."""
+
+    def __init__(self):
+        self._queue: "queue.Queue[ProgressEvent]" = queue.Queue()
+
+    def emit(self, kind: str, chap_num: Optional[float] = None, **data) -> ProgressEvent:
+        """Publie un événement (depuis n'importe quel thread)."""
+        event = ProgressEvent(kind, chap_num, data)
+        self._queue.put(event)
+        return event
+
+    def get(self, timeout: Optional[float] = None) -> Optional[ProgressEvent]:
+        """Prochain événement, ou None après `timeout` secondes sans événement."""
+        try:
+            return self._queue.get(timeout=timeout)
+        except queue.Empty:
+            return None
+
+
+def emit_nothing(kind: str, chap_num: Optional[float] = None, **data) -> None:
+    """Émetteur par défaut quand personne n'écoute."""
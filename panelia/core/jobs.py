@@ -0,0 +1,280 @@
+# jobs.py
+"""
+Ordonnanceur multi-séries PANELia
+
+Avant : ScraperEngine traitait une série par appel de run_chapter_batch.
+Dix séries = dix lots en série, ou dix moteurs (dix flottes de Chrome, dix
+ordonnanceurs de téléchargements, dix pools CPU) qui se disputent la RAM.
+
+Maintenant :
+- Un seul moteur, donc une flotte de drivers, un budget de téléchargements
+  (DownloadScheduler) et un pool CPU (StagedPipeline) pour toutes les séries
+- Jusqu'à max_active_series lots en même temps, les autres séries en file
+- Priorités : la série en attente de plus haute priorité démarre d'abord ;
+  entre séries actives, la priorité départage aussi les emprunts de driver
+  et la file de téléchargements
+- Quotas par série : chapitres simultanés (max_parallel_chapters) et
+  téléchargements simultanés (max_downloads) ; une série ne prend pas tout
+- Deux jobs d'une même série (même dossier, même journal) ne tournent jamais
+  en même temps
+- Annulation par job (CancellationToken) : retiré de la file ou interrompu
+
+Usage:
+    jobs = SeriesScheduler(engine, max_active_series=2)
+    urgent = jobs.submit(chapters_a, params_a, priority=10)
+    backlog = jobs.submit(chapters_b, params_b, max_parallel_chapters=1, max_downloads=4)
+    results = urgent.result()
+    jobs.shutdown()
+
+Auteur: PANELia Team
+Date: 2025-12-18
+"""
+
+import heapq
+import itertools
+import threading
+import time
+from concurrent.futures import Future
+from dataclasses import dataclass, field
+from pathlib import Path
+from typing import Any, Callable, Dict, List, Optional, Set
+
+from loguru import logger
+
+from panelia.core.sync import SyncPlan
+from panelia.utils.cancellation import CancellationToken
+
+PENDING, RUNNING, DONE, FAILED, CANCELLED = "pending", "running", "done", "failed", "cancelled"
+
+
+@dataclass
+class SeriesJob:
+    """Une série en file : chapitres, paramètres du lot, priorité et quotas."""
+    name: str
+    chapters: Dict[float, str]
+    params: Dict[str, Any]
+    priority: int = 0
+    max_parallel_chapters: Optional[int] = None
+    max_downloads: Optional[int] = None
+    # Synchronisation incrémentale (ScraperEngine.sync_series) au lieu du lot complet
+    sync: bool = False
+    force: bool = False
+    event_callback: Optional[Callable] = None
+    ui_progress_callback: Optional[Callable] = None
+    cancel_token: CancellationToken = field(default_factory=CancellationToken)
+    future: Future = field(default_factory=Future)
+    submitted_at: float = field(default_factory=time.monotonic)
+    started_at: Optional[float] = None
+    finished_at: Optional[float] = None
+    # Plan de synchronisation (jobs sync seulement)
+    plan: Optional[SyncPlan] = None
+
+    @property
+    def state(self) -> str:
+        if self.future.cancelled():
+            return CANCELLED
+        if not self.future.done():
+            return RUNNING if self.started_at is not None else PENDING
+        if self.future.exception() is not None:
+            return FAILED
+        return CANCELLED if self.cancel_token.cancelled else DONE
+
+    def cancel(self, reason: str = "Job annulé") -> None:
+        """Retire le job de la file, ou interrompt son lot s'il a démarré."""
+        self.cancel_token.cancel(reason)
+        self.future.cancel()
+
+    def result(self, timeout: Optional[float] = None) -> List[Dict[str, Any]]:
+        """Résultats des chapitres (voir run_chapter_batch) ; lève si le lot a échoué."""
+        return self.future.result(timeout)
+
+
+class SeriesScheduler:
+    """
+    File de séries à priorités exécutée sur un ScraperEngine partagé.
+
+    Chaque série active a son thread (celui de run_chapter_batch, où passent
+    ses callbacks) ; les ressources lourdes restent celles du moteur.
+    """
+
+    def __init__(
+        self,
+        engine,
+        max_active_series: int = 2,
+        max_parallel_chapters: Optional[int] = None,
+        max_downloads: Optional[int] = None,
+    ):
+        """
+        Args:
+            engine: ScraperEngine partagé par toutes les séries
+            max_active_series: Séries traitées en même temps
+            max_parallel_chapters: Quota par défaut de chapitres simultanés par série
+            max_downloads: Quota par défaut de téléchargements simultanés par série
+        """
+        self.engine = engine
+        self.max_active_series = max(1, max_active_series)
+        self.default_max_parallel_chapters = max_parallel_chapters
+        self.default_max_downloads = max_downloads
+
+        # Tas (-priorité, ordre d'arrivée, job)
+        self._pending: List[tuple] = []
+        self._seq = itertools.count()
+        # Dossiers de séries dont un job tourne (un seul job par série à la fois)
+        self._active_dirs: Set[Path] = set()
+        self._running: List[SeriesJob] = []
+        self._cond = threading.Condition()
+        self._closed = False
+
+        self._submitted = 0
+        self._finished = {DONE: 0, FAILED: 0, CANCELLED: 0}
+        self._queue_wait_total = 0.0
+        self._started = 0
+
+        self._workers = [
+            threading.Thread(target=self._work, name=f"panelia-series-{i}", daemon=True)
+            for i in range(self.max_active_series)
+        ]
+        for worker in self._workers:
+            worker.start()
+
+    def submit(
+        self,
+        chapters: Dict[float, str],
+        params: Dict[str, Any],
+        priority: int = 0,
+        max_parallel_chapters: Optional[int] = None,
+        max_downloads: Optional[int] = None,
+        sync: bool = False,
+        force: bool = False,
+        event_callback=None,
+        ui_progress_callback=None,
+        cancel_token: Optional[CancellationToken] = None,
+    ) -> SeriesJob:
+        """
+        Met une série en file. priority : plus haut = démarre (et se sert) d'abord.
+        Quotas None = quotas par défaut de l'ordonnanceur.
+        """
+        job = SeriesJob(
+            name=params.get("final_manhwa_name", "unknown"),
+            chapters=dict(chapters),
+            params=dict(params),
+            priority=priority,
+            max_parallel_chapters=max_parallel_chapters or self.default_max_parallel_chapters,
+            max_downloads=max_downloads or self.default_max_downloads,
+            sync=sync,
+            force=force,
+            event_callback=event_callback,
+            ui_progress_callback=ui_progress_callback,
+        )
+        if cancel_token is not None:
+            job.cancel_token = cancel_token
+        with self._cond:
+            if self._closed:
+                raise RuntimeError("Ordonnanceur de séries arrêté")
+            heapq.heappush(self._pending, (-priority, next(self._seq), job))
+            self._submitted += 1
+            self._cond.notify()
+        logger.info(f"[JOBS] Série '{job.name}' en file : {len(job.chapters)} chapitre(s), priorité {priority}")
+        return job
+
+    def _take(self) -> Optional[SeriesJob]:
+        """Job en attente de plus haute priorité dont la série ne tourne pas déjà (verrou tenu)."""
+        skipped = []
+        job = None
+        while self._pending:
+            entry = heapq.heappop(self._pending)
+            candidate = entry[2]
+            if candidate.cancel_token.cancelled:
+                candidate.future.cancel()
+            if candidate.future.cancelled():
+                self._finished[CANCELLED] += 1
+                continue
+            if self.engine.series_dir(candidate.name) in self._active_dirs:
+                skipped.append(entry)
+                continue
+            job = candidate
+            break
+        for entry in skipped:
+            heapq.heappush(self._pending, entry)
+        return job
+
+    def _work(self) -> None:
+        while True:
+            with self._cond:
+                job = self._take()
+                while job is None:
+                    if self._closed:
+                        return
+                    self._cond.wait()
+                    job = self._take()
+                if not job.future.set_running_or_notify_cancel():
+                    self._finished[CANCELLED] += 1
+                    continue
+                series_dir = self.engine.series_dir(job.name)
+                self._active_dirs.add(series_dir)
+                self._running.append(job)
+                job.started_at = time.monotonic()
+                self._queue_wait_total += job.started_at - job.submitted_at
+                self._started += 1
+
+            logger.info(f"[JOBS] Série '{job.name}' démarrée (priorité {job.priority}, {len(self._running)}/{self.max_active_series} active(s))")
+            try:
+                job.future.set_result(self._run(job))
+            except BaseException as e:
+                logger.error(f"[JOBS] Série '{job.name}' en échec : {e}", exc_info=True)
+                job.future.set_exception(e)
+            finally:
+                job.finished_at = time.monotonic()
+                with self._cond:
+                    self._active_dirs.discard(series_dir)
+                    self._running.remove(job)
+                    self._finished[job.state] += 1
+                    # Un job de la même série attendait peut-être celui-ci
+                    self._cond.notify_all()
+                logger.info(f"[JOBS] Série '{job.name}' : {job.state} en {job.finished_at - job.started_at:.1f}s")
+
+    def _run(self, job: SeriesJob) -> List[Dict[str, Any]]:
+        batch_kwargs = {
+            "ui_progress_callback": job.ui_progress_callback,
+            "event_callback": job.event_callback,
+            "cancel_token": job.cancel_token,
+            "priority": job.priority,
+            "max_parallel_chapters": job.max_parallel_chapters,
+            "max_downloads": job.max_downloads,
+        }
+        if job.sync:
+            job.plan, results = self.engine.sync_series(job.chapters, job.params, force=job.force, **batch_kwargs)
+            return results
+        return self.engine.run_chapter_batch(job.chapters, job.params, **batch_kwargs)
+
+    def get_stats(self) -> Dict[str, Any]:
+        """Jobs en file, en cours, terminés, et attente moyenne en file (s)."""
+        with self._cond:
+            return {
+                "submitted": self._submitted,
+                "pending": sum(1 for entry in self._pending if not entry[2].future.cancelled()),
+                "running": [job.name for job in self._running],
+                "done": self._finished[DONE],
+                "failed": self._finished[FAILED],
+                "cancelled": self._finished[CANCELLED],
+                "avg_queue_wait_s": round(self._queue_wait_total / self._started, 2) if self._started else 0.0,
+            }
+
+    def shutdown(self, cancel_pending: bool = True, wait: bool = True) -> None:
+        """
+        N'accepte plus de jobs. cancel_pending : retire la file (sinon elle
+        est traitée jusqu'au bout) ; les lots déjà démarrés finissent.
+        Le moteur n'est pas arrêté (engine.shutdown() reste à l'appelant).
+        """
+        with self._cond:
+            self._closed = True
+            if cancel_pending:
+                for _, _, job in self._pending:
+                    job.future.cancel()
+                    self._finished[CANCELLED] += 1
+                self._pending.clear()
+            self._cond.notify_all()
+        if wait:
+            for worker in self._workers:
+                worker.join()
+        logger.info(f"[JOBS] Ordonnanceur de séries arrêté : {self.get_stats()}")
@@ -0,0 +1,294 @@
+# journal.py
+"""
+Journal de lot PANELia (write-ahead, reprise après crash)
+
+Avant : si le processus Streamlit mourait en plein lot, le lot suivant
+recommençait tout, alors que les planches étaient déjà dans
+output/<série>/<chap>/.
+
+Maintenant :
+- Un journal JSON-lines par série (output/<série>/.panelia_journal.jsonl),
+  en ajout seul : chapitre démarré, URLs sources, empreinte SHA-256 de
+  chaque image téléchargée, planches sauvées (fichier, taille, SHA-256),
+  chapitre terminé
+- Les enregistrements de chapitre sont fsyncés avant de continuer ; une
+  dernière ligne tronquée par un crash est ignorée à la relecture
+- Reprise : un chapitre terminé, même URL, mêmes réglages de sortie, dont
+  toutes les planches sont vérifiées sur disque (taille, ou SHA-256 en
+  vérification complète) est sauté ; les autres sont refaits
+- À l'ouverture, le journal est compacté (un résumé par chapitre terminé)
+
+Usage:
+    journal = BatchJournal(series_dir / JOURNAL_FILENAME)
+    result = journal.verified_result(12.0, url, settings)  # None = à refaire
+    journal.chapter_started(12.0, url)
+    journal.chapter_done(12.0, url, result, settings)
+    journal.close()
+
+Auteur: PANELia Team
+Date: 2025-12-18
+"""
+
+import hashlib
+import json
+import os
+import threading
+import time
+import uuid
+from dataclasses import asdict, dataclass, field
+from pathlib import Path
+from typing import Any, Dict, List, Optional, Tuple
+
+from loguru import logger
+
+from panelia.utils.validation import ValidationError, get_validator
+
+
+JOURNAL_FILENAME = ".panelia_journal.jsonl"
+# "size" : fichier présent et de la taille journalisée (rapide) ;
+# "sha256" : contenu relu et haché (sûr, lit toutes les planches)
+VERIFY_MODES = ("size", "sha256")
+
+
+def content_digest(source) -> str:
+    """SHA-256 d'une image téléchargée : bytes, fichier spoolé ou SlicedImage."""
+    source = getattr(source, "source", source)
+    digest = hashlib.sha256()
+    if isinstance(source, (bytes, bytearray, memoryview)):
+        digest.update(source)
+        return digest.hexdigest()
+    position = source.tell()
+    source.seek(0)
+    for chunk in iter(lambda: source.read(1024 * 1024), b""):
+        digest.update(chunk)
+    source.seek(position)
+    return digest.hexdigest()
+
+
+def journal_url(chap_url: str) -> str:
+    """URL de chapitre telle que journalisée (après validation, comme dans le moteur)."""
+    try:
+        return get_validator().validate_url(chap_url, allow_any_domain=True)
+    except ValidationError:
+        return chap_url
+
+
+def file_digest(path: Path) -> str:
+    with open(path, "rb") as f:
+        return content_digest(f)
+
+
+@dataclass
+class PanelRecord:
+    """Planche sauvée ; file relatif au dossier de la série."""
+    file: str
+    size: int
+    sha256: str
+
+
+@dataclass
+class ChapterState:
+    """État d'un chapitre reconstruit en rejouant le journal."""
+    chap_num: float
+    chap_url: str
+    status: str = "started"  # started | done | failed
+    image_urls: List[str] = field(default_factory=list)
+    images: Dict[int, str] = field(default_factory=dict)
+    panels: List[PanelRecord] = field(default_factory=list)
+    result: Optional[Dict[str, Any]] = None
+    settings: Dict[str, Any] = field(default_factory=dict)
+
+
+class BatchJournal:
+    """Journal en ajout seul, thread-safe (chapitres et étages y écrivent)."""
+
+    def __init__(self, path: Path, verify: str = "size", compact: bool = True):
+        """
+        Args:
+            path: Fichier du journal (créé au besoin)
+            verify: Vérification des planches à la reprise (voir VERIFY_MODES)
+            compact: Réécrit le journal existant en ne gardant que les chapitres terminés
+        """
+        if verify not in VERIFY_MODES:
+            raise ValueError(f"Vérification inconnue : {verify} (attendu : {', '.join(VERIFY_MODES)})")
+        self.path = Path(path)
+        self.root = self.path.parent
+        self.verify = verify
+        self._lock = threading.Lock()
+        self.chapters: Dict[float, ChapterState] = {}
+        self.resumed = 0
+        self.rejected = 0
+
+        self.root.mkdir(parents=True, exist_ok=True)
+        replayed = self._replay()
+        if compact and replayed:
+            self._compact()
+        self._fp = open(self.path, "a", encoding="utf-8")
+        logger.debug(f"[JOURNAL] {self.path} : {replayed} enregistrement(s), {self._count('done')} chapitre(s) terminé(s)")
+
+    # --- Relecture ---------------------------------------------------------
+
+    def _replay(self) -> int:
+        if not self.path.exists():
+            return 0
+        count = 0
+        with open(self.path, encoding="utf-8") as f:
+            for line in f:
+                try:
+                    record = json.loads(line)
+                except json.JSONDecodeError:
+                    # Ligne à moitié écrite au moment du crash
+                    logger.warning(f"[JOURNAL] Enregistrement illisible ignoré dans {self.path.name}")
+                    continue
+                self._apply(record)
+                count += 1
+        return count
+
+    def _apply(self, record: Dict[str, Any]) -> None:
+        kind = record.get("type")
+        if kind == "batch":
+            return
+        chap_num = float(record["chap"])
+        if kind == "chapter_started":
+            self.chapters[chap_num] = ChapterState(chap_num, record["url"])
+            return
+        state = self.chapters.get(chap_num)
+        if state is None:
+            state = self.chapters[chap_num] = ChapterState(chap_num, record.get("url", ""))
+        if kind == "images_found":
+            state.image_urls = record["urls"]
+        elif kind == "image_downloaded":
+            state.images[int(record["index"])] = record["sha256"]
+        elif kind == "image_saved":
+            state.panels.extend(PanelRecord(**p) for p in record["panels"])
+        elif kind == "chapter_done":
+            state.chap_url = record["url"]
+            state.status = "done"
+            state.result = record["result"]
+            state.settings = record.get("settings", {})
+            if "panels" in record:
+                # Résumé compacté : liste complète des planches
+                state.panels = [PanelRecord(**p) for p in record["panels"]]
+                state.image_urls = record.get("urls", [])
+                state.images = {int(k): v for k, v in record.get("images", {}).items()}
+        elif kind == "chapter_failed":
+            state.status = "failed"
+
+    def _compact(self) -> None:
+        """Réécriture atomique : un résumé chapter_done par chapitre terminé."""
+        tmp = self.path.with_suffix(".tmp")
+        with open(tmp, "w", encoding="utf-8") as f:
+            for state in self.chapters.values():
+                if state.status == "done":
+                    f.write(json.dumps(self._summary(state), ensure_ascii=False) + "\n")
+            f.flush()
+            os.fsync(f.fileno())
+        os.replace(tmp, self.path)
+        self.chapters = {num: state for num, state in self.chapters.items() if state.status == "done"}
+
+    @staticmethod
+    def _summary(state: ChapterState) -> Dict[str, Any]:
+        return {
+            "type": "chapter_done", "chap": state.chap_num, "url": state.chap_url,
+            "result": state.result, "settings": state.settings, "urls": state.image_urls,
+            "images": {str(k): v for k, v in state.images.items()},
+            "panels": [asdict(p) for p in state.panels],
+        }
+
+    # --- Écriture ----------------------------------------------------------
+
+    def _append(self, record: Dict[str, Any], sync: bool = False) -> None:
+        """Écrit (et applique) un enregistrement ; sync=True : durable avant de rendre la main."""
+        record["ts"] = round(time.time(), 3)
+        line = json.dumps(record, ensure_ascii=False) + "\n"
+        with self._lock:
+            self._apply(record)
+            self._fp.write(line)
+            self._fp.flush()
+            if sync:
+                os.fsync(self._fp.fileno())
+
+    def begin_batch(self, chapters: List[Tuple[float, str]], settings: Dict[str, Any]) -> str:
+        batch_id = uuid.uuid4().hex[:12]
+        self._append({"type": "batch", "batch_id": batch_id, "chapters": [[n, u] for n, u in chapters], "settings": settings}, sync=True)
+        return batch_id
+
+    def chapter_started(self, chap_num: float, chap_url: str) -> None:
+        self._append({"type": "chapter_started", "chap": chap_num, "url": chap_url}, sync=True)
+
+    def images_found(self, chap_num: float, image_urls: List[str]) -> None:
+        self._append({"type": "images_found", "chap": chap_num, "urls": list(image_urls)})
+
+    def image_downloaded(self, chap_num: float, index: int, sha256: str) -> None:
+        self._append({"type": "image_downloaded", "chap": chap_num, "index": index, "sha256": sha256})
+
+    def image_saved(self, chap_num: float, index: int, panel_paths: List[Path]) -> None:
+        """Planches d'une image, hachées depuis le disque (ce qui sera vérifié à la reprise)."""
+        panels = []
+        for path in panel_paths:
+            try:
+                panels.append(asdict(PanelRecord(path.relative_to(self.root).as_posix(), path.stat().st_size, file_digest(path))))
+            except OSError as e:
+                logger.warning(f"[JOURNAL][CHAP {chap_num}] Planche {path.name} illisible : {e}")
+        self._append({"type": "image_saved", "chap": chap_num, "index": index, "panels": panels})
+
+    def chapter_done(self, chap_num: float, chap_url: str, result: Dict[str, Any], settings: Dict[str, Any]) -> None:
+        self._append({"type": "chapter_done", "chap": chap_num, "url": chap_url, "result": result, "settings": settings}, sync=True)
+
+    def chapter_failed(self, chap_num: float, error: Optional[str]) -> None:
+        self._append({"type": "chapter_failed", "chap": chap_num, "error": error}, sync=True)
+
+    # --- Reprise -----------------------------------------------------------
+
+    def _panel_ok(self, panel: PanelRecord) -> bool:
+        path = self.root / panel.file
+        try:
+            if path.stat().st_size != panel.size:
+                return False
+            return self.verify == "size" or file_digest(path) == panel.sha256
+        except OSError:
+            return False
+
+    def verified_result(self, chap_num: float, chap_url: str, settings: Dict[str, Any]) -> Optional[Dict[str, Any]]:
+        """
+        Résultat journalisé du chapitre s'il peut être sauté (terminé, même
+        URL, mêmes réglages, planches vérifiées), sinon None.
+        """
+        state = self.chapters.get(float(chap_num))
+        if state is None or state.status != "done" or state.chap_url != chap_url:
+            return None
+        if state.settings != settings or not state.panels or not all(self._panel_ok(p) for p in state.panels):
+            with self._lock:
+                self.rejected += 1
+            logger.info(f"[JOURNAL][CHAP {chap_num}] Chapitre journalisé mais réglages ou planches différents : à refaire")
+            return None
+        with self._lock:
+            self.resumed += 1
+        return dict(state.result, resumed=True)
+
+    def _count(self, status: str) -> int:
+        return sum(1 for state in self.chapters.values() if state.status == status)
+
+    def get_stats(self) -> Dict[str, int]:
+        """Chapitres par état, repris (vérifiés) et rejetés à la vérification."""
+        with self._lock:
+            return {
+                "done": self._count("done"),
+                "started": self._count("started"),
+                "failed": self._count("failed"),
+                "resumed": self.resumed,
+                "rejected": self.rejected,
+            }
+
+    def close(self) -> None:
+        with self._lock:
+            if not self._fp.closed:
+                self._fp.flush()
+                os.fsync(self._fp.fileno())
+                self._fp.close()
+
+    def __enter__(self) -> "BatchJournal":
+        return self
+
+    def __exit__(self, *exc) -> None:
+        self.close()
@@ -0,0 +1,189 @@
+# pipeline.py
+"""
+Pipeline à étages PANELia : un pool de threads par type de ressource
+
+Avant : dans le thread d'un chapitre, chaque image passait en série par le
+découpage, le nettoyage IA (sidecar HTTP) puis l'encodage JPEG : pendant
+qu'une planche s'encodait, rien d'autre n'avançait pour ce chapitre, et la
+ressource la plus lente fixait le rythme de toutes les autres.
+
+Maintenant :
+- Un étage = un pool de threads dédié + une file bornée en entrée
+- File pleine -> submit() bloque : la contre-pression remonte jusqu'aux
+  téléchargements (fenêtre du générateur) au lieu d'empiler des images en RAM
+- Chaque étage mesure son occupation (temps de travail / capacité), sa
+  profondeur de file et le temps passé bloqué par la contre-pression
+- Les étages gérés ailleurs (drivers Selenium, ordonnanceur réseau) sont
+  rapportés dans les mêmes statistiques
+
+Usage:
+    pipeline = StagedPipeline({"slice": 4, "encode": 4}, queue_size=8)
+    pipeline.attach("network", scheduler.get_stats)
+    future = pipeline["slice"].submit(slice_panels_precision, data)
+    saved = pipeline["encode"].chain(future, save_panels)
+    print(pipeline.get_stats())
+    pipeline.shutdown()
+
+Auteur: PANELia Team
+Date: 2025-12-18
+"""
+
+import queue
+import threading
+import time
+from concurrent.futures import Future
+from typing import Any, Callable, Dict, Optional
+
+from loguru import logger
+
+
+class Stage:
+    """Pool de threads nommé, alimenté par une file bornée."""
+
+    def __init__(self, name: str, workers: int, queue_size: Optional[int] = None):
+        """
+        Args:
+            name: Nom de l'étage (logs, statistiques)
+            workers: Threads de l'étage
+            queue_size: Tâches en attente max avant blocage de submit (défaut : 2 x workers)
+        """
+        self.name = name
+        self.workers = max(1, workers)
+        self.queue_size = queue_size or self.workers * 2
+
+        self._queue: "queue.Queue" = queue.Queue(maxsize=self.queue_size)
+        self._lock = threading.Lock()
+        self._created_at = time.monotonic()
+        self._peak_depth = 0
+        self._completed = 0
+        self._failed = 0
+        self._busy_total = 0.0
+        self._blocked_total = 0.0
+
+        self._threads = [
+            threading.Thread(target=self._work, name=f"panelia-{name}-{i}", daemon=True)
+            for i in range(self.workers)
+        ]
+        for thread in self._threads:
+            thread.start()
+
+    def submit(self, fn: Callable, *args, **kwargs) -> Future:
+        """Met fn(*args, **kwargs) en file ; bloque tant que la file est pleine."""
+        future: Future = Future()
+        start = time.monotonic()
+        self._queue.put((future, fn, args, kwargs))
+        blocked = time.monotonic() - start
+        with self._lock:
+            self._blocked_total += blocked
+            self._peak_depth = max(self._peak_depth, self._queue.qsize())
+        return future
+
+    def chain(self, upstream: Future, fn: Callable) -> Future:
+        """
+        fn(résultat de upstream) sur cet étage dès que upstream se termine.
+        Une erreur en amont est propagée telle quelle à la future rendue.
+        """
+        out: Future = Future()
+
+        def forward(done: Future) -> None:
+            try:
+                inner = self.submit(fn, done.result())
+            except BaseException as e:
+                out.set_exception(e)
+                return
+            inner.add_done_callback(lambda f: _copy_outcome(f, out))
+
+        upstream.add_done_callback(forward)
+        return out
+
+    def _work(self) -> None:
+        while True:
+            item = self._queue.get()
+            if item is None:
+                return
+            future, fn, args, kwargs = item
+            if not future.set_running_or_notify_cancel():
+                continue
+            start = time.monotonic()
+            try:
+                result = fn(*args, **kwargs)
+            except BaseException as e:
+                with self._lock:
+                    self._failed += 1
+                future.set_exception(e)
+            else:
+                future.set_result(result)
+            finally:
+                with self._lock:
+                    self._busy_total += time.monotonic() - start
+                    self._completed += 1
+
+    def get_stats(self) -> Dict[str, Any]:
+        """Occupation, file et contre-pression de l'étage."""
+        with self._lock:
+            capacity = (time.monotonic() - self._created_at) * self.workers
+            return {
+                "workers": self.workers,
+                "queue_depth": self._queue.qsize(),
+                "peak_queue_depth": self._peak_depth,
+                "completed": self._completed,
+                "failed": self._failed,
+                "avg_service_ms": round(self._busy_total / self._completed * 1000, 1) if self._completed else 0.0,
+                "utilisation": round(min(1.0, self._busy_total / capacity), 3) if capacity > 0 else 0.0,
+                # Temps passé par les producteurs à attendre une place : étage goulot
+                "blocked_submit_ms": round(self._blocked_total * 1000, 1),
+            }
+
+    def shutdown(self) -> None:
+        """Arrête les threads après les tâches déjà en file."""
+        for _ in self._threads:
+            self._queue.put(None)
+        for thread in self._threads:
+            thread.join()
+
+
+def _copy_outcome(source: Future, target: Future) -> None:
+    if source.cancelled():
+        target.cancel()
+    elif source.exception() is not None:
+        target.set_exception(source.exception())
+    else:
+        target.set_result(source.result())
+
+
+class StagedPipeline:
+    """Ensemble d'étages nommés + étages externes rapportés dans les stats."""
+
+    def __init__(self, pool_sizes: Dict[str, int], queue_size: Optional[int] = None):
+        """
+        Args:
+            pool_sizes: {nom d'étage: nombre de threads}
+            queue_size: Taille des files d'entrée (défaut : 2 x threads de l'étage)
+        """
+        self.stages: Dict[str, Stage] = {
+            name: Stage(name, workers, queue_size) for name, workers in pool_sizes.items()
+        }
+        self._external: Dict[str, Callable[[], Dict[str, Any]]] = {}
+
+    def __getitem__(self, name: str) -> Stage:
+        return self.stages[name]
+
+    def attach(self, name: str, stats_fn: Callable[[], Dict[str, Any]]) -> None:
+        """Rapporte un étage géré ailleurs (ex: DriverPool.get_stats)."""
+        self._external[name] = stats_fn
+
+    def get_stats(self) -> Dict[str, Dict[str, Any]]:
+        """Statistiques de tous les étages, externes d'abord (ordre du flux)."""
+        stats = {}
+        for name, stats_fn in self._external.items():
+            try:
+                stats[name] = stats_fn()
+            except Exception as e:
+                logger.debug(f"[PIPE] Stats de l'étage {name} indisponibles : {e}")
+        for name, stage in self.stages.items():
+            stats[name] = stage.get_stats()
+        return stats
+
+    def shutdown(self) -> None:
+        for stage in self.stages.values():
+            stage.shutdown()
@@ -0,0 +1,245 @@
+# prefetch.py
+"""
+Extraction anticipée des listes d'images (look-ahead) PANELia
+
+Avant : dans un worker, extraction des URLs (Selenium) -> téléchargement ->
+découpage, strictement en séquence : le driver restait inactif pendant que
+les images du chapitre descendaient.
+
+Maintenant :
+- Un thread par driver extrait les listes des chapitres N+1..N+k pendant que
+  le chapitre N télécharge (profondeur k configurable)
+- Le driver n'est utilisé que par ce thread : jamais deux navigations
+  simultanées sur la même session
+- Une liste dont les URLs expirent (URL signées expires= / X-Amz-Expires,
+  ou âge maximal dépassé) est invalidée et ré-extraite avant usage
+- Plusieurs threads d'extraction possibles (workers), chacun empruntant un
+  driver du DriverPool le temps d'une extraction
+
+Usage:
+    prefetcher = ImageListPrefetcher(chapters, extract=lambda num, url: ..., depth=2)
+    prefetcher.start()
+    for idx, (num, url) in enumerate(chapters):
+        image_urls = prefetcher.get(idx)
+    prefetcher.close()
+
+Auteur: PANELia Team
+Date: 2025-12-17
+"""
+
+import threading
+import time
+from dataclasses import dataclass
+from datetime import datetime, timezone
+from typing import Any, Callable, Dict, List, Optional, Tuple
+from urllib.parse import parse_qs, urlparse
+
+from loguru import logger
+
+
+# Paramètres de requête portant une date d'expiration (timestamp Unix)
+EXPIRY_QUERY_PARAMS = ("expires", "Expires", "exp")
+
+
+def signed_url_expiry(url: str) -> Optional[float]:
+    """
+    Date d'expiration (timestamp Unix) d'une URL signée, ou None.
+
+    Reconnaît expires=/Expires=/exp= (timestamp) et le couple
+    X-Amz-Date + X-Amz-Expires des URLs pré-signées S3.
+    """
+    query = parse_qs(urlparse(url).query)
+    for name in EXPIRY_QUERY_PARAMS:
+        values = query.get(name)
+        if values and values[0].isdigit():
+            return float(values[0])
+
+    amz_date, amz_expires = query.get("X-Amz-Date"), query.get("X-Amz-Expires")
+    if amz_date and amz_expires and amz_expires[0].isdigit():
+        try:
+            signed_at = datetime.strptime(amz_date[0], "%Y%m%dT%H%M%SZ").replace(tzinfo=timezone.utc)
+        except ValueError:
+            return None
+        return signed_at.timestamp() + int(amz_expires[0])
+    return None
+
+
+@dataclass
+class PrefetchEntry:
+    """Résultat d'extraction d'un chapitre (valeur ou exception)."""
+    value: Any
+    error: Optional[BaseException]
+    fetched_at: float
+    expires_at: Optional[float]
+
+    def is_fresh(self, margin: float) -> bool:
+        """True si les URLs restent valides au moins `margin` secondes."""
+        return self.expires_at is None or time.time() + margin < self.expires_at
+
+
+class ImageListPrefetcher:
+    """
+    Extrait en avance les listes d'images d'une file ordonnée de chapitres.
+
+    `extract(chap_num, chap_url)` est appelé depuis `workers` threads dédiés
+    (un seul par défaut : jamais en parallèle avec lui-même). Sa valeur de
+    retour est rendue telle quelle
+    par get() ; elle doit contenir (ou être) la liste d'URLs, extraite par
+    `urls_of` pour le calcul d'expiration.
+    """
+
+    def __init__(
+        self,
+        chapters: List[Tuple[float, str]],
+        extract: Callable[[float, str], Any],
+        depth: int = 2,
+        max_age: Optional[float] = 600.0,
+        expiry_margin: float = 60.0,
+        urls_of: Callable[[Any], List[str]] = lambda value: value,
+        name: str = "prefetch",
+        workers: int = 1,
+    ):
+        """
+        Args:
+            chapters: [(chap_num, chap_url), ...] dans l'ordre de traitement
+            extract: Fonction d'extraction (utilise le driver de la voie)
+            depth: Chapitres extraits en avance au-delà du chapitre courant (0 = aucun)
+            max_age: Âge max d'une liste avant ré-extraction (s, None = illimité)
+            expiry_margin: Une URL signée doit rester valide au moins ce délai (s)
+            urls_of: Extrait la liste d'URLs de la valeur retournée par extract
+            name: Nom des threads (logs)
+            workers: Extractions simultanées (ex: nombre de drivers du pool)
+        """
+        self.chapters = list(chapters)
+        self.extract = extract
+        self.depth = max(0, depth)
+        self.max_age = max_age
+        self.expiry_margin = expiry_margin
+        self.urls_of = urls_of
+        self.name = name
+        self.workers = max(1, workers)
+
+        self._entries: Dict[int, PrefetchEntry] = {}
+        self._refresh: List[int] = []
+        self._next = 0
+        self._current = 0
+        self._closed = False
+        self._cond = threading.Condition()
+        self._threads: List[threading.Thread] = []
+
+        self.ready_hits = 0
+        self.waits = 0
+        self.invalidations = 0
+
+    def start(self) -> None:
+        """Démarre les threads d'extraction."""
+        self._threads = [
+            threading.Thread(target=self._run, name=f"panelia-{self.name}-{i}", daemon=True)
+            for i in range(self.workers)
+        ]
+        for thread in self._threads:
+            thread.start()
+
+    def _expiry(self, value: Any, fetched_at: float) -> Optional[float]:
+        expiries = []
+        if self.max_age is not None:
+            expiries.append(fetched_at + self.max_age)
+        try:
+            urls = self.urls_of(value) or []
+        except Exception:
+            urls = []
+        for url in urls:
+            expiry = signed_url_expiry(url)
+            if expiry is not None:
+                expiries.append(expiry)
+        return min(expiries) if expiries else None
+
+    def _run(self) -> None:
+        while True:
+            with self._cond:
+                while not self._closed and not self._refresh and not (
+                    self._next < len(self.chapters) and self._next <= self._current + self.depth
+                ):
+                    self._cond.wait()
+                if self._closed:
+                    return
+                if self._refresh:
+                    idx = self._refresh.pop(0)
+                else:
+                    idx = self._next
+                    self._next += 1
+
+            chap_num, chap_url = self.chapters[idx]
+            fetched_at = time.time()
+            try:
+                value = self.extract(chap_num, chap_url)
+                entry = PrefetchEntry(value, None, fetched_at, self._expiry(value, fetched_at))
+            except Exception as e:
+                entry = PrefetchEntry(None, e, fetched_at, None)
+
+            with self._cond:
+                self._entries[idx] = entry
+                self._cond.notify_all()
+            if idx > self._current:
+                logger.debug(f"[PREFETCH][CHAP {chap_num}] Liste extraite en avance")
+
+    def get(self, idx: int) -> Any:
+        """
+        Liste du chapitre `idx` (bloque jusqu'à ce qu'elle soit extraite).
+        Autorise l'extraction des chapitres idx+1..idx+depth.
+
+        Raises:
+            Exception levée par extract pour ce chapitre
+        """
+        chap_num = self.chapters[idx][0]
+        with self._cond:
+            self._current = max(self._current, idx)
+            self._cond.notify_all()
+
+            waited = False
+            while True:
+                entry = self._entries.get(idx)
+                if entry is not None and (entry.error is not None or entry.is_fresh(self.expiry_margin)):
+                    del self._entries[idx]
+                    break
+                if entry is not None:
+                    # URLs expirées (ou sur le point de l'être) : ré-extraction prioritaire
+                    del self._entries[idx]
+                    self._refresh.append(idx)
+                    self.invalidations += 1
+                    logger.info(f"[PREFETCH][CHAP {chap_num}] Liste expirée, nouvelle extraction")
+                    self._cond.notify_all()
+                if self._closed:
+                    raise RuntimeError("Prefetcher fermé")
+                waited = True
+                self._cond.wait()
+
+            if waited:
+                self.waits += 1
+            else:
+                self.ready_hits += 1
+
+        if entry.error is not None:
+            raise entry.error
+        return entry.value
+
+    def close(self, wait: bool = True) -> None:
+        """
+        Arrête les threads (les extractions en cours se terminent) ; les get()
+        en attente lèvent RuntimeError. wait=False : sans attendre les threads.
+        """
+        with self._cond:
+            self._closed = True
+            self._cond.notify_all()
+        if not wait:
+            return
+        for thread in self._threads:
+            thread.join()
+
+    def get_stats(self) -> Dict[str, int]:
+        """Listes servies immédiatement, attentes et invalidations."""
+        return {
+            "ready_hits": self.ready_hits,
+            "waits": self.waits,
+            "invalidations": self.invalidations,
+        }
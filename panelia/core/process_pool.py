@@ -0,0 +1,250 @@
+# process_pool.py
+"""
+Découpage et encodage JPEG dans des processus PANELia
+
+Avant : slice_panels_precision, trim_borders_smart et l'encodage JPEG
+(optimize=True) tournaient dans des threads du même processus : dès que
+PIL/numpy gardent le GIL, tout se sérialise (~150 % CPU sur 16 cœurs).
+
+Maintenant (optionnel, processing_backend="process") :
+- Un ProcessPoolExecutor (contexte spawn : pas de fork d'un processus
+  multi-thread) exécute découpage + encodage
+- Transfert par mémoire partagée : les octets d'image (entrée) et les pixels
+  des planches (encodage seul) ne passent pas par le pickle de la file
+- Les processus sont pré-chauffés (imports numpy/PIL, codec JPEG chargé)
+  avant les premières images
+- En sortie : métadonnées des planches sauvées (chemin, taille, octets) ;
+  les planches d'une image sont écrites sous un nom temporaire, renommées
+  ensuite dans l'ordre des pages par le moteur
+
+Usage:
+    workers = ProcessImageWorkers(workers=8)
+    infos = workers.submit_image(data, output_dir, quality=92).result()
+    for n, info in enumerate(infos, 1):
+        info.commit(output_dir / f"Ch1_0_P{n:03d}.jpg")
+    workers.shutdown()
+
+Auteur: PANELia Team
+Date: 2025-12-18
+"""
+
+import io
+import multiprocessing
+import os
+import threading
+import time
+import uuid
+from concurrent.futures import Future, ProcessPoolExecutor
+from dataclasses import dataclass
+from multiprocessing.shared_memory import SharedMemory
+from pathlib import Path
+from typing import Any, Dict, List, Optional, Tuple
+
+import numpy as np
+from PIL import Image
+from loguru import logger
+
+
+@dataclass
+class PanelInfo:
+    """Planche encodée par un processus de travail."""
+    path: str
+    width: int
+    height: int
+    size_bytes: int
+
+    def commit(self, final_path: Path) -> "PanelInfo":
+        """Renomme le fichier temporaire vers son nom définitif (ChXX_PXXX)."""
+        os.replace(self.path, final_path)
+        self.path = str(final_path)
+        return self
+
+
+# --- Côté processus de travail ---------------------------------------------
+
+def _warm_worker(ready) -> None:
+    """Initialiseur : imports lourds et codec JPEG chargés une fois par processus."""
+    from panelia.scrapers.factory import slice_panels_precision  # noqa: F401
+    Image.new("RGB", (16, 16)).save(io.BytesIO(), "JPEG", optimize=True)
+    ready.release()
+
+
+def _ping() -> int:
+    return os.getpid()
+
+
+def _read_shared(name: str, size: int) -> bytes:
+    shm = SharedMemory(name=name)
+    try:
+        return bytes(shm.buf[:size])
+    finally:
+        shm.close()
+
+
+def _save_jpeg(img: Image.Image, path: Path, quality: int) -> PanelInfo:
+    img.convert('RGB').save(path, "JPEG", quality=quality, optimize=True)
+    return PanelInfo(str(path), img.size[0], img.size[1], path.stat().st_size)
+
+
+def _slice_and_encode(name: str, size: int, out_dir: str, token: str, quality: int) -> Tuple[List[PanelInfo], float, float]:
+    """Découpe l'image en mémoire partagée et encode ses planches (noms temporaires)."""
+    from panelia.scrapers.factory import slice_panels_precision
+
+    start, cpu_start = time.perf_counter(), time.process_time()
+    panels = slice_panels_precision(_read_shared(name, size))
+    infos = []
+    for i, panel in enumerate(panels):
+        try:
+            infos.append(_save_jpeg(panel, Path(out_dir) / f".{token}_{i:03d}.part.jpg", quality))
+        except Exception as e:
+            logger.warning(f"[PROC] Erreur sauvegarde planche {i} : {e}")
+    return infos, time.perf_counter() - start, time.process_time() - cpu_start
+
+
+def _encode_pixels(name: str, shape: Tuple[int, ...], mode: str, path: str, quality: int) -> Tuple[Optional[PanelInfo], float, float]:
+    """Encode une planche dont les pixels sont en mémoire partagée."""
+    start, cpu_start = time.perf_counter(), time.process_time()
+    shm = SharedMemory(name=name)
+    try:
+        img = Image.fromarray(np.ndarray(shape, dtype=np.uint8, buffer=shm.buf).copy(), mode)
+    finally:
+        shm.close()
+    try:
+        info = _save_jpeg(img, Path(path), quality)
+    except Exception as e:
+        logger.warning(f"[PROC] Erreur sauvegarde planche {Path(path).name} : {e}")
+        info = None
+    return info, time.perf_counter() - start, time.process_time() - cpu_start
+
+
+# --- Côté moteur -----------------------------------------------------------
+
+def _share(data) -> SharedMemory:
+    shm = SharedMemory(create=True, size=max(1, len(data)))
+    shm.buf[:len(data)] = data
+    return shm
+
+
+def _read_source(source) -> bytes:
+    """Corps complet d'une image téléchargée (bytes ou fichier spoolé)."""
+    if isinstance(source, (bytes, bytearray, memoryview)):
+        return bytes(source)
+    source.seek(0)
+    return source.read()
+
+
+class ProcessImageWorkers:
+    """
+    Pool de processus pour le découpage et l'encodage JPEG.
+
+    Les futures rendues sont des concurrent.futures.Future : submit_image ->
+    List[PanelInfo] (noms temporaires), submit_panel -> PanelInfo ou None.
+    """
+
+    def __init__(self, workers: Optional[int] = None, warm_up: bool = True):
+        """
+        Args:
+            workers: Processus de travail (défaut : nombre de cœurs)
+            warm_up: Démarre et pré-chauffe tous les processus tout de suite
+        """
+        self.workers = max(1, workers or os.cpu_count() or 1)
+        context = multiprocessing.get_context("spawn")
+        # Chaque processus le libère une fois pré-chauffé
+        self._ready = context.Semaphore(0)
+        self._ready_count = 0
+        self._executor = ProcessPoolExecutor(
+            max_workers=self.workers,
+            mp_context=context,
+            initializer=_warm_worker,
+            initargs=(self._ready,)
+        )
+        self._lock = threading.Lock()
+        self._created_at = time.monotonic()
+        self._submitted = 0
+        self._completed = 0
+        self._failed = 0
+        self._busy_total = 0.0
+        self._cpu_total = 0.0
+        self._shared_bytes = 0
+        self._warm_futures: List[Future] = []
+        if warm_up:
+            self.warm_up(wait=False)
+
+    def warm_up(self, wait: bool = True, timeout: float = 60) -> int:
+        """
+        Démarre tous les processus (initialiseur exécuté) avant les vraies tâches.
+        Retourne le nombre de processus prêts (si wait).
+        """
+        if not self._warm_futures:
+            # Une tâche par processus : le pool en démarre un par tâche soumise sans worker libre
+            self._warm_futures = [self._executor.submit(_ping) for _ in range(self.workers)]
+        if not wait:
+            return self._ready_count
+        deadline = time.monotonic() + timeout
+        while self._ready_count < self.workers and self._ready.acquire(timeout=max(0.0, deadline - time.monotonic())):
+            self._ready_count += 1
+        logger.info(f"[PROC] {self._ready_count}/{self.workers} processus de découpage/encodage prêts")
+        return self._ready_count
+
+    def _track(self, future: Future, shm: SharedMemory, size: int) -> Future:
+        """Libère la mémoire partagée à la fin de la tâche et tient les stats."""
+        out: Future = Future()
+        with self._lock:
+            self._submitted += 1
+            self._shared_bytes += size
+
+        def done(f: Future) -> None:
+            shm.close()
+            shm.unlink()
+            try:
+                result, elapsed, cpu = f.result()
+            except BaseException as e:
+                with self._lock:
+                    self._failed += 1
+                    self._completed += 1
+                out.set_exception(e)
+                return
+            with self._lock:
+                self._completed += 1
+                self._busy_total += elapsed
+                self._cpu_total += cpu
+            out.set_result(result)
+
+        future.add_done_callback(done)
+        return out
+
+    def submit_image(self, source, out_dir: Path, quality: int = 92) -> Future:
+        """Découpe + encode une image téléchargée ; planches sous noms temporaires dans out_dir."""
+        data = _read_source(source)
+        shm = _share(data)
+        future = self._executor.submit(_slice_and_encode, shm.name, len(data), str(out_dir), uuid.uuid4().hex, quality)
+        return self._track(future, shm, len(data))
+
+    def submit_panel(self, img: Image.Image, path: Path, quality: int = 92) -> Future:
+        """Encode une planche déjà découpée (pixels transmis par mémoire partagée)."""
+        if img.mode not in ("RGB", "L"):
+            img = img.convert("RGB")
+        pixels = np.ascontiguousarray(np.asarray(img))
+        shm = _share(pixels.reshape(-1))
+        future = self._executor.submit(_encode_pixels, shm.name, pixels.shape, img.mode, str(path), quality)
+        return self._track(future, shm, pixels.nbytes)
+
+    def get_stats(self) -> Dict[str, Any]:
+        """Tâches, occupation des processus et volume passé par mémoire partagée."""
+        with self._lock:
+            capacity = (time.monotonic() - self._created_at) * self.workers
+            return {
+                "workers": self.workers,
+                "submitted": self._submitted,
+                "in_flight": self._submitted - self._completed,
+                "completed": self._completed,
+                "failed": self._failed,
+                "avg_service_ms": round(self._busy_total / self._completed * 1000, 1) if self._completed else 0.0,
+                "utilisation": round(min(1.0, self._busy_total / capacity), 3) if capacity > 0 else 0.0,
+                # Temps CPU consommé dans les processus (hors GIL du moteur)
+                "cpu_s": round(self._cpu_total, 2),
+                "shared_mb": round(self._shared_bytes / 1024 / 1024, 1),
+            }
+
+    def shutdown(self) -> None:
+        self._executor.shutdown(wait=True, cancel_futures=True)
@@ -0,0 +1,291 @@
+# scheduler.py
+"""
+Ordonnanceur global des téléchargements d'images PANELia
+
+Avant : un sémaphore global_download_slots pris une fois par chapitre, avec
+un timeout silencieux de 10 s au-delà duquel le chapitre démarrait quand
+même ; chaque chapitre ouvrait ensuite son propre ThreadPoolExecutor. La
+concurrence réelle valait chapitres x image_workers_per_chap, sans plafond.
+
+Maintenant :
+- Chaque tentative de téléchargement d'image est une tâche du même ordonnanceur
+- Plafond global strict (nombre de threads) et plafond strict par hôte
+- Partage équitable : les chapitres actifs sont servis à tour de rôle
+  (round-robin), un gros chapitre n'affame pas les autres
+- Profondeur de file (courante / max) et temps d'attente (moyen, p95, max)
+- Priorités et quotas par lot (voie, lane()) : les chapitres d'un lot
+  prioritaire passent avant ceux des autres, le tour de rôle s'applique à
+  priorité égale ; un lot peut être plafonné à N téléchargements simultanés
+- Plafond par hôte ajustable en cours de lot (set_host_limit) et
+  observateur appelé à chaque fin de tâche : l'auto-réglage (autotune.py)
+  s'y branche
+
+Usage:
+    scheduler = DownloadScheduler(max_concurrency=12, per_host_limit=6)
+    future = scheduler.submit(chapter_key, url, job.step)
+    lane = scheduler.lane(priority=5, limit=4)   # même submit(), pour un lot
+    scheduler.release_lane(lane)
+    stats = scheduler.get_stats()
+    scheduler.shutdown()
+
+Auteur: PANELia Team
+Date: 2025-12-17
+"""
+
+import threading
+import time
+from collections import OrderedDict, deque
+from concurrent.futures import Future
+from dataclasses import dataclass, field
+from typing import Any, Callable, Deque, Dict, Optional
+
+from loguru import logger
+
+from panelia.utils.ratelimit import domain_of
+
+
+@dataclass
+class _Task:
+    host: str
+    fn: Callable
+    args: tuple
+    group: Any = None
+    future: Future = field(default_factory=Future)
+    enqueued_at: float = field(default_factory=time.monotonic)
+
+
+class SchedulerLane:
+    """
+    Voie d'un lot dans l'ordonnanceur : même submit() que DownloadScheduler,
+    avec la priorité et le groupe (quota) du lot fixés.
+    """
+
+    def __init__(self, scheduler: "DownloadScheduler", priority: int = 0, group: Any = None):
+        self.scheduler = scheduler
+        self.priority = priority
+        self.group = group
+
+    def submit(self, chapter: Any, url: str, fn: Callable, *args) -> Future:
+        return self.scheduler.submit(chapter, url, fn, *args, priority=self.priority, group=self.group)
+
+    def get_stats(self) -> Dict[str, Any]:
+        return self.scheduler.get_stats()
+
+
+class DownloadScheduler:
+    """
+    Pool de threads unique dont les tâches sont rangées par chapitre.
+
+    Un worker libre prend, en faisant tourner les chapitres, la première tâche
+    dont l'hôte a encore une place. Les futures retournées sont des
+    concurrent.futures.Future ordinaires (wait, cancel, result).
+    """
+
+    def __init__(self, max_concurrency: int = 12, per_host_limit: int = 6, name: str = "dl"):
+        """
+        Args:
+            max_concurrency: Tâches simultanées max, tous chapitres et hôtes confondus
+            per_host_limit: Tâches simultanées max vers un même domaine (défaut de chaque hôte)
+            name: Préfixe des noms de threads
+        """
+        self.max_concurrency = max(1, max_concurrency)
+        self.per_host_limit = max(1, per_host_limit)
+        # Plafonds propres à certains hôtes (auto-réglage), sinon per_host_limit
+        self._host_limits: Dict[str, int] = {}
+        # observer(hôte, résultat, exception, durée) après chaque tâche, hors verrou
+        self.observer: Optional[Callable[[str, Any, Optional[BaseException], float], None]] = None
+
+        self._queues: "OrderedDict[Any, Deque[_Task]]" = OrderedDict()
+        self._priority: Dict[Any, int] = {}
+        self._host_active: Dict[str, int] = {}
+        # Quotas par groupe (voie d'un lot) : plafond et tâches en cours
+        self._group_limits: Dict[Any, int] = {}
+        self._group_active: Dict[Any, int] = {}
+        self._cond = threading.Condition()
+        self._closed = False
+
+        self._pending = 0
+        self._peak_pending = 0
+        self._active = 0
+        self._completed = 0
+        self._wait_total = 0.0
+        self._wait_max = 0.0
+        self._recent_waits: Deque[float] = deque(maxlen=1000)
+        self._created_at = time.monotonic()
+        self._busy_total = 0.0
+
+        self._workers = [
+            threading.Thread(target=self._work, name=f"panelia-{name}-{i}", daemon=True)
+            for i in range(self.max_concurrency)
+        ]
+        for worker in self._workers:
+            worker.start()
+
+    def submit(self, chapter: Any, url: str, fn: Callable, *args, priority: int = 0, group: Any = None) -> Future:
+        """
+        Met en file fn(*args) pour le chapitre `chapter` (toute clé hashable).
+        Le domaine de `url` sert au plafond par hôte ; `priority` (plus haut =
+        servi d'abord) et `group` (quota, voir lane()) viennent de la voie du lot.
+        """
+        task = _Task(domain_of(url), fn, args, group)
+        with self._cond:
+            if self._closed:
+                raise RuntimeError("Ordonnanceur arrêté")
+            self._queues.setdefault(chapter, deque()).append(task)
+            self._priority[chapter] = priority
+            self._pending += 1
+            self._peak_pending = max(self._peak_pending, self._pending)
+            self._cond.notify()
+        return task.future
+
+    def lane(self, priority: int = 0, limit: Optional[int] = None) -> SchedulerLane:
+        """
+        Voie d'un lot : ses tâches ont la priorité donnée et, avec `limit`,
+        jamais plus de `limit` en cours à la fois. release_lane() en fin de lot.
+        """
+        group = object() if limit else None
+        if group is not None:
+            with self._cond:
+                self._group_limits[group] = max(1, limit)
+        return SchedulerLane(self, priority, group)
+
+    def release_lane(self, lane: SchedulerLane) -> None:
+        """Oublie le quota d'une voie (ses tâches encore en file restent plafonnées jusque-là)."""
+        if lane.group is None:
+            return
+        with self._cond:
+            self._group_limits.pop(lane.group, None)
+            self._cond.notify_all()
+
+    def host_limit(self, host: str) -> int:
+        return self._host_limits.get(host, self.per_host_limit)
+
+    def set_host_limit(self, host: str, limit: int) -> None:
+        """Plafond d'un hôte ; une hausse réveille les tâches qui l'attendaient."""
+        with self._cond:
+            self._host_limits[host] = max(1, min(self.max_concurrency, limit))
+            self._cond.notify_all()
+
+    def _runnable(self, task: _Task) -> bool:
+        if self._host_active.get(task.host, 0) >= self.host_limit(task.host):
+            return False
+        limit = self._group_limits.get(task.group)
+        return limit is None or self._group_active.get(task.group, 0) < limit
+
+    def _take(self) -> Optional[_Task]:
+        """
+        Prochaine tâche exécutable (verrou tenu) : chapitres par priorité
+        décroissante, à tour de rôle à priorité égale (tri stable).
+        """
+        for chapter in sorted(self._queues, key=lambda c: -self._priority[c]):
+            queue = self._queues[chapter]
+            # Le chapitre passe en fin de tour, servi ou non
+            self._queues.move_to_end(chapter)
+
+            for i, task in enumerate(queue):
+                if task.future.cancelled():
+                    continue
+                if self._runnable(task):
+                    del queue[i]
+                    self._pending -= 1
+                    break
+            else:
+                task = None
+
+            # Purge des tâches annulées pendant leur attente
+            while queue and queue[0].future.cancelled():
+                queue.popleft()
+                self._pending -= 1
+            if not queue:
+                del self._queues[chapter]
+                del self._priority[chapter]
+
+            if task is not None and task.future.set_running_or_notify_cancel():
+                return task
+        return None
+
+    def _work(self) -> None:
+        while True:
+            with self._cond:
+                task = self._take()
+                while task is None:
+                    if self._closed:
+                        return
+                    self._cond.wait()
+                    task = self._take()
+
+                waited = time.monotonic() - task.enqueued_at
+                self._wait_total += waited
+                self._wait_max = max(self._wait_max, waited)
+                self._recent_waits.append(waited)
+                self._host_active[task.host] = self._host_active.get(task.host, 0) + 1
+                if task.group is not None:
+                    self._group_active[task.group] = self._group_active.get(task.group, 0) + 1
+                self._active += 1
+
+            started = time.monotonic()
+            result = error = None
+            try:
+                result = task.fn(*task.args)
+            except BaseException as e:
+                error = e
+            observer = self.observer
+            if observer is not None:
+                try:
+                    observer(task.host, result, error, time.monotonic() - started)
+                except Exception as e:
+                    logger.warning(f"[SCHED] Observateur en échec : {e}")
+            try:
+                if error is not None:
+                    task.future.set_exception(error)
+                else:
+                    task.future.set_result(result)
+            finally:
+                with self._cond:
+                    self._busy_total += time.monotonic() - started
+                    self._host_active[task.host] -= 1
+                    if task.group is not None:
+                        self._group_active[task.group] -= 1
+                        if not self._group_active[task.group]:
+                            del self._group_active[task.group]
+                    self._active -= 1
+                    self._completed += 1
+                    # Une place d'hôte (ou de quota) libérée peut débloquer une tâche d'un autre chapitre
+                    self._cond.notify_all()
+
+    def get_stats(self) -> Dict[str, Any]:
+        """Profondeur de file, tâches actives et temps d'attente (ms)."""
+        with self._cond:
+            waits = sorted(self._recent_waits)
+            p95 = waits[min(len(waits) - 1, int(len(waits) * 0.95))] if waits else 0.0
+            capacity = (time.monotonic() - self._created_at) * self.max_concurrency
+            return {
+                "queue_depth": self._pending,
+                "peak_queue_depth": self._peak_pending,
+                "active": self._active,
+                "active_chapters": len(self._queues),
+                "active_by_host": {h: n for h, n in self._host_active.items() if n},
+                "host_limits": dict(self._host_limits),
+                "completed": self._completed,
+                "avg_wait_ms": round(self._wait_total / self._completed * 1000, 1) if self._completed else 0.0,
+                "p95_wait_ms": round(p95 * 1000, 1),
+                "max_wait_ms": round(self._wait_max * 1000, 1),
+                # Part de la capacité (threads x temps écoulé) passée à télécharger
+                "utilisation": round(min(1.0, self._busy_total / capacity), 3) if capacity > 0 else 0.0,
+            }
+
+    def shutdown(self, cancel_pending: bool = True) -> None:
+        """Arrête les workers (après les tâches en cours) et annule la file."""
+        with self._cond:
+            self._closed = True
+            if cancel_pending:
+                for queue in self._queues.values():
+                    for task in queue:
+                        task.future.cancel()
+                self._queues.clear()
+                self._priority.clear()
+                self._pending = 0
+            self._cond.notify_all()
+        for worker in self._workers:
+            worker.join()
+        logger.debug(f"[SCHED] Ordonnanceur arrêté : {self.get_stats()}")
@@ -0,0 +1,163 @@
+# sync.py
+"""
+Synchronisation incrémentale d'une série PANELia
+
+Avant : revérifier une série chaque jour = relancer la découverte, puis
+choisir la plage de chapitres à la main dans app.py.
+
+Maintenant :
+- La liste découverte (discover_chapters_*) est comparée à ce qui existe
+  localement : journal de la série (chapitres terminés et vérifiés, voir
+  journal.py) et dossiers de chapitres déjà remplis (lots antérieurs au
+  journal)
+- Seuls les chapitres manquants ou modifiés (URL, réglages de sortie ou
+  planches différents) sont mis en file
+- Une empreinte de la liste (+ réglages) est stockée dans
+  output/<série>/.panelia_sync.json : liste inchangée depuis la dernière
+  synchronisation complète -> série sautée sans rien vérifier
+
+Usage:
+    sync = SeriesSync(engine.series_dir(name), settings)
+    plan = sync.plan(discovered_chapters)
+    if not plan.unchanged:
+        results = engine.run_chapter_batch(plan.to_process, params)
+        sync.record(plan, results)
+
+Auteur: PANELia Team
+Date: 2025-12-18
+"""
+
+import hashlib
+import json
+import os
+import time
+from dataclasses import dataclass, field
+from pathlib import Path
+from typing import Any, Dict, List, Optional
+
+from loguru import logger
+
+from panelia.core.journal import JOURNAL_FILENAME, BatchJournal, journal_url
+
+
+SYNC_STATE_FILENAME = ".panelia_sync.json"
+
+
+def chapter_list_fingerprint(chapters: Dict[float, str], settings: Optional[Dict[str, Any]] = None) -> str:
+    """SHA-256 de la liste (numéro, URL) triée et des réglages de sortie."""
+    payload = json.dumps(
+        {"chapters": sorted([float(n), u] for n, u in chapters.items()), "settings": settings or {}},
+        sort_keys=True
+    )
+    return hashlib.sha256(payload.encode("utf-8")).hexdigest()
+
+
+@dataclass
+class SyncPlan:
+    """Résultat de la comparaison liste découverte / disque."""
+    fingerprint: str
+    # Liste identique à la dernière synchronisation complète : rien à faire
+    unchanged: bool = False
+    missing: Dict[float, str] = field(default_factory=dict)
+    changed: Dict[float, str] = field(default_factory=dict)
+    up_to_date: List[float] = field(default_factory=list)
+    # Dossier déjà rempli mais absent du journal : gardé tel quel
+    untracked: List[float] = field(default_factory=list)
+
+    @property
+    def to_process(self) -> Dict[float, str]:
+        return {**self.missing, **self.changed}
+
+    def summary(self) -> Dict[str, Any]:
+        return {
+            "unchanged": self.unchanged,
+            "missing": len(self.missing),
+            "changed": len(self.changed),
+            "up_to_date": len(self.up_to_date),
+            "untracked": len(self.untracked),
+        }
+
+
+class SeriesSync:
+    """Plan de synchronisation d'une série et état de la dernière vérification."""
+
+    def __init__(self, series_dir: Path, settings: Optional[Dict[str, Any]] = None, verify: str = "size"):
+        """
+        Args:
+            series_dir: Dossier de sortie de la série (ScraperEngine.series_dir)
+            settings: Réglages de sortie (voir engine.output_settings)
+            verify: Vérification des planches journalisées (voir journal.VERIFY_MODES)
+        """
+        self.series_dir = Path(series_dir)
+        self.settings = settings or {}
+        self.verify = verify
+        self.state_path = self.series_dir / SYNC_STATE_FILENAME
+
+    def load_state(self) -> Dict[str, Any]:
+        try:
+            return json.loads(self.state_path.read_text(encoding="utf-8"))
+        except (OSError, ValueError):
+            return {}
+
+    def _has_panels(self, chap_num: float) -> bool:
+        chap_dir = self.series_dir / str(chap_num).replace('.', '_')
+        return chap_dir.is_dir() and any(chap_dir.glob("*.jpg"))
+
+    def plan(self, discovered: Dict[float, str], force: bool = False) -> SyncPlan:
+        """
+        Compare la liste découverte à l'existant.
+
+        Args:
+            discovered: {numéro: URL} rendu par discover_chapters_*
+            force: Ignore l'empreinte stockée (vérifie chaque chapitre)
+        """
+        fingerprint = chapter_list_fingerprint(discovered, self.settings)
+        state = self.load_state()
+        if not force and state.get("fingerprint") == fingerprint and state.get("complete"):
+            logger.info(f"[SYNC] {self.series_dir.name} : liste inchangée depuis {time.strftime('%Y-%m-%d %H:%M', time.localtime(state.get('checked_at', 0)))}, série sautée")
+            return SyncPlan(fingerprint, unchanged=True, up_to_date=sorted(discovered))
+
+        plan = SyncPlan(fingerprint)
+        journal_path = self.series_dir / JOURNAL_FILENAME
+        # Sans compaction : un chapitre commencé mais jamais terminé doit rester connu du journal
+        journal = BatchJournal(journal_path, verify=self.verify, compact=False) if journal_path.exists() else None
+        try:
+            for chap_num, chap_url in sorted(discovered.items()):
+                tracked = journal.chapters.get(float(chap_num)) if journal is not None else None
+                if tracked is not None and tracked.status == "done":
+                    if journal.verified_result(chap_num, journal_url(chap_url), self.settings) is not None:
+                        plan.up_to_date.append(chap_num)
+                    else:
+                        plan.changed[chap_num] = chap_url
+                elif tracked is None and self._has_panels(chap_num):
+                    plan.untracked.append(chap_num)
+                else:
+                    plan.missing[chap_num] = chap_url
+        finally:
+            if journal is not None:
+                journal.close()
+        logger.info(f"[SYNC] {self.series_dir.name} : {plan.summary()}")
+        return plan
+
+    def record(self, plan: SyncPlan, results: List[Dict[str, Any]]) -> bool:
+        """
+        Stocke l'empreinte après traitement. La synchronisation est complète
+        (prochaine vérification sautée si la liste n'a pas bougé) seulement
+        si tous les chapitres en file ont abouti. Retourne ce statut.
+        """
+        done = {float(r["chap_num"]) for r in results if not r.get("error") and r.get("panels_saved")}
+        failed = sorted(float(n) for n in plan.to_process if float(n) not in done)
+        state = {
+            "fingerprint": plan.fingerprint,
+            "complete": not failed,
+            "checked_at": time.time(),
+            "chapters": len(plan.up_to_date) + len(plan.untracked) + len(plan.to_process),
+            "failed": failed,
+        }
+        self.series_dir.mkdir(parents=True, exist_ok=True)
+        tmp = self.state_path.with_suffix(".tmp")
+        tmp.write_text(json.dumps(state, indent=2), encoding="utf-8")
+        os.replace(tmp, self.state_path)
+        if failed:
+            logger.warning(f"[SYNC] {self.series_dir.name} : {len(failed)} chapitre(s) à reprendre à la prochaine synchronisation : {failed}")
+        return not failed
@@ -0,0 +1,495 @@
+# workqueue.py
+"""
+File de travail partagée des chapitres PANELia (plusieurs machines)
+
+Avant : un lot vivait dans le processus qui l'avait lancé (app.py, CLI,
+SeriesScheduler) ; impossible de répartir les chapitres d'une série sur
+plusieurs machines, et un processus planté emportait ses chapitres en cours.
+
+Maintenant :
+- WorkQueue : file de tâches « chapitre » avec bail (lease), acquittement
+  (ack) et délai de visibilité ; interface commune aux moteurs de stockage
+- SQLiteWorkQueue : moteur fourni, un simple fichier SQLite (aucun service
+  externe) ; transactions BEGIN IMMEDIATE pour des baux atomiques entre
+  processus
+- Bail expiré (worker planté, machine coupée) = tâche à nouveau visible et
+  reprise par un autre worker ; max_attempts tentatives puis "dead"
+- Jeton de bail : un worker dont le bail a expiré et été réattribué ne peut
+  plus acquitter (pas de double résultat)
+- Résultats, métriques par chapitre et état des workers (dernier signe de
+  vie, statistiques du moteur) remontent dans la même base
+
+Le fichier SQLite doit être sur un disque local ou un partage dont le
+verrouillage de fichiers est fiable (éviter NFS sans verrous).
+
+Usage:
+    queue = open_work_queue("sqlite:///srv/panelia/queue.db")
+    queue.enqueue("Solo_Leveling", chapters, params)
+    leases = queue.lease("node-a", limit=4)
+    queue.ack(leases[0], result)
+    print(queue.get_stats())
+
+Auteur: PANELia Team
+Date: 2025-12-18
+"""
+
+import json
+import os
+import socket
+import sqlite3
+import threading
+import time
+import uuid
+from abc import ABC, abstractmethod
+from dataclasses import dataclass
+from pathlib import Path
+from typing import Any, Dict, List, Optional
+
+from loguru import logger
+
+from panelia.core.engine import CANCELLED_MESSAGE
+from panelia.core.events import CHAPTER_FINISHED
+from panelia.utils.cancellation import CancellationToken
+from panelia.utils.metrics import get_collector
+
+PENDING, LEASED, DONE, DEAD = "pending", "leased", "done", "dead"
+
+
+@dataclass
+class ChapterTask:
+    """Un chapitre à traiter, avec les paramètres de lot de sa série."""
+    task_id: int
+    series: str
+    chap_num: float
+    chap_url: str
+    params: Dict[str, Any]
+    priority: int = 0
+    attempts: int = 0
+
+
+@dataclass
+class Lease:
+    """Bail exclusif d'une tâche : valable jusqu'à expires_at, prolongeable."""
+    task: ChapterTask
+    token: str
+    worker: str
+    expires_at: float
+
+
+def queue_params(params: Dict[str, Any]) -> Dict[str, Any]:
+    """Paramètres de lot transmissibles à un autre processus (JSON, sans objets vivants)."""
+    serializable = {}
+    for key, value in params.items():
+        try:
+            json.dumps(value)
+        except (TypeError, ValueError):
+            continue
+        serializable[key] = value
+    return serializable
+
+
+def default_worker_id() -> str:
+    return f"{socket.gethostname()}-{os.getpid()}"
+
+
+class WorkQueue(ABC):
+    """
+    Interface des files de chapitres. Un moteur de stockage (SQLite, ou un
+    service partagé) implémente ces méthodes ; QueueWorker n'utilise qu'elles.
+    Un moteur incomplet échoue dès sa construction (TypeError), pas en plein bail.
+    """
+
+    @abstractmethod
+    def enqueue(self, series: str, chapters: Dict[float, str], params: Dict[str, Any], priority: int = 0, requeue: bool = False) -> int:
+        """Ajoute les chapitres d'une série ; retourne le nombre de tâches mises en file."""
+
+    @abstractmethod
+    def lease(self, worker: str, limit: int = 1, visibility_timeout: Optional[float] = None) -> List[Lease]:
+        """Jusqu'à `limit` tâches d'une même série (mêmes paramètres), invisibles aux autres workers."""
+
+    @abstractmethod
+    def extend(self, lease: Lease, visibility_timeout: Optional[float] = None) -> bool:
+        """Prolonge un bail ; False s'il a expiré et été repris."""
+
+    @abstractmethod
+    def ack(self, lease: Lease, result: Dict[str, Any]) -> bool:
+        """Tâche terminée : stocke le résultat. False si le bail n'est plus valide."""
+
+    @abstractmethod
+    def fail(self, lease: Lease, error: str, retry_delay: Optional[float] = None) -> bool:
+        """Tentative en échec : tâche à nouveau visible après retry_delay, ou "dead"."""
+
+    @abstractmethod
+    def release(self, lease: Lease) -> bool:
+        """Rend la tâche sans la compter comme tentative (worker arrêté, lot annulé)."""
+
+    @abstractmethod
+    def report_worker(self, worker: str, stats: Dict[str, Any]) -> None:
+        """Signe de vie et statistiques d'un worker."""
+
+    @abstractmethod
+    def results(self, series: Optional[str] = None) -> List[Dict[str, Any]]:
+        """Résultats des tâches terminées ("done" et "dead")."""
+
+    @abstractmethod
+    def get_stats(self) -> Dict[str, Any]:
+        """Tâches par état et workers (dernier signe de vie)."""
+
+    def close(self) -> None:
+        pass
+
+
+class SQLiteWorkQueue(WorkQueue):
+    """
+    File de chapitres dans un fichier SQLite, partageable entre processus.
+
+    Chaque opération est une transaction courte (BEGIN IMMEDIATE) : deux
+    workers ne peuvent pas prendre la même tâche, même sur deux machines.
+    """
+
+    def __init__(self, path: str, visibility_timeout: float = 300.0, max_attempts: int = 3, retry_delay: float = 30.0):
+        """
+        Args:
+            path: Fichier SQLite (créé si absent)
+            visibility_timeout: Durée d'un bail sans prolongation (s)
+            max_attempts: Tentatives avant de marquer la tâche "dead"
+            retry_delay: Attente avant de reproposer une tâche en échec (s)
+        """
+        self.path = Path(path)
+        self.path.parent.mkdir(parents=True, exist_ok=True)
+        self.visibility_timeout = visibility_timeout
+        self.max_attempts = max(1, max_attempts)
+        self.retry_delay = retry_delay
+
+        self._lock = threading.Lock()
+        # isolation_level=None : transactions explicites (BEGIN IMMEDIATE)
+        self._db = sqlite3.connect(str(self.path), timeout=30, isolation_level=None, check_same_thread=False)
+        self._db.execute(
+            "CREATE TABLE IF NOT EXISTS tasks ("
+            " id INTEGER PRIMARY KEY AUTOINCREMENT, series TEXT NOT NULL, chap_num REAL NOT NULL,"
+            " chap_url TEXT NOT NULL, params TEXT NOT NULL, priority INTEGER NOT NULL DEFAULT 0,"
+            " status TEXT NOT NULL, attempts INTEGER NOT NULL DEFAULT 0, available_at REAL NOT NULL,"
+            " lease_token TEXT, worker TEXT, lease_expires REAL, enqueued_at REAL NOT NULL,"
+            " updated_at REAL NOT NULL, result TEXT, error TEXT, UNIQUE(series, chap_num))"
+        )
+        self._db.execute("CREATE INDEX IF NOT EXISTS idx_tasks_ready ON tasks(status, priority, id)")
+        self._db.execute(
+            "CREATE TABLE IF NOT EXISTS workers ("
+            " worker TEXT PRIMARY KEY, host TEXT, last_seen REAL NOT NULL, stats TEXT)"
+        )
+        logger.info(f"[QUEUE] File SQLite : {self.path} (bail {visibility_timeout:.0f}s, {self.max_attempts} tentative(s))")
+
+    def _transaction(self):
+        return _Transaction(self._db, self._lock)
+
+    def enqueue(self, series: str, chapters: Dict[float, str], params: Dict[str, Any], priority: int = 0, requeue: bool = False) -> int:
+        """
+        Un chapitre déjà en file n'est pas dupliqué ; requeue=True remet en
+        file les chapitres déjà terminés ("done" ou "dead") de la série.
+        """
+        now = time.time()
+        # Clés triées : lease() regroupe les tâches d'un même lot par égalité de texte
+        payload = json.dumps(queue_params(params), sort_keys=True)
+        added = 0
+        with self._transaction() as db:
+            for chap_num, chap_url in sorted(chapters.items()):
+                row = db.execute("SELECT status FROM tasks WHERE series = ? AND chap_num = ?", (series, float(chap_num))).fetchone()
+                if row is None:
+                    db.execute(
+                        "INSERT INTO tasks (series, chap_num, chap_url, params, priority, status, available_at, enqueued_at, updated_at)"
+                        " VALUES (?, ?, ?, ?, ?, ?, ?, ?, ?)",
+                        (series, float(chap_num), chap_url, payload, priority, PENDING, now, now, now)
+                    )
+                elif requeue and row[0] in (DONE, DEAD):
+                    db.execute(
+                        "UPDATE tasks SET chap_url = ?, params = ?, priority = ?, status = ?, attempts = 0, available_at = ?,"
+                        " lease_token = NULL, worker = NULL, lease_expires = NULL, result = NULL, error = NULL, updated_at = ?"
+                        " WHERE series = ? AND chap_num = ?",
+                        (chap_url, payload, priority, PENDING, now, now, series, float(chap_num))
+                    )
+                else:
+                    continue
+                added += 1
+        logger.info(f"[QUEUE] {series} : {added}/{len(chapters)} chapitre(s) mis en file")
+        return added
+
+    def _expire_leases(self, db, now: float) -> None:
+        """Baux expirés : tâche à nouveau visible, ou "dead" après max_attempts."""
+        expired = db.execute("SELECT id, worker, attempts FROM tasks WHERE status = ? AND lease_expires < ?", (LEASED, now)).fetchall()
+        for task_id, worker, attempts in expired:
+            status = DEAD if attempts >= self.max_attempts else PENDING
+            db.execute(
+                "UPDATE tasks SET status = ?, lease_token = NULL, lease_expires = NULL, available_at = ?, updated_at = ?,"
+                " error = COALESCE(error, ?) WHERE id = ?",
+                (status, now, now, f"Bail expiré (worker {worker})" if status == DEAD else None, task_id)
+            )
+            logger.warning(f"[QUEUE] Bail de la tâche {task_id} expiré (worker {worker}) -> {status}")
+
+    def lease(self, worker: str, limit: int = 1, visibility_timeout: Optional[float] = None) -> List[Lease]:
+        now = time.time()
+        expires = now + (visibility_timeout or self.visibility_timeout)
+        with self._transaction() as db:
+            self._expire_leases(db, now)
+            head = db.execute(
+                "SELECT series, params FROM tasks WHERE status = ? AND available_at <= ? ORDER BY priority DESC, id LIMIT 1",
+                (PENDING, now)
+            ).fetchone()
+            if head is None:
+                return []
+            rows = db.execute(
+                "SELECT id, series, chap_num, chap_url, params, priority, attempts FROM tasks"
+                " WHERE status = ? AND available_at <= ? AND series = ? AND params = ? ORDER BY priority DESC, chap_num LIMIT ?",
+                (PENDING, now, head[0], head[1], max(1, limit))
+            ).fetchall()
+            leases = []
+            for task_id, series, chap_num, chap_url, params, priority, attempts in rows:
+                token = uuid.uuid4().hex
+                db.execute(
+                    "UPDATE tasks SET status = ?, attempts = attempts + 1, lease_token = ?, worker = ?, lease_expires = ?, updated_at = ? WHERE id = ?",
+                    (LEASED, token, worker, expires, now, task_id)
+                )
+                task = ChapterTask(task_id, series, chap_num, chap_url, json.loads(params), priority, attempts + 1)
+                leases.append(Lease(task, token, worker, expires))
+        return leases
+
+    def extend(self, lease: Lease, visibility_timeout: Optional[float] = None) -> bool:
+        now = time.time()
+        expires = now + (visibility_timeout or self.visibility_timeout)
+        with self._transaction() as db:
+            updated = db.execute(
+                "UPDATE tasks SET lease_expires = ?, updated_at = ? WHERE id = ? AND lease_token = ? AND status = ?",
+                (expires, now, lease.task.task_id, lease.token, LEASED)
+            ).rowcount
+        if updated:
+            lease.expires_at = expires
+        return bool(updated)
+
+    def _settle(self, lease: Lease, assignments: str, values: tuple) -> bool:
+        with self._transaction() as db:
+            updated = db.execute(
+                f"UPDATE tasks SET {assignments}, lease_token = NULL, lease_expires = NULL, updated_at = ?"
+                " WHERE id = ? AND lease_token = ? AND status = ?",
+                values + (time.time(), lease.task.task_id, lease.token, LEASED)
+            ).rowcount
+        if not updated:
+            logger.warning(f"[QUEUE] Bail perdu pour la tâche {lease.task.task_id} ({lease.task.series} ch.{lease.task.chap_num}) : résultat ignoré")
+        return bool(updated)
+
+    def ack(self, lease: Lease, result: Dict[str, Any]) -> bool:
+        return self._settle(lease, "status = ?, result = ?, error = NULL", (DONE, json.dumps(result, default=str)))
+
+    def fail(self, lease: Lease, error: str, retry_delay: Optional[float] = None) -> bool:
+        if lease.task.attempts >= self.max_attempts:
+            return self._settle(lease, "status = ?, error = ?", (DEAD, error))
+        delay = self.retry_delay if retry_delay is None else retry_delay
+        return self._settle(lease, "status = ?, error = ?, available_at = ?", (PENDING, error, time.time() + delay))
+
+    def release(self, lease: Lease) -> bool:
+        return self._settle(lease, "status = ?, attempts = attempts - 1, available_at = ?", (PENDING, time.time()))
+
+    def report_worker(self, worker: str, stats: Dict[str, Any]) -> None:
+        with self._transaction() as db:
+            db.execute(
+                "INSERT INTO workers (worker, host, last_seen, stats) VALUES (?, ?, ?, ?)"
+                " ON CONFLICT(worker) DO UPDATE SET last_seen = excluded.last_seen, stats = excluded.stats",
+                (worker, socket.gethostname(), time.time(), json.dumps(stats, default=str))
+            )
+
+    def results(self, series: Optional[str] = None) -> List[Dict[str, Any]]:
+        query = "SELECT series, chap_num, chap_url, status, attempts, worker, result, error FROM tasks WHERE status IN (?, ?)"
+        args: tuple = (DONE, DEAD)
+        if series is not None:
+            query += " AND series = ?"
+            args += (series,)
+        with self._lock:
+            rows = self._db.execute(query + " ORDER BY series, chap_num", args).fetchall()
+        return [
+            {
+                "series": s, "chap_num": n, "chap_url": u, "status": st, "attempts": a, "worker": w,
+                "result": json.loads(r) if r else None, "error": e,
+            }
+            for s, n, u, st, a, w, r, e in rows
+        ]
+
+    def get_stats(self) -> Dict[str, Any]:
+        """Tâches par état et workers (dernier signe de vie en secondes)."""
+        now = time.time()
+        with self._lock:
+            by_status = dict(self._db.execute("SELECT status, COUNT(*) FROM tasks GROUP BY status").fetchall())
+            expired = self._db.execute("SELECT COUNT(*) FROM tasks WHERE status = ? AND lease_expires < ?", (LEASED, now)).fetchone()[0]
+            workers = self._db.execute("SELECT worker, last_seen FROM workers ORDER BY worker").fetchall()
+        return {
+            **{status: by_status.get(status, 0) for status in (PENDING, LEASED, DONE, DEAD)},
+            "expired_leases": expired,
+            "workers": {worker: round(now - last_seen, 1) for worker, last_seen in workers},
+        }
+
+    def close(self) -> None:
+        with self._lock:
+            self._db.close()
+
+
+class _Transaction:
+    """BEGIN IMMEDIATE ... COMMIT (ROLLBACK sur exception), sous le verrou du processus."""
+
+    def __init__(self, db: sqlite3.Connection, lock: threading.Lock):
+        self.db = db
+        self.lock = lock
+
+    def __enter__(self) -> sqlite3.Connection:
+        self.lock.acquire()
+        try:
+            self.db.execute("BEGIN IMMEDIATE")
+        except BaseException:
+            self.lock.release()
+            raise
+        return self.db
+
+    def __exit__(self, exc_type, exc, tb) -> None:
+        try:
+            self.db.execute("ROLLBACK" if exc_type else "COMMIT")
+        finally:
+            self.lock.release()
+
+
+class QueueWorker:
+    """
+    Worker d'un nœud : prend des chapitres dans la file partagée et les
+    traite avec le ScraperEngine local (drivers, journal, pipeline habituels).
+
+    Les chapitres baillés ensemble forment un lot run_chapter_batch ; chacun
+    est acquitté dès sa fin (événement chapter_finished), et un thread
+    prolonge les baux pendant le lot. Un worker planté cesse de prolonger :
+    ses chapitres reviennent dans la file après le délai de visibilité.
+    """
+
+    def __init__(
+        self,
+        engine,
+        queue: WorkQueue,
+        worker_id: Optional[str] = None,
+        batch_size: Optional[int] = None,
+        visibility_timeout: Optional[float] = None,
+        poll_interval: float = 5.0,
+        cancel_token: Optional[CancellationToken] = None,
+    ):
+        """
+        Args:
+            engine: ScraperEngine du nœud
+            queue: File partagée
+            worker_id: Identifiant dans la file (défaut : hôte-pid)
+            batch_size: Chapitres baillés à la fois (défaut : un par driver + prefetch)
+            visibility_timeout: Durée des baux (défaut : celle de la file)
+            poll_interval: Attente entre deux consultations d'une file vide (s)
+            cancel_token: Arrêt du worker (chapitres en cours rendus à la file)
+        """
+        self.engine = engine
+        self.queue = queue
+        self.worker_id = worker_id or default_worker_id()
+        self.batch_size = batch_size or engine.num_drivers + engine.prefetch_depth
+        self.visibility_timeout = visibility_timeout or getattr(queue, "visibility_timeout", 300.0)
+        self.poll_interval = poll_interval
+        self.cancel_token = cancel_token or CancellationToken()
+        self._stats = {"batches": 0, "acked": 0, "failed": 0, "released": 0, "lost_leases": 0}
+
+    def _heartbeat(self, leases: Dict[float, Lease], stop: threading.Event) -> None:
+        """Prolonge les baux non encore réglés, au tiers du délai de visibilité."""
+        while not stop.wait(self.visibility_timeout / 3):
+            for chap_num, lease in list(leases.items()):
+                if not self.queue.extend(lease, self.visibility_timeout) and leases.pop(chap_num, None) is not None:
+                    # Repris par un autre worker (pas juste acquitté) : notre résultat serait ignoré
+                    self._stats["lost_leases"] += 1
+            self.queue.report_worker(self.worker_id, self.get_stats())
+
+    def _settle(self, lease: Lease, result: Dict[str, Any]) -> None:
+        error = result.get("error")
+        if error == CANCELLED_MESSAGE:
+            self.queue.release(lease)
+            self._stats["released"] += 1
+        elif error or not result.get("panels_saved"):
+            self.queue.fail(lease, error or "Aucune planche")
+            self._stats["failed"] += 1
+        else:
+            # Métriques du chapitre remontées avec son résultat
+            metrics = get_collector().get_chapter_metrics(lease.task.chap_num)
+            self.queue.ack(lease, dict(result, worker=self.worker_id, metrics=metrics))
+            self._stats["acked"] += 1
+
+    def run_once(self) -> int:
+        """Un lot : baille, traite, acquitte. Retourne le nombre de chapitres baillés."""
+        leased = self.queue.lease(self.worker_id, limit=self.batch_size, visibility_timeout=self.visibility_timeout)
+        if not leased:
+            return 0
+        series = leased[0].task.series
+        leases = {lease.task.chap_num: lease for lease in leased}
+        chapters = {lease.task.chap_num: lease.task.chap_url for lease in leased}
+        logger.info(f"[QUEUE] {self.worker_id} : {len(chapters)} chapitre(s) de '{series}' baillé(s)")
+
+        def on_event(event) -> None:
+            if event.kind != CHAPTER_FINISHED:
+                return
+            lease = leases.pop(event.chap_num, None)
+            if lease is not None:
+                self._settle(lease, event.data["result"])
+
+        stop = threading.Event()
+        heartbeat = threading.Thread(target=self._heartbeat, args=(leases, stop), name="panelia-lease", daemon=True)
+        heartbeat.start()
+        try:
+            self.engine.run_chapter_batch(chapters, dict(leased[0].task.params), event_callback=on_event, cancel_token=self.cancel_token)
+        finally:
+            stop.set()
+            heartbeat.join()
+            # Lot interrompu par une exception : chapitres non réglés rendus à la file
+            for lease in list(leases.values()):
+                self.queue.release(lease)
+                self._stats["released"] += 1
+            self._stats["batches"] += 1
+            self.queue.report_worker(self.worker_id, self.get_stats())
+        return len(leased)
+
+    def run(self, max_idle: Optional[float] = None) -> None:
+        """
+        Boucle du worker jusqu'à annulation du jeton, ou file vide pendant
+        max_idle secondes (None = attend indéfiniment de nouvelles tâches).
+        """
+        logger.info(f"[QUEUE] Worker {self.worker_id} démarré (lots de {self.batch_size})")
+        idle_since = time.monotonic()
+        while not self.cancel_token.cancelled:
+            if self.run_once():
+                idle_since = time.monotonic()
+                continue
+            if max_idle is not None and time.monotonic() - idle_since >= max_idle:
+                break
+            self.queue.report_worker(self.worker_id, self.get_stats())
+            self.cancel_token.wait(self.poll_interval)
+        logger.info(f"[QUEUE] Worker {self.worker_id} arrêté : {self.get_stats()}")
+
+    def get_stats(self) -> Dict[str, Any]:
+        """Compteurs du worker et état du moteur local (étages, drivers)."""
+        return {
+            **self._stats,
+            "pipeline": self.engine.pipeline.get_stats(),
+            "drivers": self.engine.driver_pool.get_stats(),
+        }
+
+
+# Moteurs de stockage par schéma d'URL (open_work_queue)
+WORK_QUEUE_BACKENDS = {"sqlite": SQLiteWorkQueue}
+
+
+def open_work_queue(spec: str, **options) -> WorkQueue:
+    """
+    "sqlite:///chemin/queue.db" (ou un simple chemin) -> SQLiteWorkQueue.
+
+    Raises:
+        ValueError: Schéma inconnu
+    """
+    scheme, sep, location = spec.partition("://")
+    # sqlite:///abs/queue.db -> /abs/queue.db ; sqlite://rel/queue.db -> rel/queue.db
+    if not sep:
+        scheme, location = "sqlite", spec
+    backend = WORK_QUEUE_BACKENDS.get(scheme)
+    if backend is None:
+        raise ValueError(f"File de travail inconnue : {scheme} (attendu : {', '.join(WORK_QUEUE_BACKENDS)})")
+    return backend(location, **options)
@@ -0,0 +1,102 @@
+# discovery.py
+"""
+Découverte des chapitres d'une série, hors Streamlit PANELia
+
+Avant : la sélection du scraper (SUPPORTED_SITES), la cascade de repli et
+l'extraction du titre vivaient dans app.py, mêlées aux messages st.* :
+impossible de découvrir une série sans interface.
+
+Maintenant :
+- discover_chapters(series_url, session) -> ({numéro: URL}, titre) utilisable
+  par app.py comme par la ligne de commande (python -m panelia)
+- Les messages passent par loguru ; l'appelant décide de l'affichage
+- site_needs_selenium() dit s'il faut ouvrir un navigateur avant
+
+Usage:
+    session = WebSession(headless=True) if site_needs_selenium(url) else None
+    chapters, title = discover_chapters(url, session)
+
+Auteur: PANELia Team
+Date: 2025-12-18
+"""
+
+import re
+from typing import Dict, Optional, Tuple
+from urllib.parse import urlparse
+
+from loguru import logger
+
+from panelia.scrapers.config import SUPPORTED_SITES
+from panelia.scrapers.factory import discover_chapters_asuracomic, discover_chapters_madara_theme
+
+# Cascade essayée sur le HTML de la page pour un site sans scraper dédié
+FALLBACK_STRATEGIES = (("Madara", discover_chapters_madara_theme), ("AsuraComic", discover_chapters_asuracomic))
+
+_UUID = re.compile(r"^[0-9a-f]{8}-[0-9a-f]{4}-[0-9a-f]{4}-[0-9a-f]{4}-[0-9a-f]{12}$", re.I)
+
+
+def site_config(series_url: str) -> Optional[tuple]:
+    """(fonction de découverte, needs_selenium, allow_driverless) du site, ou None."""
+    for domain, cfg in SUPPORTED_SITES.items():
+        if domain in series_url:
+            return cfg
+    return None
+
+
+def site_needs_selenium(series_url: str) -> bool:
+    """True si la découverte demande un navigateur (site inconnu compris)."""
+    cfg = site_config(series_url)
+    return cfg is None or cfg[1]
+
+
+def extract_series_title_from_html(page_html: str) -> Optional[str]:
+    try:
+        from bs4 import BeautifulSoup
+        soup = BeautifulSoup(page_html, 'html.parser')
+        h1_tag = soup.find('h1')
+        return h1_tag.text.strip() if h1_tag else None
+    except Exception:
+        return None
+
+
+def series_name_from_url(series_url: str) -> str:
+    """Nom de série déduit de l'URL : dernier segment lisible (ni UUID ni nombre), sinon l'hôte."""
+    parsed = urlparse(series_url)
+    for segment in reversed([s for s in parsed.path.split('/') if s]):
+        if not _UUID.match(segment) and not segment.isdigit():
+            return segment.replace('-', ' ').replace('_', ' ').title()
+    return parsed.netloc
+
+
+def discover_chapters(series_url: str, session=None) -> Tuple[Dict[float, str], Optional[str]]:
+    """
+    Chapitres {numéro: URL} et titre (None si inconnu) d'une série.
+
+    Raises:
+        ValueError: Le site demande Selenium et session est None
+    """
+    logger.info(f"Découverte pour : {series_url}")
+    cfg = site_config(series_url)
+    if cfg is not None and not cfg[1]:
+        return cfg[0](series_url), None
+    if session is None:
+        raise ValueError(f"Session Selenium requise pour découvrir {series_url}")
+
+    if cfg is not None:
+        chapters = cfg[0](session, series_url)
+        return chapters, extract_series_title_from_html(session.page_source)
+
+    logger.warning("Aucun scraper spécialisé. Lancement de la cascade de repli...")
+    # Driver emprunté à la flotte chaude : il est encore sur la dernière page visitée
+    session.get(series_url)
+    page_html = session.page_source
+    for name, func in FALLBACK_STRATEGIES:
+        try:
+            chapters = func(page_html, series_url)
+            if chapters:
+                logger.info(f"La stratégie de repli '{name}' a fonctionné !")
+                return chapters, extract_series_title_from_html(page_html)
+        except Exception:
+            continue
+    logger.error("Toutes les stratégies de repli ont échoué.")
+    return {}, None
@@ -10,7 +10,6 @@ import io
 from typing import List
 from urllib.parse import urljoin
 
-import httpx
 import cv2
 import numpy as np
 from PIL import Image
@@ -20,6 +19,9 @@ from selenium.webdriver.support.ui import WebDriverWait
 from selenium.webdriver.support import expected_conditions as EC
 from selenium.webdriver.common.by import By
 
+from panelia.utils.http_pool import get_client_pool
+from panelia.scrapers.mangadex import get_mangadex_home
+
 ###############################################################
 # 🔥 0. DRIVER ACCESS - LE POINT CENTRAL
 ###############################################################
@@ -155,42 +157,26 @@ def discover_chapters_mangadex(series_url: str) -> dict[float, str]:
     api = f"https://api.mangadex.org/manga/{uid}/feed"
     params = {"translatedLanguage[]": "en", "order[chapter]": "desc", "limit": 500}
     off, total = 0, None
-    # On tente avec HTTP/2, sinon fallback vers HTTP/1.1 (évite ImportError: No module named 'h2')
+    # Client partagé (HTTP/2 si h2 est installé, sinon repli HTTP/1.1 géré par le pool)
+    pool = get_client_pool()
     try:
-        with httpx.Client(http2=True, timeout=15) as client:
-            while total is None or off < total:
-                params['offset'] = off
-                r = client.get(api, params=params)
-                if r.status_code != 200: break
-                d = r.json()
-                if d.get("result") != "ok": break
-                total = d.get("total", 0) if total is None else total
-                for c in d.get('data', []):
-                    attrs = c.get('attributes', {})
-                    ch = attrs.get('chapter')
-                    cid_val = c.get('id')
-                    if ch and cid_val:
-                        try: chap[float(ch)] = f"https://mangadex.org/chapter/{cid_val}"
-                        except: pass
-                off += len(d.get('data', []))
-    except (ImportError, httpx.UnsupportedProtocol):
-        logger.info("HTTP/2 non supporté (h2 manquant). Rebasculement vers HTTP/1.1...")
-        with httpx.Client(http2=False, timeout=15) as client:
-            while total is None or off < total:
-                params['offset'] = off
-                r = client.get(api, params=params)
-                if r.status_code != 200: break
-                d = r.json()
-                if d.get("result") != "ok": break
-                total = d.get("total", 0) if total is None else total
-                for c in d.get('data', []):
-                    attrs = c.get('attributes', {})
-                    ch = attrs.get('chapter')
-                    cid_val = c.get('id')
-                    if ch and cid_val:
-                        try: chap[float(ch)] = f"https://mangadex.org/chapter/{cid_val}"
-                        except: pass
-                    off += len(d.get('data', []))
+        while total is None or off < total:
+            params['offset'] = off
+            r = pool.get(api, params=params, timeout=15)
+            if r.status_code != 200: break
+            d = r.json()
+            if d.get("result") != "ok": break
+            total = d.get("total", 0) if total is None else total
+            data = d.get('data', [])
+            for c in data:
+                attrs = c.get('attributes', {})
+                ch = attrs.get('chapter')
+                cid_val = c.get('id')
+                if ch and cid_val:
+                    try: chap[float(ch)] = f"https://mangadex.org/chapter/{cid_val}"
+                    except: pass
+            if not data: break
+            off += len(data)
     except Exception as e:
         logger.warning(f"Erreur API MangaDex : {e}")
     return chap
@@ -272,30 +258,10 @@ def detect_site_type(url: str) -> str:
     return "generic"
 
 # --- A. MangaDex (API) ---
-def scrape_images_mangadex(chapter_url):
-    cid = re.search(r'chapter/([a-f0-9\-]{36})', chapter_url)
-    if not cid: return []
-    api = f"https://api.mangadex.org/at-home/server/{cid.group(1)}"
-    # On tente avec HTTP/2, sinon fallback vers HTTP/1.1
-    try:
-        with httpx.Client(http2=True, timeout=15) as client:
-            r = client.get(api)
-            if r.status_code != 200: return []
-            d = r.json()
-            if d.get('result') != 'ok': return []
-            base = d['baseUrl']; h = d['chapter']['hash']
-            return [f"{base}/data/{h}/{fn}" for fn in d['chapter']['data']]
-    except (ImportError, httpx.UnsupportedProtocol):
-        with httpx.Client(http2=False, timeout=15) as client:
-            r = client.get(api)
-            if r.status_code != 200: return []
-            d = r.json()
-            if d.get('result') != 'ok': return []
-            base = d['baseUrl']; h = d['chapter']['hash']
-            return [f"{base}/data/{h}/{fn}" for fn in d['chapter']['data']]
-    except Exception as e:
-        logger.warning(f"Erreur scrape MangaDex images : {e}")
-        return []
+def scrape_images_mangadex(chapter_url, data_saver=False):
+    # URLs canoniques (uploads.mangadex.org) : le nœud MD@Home est choisi au
+    # téléchargement via get_mangadex_home() passé en url_resolver
+    return get_mangadex_home().chapter_images(chapter_url, data_saver=data_saver)
 
 # --- B. Madara optimisé ---
 def scrape_images_madara(session, url, min_width=400):
@@ -381,9 +347,20 @@ def scrape_images_smart(session,url,min_width=400):
 ###############################################################
 # 🔥 3. TRAITEMENT IMAGES (Numpy V3 – déjà présent)
 ###############################################################
-def slice_panels_precision(image_bytes: bytes, min_gap_height: int = 15, min_panel_height: int = 150, content_threshold: float = 0.05) -> List[Image.Image]:
+def _open_image_source(image_source) -> Image.Image:
+    """
+    Ouvre une image depuis des bytes ou un fichier binaire (spool disque,
+    objet du cache) : un fichier est lu par PIL directement, sans copie en RAM.
+    """
+    if isinstance(image_source, (bytes, bytearray, memoryview)):
+        return Image.open(io.BytesIO(image_source))
+    image_source.seek(0)
+    return Image.open(image_source)
+
+def slice_panels_precision(image_bytes, min_gap_height: int = 15, min_panel_height: int = 150, content_threshold: float = 0.05) -> List[Image.Image]:
+    """image_bytes : bytes ou fichier binaire rembobinable."""
     try:
-        img = Image.open(io.BytesIO(image_bytes))
+        img = _open_image_source(image_bytes)
         gray = np.array(img.convert('L'))
         h,w = gray.shape
         row_means = gray.mean(axis=1)
@@ -416,17 +393,21 @@ def slice_panels_precision(image_bytes: bytes, min_gap_height: int = 15, min_pan
             if np.sum(g2<250)/g2.size < content_threshold: continue
             panels.append(p)
         return panels if panels else [img]
-    except:
-        return [Image.open(io.BytesIO(image_bytes))]
+    except Exception:
+        # Chargée tout de suite : le fichier source (spool) est fermé ensuite
+        img = _open_image_source(image_bytes)
+        img.load()
+        return [img]
 
 ###############################################################
 # 🔥 4. PROCESS IMAGE SMART
 ###############################################################
 
 # On remplace l'appel dans `process_image_smart` pour utiliser notre nouvel algorithme
-def process_image_smart(image_bytes: bytes) -> List[Image.Image]:
+def process_image_smart(image_bytes) -> List[Image.Image]:
     """
     Doit retourner une LISTE d’images PIL.
+    Accepte des bytes ou un fichier binaire (téléchargement spoolé sur disque).
     Exemple :
         return [img] ou [img1, img2, img3]
     """
@@ -0,0 +1,289 @@
+# incremental.py
+"""
+Décodage incrémental et découpage des planches pendant le téléchargement
+
+Avant : le décodage ne commençait qu'une fois l'image entièrement reçue
+(Image.open dans slice_panels_precision), puis toute l'analyse des lignes
+tournait après coup : réseau puis CPU, en série, pour chaque image.
+
+Maintenant :
+- Les morceaux du flux HTTP alimentent directement le décodeur PIL (le même
+  mécanisme que PIL.ImageFile.Parser, forcé pour JPEG et PNG non entrelacé,
+  que Parser ne décode qu'à la fin)
+- Les statistiques de ligne (moyenne, écart-type) sont calculées au fur et à
+  mesure que les lignes sont décodées
+- Chaque planche est coupée, rognée et filtrée dès que la bande blanche/noire
+  qui la termine est reçue : mêmes coupes que slice_panels_precision
+- Tout format non incrémental (WebP, JPEG progressif, PNG entrelacé...) ou
+  toute anomalie : repli sur slice_panels_precision à la fin du téléchargement
+
+Usage:
+    slicer = IncrementalSlicer()
+    for chunk in response.iter_bytes():
+        slicer.feed(chunk)
+    sliced = slicer.finish(body_file)   # SlicedImage : .panels, .close()
+
+Auteur: PANELia Team
+Date: 2025-12-17
+"""
+
+import io
+from typing import List, Optional
+
+import numpy as np
+from PIL import Image
+from loguru import logger
+
+from panelia.scrapers.factory import slice_panels_precision, trim_borders_smart
+
+
+# Décodeurs PIL dont les lignes sortent dans l'ordre, au fil des octets
+INCREMENTAL_CODECS = ("jpeg", "zip")
+# Modes dont la ligne sentinelle est représentable sans ambiguïté
+SENTINEL_MODES = ("L", "LA", "P", "RGB", "RGBA", "CMYK")
+# Au-delà, on renonce à trouver l'en-tête (métadonnées démesurées)
+MAX_HEADER_BYTES = 4 * 1024 * 1024
+
+
+class SlicedImage:
+    """Planches déjà découpées + corps téléchargé (fichier spoolé à fermer)."""
+
+    def __init__(self, source, panels: List[Image.Image], incremental: bool):
+        self.source = source
+        self.panels = panels
+        self.incremental = incremental
+
+    def close(self) -> None:
+        if hasattr(self.source, "close"):
+            self.source.close()
+
+
+class IncrementalSlicer:
+    """
+    Découpe une image au fil de son téléchargement.
+
+    feed() et finish() n'échouent jamais : au moindre problème le découpeur
+    passe en mode repli et finish() découpe l'image complète comme avant.
+    """
+
+    def __init__(self, min_gap_height: int = 15, min_panel_height: int = 150, content_threshold: float = 0.05, probe_rows: int = 256):
+        """
+        Args:
+            min_gap_height, min_panel_height, content_threshold: Voir slice_panels_precision
+            probe_rows: Lignes examinées par bloc pour localiser le front de décodage
+        """
+        self.min_gap_height = min_gap_height
+        self.min_panel_height = min_panel_height
+        self.content_threshold = content_threshold
+        self.probe_rows = probe_rows
+        self.reset()
+
+    def reset(self) -> None:
+        """Repart de l'octet 0 (ex: le serveur a ignoré le Range et renvoie tout)."""
+        self.image: Optional[Image.Image] = None
+        self.panels: List[Image.Image] = []
+        self.incremental = True
+        self._header = bytearray()
+        self._decoder = None
+        self._pending = b""
+        self._decoded = False
+        self._sentinel = None
+        # PNG : octets de données restant dans le chunk IDAT courant, en-tête du suivant
+        self._png = False
+        self._idat_left = 0
+        self._framing = bytearray()
+        self._idat_done = False
+        # Front de décodage et machine à états des bandes (cf. slice_panels_precision)
+        self.rows_ready = 0
+        self._scanned = 0
+        self._in_gap = False
+        self._gap_start = 0
+        self._last_cut = 0
+
+    # --- Alimentation -------------------------------------------------------
+
+    def feed(self, chunk: bytes) -> None:
+        """Ajoute un morceau du corps HTTP et découpe ce qui peut l'être."""
+        if not self.incremental or self._decoded:
+            return
+        try:
+            if self._decoder is None:
+                self._open(chunk)
+            else:
+                self._decode(chunk)
+            if self._decoder is not None:
+                self._advance()
+        except Exception as e:
+            logger.debug(f"[SLICE] Décodage incrémental abandonné : {e}")
+            self._fall_back()
+
+    def _fall_back(self) -> None:
+        self.incremental = False
+        self.image = None
+        self.panels = []
+        self._header = bytearray()
+        self._decoder = None
+        self._pending = b""
+
+    def _open(self, chunk: bytes) -> None:
+        self._header += chunk
+        try:
+            im = Image.open(io.BytesIO(bytes(self._header)))
+        except Exception:
+            if len(self._header) > MAX_HEADER_BYTES:
+                raise ValueError("en-tête introuvable")
+            return
+
+        if len(im.tile) != 1 or im.mode not in SENTINEL_MODES:
+            raise ValueError(f"format non incrémental ({im.format} {im.mode})")
+        codec, extents, offset, args = im.tile[0]
+        if codec not in INCREMENTAL_CODECS or im.info.get("progressive") or im.info.get("progression") or im.info.get("interlace"):
+            raise ValueError(f"format non incrémental ({im.format} {codec})")
+
+        im.load_prepare()
+        im.tile = []
+        self._fill_sentinel(im)
+        decoder = Image._getdecoder(im.mode, codec, args, im.decoderconfig)
+        decoder.setimage(im.im, extents)
+        self.image, self._decoder = im, decoder
+
+        data = bytes(self._header[offset:])
+        if codec == "zip":
+            # Le décodeur PNG ne veut que les données IDAT, sans l'enveloppe des chunks
+            self._png = True
+            self._idat_left = int.from_bytes(self._header[offset - 8:offset - 4], "big")
+        self._header = bytearray()
+        self._decode(data)
+
+    def _fill_sentinel(self, im: Image.Image) -> None:
+        """
+        Pré-remplit l'image d'une ligne sentinelle (damier 0/255 au pixel près,
+        impossible en sortie de décodeur) : une ligne décodée en diffère.
+        """
+        w, h = im.size
+        row = np.tile(np.array([0, 255], dtype=np.uint8), (w + 1) // 2)[:w].reshape(1, w)
+        row_img = Image.fromarray(row, "L").convert(im.mode)
+        self._sentinel = np.asarray(row_img).reshape(1, -1)
+        block = row_img.resize((w, min(h, self.probe_rows)), Image.NEAREST)
+        for y in range(0, h, block.height):
+            im.paste(block, (0, y))
+
+    def _decode(self, data: bytes) -> None:
+        if self._png:
+            data = self._unwrap_idat(data)
+        buf = self._pending + data
+        if not buf:
+            return
+        consumed, err = self._decoder.decode(buf)
+        if consumed < 0:
+            if err < 0:
+                raise ValueError(f"erreur de décodage {err}")
+            self._decoded = True
+            self._pending = b""
+        else:
+            self._pending = buf[consumed:]
+
+    def _unwrap_idat(self, data: bytes) -> bytes:
+        """Extrait les octets IDAT d'un morceau de flux PNG (CRC et en-têtes retirés)."""
+        out = bytearray()
+        while data and not self._idat_done:
+            if self._idat_left > 0:
+                take = data[:self._idat_left]
+                out += take
+                self._idat_left -= len(take)
+                data = data[len(take):]
+                continue
+            # CRC du chunk courant (4) + longueur (4) + type (4) du suivant
+            need = 12 - len(self._framing)
+            self._framing += data[:need]
+            data = data[need:]
+            if len(self._framing) == 12:
+                length, kind = int.from_bytes(self._framing[4:8], "big"), bytes(self._framing[8:12])
+                self._framing = bytearray()
+                if kind == b"IDAT":
+                    self._idat_left = length
+                else:
+                    self._idat_done = True
+        return bytes(out)
+
+    # --- Lignes et coupes ---------------------------------------------------
+
+    def _advance(self) -> None:
+        w, h = self.image.size
+        if self._decoded:
+            self.rows_ready = h
+        else:
+            # Décodage de haut en bas : le front est la première ligne encore sentinelle
+            while self.rows_ready < h:
+                end = min(h, self.rows_ready + self.probe_rows)
+                block = np.asarray(self.image.crop((0, self.rows_ready, w, end))).reshape(end - self.rows_ready, -1)
+                pending = np.flatnonzero(np.all(block == self._sentinel, axis=1))
+                if pending.size:
+                    self.rows_ready += int(pending[0])
+                    break
+                self.rows_ready = end
+        self._scan_rows(self.rows_ready)
+
+    def _scan_rows(self, upto: int) -> None:
+        if upto <= self._scanned:
+            return
+        w = self.image.size[0]
+        gray = np.array(self.image.crop((0, self._scanned, w, upto)).convert('L'))
+        row_means = gray.mean(axis=1)
+        row_stds = gray.std(axis=1)
+        is_gap = (row_stds < 15) & ((row_means > 235) | (row_means < 20))
+
+        for offset, g in enumerate(is_gap):
+            i = self._scanned + offset
+            if g and not self._in_gap:
+                self._gap_start = i
+                self._in_gap = True
+            elif not g and self._in_gap:
+                gap_height = i - self._gap_start
+                if gap_height >= self.min_gap_height:
+                    cut = self._gap_start + gap_height // 2
+                    self._emit(self._last_cut, cut)
+                    self._last_cut = cut
+                self._in_gap = False
+        self._scanned = upto
+
+    def _emit(self, start: int, end: int) -> None:
+        if end - start < self.min_panel_height:
+            return
+        panel = trim_borders_smart(self.image.crop((0, start, self.image.size[0], end)))
+        g2 = np.array(panel.convert('L'))
+        if np.sum(g2 < 250) / g2.size < self.content_threshold:
+            return
+        self.panels.append(panel)
+
+    # --- Fin de flux --------------------------------------------------------
+
+    def finish(self, source) -> SlicedImage:
+        """
+        Fin du téléchargement : dernière planche, ou repli complet si le
+        décodage incrémental n'a pas abouti.
+
+        Args:
+            source: Corps complet (bytes ou fichier rembobinable), gardé dans le résultat
+        """
+        if self.incremental and self._decoder is not None and not self._decoded:
+            try:
+                self._decode(b"")
+            except Exception:
+                pass
+        if self.incremental and self._decoded:
+            try:
+                self._advance()
+                self._emit(self._last_cut, self.image.size[1])
+                panels = self.panels if self.panels else [self.image]
+                return SlicedImage(source, panels, incremental=True)
+            except Exception as e:
+                logger.debug(f"[SLICE] Fin du découpage incrémental impossible : {e}")
+
+        try:
+            panels = slice_panels_precision(source, self.min_gap_height, self.min_panel_height, self.content_threshold)
+        except Exception as e:
+            # Corps illisible : le téléchargement reste réussi, aucune planche (comme avant)
+            logger.warning(f"[SLICE] Image illisible : {e}")
+            panels = []
+        return SlicedImage(source, panels, incremental=False)
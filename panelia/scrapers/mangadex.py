@@ -0,0 +1,359 @@
+# mangadex.py
+"""
+Chemin images MangaDex : MangaDex@Home avec failover
+
+Avant : un seul baseUrl at-home/server par chapitre, jamais rafraîchi ; un
+nœud MD@Home lent ou cassé bloquait tout le chapitre.
+
+Maintenant :
+- URLs canoniques sur l'origine uploads.mangadex.org (clé de cache stable)
+- Résolution à chaque tentative vers le nœud MD@Home courant du chapitre
+- Nœud en échec ou trop lent -> nouveau at-home/server en cours de chapitre
+- Repli sur l'origine uploads.mangadex.org si aucun nœud sain n'est proposé
+- Rendu dataSaver optionnel (images compressées, plus légères)
+- Débit par nœud mémorisé pour tout le lot : un nœud lent n'est plus utilisé
+- Rapports MD@Home (api.network.mangadex.org/report) envoyés en tâche de fond
+
+Usage:
+    mdh = get_mangadex_home()
+    urls = mdh.chapter_images("https://mangadex.org/chapter/<uuid>", data_saver=False)
+    for img in stream_download_images(urls, url_resolver=mdh):
+        ...
+
+Auteur: PANELia Team
+Date: 2025-12-17
+"""
+
+import re
+import threading
+import time
+from concurrent.futures import ThreadPoolExecutor
+from dataclasses import dataclass, field
+from typing import Dict, List, Optional
+from urllib.parse import urlparse
+
+from loguru import logger
+
+from panelia.utils.http_pool import get_client_pool, origin_of
+
+
+API_BASE = "https://api.mangadex.org"
+UPLOADS_ORIGIN = "https://uploads.mangadex.org"
+UPLOADS_HOST = urlparse(UPLOADS_ORIGIN).hostname
+REPORT_URL = "https://api.network.mangadex.org/report"
+
+# /data/<hash>/<fichier> ou /data-saver/<hash>/<fichier>
+_IMAGE_PATH_RE = re.compile(r"/(data|data-saver)/([0-9a-f]+)/([^/?#]+)$")
+_CHAPTER_ID_RE = re.compile(r"chapter/([a-f0-9\-]{36})")
+
+
+@dataclass
+class NodeStats:
+    """Débit et fiabilité observés pour un nœud MD@Home (ou l'origine)."""
+    requests: int = 0
+    failures: int = 0
+    consecutive_failures: int = 0
+    bytes: int = 0
+    seconds: float = 0.0
+    ewma_bps: Optional[float] = None
+
+    @property
+    def throughput_bps(self) -> float:
+        """Débit moyen (octets/s) sur les succès."""
+        return self.bytes / self.seconds if self.seconds > 0 else 0.0
+
+    def to_dict(self) -> Dict:
+        return {
+            "requests": self.requests,
+            "failures": self.failures,
+            "throughput_kbps": round(self.throughput_bps / 1024, 1),
+            "recent_kbps": round((self.ewma_bps or 0.0) / 1024, 1),
+        }
+
+
+@dataclass
+class ChapterServer:
+    """Nœud courant d'un chapitre (un baseUrl MD@Home est valable ~15 minutes)."""
+    chapter_id: str
+    base_url: str
+    fetched_at: float
+    stale: bool = False
+    tried: List[str] = field(default_factory=list)
+
+
+class MangaDexAtHome:
+    """
+    Résolveur d'URLs MangaDex pour le moteur de téléchargement.
+
+    Implémente le contrat `url_resolver` de stream_download_images :
+    resolve(url) avant chaque tentative, report(url, success, size, seconds)
+    après. Thread-safe, partagé par tous les chapitres d'un lot.
+    """
+
+    def __init__(
+        self,
+        server_ttl: float = 10 * 60,
+        refresh_interval: float = 5.0,
+        min_throughput_bps: float = 150 * 1024,
+        max_consecutive_failures: int = 2,
+        max_node_attempts: int = 3,
+        network_reports: bool = True,
+    ):
+        """
+        Args:
+            server_ttl: Âge max d'un baseUrl avant rafraîchissement (s)
+            refresh_interval: Écart min entre deux at-home/server d'un même chapitre (s)
+            min_throughput_bps: Débit récent en dessous duquel un nœud est jugé lent
+            max_consecutive_failures: Échecs consécutifs avant de quitter un nœud
+            max_node_attempts: Nœuds demandés par chapitre avant repli sur l'origine
+            network_reports: Envoyer les rapports MD@Home à MangaDex
+        """
+        self.server_ttl = server_ttl
+        self.refresh_interval = refresh_interval
+        self.min_throughput_bps = min_throughput_bps
+        self.max_consecutive_failures = max_consecutive_failures
+        self.max_node_attempts = max_node_attempts
+        self.network_reports = network_reports
+
+        self._chapters: Dict[str, ChapterServer] = {}   # hash -> nœud courant
+        self._hash_to_chapter: Dict[str, str] = {}       # hash -> id de chapitre
+        self._nodes: Dict[str, NodeStats] = {}           # origine -> stats
+        self._bad_nodes: set = set()
+        self._lock = threading.Lock()
+        self._reporter: Optional[ThreadPoolExecutor] = None
+
+    # ------------------------------------------------------------------
+    # API at-home
+    # ------------------------------------------------------------------
+    def _fetch_server(self, chapter_id: str) -> Optional[dict]:
+        """Appelle at-home/server ; retourne le JSON ou None."""
+        try:
+            r = get_client_pool().get(f"{API_BASE}/at-home/server/{chapter_id}", timeout=15)
+            if r.status_code != 200:
+                logger.warning(f"[MDH] at-home/server {chapter_id} -> HTTP {r.status_code}")
+                return None
+            d = r.json()
+            return d if d.get("result") == "ok" else None
+        except Exception as e:
+            logger.warning(f"[MDH] at-home/server {chapter_id} indisponible : {e}")
+            return None
+
+    def chapter_images(self, chapter_url: str, data_saver: bool = False) -> List[str]:
+        """
+        Liste des images d'un chapitre, en URLs canoniques (origine uploads).
+
+        Args:
+            chapter_url: https://mangadex.org/chapter/<uuid>
+            data_saver: Rendu compressé (dataSaver) au lieu de l'original
+
+        Returns:
+            URLs dans l'ordre des pages ([] si le chapitre est introuvable)
+        """
+        cid = _CHAPTER_ID_RE.search(chapter_url)
+        if not cid:
+            return []
+        chapter_id = cid.group(1)
+
+        d = self._fetch_server(chapter_id)
+        if d is None:
+            return []
+        try:
+            h = d["chapter"]["hash"]
+            files = d["chapter"]["dataSaver" if data_saver else "data"]
+        except (KeyError, TypeError):
+            logger.warning(f"[MDH] Réponse at-home inattendue pour {chapter_id}")
+            return []
+
+        with self._lock:
+            self._hash_to_chapter[h] = chapter_id
+            server = ChapterServer(chapter_id, d["baseUrl"].rstrip("/"), time.monotonic(), tried=[origin_of(d["baseUrl"])])
+            if origin_of(server.base_url) in self._bad_nodes:
+                # Nœud déjà jugé mauvais pendant ce lot : on en redemande un dès la première image
+                server.stale = True
+                server.fetched_at -= self.refresh_interval
+            self._chapters[h] = server
+
+        folder = "data-saver" if data_saver else "data"
+        return [f"{UPLOADS_ORIGIN}/{folder}/{h}/{fn}" for fn in files]
+
+    # ------------------------------------------------------------------
+    # Contrat url_resolver
+    # ------------------------------------------------------------------
+    def resolve(self, url: str) -> str:
+        """URL à utiliser pour la prochaine tentative (nœud courant ou origine)."""
+        m = _IMAGE_PATH_RE.search(urlparse(url).path)
+        if not m:
+            return url
+        folder, h, filename = m.groups()
+
+        with self._lock:
+            server = self._chapters.get(h)
+            if server is None:
+                return url
+            now = time.monotonic()
+            expired = now - server.fetched_at > self.server_ttl
+            can_refresh = now - server.fetched_at >= self.refresh_interval
+            needs_refresh = (server.stale or expired) and can_refresh and server.base_url != UPLOADS_ORIGIN
+            if needs_refresh:
+                # Une seule requête at-home par chapitre à la fois
+                server.fetched_at = now
+                server.stale = False
+            base_url = server.base_url
+
+        if needs_refresh:
+            base_url = self._refresh(h)
+
+        return f"{base_url}/{folder}/{h}/{filename}"
+
+    def _refresh(self, h: str) -> str:
+        """Demande un nouveau nœud pour le chapitre ; repli sur l'origine si aucun n'est sain."""
+        chapter_id = self._hash_to_chapter[h]
+        d = self._fetch_server(chapter_id)
+
+        with self._lock:
+            server = self._chapters[h]
+            if d is None:
+                return server.base_url
+            new_base = d["baseUrl"].rstrip("/")
+            new_origin = origin_of(new_base)
+            server.tried.append(new_origin)
+
+            if new_origin in self._bad_nodes:
+                if len(server.tried) >= self.max_node_attempts:
+                    logger.warning(f"[MDH] Chapitre {chapter_id} : aucun nœud sain après {len(server.tried)} essais, repli sur {UPLOADS_ORIGIN}")
+                    server.base_url = UPLOADS_ORIGIN
+                else:
+                    # Nœud déjà jugé mauvais : on retentera au prochain intervalle
+                    server.stale = True
+                return server.base_url
+
+            if new_base != server.base_url:
+                logger.info(f"[MDH] Chapitre {chapter_id} : bascule {origin_of(server.base_url)} -> {new_origin}")
+            server.base_url = new_base
+            server.fetched_at = time.monotonic()
+            return server.base_url
+
+    def report(self, url: str, success: bool, size: int = 0, seconds: float = 0.0, cached: bool = False) -> None:
+        """
+        Résultat d'une tentative sur `url` (URL résolue). Met à jour le débit
+        du nœud et marque les chapitres servis par un nœud lent ou en échec.
+        """
+        origin = origin_of(url)
+        m = _IMAGE_PATH_RE.search(urlparse(url).path)
+
+        with self._lock:
+            stats = self._nodes.setdefault(origin, NodeStats())
+            stats.requests += 1
+            if success:
+                stats.consecutive_failures = 0
+                if size > 0 and seconds > 0:
+                    stats.bytes += size
+                    stats.seconds += seconds
+                    sample = size / seconds
+                    stats.ewma_bps = sample if stats.ewma_bps is None else 0.7 * stats.ewma_bps + 0.3 * sample
+            else:
+                stats.failures += 1
+                stats.consecutive_failures += 1
+
+            slow = (
+                stats.ewma_bps is not None
+                and stats.requests >= 3
+                and stats.ewma_bps < self.min_throughput_bps
+            )
+            failing = stats.consecutive_failures >= self.max_consecutive_failures
+            if (slow or failing) and origin != UPLOADS_ORIGIN and origin not in self._bad_nodes:
+                self._bad_nodes.add(origin)
+                reason = "lent" if slow else "en échec"
+                logger.warning(f"[MDH] Nœud {origin} {reason} ({stats.to_dict()}), évité pour le reste du lot")
+                for server in self._chapters.values():
+                    if origin_of(server.base_url) == origin:
+                        server.stale = True
+            elif not success and m:
+                # Un échec isolé : on redemande un nœud pour ce chapitre au prochain intervalle
+                server = self._chapters.get(m.group(2))
+                if server is not None and origin_of(server.base_url) == origin:
+                    server.stale = True
+
+        if self.network_reports and origin != UPLOADS_ORIGIN and not origin.endswith(".mangadex.org"):
+            self._send_network_report(url, success, size, seconds, cached)
+
+    def _send_network_report(self, url: str, success: bool, size: int, seconds: float, cached: bool) -> None:
+        """Rapport MD@Home (demandé par MangaDex pour chaque image d'un nœud tiers)."""
+        payload = {
+            "url": url,
+            "success": success,
+            "bytes": size,
+            "duration": int(seconds * 1000),
+            "cached": cached,
+        }
+
+        def send():
+            try:
+                client = get_client_pool().get_client(REPORT_URL)
+                client.post(REPORT_URL, json=payload, timeout=10)
+            except Exception as e:
+                logger.debug(f"[MDH] Rapport MD@Home non envoyé : {e}")
+
+        with self._lock:
+            if self._reporter is None:
+                self._reporter = ThreadPoolExecutor(max_workers=1, thread_name_prefix="panelia-mdh-report")
+            reporter = self._reporter
+        reporter.submit(send)
+
+    # ------------------------------------------------------------------
+    # Introspection
+    # ------------------------------------------------------------------
+    def served_hosts(self, host: str) -> List[str]:
+        """
+        Hôtes des nœuds qui servent réellement les URLs canoniques de `host`
+        (vide hors uploads.mangadex.org) : leurs 429 concernent cet hôte.
+        """
+        if host.lower() != UPLOADS_HOST:
+            return []
+        with self._lock:
+            origins = set(self._nodes) | {origin_of(server.base_url) for server in self._chapters.values()}
+        return sorted({urlparse(origin).hostname for origin in origins} - {UPLOADS_HOST, None})
+
+    def get_node_stats(self) -> Dict[str, Dict]:
+        """Stats par nœud, ex: {"https://abc.xyz.mangadex.network:443": {...}}."""
+        with self._lock:
+            out = {}
+            for origin, stats in self._nodes.items():
+                out[origin] = dict(stats.to_dict(), avoided=origin in self._bad_nodes)
+            return out
+
+    def close(self) -> None:
+        """Attend l'envoi des rapports en attente."""
+        with self._lock:
+            reporter, self._reporter = self._reporter, None
+        if reporter is not None:
+            reporter.shutdown(wait=True)
+
+
+# Instance globale (singleton)
+_global_mdh: Optional[MangaDexAtHome] = None
+_global_mdh_lock = threading.Lock()
+
+
+def get_mangadex_home() -> MangaDexAtHome:
+    """
+    Retourne le résolveur MD@Home global (stats de nœuds partagées par le lot).
+
+    Returns:
+        MangaDexAtHome: Instance singleton
+    """
+    global _global_mdh
+    if _global_mdh is None:
+        with _global_mdh_lock:
+            if _global_mdh is None:
+                _global_mdh = MangaDexAtHome()
+    return _global_mdh
+
+
+def reset_mangadex_home(**settings) -> None:
+    """Oublie nœuds et chapitres (nouveau lot)."""
+    global _global_mdh
+    with _global_mdh_lock:
+        if _global_mdh is not None:
+            _global_mdh.close()
+        _global_mdh = MangaDexAtHome(**settings)
@@ -0,0 +1,469 @@
+# async_http.py
+"""
+Moteur de téléchargement asyncio (httpx.AsyncClient)
+
+Alternative à stream_download_images (un ThreadPoolExecutor par chapitre, des
+threads bloqués dans time.sleep pendant le backoff) :
+- Une seule boucle asyncio pour tout le processus, dans un thread dédié
+- Plafond de requêtes simultanées par hôte, partagé entre tous les chapitres
+- Backoff via asyncio.sleep : une image en attente ne bloque aucun thread
+- Même RetryPolicy que le moteur threadé (classification, jitter, échéances)
+  et mêmes circuit breakers par hôte
+- Façade générateur synchrone, même signature que stream_download_images,
+  consommable telle quelle par ScraperEngine._process_single_chapter
+
+Usage:
+    for img_bytes in stream_download_images_async(urls, chapter_num=1.0):
+        ...
+
+Auteur: PANELia Team
+Date: 2025-12-15
+"""
+
+import asyncio
+import os
+import queue
+import random
+import threading
+import time
+from typing import AsyncIterator, Dict, Iterable, Iterator, Optional, Tuple
+
+import httpx
+from loguru import logger
+
+from panelia.utils.http import (
+    USER_AGENTS,
+    SpooledDownload,
+    cached_without_revalidation,
+    open_cached_without_revalidation,
+    open_revalidated,
+    read_revalidated,
+    store_in_cache,
+    store_spool_in_cache,
+)
+from panelia.utils.http_pool import origin_of
+from panelia.utils.metrics import get_collector
+from panelia.utils.ratelimit import get_rate_limiter
+from panelia.utils.errors import get_error_handler
+from panelia.utils.retry import Deadline, RetryPolicy, is_host_failure
+
+
+class AsyncImageDownloader:
+    """
+    Téléchargeur asynchrone avec plafond de concurrence par hôte.
+
+    Les AsyncClient sont liés à la boucle qui les a créés : une instance ne
+    doit être utilisée que depuis une seule boucle.
+    """
+
+    def __init__(
+        self,
+        per_host_limit: int = 16,
+        max_connections: int = 200,
+        max_retries: int = 8,
+        backoff_base: float = 0.5,
+        transport: Optional[httpx.AsyncBaseTransport] = None,
+        retry_policy: Optional[RetryPolicy] = None,
+    ):
+        """
+        Args:
+            per_host_limit: Requêtes simultanées max par hôte (tous chapitres confondus)
+            max_connections: Connexions max par client (donc par hôte)
+            max_retries: Nombre de tentatives par image
+            backoff_base: Base du backoff exponentiel (secondes)
+            transport: Transport httpx alternatif (tests, bancs d'essai)
+            retry_policy: Politique complète (prioritaire sur max_retries/backoff_base)
+        """
+        self.per_host_limit = max(1, per_host_limit)
+        self.limits = httpx.Limits(
+            max_connections=max_connections,
+            max_keepalive_connections=max_connections,
+            keepalive_expiry=30.0,
+        )
+        self.retry_policy = retry_policy or RetryPolicy(max_attempts=max_retries, base_delay=backoff_base)
+        self.transport = transport
+        self._clients: Dict[Tuple[str, bool], httpx.AsyncClient] = {}
+        self._host_slots: Dict[str, asyncio.Semaphore] = {}
+        self._http2_available: Optional[bool] = None
+
+    def _get_client(self, url: str, http2: bool) -> httpx.AsyncClient:
+        if http2 and self._http2_available is False:
+            http2 = False
+        key = (origin_of(url), http2)
+        client = self._clients.get(key)
+        if client is not None:
+            return client
+
+        kwargs = {"limits": self.limits, "follow_redirects": True}
+        if self.transport is not None:
+            kwargs["transport"] = self.transport
+        try:
+            client = httpx.AsyncClient(http2=http2, **kwargs)
+            if http2:
+                self._http2_available = True
+        except ImportError:
+            logger.info("HTTP/2 non supporté (h2 manquant). Rebasculement vers HTTP/1.1...")
+            self._http2_available = False
+            return self._get_client(url, False)
+
+        self._clients[key] = client
+        return client
+
+    def _host_slot(self, url: str) -> asyncio.Semaphore:
+        host = origin_of(url)
+        if host not in self._host_slots:
+            self._host_slots[host] = asyncio.Semaphore(self.per_host_limit)
+        return self._host_slots[host]
+
+    async def download(self, url: str, referer: Optional[str] = None, chapter_num=None, timeout: float = 30, cache=None, spool_threshold: Optional[int] = None, deadline: Optional[Deadline] = None, url_resolver=None):
+        """
+        Équivalent asynchrone de download_image_smart : retry selon la
+        RetryPolicy, rotation User-Agent, HTTP2 puis HTTP1, cache disque optionnel.
+        Retourne bytes ou None. Les accès disque du cache passent par un thread.
+
+        Avec spool_threshold, équivalent de download_image_spooled : le corps
+        est écrit par morceaux dans un fichier temporaire (reprise par Range)
+        et la méthode retourne ce fichier rembobiné.
+
+        url_resolver : même contrat que pour stream_download_images.
+        """
+        if spool_threshold:
+            cached, entry = await asyncio.to_thread(open_cached_without_revalidation, cache, url, chapter_num)
+        else:
+            cached, entry = await asyncio.to_thread(cached_without_revalidation, cache, url, chapter_num)
+        if cached is not None:
+            if chapter_num is not None:
+                size = len(cached) if isinstance(cached, bytes) else os.fstat(cached.fileno()).st_size
+                get_collector().add_download(chapter_num, size, success=True)
+            return cached
+
+        policy = self.retry_policy
+        deadline = deadline or policy.image_deadline_within()
+        spool = SpooledDownload(spool_threshold) if spool_threshold else None
+        attempt = 0
+        while attempt < policy.max_attempts:
+            if deadline.expired:
+                logger.error(f"[DL-ASYNC][CHAP {chapter_num}] ABANDON pour {url} - budget temps épuisé")
+                break
+
+            # URL réellement contactée (failover MD@Home...) ; le cache reste indexé sur `url`
+            request_url = await asyncio.to_thread(url_resolver.resolve, url) if url_resolver else url
+            breaker = get_error_handler().get_host_breaker(request_url)
+            if not breaker.can_execute():
+                # Circuit ouvert : pas de requête, donc pas de tentative consommée ;
+                # on attend la prochaine sonde, seule l'échéance de l'image borne l'attente
+                get_collector().record_short_circuit(breaker.name)
+                wait_time = breaker.retry_in()
+                if wait_time >= deadline.remaining():
+                    logger.error(f"[DL-ASYNC][CHAP {chapter_num}] ÉCHEC FINAL pour {url} (circuit {breaker.name} ouvert)")
+                    break
+                logger.warning(f"[DL-ASYNC][CHAP {chapter_num}] Circuit {breaker.name} ouvert, tentative {attempt+1}/{policy.max_attempts} reportée de {wait_time:.1f}s.")
+                await asyncio.sleep(wait_time)
+                continue
+
+            started, transferred = time.monotonic(), 0
+            try:
+                headers = {
+                    "User-Agent": random.choice(USER_AGENTS),
+                    "Accept": "image/avif,image/webp,image/png,image/*;q=0.8",
+                }
+                if referer:
+                    headers["Referer"] = referer
+                if entry is not None and (spool is None or spool.written == 0):
+                    headers.update(cache.conditional_headers(entry))
+                if spool is not None:
+                    headers.update(spool.resume_headers())
+
+                client = self._get_client(request_url, http2=(attempt == 0))
+                limiter = get_rate_limiter()
+                await limiter.acquire_async(request_url)
+                async with self._host_slot(request_url):
+                    started = time.monotonic()
+                    async with client.stream("GET", request_url, headers=headers, timeout=httpx.Timeout(deadline.clip_timeout(timeout))) as r:
+                        limiter.record_response(request_url, r.status_code, r.headers.get("Retry-After"))
+                        if entry is not None and r.status_code == 304:
+                            revalidate = open_revalidated if spool is not None else read_revalidated
+                            cached = await asyncio.to_thread(revalidate, cache, entry, r, chapter_num)
+                            if cached is not None:
+                                breaker.record_success()
+                                if url_resolver:
+                                    url_resolver.report(request_url, True, 0, time.monotonic() - started)
+                                if chapter_num is not None:
+                                    get_collector().add_download(chapter_num, entry.size, success=True)
+                                if spool is not None:
+                                    spool.discard()
+                                return cached
+                            # Objet disparu du disque : problème local, pas de l'hôte (qui a
+                            # répondu) ; on refait la requête sans condition, sans tentative consommée
+                            breaker.record_success()
+                            entry = None
+                            continue
+
+                        r.raise_for_status()
+                        if spool is None:
+                            img_bytes = await r.aread()
+                            transferred = len(img_bytes)
+                        else:
+                            spool.begin(r)
+                            async for chunk in r.aiter_bytes(chunk_size=256 * 1024):
+                                spool.write(chunk)
+                                transferred += len(chunk)
+                    elapsed = time.monotonic() - started
+                breaker.record_success()
+                if url_resolver:
+                    url_resolver.report(request_url, True, transferred, elapsed)
+
+                if spool is None:
+                    await asyncio.to_thread(store_in_cache, cache, url, r, img_bytes, chapter_num)
+                    result, size = img_bytes, len(img_bytes)
+                else:
+                    result, size = spool.finish(), spool.written
+                    await asyncio.to_thread(store_spool_in_cache, cache, url, spool, chapter_num)
+                logger.info(f"[DL-ASYNC][CHAP {chapter_num}] Succès tentative {attempt+1} ({size} octets)")
+
+                if chapter_num is not None:
+                    get_collector().add_download(chapter_num, size, success=True)
+                return result
+
+            except Exception as e:
+                if is_host_failure(e):
+                    breaker.record_failure()
+                else:
+                    breaker.record_success()
+                if url_resolver:
+                    url_resolver.report(request_url, False, transferred, time.monotonic() - started)
+                error_handler = get_error_handler()
+                context = error_handler.classify_error(e, chapter_num=chapter_num, url=url)
+                context.retry_count = attempt
+                wait_time = policy.next_delay(attempt, e, deadline)
+
+                if wait_time is None:
+                    logger.error(f"[DL-ASYNC][CHAP {chapter_num}] ÉCHEC FINAL pour {url} - {context.user_message}")
+                    error_handler.handle_error(context)
+                    break
+
+                logger.warning(f"[DL-ASYNC][CHAP {chapter_num}] Tentative {attempt+1}/{policy.max_attempts} échouée -> {context.user_message}. Nouvelle tentative dans {wait_time:.1f}s.")
+                # Le slot de l'hôte est déjà rendu : l'attente n'occupe ni thread ni connexion
+                await asyncio.sleep(wait_time)
+                attempt += 1
+
+        if spool is not None:
+            spool.discard()
+        if chapter_num is not None:
+            get_collector().add_download(chapter_num, 0, success=False)
+        return None
+
+    async def download_many(
+        self,
+        image_urls: Iterable[str],
+        chapter_num=None,
+        referer: Optional[str] = None,
+        timeout: float = 60,
+        max_in_flight: Optional[int] = None,
+        ordered: bool = False,
+        window: Optional[int] = None,
+        cache=None,
+        spool_threshold: Optional[int] = None,
+        url_resolver=None,
+        with_index: bool = False,
+    ) -> AsyncIterator[bytes]:
+        """
+        Télécharge une liste d'URLs et yield les bytes (ordre de complétion,
+        ou ordre source si ordered=True).
+
+        Args:
+            max_in_flight: Plafond propre à cet appel (en plus du plafond par hôte)
+            ordered: Émettre dans l'ordre des URLs (tampon de réordonnancement)
+            window: Images lancées mais pas encore consommées (défaut : 2 x max_in_flight).
+                    Le générateur ne lance rien de nouveau tant qu'on ne le relance pas.
+            cache: DownloadCache optionnel
+            spool_threshold: Si fourni, yield des fichiers spoolés au lieu de bytes
+            url_resolver: resolve/report appelés autour de chaque tentative (failover MD@Home)
+            with_index: yield des couples (index source à partir de 0, bytes)
+        """
+        urls = list(image_urls)
+        window = max(1, window or (max_in_flight or self.per_host_limit) * 2)
+        chapter_slots = asyncio.Semaphore(max_in_flight) if max_in_flight else None
+        chapter_deadline = self.retry_policy.new_chapter_deadline()
+
+        async def one(url):
+            deadline = self.retry_policy.image_deadline_within(chapter_deadline)
+            if chapter_slots is None:
+                return await self.download(url, referer=referer, chapter_num=chapter_num, timeout=timeout, cache=cache, spool_threshold=spool_threshold, deadline=deadline, url_resolver=url_resolver)
+            async with chapter_slots:
+                return await self.download(url, referer=referer, chapter_num=chapter_num, timeout=timeout, cache=cache, spool_threshold=spool_threshold, deadline=deadline, url_resolver=url_resolver)
+
+        pending: Dict[int, asyncio.Task] = {}
+        next_submit = 0
+
+        def fill_window():
+            nonlocal next_submit
+            while next_submit < len(urls) and len(pending) < window:
+                pending[next_submit] = asyncio.ensure_future(one(urls[next_submit]))
+                next_submit += 1
+
+        try:
+            fill_window()
+            while pending:
+                if ordered:
+                    idx = min(pending)
+                    await asyncio.wait([pending[idx]])
+                else:
+                    done, _ = await asyncio.wait(pending.values(), return_when=asyncio.FIRST_COMPLETED)
+                    idx = next(i for i, t in pending.items() if t in done)
+                task = pending.pop(idx)
+
+                try:
+                    img_bytes = task.result()
+                except Exception as e:
+                    img_bytes = None
+                    logger.warning(f"[DL-ASYNC][CHAP {chapter_num}] Erreur téléchargement pour {urls[idx]}: {e}")
+
+                fill_window()
+                if img_bytes:
+                    yield (idx, img_bytes) if with_index else img_bytes
+        finally:
+            for t in pending.values():
+                t.cancel()
+
+    async def warm_up(self, urls: Iterable[str], connections: int = 2, timeout: float = 10.0) -> Dict[str, int]:
+        """
+        Ouvre en parallèle `connections` connexions (HEAD) vers chaque hôte de
+        `urls`, gardées en keep-alive pour les téléchargements qui suivent.
+
+        Returns:
+            {origine: connexions ouvertes}
+        """
+        samples: Dict[str, str] = {}
+        for url in urls:
+            samples.setdefault(origin_of(url), url)
+
+        async def open_one(url: str) -> bool:
+            try:
+                await self._get_client(url, http2=True).head(url, timeout=timeout)
+                return True
+            except Exception as e:
+                logger.warning(f"[ASYNC] Pré-chauffage {origin_of(url)} échoué : {e}")
+                return False
+
+        owners = [origin for origin in samples for _ in range(max(1, connections))]
+        opened = await asyncio.gather(*(open_one(samples[origin]) for origin in owners))
+        report: Dict[str, int] = {origin: 0 for origin in samples}
+        for origin, ok in zip(owners, opened):
+            report[origin] += int(ok)
+        return report
+
+    async def aclose(self) -> None:
+        """Ferme tous les AsyncClient."""
+        clients = list(self._clients.values())
+        self._clients.clear()
+        for client in clients:
+            await client.aclose()
+
+
+class _LoopThread:
+    """Boucle asyncio unique du processus, exécutée dans un thread démon."""
+
+    def __init__(self):
+        self.loop = asyncio.new_event_loop()
+        self.thread = threading.Thread(target=self._run, name="panelia-async-dl", daemon=True)
+        self.thread.start()
+
+    def _run(self):
+        asyncio.set_event_loop(self.loop)
+        self.loop.run_forever()
+
+    def submit(self, coro):
+        return asyncio.run_coroutine_threadsafe(coro, self.loop)
+
+
+_loop_thread: Optional[_LoopThread] = None
+_downloader: Optional[AsyncImageDownloader] = None
+_loop_lock = threading.Lock()
+
+_DONE = object()
+
+
+def _get_loop_and_downloader() -> Tuple[_LoopThread, AsyncImageDownloader]:
+    global _loop_thread, _downloader
+    with _loop_lock:
+        if _loop_thread is None:
+            _loop_thread = _LoopThread()
+            _downloader = AsyncImageDownloader()
+        return _loop_thread, _downloader
+
+
+def configure_async_downloader(downloader: AsyncImageDownloader) -> None:
+    """
+    Remplace le téléchargeur partagé (ex: plafond par hôte différent).
+    L'ancien est fermé sur la boucle.
+    """
+    global _downloader
+    loop_thread, old = _get_loop_and_downloader()
+    with _loop_lock:
+        _downloader = downloader
+    if old is not None and old is not downloader:
+        loop_thread.submit(old.aclose())
+
+
+def warm_up_async_downloader(urls: Iterable[str], connections: int = 2, timeout: float = 10.0) -> Dict[str, int]:
+    """Pré-chauffe les hôtes de `urls` dans le téléchargeur partagé (appel bloquant)."""
+    loop_thread, downloader = _get_loop_and_downloader()
+    return loop_thread.submit(downloader.warm_up(list(urls), connections=connections, timeout=timeout)).result()
+
+
+def stream_download_images_async(image_urls, chapter_num=None, referer=None, timeout=60, max_workers=4, ordered=False, window=None, cache=None, spool_threshold=None, url_resolver=None, cancel_token=None, with_index=False) -> Iterator[bytes]:
+    """
+    Façade synchrone du moteur asyncio : même contrat que stream_download_images
+    (yield des bytes, images échouées ignorées, ordered/window/cache/spool_threshold/
+    url_resolver/with_index identiques).
+
+    max_workers plafonne les requêtes en vol pour ce chapitre ; le plafond par
+    hôte du téléchargeur partagé s'applique en plus, tous chapitres confondus.
+    La boucle attend que le consommateur ait pris chaque image avant de
+    reprendre le générateur : la backpressure de la fenêtre est conservée.
+    cancel_token : l'annulation coupe la tâche asyncio (requêtes en vol
+    comprises) et le générateur lève OperationCancelled.
+    """
+    loop_thread, downloader = _get_loop_and_downloader()
+    results: "queue.Queue" = queue.Queue()
+    handoff = asyncio.Semaphore(1)
+
+    async def pump():
+        try:
+            async for img_bytes in downloader.download_many(
+                image_urls, chapter_num=chapter_num, referer=referer,
+                timeout=timeout, max_in_flight=max_workers,
+                ordered=ordered, window=window, cache=cache,
+                spool_threshold=spool_threshold, url_resolver=url_resolver,
+                with_index=with_index
+            ):
+                await handoff.acquire()
+                results.put(img_bytes)
+        except Exception as e:
+            logger.warning(f"[DL-ASYNC][CHAP {chapter_num}] Erreur moteur async : {e}")
+        finally:
+            results.put(_DONE)
+
+    future = loop_thread.submit(pump())
+    unregister = cancel_token.add_callback(future.cancel) if cancel_token is not None else None
+    try:
+        while True:
+            item = results.get()
+            if item is _DONE:
+                break
+            if cancel_token is not None and cancel_token.cancelled:
+                source = item[1] if with_index else item
+                if hasattr(source, "close"):
+                    source.close()
+                continue
+            loop_thread.loop.call_soon_threadsafe(handoff.release)
+            yield item
+        if cancel_token is not None:
+            cancel_token.raise_if_cancelled()
+    finally:
+        if unregister is not None:
+            unregister()
+        # Consommateur parti avant la fin : on annule les téléchargements restants
+        if not future.done():
+            future.cancel()
@@ -0,0 +1,247 @@
+# cache.py
+"""
+Cache disque des téléchargements d'images PANELia
+
+Relancer un lot (après un crash, ou pour changer la qualité JPEG) ne doit pas
+retélécharger chaque image :
+- Corps stockés par contenu (SHA-256) : objects/ab/abcdef...
+- Index SQLite URL -> (hash, taille, ETag, Last-Modified, dernier accès)
+- Revalidation conditionnelle (If-None-Match / If-Modified-Since -> 304)
+- Taille plafonnée, éviction LRU
+
+Usage:
+    cache = DownloadCache("cache/downloads", max_bytes=2 * 1024**3)
+    entry = cache.lookup(url)
+    headers.update(cache.conditional_headers(entry))
+    ...
+    cache.store(url, body, etag=r.headers.get("ETag"))
+
+Auteur: PANELia Team
+Date: 2025-12-15
+"""
+
+import hashlib
+import io
+import os
+import shutil
+import sqlite3
+import threading
+import time
+from dataclasses import dataclass
+from pathlib import Path
+from typing import BinaryIO, Dict, Optional
+
+from loguru import logger
+
+
+@dataclass
+class CacheEntry:
+    """Entrée d'index pour une URL."""
+    url: str
+    sha256: str
+    size: int
+    etag: Optional[str] = None
+    last_modified: Optional[str] = None
+    last_access: float = 0.0
+
+    @property
+    def has_validators(self) -> bool:
+        """True si le serveur a fourni de quoi revalider (ETag ou Last-Modified)."""
+        return bool(self.etag or self.last_modified)
+
+
+class DownloadCache:
+    """
+    Cache disque adressé par contenu, thread-safe.
+
+    Deux URLs qui servent les mêmes octets partagent un seul objet sur disque.
+    Les entrées sans ETag ni Last-Modified sont servies sans revalidation
+    (les URLs d'images des CDN sont en pratique immuables).
+    """
+
+    def __init__(self, cache_dir: str = "cache/downloads", max_bytes: int = 2 * 1024 ** 3):
+        """
+        Args:
+            cache_dir: Répertoire du cache (créé si absent)
+            max_bytes: Taille max des objets stockés avant éviction LRU
+        """
+        self.cache_dir = Path(cache_dir)
+        self.objects_dir = self.cache_dir / "objects"
+        self.objects_dir.mkdir(parents=True, exist_ok=True)
+        self.max_bytes = max_bytes
+
+        self._lock = threading.Lock()
+        self._db = sqlite3.connect(str(self.cache_dir / "index.sqlite"), check_same_thread=False)
+        self._db.execute(
+            "CREATE TABLE IF NOT EXISTS entries ("
+            " url TEXT PRIMARY KEY, sha256 TEXT NOT NULL, size INTEGER NOT NULL,"
+            " etag TEXT, last_modified TEXT, last_access REAL NOT NULL)"
+        )
+        self._db.execute("CREATE INDEX IF NOT EXISTS idx_entries_access ON entries(last_access)")
+        self._db.execute("CREATE INDEX IF NOT EXISTS idx_entries_sha ON entries(sha256)")
+        self._db.commit()
+
+        logger.info(f"[CACHE] Cache disque : {self.cache_dir} (max {max_bytes / 1024 / 1024:.0f} MB)")
+
+    def _object_path(self, sha256: str) -> Path:
+        return self.objects_dir / sha256[:2] / sha256
+
+    def lookup(self, url: str) -> Optional[CacheEntry]:
+        """Retourne l'entrée d'index pour `url`, ou None."""
+        with self._lock:
+            row = self._db.execute(
+                "SELECT url, sha256, size, etag, last_modified, last_access FROM entries WHERE url = ?",
+                (url,)
+            ).fetchone()
+        return CacheEntry(*row) if row else None
+
+    def conditional_headers(self, entry: Optional[CacheEntry]) -> Dict[str, str]:
+        """En-têtes de revalidation pour une entrée (vide si rien à revalider)."""
+        headers = {}
+        if entry is None:
+            return headers
+        if entry.etag:
+            headers["If-None-Match"] = entry.etag
+        if entry.last_modified:
+            headers["If-Modified-Since"] = entry.last_modified
+        return headers
+
+    def read(self, entry: CacheEntry) -> Optional[bytes]:
+        """
+        Lit le corps d'une entrée et la marque comme récemment utilisée.
+        Retourne None (et oublie l'entrée) si l'objet a disparu du disque.
+        """
+        path = self._object_path(entry.sha256)
+        try:
+            data = path.read_bytes()
+        except OSError:
+            logger.warning(f"[CACHE] Objet manquant pour {entry.url}, entrée supprimée")
+            self.forget(entry.url)
+            return None
+        self.touch(entry.url)
+        return data
+
+    def open(self, entry: CacheEntry) -> Optional[BinaryIO]:
+        """
+        Ouvre le corps d'une entrée en lecture (fichier sur disque, rien en RAM).
+        Retourne None (et oublie l'entrée) si l'objet a disparu du disque.
+        """
+        try:
+            fp = open(self._object_path(entry.sha256), "rb")
+        except OSError:
+            logger.warning(f"[CACHE] Objet manquant pour {entry.url}, entrée supprimée")
+            self.forget(entry.url)
+            return None
+        self.touch(entry.url)
+        return fp
+
+    def touch(self, url: str, etag: Optional[str] = None, last_modified: Optional[str] = None) -> None:
+        """Met à jour le dernier accès (et les validateurs après un 304)."""
+        with self._lock:
+            self._db.execute(
+                "UPDATE entries SET last_access = ?, etag = COALESCE(?, etag),"
+                " last_modified = COALESCE(?, last_modified) WHERE url = ?",
+                (time.time(), etag, last_modified, url)
+            )
+            self._db.commit()
+
+    def store(self, url: str, body: bytes, etag: Optional[str] = None, last_modified: Optional[str] = None) -> CacheEntry:
+        """Stocke un corps téléchargé et l'associe à `url`."""
+        return self.store_file(url, io.BytesIO(body), etag=etag, last_modified=last_modified)
+
+    def store_file(self, url: str, fileobj: BinaryIO, etag: Optional[str] = None, last_modified: Optional[str] = None) -> CacheEntry:
+        """
+        Stocke un corps depuis un fichier (lu par morceaux, jamais chargé en entier).
+        Le fichier est rembobiné à la fin.
+        """
+        fileobj.seek(0)
+        digest = hashlib.sha256()
+        size = 0
+        for chunk in iter(lambda: fileobj.read(1024 * 1024), b""):
+            digest.update(chunk)
+            size += len(chunk)
+        sha256 = digest.hexdigest()
+
+        path = self._object_path(sha256)
+        if not path.exists():
+            path.parent.mkdir(parents=True, exist_ok=True)
+            # Écriture atomique : un crash ne laisse jamais d'objet tronqué
+            tmp = path.with_suffix(f".tmp{threading.get_ident()}")
+            fileobj.seek(0)
+            with open(tmp, "wb") as out:
+                shutil.copyfileobj(fileobj, out, 1024 * 1024)
+            os.replace(tmp, path)
+        fileobj.seek(0)
+
+        entry = CacheEntry(url, sha256, size, etag, last_modified, time.time())
+        with self._lock:
+            self._db.execute(
+                "INSERT OR REPLACE INTO entries (url, sha256, size, etag, last_modified, last_access)"
+                " VALUES (?, ?, ?, ?, ?, ?)",
+                (entry.url, entry.sha256, entry.size, entry.etag, entry.last_modified, entry.last_access)
+            )
+            self._db.commit()
+            self._evict_locked()
+        return entry
+
+    def forget(self, url: str) -> None:
+        """Supprime l'entrée d'une URL (et son objet s'il n'est plus référencé)."""
+        with self._lock:
+            row = self._db.execute("SELECT sha256 FROM entries WHERE url = ?", (url,)).fetchone()
+            if not row:
+                return
+            self._db.execute("DELETE FROM entries WHERE url = ?", (url,))
+            self._db.commit()
+            self._drop_object_if_orphan_locked(row[0])
+
+    def _drop_object_if_orphan_locked(self, sha256: str) -> None:
+        still_used = self._db.execute("SELECT 1 FROM entries WHERE sha256 = ? LIMIT 1", (sha256,)).fetchone()
+        if not still_used:
+            try:
+                self._object_path(sha256).unlink()
+            except OSError:
+                pass
+
+    def _total_bytes_locked(self) -> int:
+        # Taille des objets distincts (un objet partagé n'est compté qu'une fois)
+        row = self._db.execute(
+            "SELECT COALESCE(SUM(size), 0) FROM (SELECT sha256, MAX(size) AS size FROM entries GROUP BY sha256)"
+        ).fetchone()
+        return row[0]
+
+    def _evict_locked(self) -> None:
+        """Éviction LRU jusqu'à repasser sous max_bytes."""
+        total = self._total_bytes_locked()
+        if total <= self.max_bytes:
+            return
+
+        evicted = 0
+        rows = self._db.execute("SELECT url, sha256 FROM entries ORDER BY last_access ASC").fetchall()
+        for url, sha256 in rows:
+            if total <= self.max_bytes:
+                break
+            self._db.execute("DELETE FROM entries WHERE url = ?", (url,))
+            still_used = self._db.execute("SELECT 1 FROM entries WHERE sha256 = ? LIMIT 1", (sha256,)).fetchone()
+            if not still_used:
+                size = self._object_path(sha256).stat().st_size if self._object_path(sha256).exists() else 0
+                self._drop_object_if_orphan_locked(sha256)
+                total -= size
+            evicted += 1
+        self._db.commit()
+        logger.info(f"[CACHE] Éviction LRU : {evicted} entrée(s), {total / 1024 / 1024:.1f} MB restants")
+
+    def get_stats(self) -> Dict[str, float]:
+        """Nombre d'entrées et taille occupée."""
+        with self._lock:
+            entries = self._db.execute("SELECT COUNT(*) FROM entries").fetchone()[0]
+            total = self._total_bytes_locked()
+        return {
+            "entries": entries,
+            "total_mb": round(total / 1024 / 1024, 2),
+            "max_mb": round(self.max_bytes / 1024 / 1024, 2),
+        }
+
+    def close(self) -> None:
+        """Ferme l'index SQLite."""
+        with self._lock:
+            self._db.close()
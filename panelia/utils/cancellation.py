@@ -0,0 +1,109 @@
+# cancellation.py
+"""
+Jeton d'annulation coopératif PANELia
+
+Avant : une fois run_chapter_batch lancé, rien ne pouvait l'arrêter : les
+chapitres en file démarraient quand même et chaque téléchargement allait au
+bout de ses retries.
+
+Maintenant :
+- Un CancellationToken partagé par le lot, les chapitres et les générateurs
+  de téléchargement ; cancel() est idempotent et utilisable depuis n'importe
+  quel thread
+- token.future se résout à l'annulation : un wait(FIRST_COMPLETED) qui
+  l'inclut se réveille immédiatement, sans boucle d'attente active
+- add_callback() pour les ressources à couper tout de suite (tâche asyncio,
+  prefetcher...)
+
+Usage:
+    token = CancellationToken()
+    engine.run_chapter_batch(chapters, params, cancel_token=token)
+    token.cancel("Arrêt demandé")  # depuis un autre thread
+    token.raise_if_cancelled()     # lève OperationCancelled
+
+Auteur: PANELia Team
+Date: 2025-12-18
+"""
+
+import threading
+from concurrent.futures import Future
+from concurrent.futures import TimeoutError as FutureTimeoutError
+from typing import Callable, List, Optional
+
+from loguru import logger
+
+
+class OperationCancelled(Exception):
+    """Travail interrompu par un CancellationToken."""
+
+
+class CancellationToken:
+    """Signal d'annulation partagé entre threads."""
+
+    def __init__(self):
+        self._future: Future = Future()
+        self._lock = threading.Lock()
+        self._callbacks: List[Callable[[], None]] = []
+        self.reason: Optional[str] = None
+
+    @property
+    def cancelled(self) -> bool:
+        return self._future.done()
+
+    @property
+    def future(self) -> Future:
+        """Future résolue (avec la raison) à l'annulation, pour concurrent.futures.wait."""
+        return self._future
+
+    def cancel(self, reason: str = "Annulé") -> bool:
+        """Annule ; False si déjà annulé. Les callbacks sont appelés dans ce thread."""
+        with self._lock:
+            if self._future.done():
+                return False
+            self.reason = reason
+            callbacks, self._callbacks = self._callbacks, []
+            self._future.set_result(reason)
+        logger.info(f"[CANCEL] Annulation demandée : {reason}")
+        for callback in callbacks:
+            try:
+                callback()
+            except Exception as e:
+                logger.warning(f"[CANCEL] Erreur callback d'annulation : {e}")
+        return True
+
+    def raise_if_cancelled(self) -> None:
+        """
+        Raises:
+            OperationCancelled: Si le jeton est annulé
+        """
+        if self._future.done():
+            raise OperationCancelled(self.reason)
+
+    def wait(self, timeout: Optional[float] = None) -> bool:
+        """Attend l'annulation au plus `timeout` secondes ; True si annulé."""
+        try:
+            self._future.result(timeout)
+            return True
+        except FutureTimeoutError:
+            return False
+
+    def add_callback(self, callback: Callable[[], None]) -> Callable[[], None]:
+        """
+        callback() à l'annulation (tout de suite si déjà annulé).
+        Retourne une fonction qui le désinscrit.
+        """
+        with self._lock:
+            if not self._future.done():
+                self._callbacks.append(callback)
+                registered = True
+            else:
+                registered = False
+        if not registered:
+            callback()
+
+        def remove() -> None:
+            with self._lock:
+                if callback in self._callbacks:
+                    self._callbacks.remove(callback)
+
+        return remove
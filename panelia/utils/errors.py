@@ -5,7 +5,7 @@ Module de gestion centralisée des erreurs PANELia
 Fournit :
 - Classification des erreurs par type
 - Retry logic avec backoff exponentiel
-- Circuit breaker pattern
+- Circuit breaker pattern (par catégorie et par hôte)
 - Gestion gracieuse des erreurs
 - Logging structuré
 - Recovery automatique
@@ -16,6 +16,7 @@ Date: 2025-12-08
 
 import time
 import functools
+import threading
 from typing import Optional, Callable, Any, Type, Tuple
 from enum import Enum
 from dataclasses import dataclass, field
@@ -23,6 +24,9 @@ from datetime import datetime, timedelta
 
 from loguru import logger
 
+from panelia.utils.metrics import get_collector
+from panelia.utils.ratelimit import domain_of
+
 
 class ErrorSeverity(Enum):
     """Niveau de sévérité des erreurs."""
@@ -78,8 +82,10 @@ class CircuitBreaker:
 
     États:
     - CLOSED: Normal, requêtes passent
-    - OPEN: Trop d'erreurs, requêtes bloquées
-    - HALF_OPEN: Test de récupération
+    - OPEN: Trop d'erreurs consécutives, requêtes bloquées
+    - HALF_OPEN: Test de récupération (une seule requête sonde à la fois)
+
+    Thread-safe : un même breaker est partagé par tous les workers d'un hôte.
 
     Usage:
         breaker = CircuitBreaker(threshold=5, timeout=60)
@@ -91,63 +97,114 @@ class CircuitBreaker:
                 breaker.record_failure()
     """
 
-    def __init__(self, threshold: int = 5, timeout: int = 60):
+    def __init__(
+        self,
+        threshold: int = 5,
+        timeout: int = 60,
+        name: str = "",
+        on_transition: Optional[Callable[[str, str, str], None]] = None
+    ):
         """
         Args:
-            threshold: Nombre d'échecs avant ouverture
+            threshold: Nombre d'échecs consécutifs avant ouverture
             timeout: Secondes avant tentative de récupération
+            name: Nom affiché dans les logs (catégorie ou hôte)
+            on_transition: Callback (name, ancien état, nouvel état)
         """
         self.threshold = threshold
         self.timeout = timeout
+        self.name = name
+        self.on_transition = on_transition
         self.failures = 0
         self.last_failure_time: Optional[datetime] = None
         self.state = "CLOSED"  # CLOSED, OPEN, HALF_OPEN
+        self._probe_started: Optional[datetime] = None
+        self._lock = threading.RLock()
+
+    def _label(self) -> str:
+        return f"Circuit breaker [{self.name}]" if self.name else "Circuit breaker"
+
+    def _transition(self, new_state: str) -> None:
+        old_state = self.state
+        self.state = new_state
+        if self.on_transition and old_state != new_state:
+            try:
+                self.on_transition(self.name, old_state, new_state)
+            except Exception as e:
+                logger.debug(f"{self._label()} : callback de transition en échec ({e})")
 
     def can_execute(self) -> bool:
-        """Vérifie si l'opération peut être exécutée."""
-        if self.state == "CLOSED":
-            return True
-
-        if self.state == "OPEN":
-            # Vérifier si timeout écoulé pour passer en HALF_OPEN
-            if self.last_failure_time and \
-               (datetime.now() - self.last_failure_time).total_seconds() >= self.timeout:
-                self.state = "HALF_OPEN"
-                logger.info(f"Circuit breaker passage en HALF_OPEN (test récupération)")
+        """
+        Vérifie si l'opération peut être exécutée.
+        En HALF_OPEN, seul le premier appelant obtient True (requête sonde).
+        """
+        with self._lock:
+            if self.state == "CLOSED":
+                return True
+
+            now = datetime.now()
+            if self.state == "OPEN":
+                # Vérifier si timeout écoulé pour passer en HALF_OPEN
+                if self.last_failure_time and \
+                   (now - self.last_failure_time).total_seconds() >= self.timeout:
+                    self._transition("HALF_OPEN")
+                    self._probe_started = now
+                    logger.info(f"{self._label()} passage en HALF_OPEN (test récupération)")
+                    return True
+                return False
+
+            # HALF_OPEN : une seule sonde ; une sonde perdue (annulée) est remplacée après timeout
+            if self._probe_started is None or (now - self._probe_started).total_seconds() >= self.timeout:
+                self._probe_started = now
                 return True
             return False
 
-        # HALF_OPEN : autoriser une tentative
-        return True
+    def retry_in(self) -> float:
+        """Secondes avant que can_execute() puisse de nouveau autoriser une requête."""
+        with self._lock:
+            if self.state == "CLOSED":
+                return 0.0
+            if self.state == "OPEN" and self.last_failure_time:
+                elapsed = (datetime.now() - self.last_failure_time).total_seconds()
+                return max(0.0, self.timeout - elapsed)
+            # HALF_OPEN avec sonde en cours : on repasse bientôt voir le verdict
+            return min(1.0, float(self.timeout))
 
     def record_success(self):
         """Enregistre un succès."""
-        if self.state == "HALF_OPEN":
-            self.state = "CLOSED"
+        with self._lock:
+            if self.state == "HALF_OPEN":
+                self._transition("CLOSED")
+                self._probe_started = None
+                logger.info(f"{self._label()} FERMÉ (récupération réussie)")
+            # Seuls les échecs consécutifs ouvrent le circuit
             self.failures = 0
-            logger.info("Circuit breaker FERMÉ (récupération réussie)")
 
     def record_failure(self):
         """Enregistre un échec."""
-        self.failures += 1
-        self.last_failure_time = datetime.now()
-
-        if self.state == "HALF_OPEN":
-            self.state = "OPEN"
-            logger.warning("Circuit breaker réouvert (récupération échouée)")
-        elif self.failures >= self.threshold:
-            self.state = "OPEN"
-            logger.error(
-                f"Circuit breaker OUVERT ({self.failures} échecs, "
-                f"timeout {self.timeout}s)"
-            )
+        with self._lock:
+            self.failures += 1
+            self.last_failure_time = datetime.now()
+
+            if self.state == "HALF_OPEN":
+                self._transition("OPEN")
+                self._probe_started = None
+                logger.warning(f"{self._label()} réouvert (récupération échouée)")
+            elif self.state == "CLOSED" and self.failures >= self.threshold:
+                self._transition("OPEN")
+                logger.error(
+                    f"{self._label()} OUVERT ({self.failures} échecs, "
+                    f"timeout {self.timeout}s)"
+                )
 
     def reset(self):
         """Réinitialise le circuit breaker."""
-        self.failures = 0
-        self.last_failure_time = None
-        self.state = "CLOSED"
-        logger.info("Circuit breaker réinitialisé")
+        with self._lock:
+            self.failures = 0
+            self.last_failure_time = None
+            self._probe_started = None
+            self._transition("CLOSED")
+        logger.info(f"{self._label()} réinitialisé")
 
 
 class ErrorHandler:
@@ -170,9 +227,15 @@ class ErrorHandler:
             handler.handle_error(context)
     """
 
+    # Paramètres des breakers par hôte (téléchargements d'images)
+    HOST_BREAKER_THRESHOLD = 5
+    HOST_BREAKER_TIMEOUT = 30
+
     def __init__(self):
         """Initialise le gestionnaire d'erreurs."""
         self.circuit_breakers = {}  # Par catégorie
+        self.host_breakers = {}     # Par hôte (nom d'hôte en minuscules)
+        self._lock = threading.Lock()
         logger.info("ErrorHandler initialisé")
 
     def classify_error(
@@ -299,18 +362,50 @@ class ErrorHandler:
         Returns:
             CircuitBreaker pour cette catégorie
         """
-        if category not in self.circuit_breakers:
-            # Paramètres par catégorie
-            if category == ErrorCategory.NETWORK:
-                threshold, timeout = 3, 30
-            elif category == ErrorCategory.DRIVER:
-                threshold, timeout = 2, 60
-            else:
-                threshold, timeout = 5, 60
+        with self._lock:
+            if category not in self.circuit_breakers:
+                # Paramètres par catégorie
+                if category == ErrorCategory.NETWORK:
+                    threshold, timeout = 3, 30
+                elif category == ErrorCategory.DRIVER:
+                    threshold, timeout = 2, 60
+                else:
+                    threshold, timeout = 5, 60
 
-            self.circuit_breakers[category] = CircuitBreaker(threshold, timeout)
+                self.circuit_breakers[category] = CircuitBreaker(threshold, timeout, name=category.value)
 
-        return self.circuit_breakers[category]
+            return self.circuit_breakers[category]
+
+    def get_host_breaker(self, url_or_host: str) -> CircuitBreaker:
+        """
+        Récupère ou crée le circuit breaker d'un hôte.
+
+        Un CDN en panne ouvre son propre circuit : ses images attendent la
+        sonde de récupération pendant que les autres hôtes continuent.
+
+        Args:
+            url_or_host: URL complète ou nom d'hôte
+
+        Returns:
+            CircuitBreaker de cet hôte
+        """
+        host = domain_of(url_or_host)
+        with self._lock:
+            breaker = self.host_breakers.get(host)
+            if breaker is None:
+                breaker = CircuitBreaker(
+                    self.HOST_BREAKER_THRESHOLD,
+                    self.HOST_BREAKER_TIMEOUT,
+                    name=host,
+                    on_transition=_report_breaker_transition
+                )
+                self.host_breakers[host] = breaker
+            return breaker
+
+    def get_host_breaker_states(self) -> dict:
+        """État courant des breakers par hôte, ex: {"cdn.example.com": "OPEN"}."""
+        with self._lock:
+            return {host: b.state for host, b in self.host_breakers.items()}
 
     def retry(
         self,
@@ -418,12 +513,19 @@ class ErrorHandler:
             return default
 
     def reset_circuit_breakers(self):
-        """Réinitialise tous les circuit breakers."""
+        """Réinitialise tous les circuit breakers (catégories et hôtes)."""
         for breaker in self.circuit_breakers.values():
             breaker.reset()
+        with self._lock:
+            self.host_breakers.clear()
         logger.info("Tous les circuit breakers réinitialisés")
 
 
+def _report_breaker_transition(name: str, old_state: str, new_state: str) -> None:
+    """Remonte une transition de breaker d'hôte dans les métriques."""
+    get_collector().record_breaker_transition(name, old_state, new_state)
+
+
 # Instance globale (singleton)
 _global_handler: Optional[ErrorHandler] = None
 
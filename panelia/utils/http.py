@@ -1,17 +1,28 @@
 # http_utils.py
 """
 Utilitaires HTTP robustes : download_image_smart + download_all_images
-Retry + backoff exponentiel, rotation User-Agent, referer, fallback HTTP2 -> HTTP1
+Retry selon RetryPolicy (voir retry.py), rotation User-Agent, referer, fallback HTTP2 -> HTTP1
+Les clients httpx sont partagés par hôte (voir http_pool.py) : keep-alive et
+multiplexage HTTP/2 entre toutes les images d'un même CDN.
+download_image_spooled : variante streaming pour les très grandes images
+(corps écrit dans un fichier temporaire, reprise par Range).
 Utilisé par app.py et scraper_engine.py
 """
 
+import heapq
+import os
 import random
+import tempfile
 import time
-from concurrent.futures import ThreadPoolExecutor, as_completed
+from concurrent.futures import ThreadPoolExecutor, wait, FIRST_COMPLETED
 import httpx
 from loguru import logger
+from panelia.utils.cancellation import OperationCancelled
 from panelia.utils.metrics import get_collector
 from panelia.utils.errors import get_error_handler, ErrorCategory
+from panelia.utils.http_pool import get_client_pool
+from panelia.utils.ratelimit import get_rate_limiter
+from panelia.utils.retry import DEFAULT_RETRY_POLICY, TransientDownloadError, is_host_failure
 
 USER_AGENTS = [
     # Desktop Chrome / Firefox / Safari
@@ -25,88 +36,601 @@ USER_AGENTS = [
     "Mozilla/5.0 (Linux; Android 13; SM-G998B) AppleWebKit/537.36 (KHTML, like Gecko) Chrome/122.0.0.0 Mobile Safari/537.36"
 ]
 
-def download_image_smart(url, referer=None, chapter_num=None, timeout=30):
+def _limited_get(pool, url, **kwargs):
     """
-    Télécharge une image en mode robuste :
-      - retry exponentiel (max_retries)
-      - rotation User-Agent
-      - HTTP2 first then HTTP1 fallback
-      - referer si fourni
-    Retourne bytes ou None.
+    GET soumis au limiteur adaptatif du domaine (attente avant, ajustement après).
+    Retourne (réponse, secondes d'attente du limiteur).
+    """
+    limiter = get_rate_limiter()
+    waited = limiter.acquire(url)
+    r = pool.get(url, **kwargs)
+    limiter.record_response(url, r.status_code, r.headers.get("Retry-After"))
+    return r, waited
+
+
+def cached_without_revalidation(cache, url, chapter_num=None):
+    """
+    Consulte le cache avant toute requête. Retourne (bytes, None) pour une
+    entrée servie directement (pas de validateur), (None, entrée) pour une
+    entrée à revalider, (None, None) si l'URL est inconnue.
     """
-    max_retries = 8
-    backoff_base = 1.0
+    if cache is None:
+        return None, None
+    entry = cache.lookup(url)
+    if entry is None:
+        return None, None
+    if entry.has_validators:
+        return None, entry
+    body = cache.read(entry)
+    if body is not None:
+        get_collector().record_cache(chapter_num, hit=True)
+        logger.info(f"[DL][CHAP {chapter_num}] Servi depuis le cache ({len(body)} octets)")
+    return body, None
+
+
+def read_revalidated(cache, entry, response, chapter_num=None):
+    """Après un 304 : relit le corps en cache (None si l'objet a disparu)."""
+    body = cache.read(entry)
+    if body is not None:
+        cache.touch(entry.url, etag=response.headers.get("ETag"), last_modified=response.headers.get("Last-Modified"))
+        get_collector().record_cache(chapter_num, hit=True, revalidated=True)
+        logger.info(f"[DL][CHAP {chapter_num}] Cache revalidé (304, {len(body)} octets)")
+    return body
+
 
-    for attempt in range(max_retries):
+def open_cached_without_revalidation(cache, url, chapter_num=None):
+    """Comme cached_without_revalidation, mais retourne un fichier ouvert (mode spool)."""
+    if cache is None:
+        return None, None
+    entry = cache.lookup(url)
+    if entry is None:
+        return None, None
+    if entry.has_validators:
+        return None, entry
+    fp = cache.open(entry)
+    if fp is not None:
+        get_collector().record_cache(chapter_num, hit=True)
+        logger.info(f"[DL][CHAP {chapter_num}] Servi depuis le cache ({entry.size} octets)")
+    return fp, None
+
+
+def open_revalidated(cache, entry, response, chapter_num=None):
+    """Après un 304 : ouvre le corps en cache (None si l'objet a disparu)."""
+    fp = cache.open(entry)
+    if fp is not None:
+        cache.touch(entry.url, etag=response.headers.get("ETag"), last_modified=response.headers.get("Last-Modified"))
+        get_collector().record_cache(chapter_num, hit=True, revalidated=True)
+        logger.info(f"[DL][CHAP {chapter_num}] Cache revalidé (304, {entry.size} octets)")
+    return fp
+
+
+def store_spool_in_cache(cache, url, spool, chapter_num=None):
+    """Après un 200 streamé : stocke le fichier spoolé et ses validateurs (miss)."""
+    if cache is None:
+        return
+    try:
+        cache.store_file(url, spool.file, etag=spool.etag, last_modified=spool.last_modified)
+    except Exception as e:
+        logger.warning(f"[DL][CHAP {chapter_num}] Écriture cache impossible pour {url}: {e}")
+    get_collector().record_cache(chapter_num, hit=False)
+
+
+def store_in_cache(cache, url, response, body, chapter_num=None):
+    """Après un 200 : stocke le corps et ses validateurs (miss)."""
+    if cache is None:
+        return
+    try:
+        cache.store(url, body, etag=response.headers.get("ETag"), last_modified=response.headers.get("Last-Modified"))
+    except Exception as e:
+        # Le cache ne doit jamais faire échouer un téléchargement
+        logger.warning(f"[DL][CHAP {chapter_num}] Écriture cache impossible pour {url}: {e}")
+    get_collector().record_cache(chapter_num, hit=False)
+
+
+class IncompleteDownloadError(TransientDownloadError):
+    """Transfert interrompu avant Content-Length : la tentative suivante reprend par Range."""
+    pass
+
+
+class SpooledDownload:
+    """
+    Corps d'image écrit au fil de l'eau dans un SpooledTemporaryFile :
+    en RAM sous `threshold` octets, sur disque au-delà. Conserve l'état
+    nécessaire pour reprendre un transfert interrompu (Range / If-Range).
+    """
+
+    def __init__(self, threshold: int = 8 * 1024 * 1024):
+        self.file = tempfile.SpooledTemporaryFile(max_size=threshold, prefix="panelia_dl_")
+        self.written = 0
+        self.expected = None
+        self.validator = None
+        self.etag = None
+        self.last_modified = None
+
+    def resume_headers(self) -> dict:
+        """En-têtes de reprise si une partie du corps est déjà sur disque."""
+        if self.written == 0:
+            return {}
+        headers = {"Range": f"bytes={self.written}-"}
+        if self.validator:
+            # If-Range : si l'image a changé entre-temps, le serveur renvoie tout (200)
+            headers["If-Range"] = self.validator
+        return headers
+
+    def begin(self, response) -> None:
+        """Prépare l'écriture selon la réponse : ajout (206) ou remise à zéro (200)."""
+        content_range = response.headers.get("Content-Range", "")
+        resumed = (
+            response.status_code == 206
+            and self.written > 0
+            and content_range.startswith(f"bytes {self.written}-")
+        )
+        if resumed:
+            total = content_range.rsplit("/", 1)[-1]
+            self.expected = int(total) if total.isdigit() else None
+        else:
+            self.file.seek(0)
+            self.file.truncate()
+            self.written = 0
+            length = response.headers.get("Content-Length")
+            # Avec Content-Encoding, Content-Length ne correspond pas aux octets décodés
+            encoded = response.headers.get("Content-Encoding", "identity") != "identity"
+            self.expected = int(length) if (length and length.isdigit() and not encoded) else None
+
+        self.etag = response.headers.get("ETag")
+        self.last_modified = response.headers.get("Last-Modified")
+        # Un ETag faible n'est pas accepté dans If-Range
+        if self.etag and not self.etag.startswith("W/"):
+            self.validator = self.etag
+        else:
+            self.validator = self.last_modified
+
+    def write(self, chunk: bytes) -> None:
+        self.file.write(chunk)
+        self.written += len(chunk)
+
+    def finish(self):
+        """Vérifie la complétude et retourne le fichier rembobiné."""
+        if self.expected is not None and self.written < self.expected:
+            raise IncompleteDownloadError(f"connection interrompue : {self.written}/{self.expected} octets")
+        self.file.seek(0)
+        return self.file
+
+    def discard(self) -> None:
+        self.file.close()
+
+
+class _ImageJob:
+    """
+    Une image à télécharger et son état entre deux tentatives : entrée de
+    cache à revalider, fichier spoolé partiel, numéro de tentative, échéance.
+
+    step() fait UNE tentative et ne dort jamais : l'attente avant la suivante
+    est à la charge de l'appelant (time.sleep pour download_image_smart, file
+    de minuteries pour stream_download_images).
+    """
+
+    def __init__(self, url, referer=None, chapter_num=None, timeout=30, cache=None, spool_threshold=None, policy=None, deadline=None, resolver=None, slicer=None, cancel_token=None):
+        self.url = url
+        self.resolver = resolver
+        self.referer = referer
+        self.chapter_num = chapter_num
+        self.timeout = timeout
+        self.cache = cache
+        self.spool_threshold = spool_threshold
+        self.policy = policy or DEFAULT_RETRY_POLICY
+        self.deadline = deadline or self.policy.image_deadline_within()
+        self.attempt = 0
+        self.entry = None
+        self.spool = None
+        self.transferred = 0
+        self.limiter_wait = 0.0
+        # Découpeur incrémental (mode spool) : reçoit les morceaux au fil du flux
+        self.slicer = slicer
+        # Lot annulé : plus de nouvelle tentative, transfert spoolé interrompu
+        self.cancel_token = cancel_token
+        self._cache_checked = False
+
+    def step(self):
+        """
+        Une tentative de téléchargement.
+
+        Returns:
+            (True, résultat) si l'image est terminée : bytes (ou fichier en mode
+            spool), None si abandon définitif ;
+            (False, délai) s'il faut retenter dans `délai` secondes.
+        """
+        if self.cancel_token is not None and self.cancel_token.cancelled:
+            self.discard()
+            return True, None
+
+        if not self._cache_checked:
+            self._cache_checked = True
+            hit = self._from_cache()
+            if hit is not None:
+                return True, hit
+
+        if self.deadline.expired:
+            logger.error(f"[DL][CHAP {self.chapter_num}] ABANDON pour {self.url} - budget temps épuisé")
+            return True, self._give_up()
+
+        # URL réellement contactée (nœud MD@Home courant...) ; le cache reste indexé sur self.url
+        request_url = self.resolver.resolve(self.url) if self.resolver else self.url
+        breaker = get_error_handler().get_host_breaker(request_url)
+        if not breaker.can_execute():
+            return self._on_open_circuit(breaker)
+
+        started = time.monotonic()
+        self.transferred = 0
+        # Attente du limiteur de débit : pas du temps de transfert du nœud
+        self.limiter_wait = 0.0
         try:
-            headers = {
-                "User-Agent": random.choice(USER_AGENTS),
-                "Accept": "image/avif,image/webp,image/png,image/*;q=0.8",
-            }
-            if referer:
-                headers["Referer"] = referer
-
-            use_http2 = (attempt == 0)
-
-            # httpx client context
-            with httpx.Client(http2=use_http2, timeout=httpx.Timeout(timeout), follow_redirects=True, headers=headers) as client:
-                r = client.get(url)
-                r.raise_for_status()
-                img_bytes = r.content
-                logger.info(f"[DL][CHAP {chapter_num}] Succès tentative {attempt+1} ({len(img_bytes)} octets)")
+            if self.spool_threshold:
+                result, size = self._fetch_spooled(request_url)
+            else:
+                result = self._fetch(request_url)
+                size = len(result)
+        except OperationCancelled:
+            # Ni échec d'hôte ni tentative : l'image est simplement abandonnée
+            self.discard()
+            return True, None
+        except Exception as e:
+            if is_host_failure(e):
+                breaker.record_failure()
+            else:
+                breaker.record_success()
+            if self.resolver:
+                self.resolver.report(request_url, False, self.transferred, time.monotonic() - started - self.limiter_wait)
+            return self._on_failure(e)
 
-                # Enregistrer le téléchargement réussi dans les métriques
-                if chapter_num is not None:
-                    collector = get_collector()
-                    collector.add_download(chapter_num, len(img_bytes), success=True)
+        breaker.record_success()
+        if self.resolver:
+            self.resolver.report(request_url, True, self.transferred, time.monotonic() - started - self.limiter_wait)
 
+        mode = ", streaming" if self.spool_threshold else ""
+        logger.info(f"[DL][CHAP {self.chapter_num}] Succès tentative {self.attempt+1} ({size} octets{mode})")
+        if self.chapter_num is not None:
+            get_collector().add_download(self.chapter_num, size, success=True)
+        return True, result
+
+    def _headers(self):
+        headers = {
+            "User-Agent": random.choice(USER_AGENTS),
+            "Accept": "image/avif,image/webp,image/png,image/*;q=0.8",
+        }
+        if self.referer:
+            headers["Referer"] = self.referer
+        return headers
+
+    def _from_cache(self):
+        if self.spool_threshold:
+            hit, self.entry = open_cached_without_revalidation(self.cache, self.url, self.chapter_num)
+            size = os.fstat(hit.fileno()).st_size if hit is not None else 0
+        else:
+            hit, self.entry = cached_without_revalidation(self.cache, self.url, self.chapter_num)
+            size = len(hit) if hit is not None else 0
+        if hit is not None and self.chapter_num is not None:
+            get_collector().add_download(self.chapter_num, size, success=True)
+        return hit
+
+    def _fetch(self, request_url):
+        headers = self._headers()
+        use_http2 = (self.attempt == 0)
+        timeout = httpx.Timeout(self.deadline.clip_timeout(self.timeout))
+
+        # Client partagé par hôte : la connexion (et le multiplexage HTTP/2) est réutilisée
+        pool = get_client_pool()
+        request_headers = dict(headers, **(self.cache.conditional_headers(self.entry) if self.entry else {}))
+        r, waited = _limited_get(pool, request_url, http2=use_http2, headers=request_headers, timeout=timeout)
+        self.limiter_wait += waited
+
+        if self.entry is not None and r.status_code == 304:
+            img_bytes = read_revalidated(self.cache, self.entry, r, self.chapter_num)
+            if img_bytes is not None:
                 return img_bytes
+            # Objet disparu du disque : on refait la requête sans condition
+            self.entry = None
+            r, waited = _limited_get(pool, request_url, http2=use_http2, headers=headers, timeout=timeout)
+            self.limiter_wait += waited
 
-        except Exception as e:
-            # Classifier l'erreur
-            error_handler = get_error_handler()
-            context = error_handler.classify_error(e, chapter_num=chapter_num, url=url)
+        r.raise_for_status()
+        img_bytes = r.content
+        self.transferred = len(img_bytes)
+        store_in_cache(self.cache, self.url, r, img_bytes, self.chapter_num)
+        return img_bytes
+
+    def _fetch_spooled(self, request_url):
+        if self.spool is None:
+            self.spool = SpooledDownload(self.spool_threshold)
+        spool = self.spool
+
+        limiter = get_rate_limiter()
+        while True:
+            headers = self._headers()
+            if self.entry is not None and spool.written == 0:
+                headers.update(self.cache.conditional_headers(self.entry))
+            headers.update(spool.resume_headers())
+            timeout = httpx.Timeout(self.deadline.clip_timeout(self.timeout))
+
+            self.limiter_wait += limiter.acquire(request_url)
+            with get_client_pool().stream(request_url, http2=(self.attempt == 0), headers=headers, timeout=timeout) as r:
+                limiter.record_response(request_url, r.status_code, r.headers.get("Retry-After"))
+                if self.entry is not None and r.status_code == 304:
+                    fp = open_revalidated(self.cache, self.entry, r, self.chapter_num)
+                    if fp is not None:
+                        self.discard()
+                        return fp, self.entry.size
+                    # Objet disparu du disque : on refait la requête sans condition
+                    self.entry = None
+                    continue
+
+                r.raise_for_status()
+                spool.begin(r)
+                if self.slicer is not None and spool.written == 0:
+                    # Corps repris depuis l'octet 0 : décodage à recommencer
+                    self.slicer.reset()
+                for chunk in r.iter_bytes(chunk_size=256 * 1024):
+                    if self.cancel_token is not None:
+                        self.cancel_token.raise_if_cancelled()
+                    spool.write(chunk)
+                    self.transferred += len(chunk)
+                    if self.slicer is not None:
+                        self.slicer.feed(chunk)
+            break
 
-            wait_time = backoff_base * (2 ** attempt)
+        body = spool.finish()
+        store_spool_in_cache(self.cache, self.url, spool, self.chapter_num)
+        if self.slicer is not None:
+            body = self.slicer.finish(body)
+        return body, spool.written
 
-            # Dernière tentative ?
-            if attempt == max_retries - 1:
-                logger.error(f"[DL][CHAP {chapter_num}] ÉCHEC FINAL pour {url} - {context.user_message}")
-                error_handler.handle_error(context)
+    def _on_failure(self, e):
+        error_handler = get_error_handler()
+        context = error_handler.classify_error(e, chapter_num=self.chapter_num, url=self.url)
+        context.retry_count = self.attempt
+
+        delay = self.policy.next_delay(self.attempt, e, self.deadline)
+        if delay is None:
+            if not self.policy.is_retryable(e):
+                reason = "erreur définitive"
+            elif self.attempt + 1 >= self.policy.max_attempts:
+                reason = "tentatives épuisées"
             else:
-                logger.warning(f"[DL][CHAP {chapter_num}] Tentative {attempt+1}/{max_retries} échouée -> {context.user_message}. Nouvelle tentative dans {wait_time:.1f}s.")
+                reason = "budget temps épuisé"
+            logger.error(f"[DL][CHAP {self.chapter_num}] ÉCHEC FINAL pour {self.url} ({reason}) - {context.user_message}")
+            error_handler.handle_error(context)
+            return True, self._give_up()
+
+        resume = f" (reprise à {self.spool.written} octets)" if self.spool is not None and self.spool.written else ""
+        logger.warning(f"[DL][CHAP {self.chapter_num}] Tentative {self.attempt+1}/{self.policy.max_attempts} échouée -> {context.user_message}. Nouvelle tentative dans {delay:.1f}s{resume}.")
+        self.attempt += 1
+        return False, delay
+
+    def _on_open_circuit(self, breaker):
+        """
+        Circuit de l'hôte ouvert : aucune requête émise, donc aucune tentative
+        consommée. Le retry est calé sur la prochaine sonde du breaker ; seule
+        l'échéance de l'image borne l'attente.
+        """
+        get_collector().record_short_circuit(breaker.name)
+        delay = breaker.retry_in()
+        if delay >= self.deadline.remaining():
+            logger.error(f"[DL][CHAP {self.chapter_num}] ÉCHEC FINAL pour {self.url} (circuit {breaker.name} ouvert)")
+            return True, self._give_up()
+        logger.warning(f"[DL][CHAP {self.chapter_num}] Circuit {breaker.name} ouvert, tentative {self.attempt+1}/{self.policy.max_attempts} reportée de {delay:.1f}s.")
+        return False, delay
+
+    def _give_up(self):
+        self.discard()
+        if self.chapter_num is not None:
+            get_collector().add_download(self.chapter_num, 0, success=False)
+        return None
+
+    def discard(self):
+        """Libère le fichier spoolé partiel (abandon ou consommateur parti)."""
+        if self.spool is not None:
+            self.spool.discard()
+            self.spool = None
+
+
+def download_image_smart(url, referer=None, chapter_num=None, timeout=30, cache=None, retry_policy=None, deadline=None, url_resolver=None):
+    """
+    Télécharge une image en mode robuste :
+      - retry selon RetryPolicy (codes/exceptions classés, backoff plafonné
+        avec jitter, échéance par image)
+      - rotation User-Agent
+      - HTTP2 first then HTTP1 fallback
+      - referer si fourni
+      - cache disque optionnel (DownloadCache) avec revalidation conditionnelle
+    Retourne bytes ou None.
+
+    Appel bloquant : le thread appelant dort entre deux tentatives. Pour un
+    chapitre entier, préférer stream_download_images (file de minuteries).
+    """
+    job = _ImageJob(url, referer, chapter_num, timeout, cache, policy=retry_policy, deadline=deadline, resolver=url_resolver)
+    while True:
+        finished, value = job.step()
+        if finished:
+            return value
+        time.sleep(value)
 
-            time.sleep(wait_time)
 
-    # Enregistrer l'échec dans les métriques
-    if chapter_num is not None:
-        collector = get_collector()
-        collector.add_download(chapter_num, 0, success=False)
+def download_image_spooled(url, referer=None, chapter_num=None, timeout=30, cache=None, spool_threshold=8 * 1024 * 1024, retry_policy=None, deadline=None, url_resolver=None):
+    """
+    Variante streaming de download_image_smart pour les images de 20-40 MB :
+      - corps lu par morceaux (client.stream) et écrit dans un fichier temporaire
+        (en RAM sous spool_threshold, sur disque au-delà)
+      - transfert interrompu -> reprise à l'octet près via Range / If-Range
+      - hit de cache -> fichier objet du cache ouvert directement
 
-    return None
+    Retourne un fichier binaire rembobiné (à fermer par l'appelant) ou None.
+    Le pic mémoire ne dépend plus de la taille de l'image.
+    """
+    job = _ImageJob(url, referer, chapter_num, timeout, cache, spool_threshold=spool_threshold, policy=retry_policy, deadline=deadline, resolver=url_resolver)
+    while True:
+        finished, value = job.step()
+        if finished:
+            return value
+        time.sleep(value)
 
 
-def stream_download_images(image_urls, chapter_num=None, referer=None, timeout=60, max_workers=4):
+def stream_download_images(image_urls, chapter_num=None, referer=None, timeout=60, max_workers=4, ordered=False, window=None, cache=None, spool_threshold=None, retry_policy=None, url_resolver=None, scheduler=None, slicer_factory=None, cancel_token=None, with_index=False):
     """
     Télécharge en parallèle les URLs passées et yield (générateur) les bytes
     dès qu'une image est terminée. Idéal pour économiser la RAM.
+
+    - ordered=False : ordre de complétion (le plus rapide)
+    - ordered=True  : ordre des URLs sources (numérotation ChXX_PXXX stable),
+      via un tampon de réordonnancement
+
+    Dans les deux modes, au plus `window` images (défaut : 2 x max_workers)
+    sont en cours de téléchargement, en attente de retry ou en attente d'être
+    consommées : quand la fenêtre est pleine, plus aucun téléchargement n'est
+    lancé tant que le consommateur n'a pas avancé (backpressure).
+
+    Les retries ne bloquent aucun worker : une tentative échouée est reprogrammée
+    dans une file de minuteries et le worker passe à l'image suivante.
+    retry_policy fixe la classification, le backoff et les échéances par image
+    et par chapitre (défaut : DEFAULT_RETRY_POLICY).
+
+    cache : DownloadCache optionnel (hits servis sans requête, 304 revalidés).
+    spool_threshold : si fourni, chaque image est streamée vers un fichier
+    temporaire et le générateur yield des fichiers rembobinés (à fermer) au
+    lieu de bytes.
+    url_resolver : objet optionnel avec resolve(url) -> url appelé avant chaque
+    tentative et report(url, success, size, seconds) après (ex: failover
+    MangaDex@Home, voir scrapers/mangadex.py). Le cache reste indexé sur l'URL
+    d'origine.
+    scheduler : ordonnanceur partagé optionnel (submit(chapitre, url, fn) ->
+    Future, voir core/scheduler.py). Les tentatives passent alors par ses
+    plafonds global et par hôte au lieu d'un pool de max_workers threads
+    propre au chapitre ; max_workers ne fixe plus que la fenêtre par défaut.
+    slicer_factory : avec spool_threshold, fabrique d'un découpeur par image
+    (feed/reset/finish, voir scrapers/incremental.py) alimenté pendant le
+    transfert ; le générateur yield alors son résultat (planches déjà
+    découpées) pour les images téléchargées, le fichier brut pour les hits
+    de cache.
+    cancel_token : CancellationToken optionnel (voir cancellation.py). Une fois
+    annulé, le générateur lève OperationCancelled sans attendre les tentatives
+    en cours ; celles-ci s'arrêtent au prochain morceau reçu (mode spool) et
+    aucune nouvelle tentative n'est lancée.
+    with_index : yield des couples (index source à partir de 0, image) ; les
+    images échouées étant sautées, le rang d'émission n'est pas l'index source.
     """
-    with ThreadPoolExecutor(max_workers=max_workers) as executor:
-        # On soumet toutes les tâches
-        future_to_url = {
-            executor.submit(download_image_smart, url, referer=referer, chapter_num=chapter_num, timeout=timeout): url 
-            for url in image_urls
-        }
-        
-        # On yield les résultats au fur et à mesure de leur complétion
-        for future in as_completed(future_to_url):
-            try:
-                img_bytes = future.result()
-                if img_bytes:
-                    yield img_bytes
-            except Exception as e:
-                url = future_to_url[future]
-                logger.warning(f"[DL][CHAP {chapter_num}] Erreur as_completed pour {url}: {e}")
+    urls = list(image_urls)
+    window = max(max_workers, window or max_workers * 2)
+    policy = retry_policy or DEFAULT_RETRY_POLICY
+    chapter_deadline = policy.new_chapter_deadline()
+
+    # Clé de ce flux dans l'ordonnanceur partagé (tour de rôle entre chapitres)
+    stream_key = object()
+
+    executor = ThreadPoolExecutor(max_workers=max_workers) if scheduler is None else None
+    jobs = {}      # index source -> _ImageJob lancée, pas encore émise
+    running = {}   # future d'une tentative en cours -> index source
+    timers = []    # tas (instant monotonic, index source) des retries programmés
+    finished = {}  # index source -> résultat (None = échec), pas encore émis
+    next_submit = 0
+
+    def launch(idx):
+        if scheduler is not None:
+            running[scheduler.submit(stream_key, urls[idx], jobs[idx].step)] = idx
+        else:
+            running[executor.submit(jobs[idx].step)] = idx
+
+    def fill_window():
+        nonlocal next_submit
+        while next_submit < len(urls) and len(jobs) < window:
+            jobs[next_submit] = _ImageJob(
+                urls[next_submit], referer, chapter_num, timeout, cache,
+                spool_threshold=spool_threshold, policy=policy,
+                deadline=policy.image_deadline_within(chapter_deadline),
+                resolver=url_resolver,
+                slicer=slicer_factory() if (slicer_factory and spool_threshold) else None,
+                cancel_token=cancel_token
+            )
+            launch(next_submit)
+            next_submit += 1
+
+    def next_ready():
+        if ordered:
+            # La tête de fenêtre bloque l'émission, pas les téléchargements déjà lancés
+            head = min(jobs)
+            return head if head in finished else None
+        return next(iter(finished), None)
+
+    try:
+        fill_window()
+        while jobs:
+            if cancel_token is not None:
+                cancel_token.raise_if_cancelled()
+            idx = next_ready()
+            if idx is None:
+                # Relancer les retries arrivés à échéance
+                now = time.monotonic()
+                while timers and timers[0][0] <= now:
+                    launch(heapq.heappop(timers)[1])
+                timeout_next = max(0.0, timers[0][0] - now) if timers else None
+
+                # La future du jeton réveille l'attente dès l'annulation
+                waited = list(running) + ([cancel_token.future] if cancel_token is not None else [])
+                if waited:
+                    done, _ = wait(waited, timeout=timeout_next, return_when=FIRST_COMPLETED)
+                else:
+                    # Toutes les images restantes attendent un retry
+                    time.sleep(timeout_next or 0)
+                    done = ()
+
+                for future in done:
+                    if future not in running:
+                        continue
+                    i = running.pop(future)
+                    try:
+                        complete, value = future.result()
+                    except Exception as e:
+                        complete, value = True, None
+                        logger.warning(f"[DL][CHAP {chapter_num}] Erreur téléchargement pour {urls[i]}: {e}")
+                    if complete:
+                        finished[i] = value
+                    else:
+                        heapq.heappush(timers, (time.monotonic() + value, i))
+                continue
+
+            jobs.pop(idx)
+            img_bytes = finished.pop(idx)
+            # On relance avant de rendre la main : le réseau avance pendant le traitement
+            fill_window()
+            if img_bytes:
+                yield (idx, img_bytes) if with_index else img_bytes
+    finally:
+        # Consommateur parti avant la fin : on abandonne ce qui n'a pas démarré
+        for future, i in running.items():
+            future.cancel()
+            job = jobs[i]
+            if future.cancelled():
+                job.discard()
+            else:
+                future.add_done_callback(lambda f, job=job: _abandon_step(f, job))
+        for _, i in timers:
+            jobs[i].discard()
+        for result in finished.values():
+            if result is not None and hasattr(result, "close"):
+                # Fichiers temporaires déjà téléchargés mais jamais consommés
+                result.close()
+        if executor is not None:
+            # Annulation : on n'attend pas les tentatives en vol (résultats abandonnés ci-dessus)
+            executor.shutdown(wait=not (cancel_token is not None and cancel_token.cancelled))
+
+
+def _abandon_step(future, job):
+    """Fin d'une tentative dont le résultat ne sera jamais consommé."""
+    try:
+        complete, value = future.result()
+        if complete and value is not None and hasattr(value, "close"):
+            value.close()
+    except Exception:
+        pass
+    job.discard()
 
 def download_all_images(image_urls, chapter_num=None, referer=None, timeout=60, max_workers=4):
     """
@@ -0,0 +1,419 @@
+# http_pool.py
+"""
+Registre partagé de clients HTTP longue durée (httpx)
+
+Avant : un httpx.Client neuf par tentative et par image, donc une poignée de
+main TCP+TLS par planche et aucun multiplexage HTTP/2.
+
+Maintenant :
+- Un client par clé (hôte, protocole, proxy), réutilisé par tous les threads
+- Keep-alive + limites de connexions configurables
+- HTTP/2 si le paquet h2 est installé, sinon repli automatique en HTTP/1.1
+- Compteurs de réutilisation des connexions (via l'extension "trace" de httpcore)
+- Pré-chauffage (warm_up) : DNS résolu et connexions ouvertes en parallèle
+  vers chaque hôte avant le gros des téléchargements
+- Temps jusqu'au premier octet (TTFB) par hôte, séparé entre requêtes sur
+  connexion neuve (froide) et sur connexion déjà ouverte (chaude)
+
+Usage:
+    pool = get_client_pool()
+    pool.warm_up(image_urls, connections=4)
+    r = pool.get("https://cdn.example.com/img.jpg", headers={...}, timeout=30)
+    stats = pool.get_stats()
+
+Auteur: PANELia Team
+Date: 2025-12-15
+"""
+
+import socket
+import threading
+import time
+from concurrent.futures import ThreadPoolExecutor
+from contextlib import contextmanager
+from dataclasses import dataclass
+from typing import Dict, Iterable, Optional, Tuple
+from urllib.parse import urlparse
+
+import httpx
+from loguru import logger
+
+
+# Clé du registre : (origine "scheme://host:port", "h2" | "h1", proxy)
+ClientKey = Tuple[str, str, Optional[str]]
+
+
+@dataclass
+class HostPoolStats:
+    """Compteurs de connexions pour une clé (hôte, protocole, proxy)."""
+    requests: int = 0
+    new_connections: int = 0
+    tls_handshakes: int = 0
+    clients_created: int = 0
+    warmup_connections: int = 0
+    cold_requests: int = 0
+    warm_requests: int = 0
+    ttfb_cold_total: float = 0.0
+    ttfb_warm_total: float = 0.0
+
+    def record_ttfb(self, seconds: float, cold: bool) -> None:
+        if cold:
+            self.cold_requests += 1
+            self.ttfb_cold_total += seconds
+        else:
+            self.warm_requests += 1
+            self.ttfb_warm_total += seconds
+
+    @property
+    def ttfb_cold_ms(self) -> Optional[float]:
+        """TTFB moyen des requêtes qui ont dû ouvrir une connexion (ms)."""
+        if self.cold_requests > 0:
+            return self.ttfb_cold_total / self.cold_requests * 1000
+        return None
+
+    @property
+    def ttfb_warm_ms(self) -> Optional[float]:
+        """TTFB moyen des requêtes servies sur une connexion ouverte (ms)."""
+        if self.warm_requests > 0:
+            return self.ttfb_warm_total / self.warm_requests * 1000
+        return None
+
+    @property
+    def reused_connections(self) -> int:
+        """Requêtes servies sur une connexion déjà ouverte."""
+        return max(0, self.requests - self.new_connections)
+
+    @property
+    def reuse_rate(self) -> float:
+        """Taux de réutilisation des connexions (%)."""
+        if self.requests > 0:
+            return (self.reused_connections / self.requests) * 100
+        return 0.0
+
+    def to_dict(self) -> Dict:
+        return {
+            "requests": self.requests,
+            "new_connections": self.new_connections,
+            "reused_connections": self.reused_connections,
+            "tls_handshakes": self.tls_handshakes,
+            "clients_created": self.clients_created,
+            "reuse_rate": round(self.reuse_rate, 2),
+            "warmup_connections": self.warmup_connections,
+            "ttfb_cold_ms": round(self.ttfb_cold_ms, 1) if self.ttfb_cold_ms is not None else None,
+            "ttfb_warm_ms": round(self.ttfb_warm_ms, 1) if self.ttfb_warm_ms is not None else None,
+        }
+
+
+def origin_of(url: str) -> str:
+    """Retourne l'origine 'scheme://host[:port]' d'une URL."""
+    parsed = urlparse(url)
+    return f"{parsed.scheme}://{parsed.netloc}".lower()
+
+
+class HttpClientPool:
+    """
+    Registre thread-safe de clients httpx partagés.
+
+    httpx.Client est thread-safe : un même client (et son pool de connexions)
+    est partagé par tous les workers qui visent le même hôte.
+    """
+
+    def __init__(
+        self,
+        max_connections: int = 20,
+        max_keepalive_connections: int = 10,
+        keepalive_expiry: float = 30.0,
+        timeout: float = 30.0,
+    ):
+        """
+        Args:
+            max_connections: Connexions simultanées max par client (donc par hôte)
+            max_keepalive_connections: Connexions gardées ouvertes au repos
+            keepalive_expiry: Secondes avant fermeture d'une connexion inactive
+            timeout: Timeout par défaut (surchargeable par requête)
+        """
+        self.limits = httpx.Limits(
+            max_connections=max_connections,
+            max_keepalive_connections=max_keepalive_connections,
+            keepalive_expiry=keepalive_expiry,
+        )
+        self.timeout = timeout
+        self._clients: Dict[ClientKey, httpx.Client] = {}
+        self._stats: Dict[ClientKey, HostPoolStats] = {}
+        self._lock = threading.Lock()
+        self._http2_available: Optional[bool] = None
+
+    def _make_key(self, url: str, http2: bool, proxy: Optional[str]) -> ClientKey:
+        return (origin_of(url), "h2" if http2 else "h1", proxy)
+
+    def _new_client(self, http2: bool, proxy: Optional[str]) -> httpx.Client:
+        kwargs = {
+            "http2": http2,
+            "timeout": httpx.Timeout(self.timeout),
+            "limits": self.limits,
+            "follow_redirects": True,
+        }
+        if proxy:
+            kwargs["proxy"] = proxy
+        return httpx.Client(**kwargs)
+
+    def get_client(self, url: str, http2: bool = True, proxy: Optional[str] = None) -> httpx.Client:
+        """
+        Retourne le client partagé pour l'hôte de `url` (créé à la demande).
+
+        Si HTTP/2 est demandé mais que h2 n'est pas installé, retourne le
+        client HTTP/1.1 de l'hôte.
+        """
+        if http2 and self._http2_available is False:
+            http2 = False
+
+        key = self._make_key(url, http2, proxy)
+        with self._lock:
+            client = self._clients.get(key)
+            if client is not None:
+                return client
+
+            try:
+                client = self._new_client(http2, proxy)
+                if http2:
+                    self._http2_available = True
+            except ImportError:
+                # h2 absent : on mémorise et on bascule en HTTP/1.1
+                logger.info("HTTP/2 non supporté (h2 manquant). Rebasculement vers HTTP/1.1...")
+                self._http2_available = False
+                key = self._make_key(url, False, proxy)
+                client = self._clients.get(key)
+                if client is not None:
+                    return client
+                client = self._new_client(False, proxy)
+
+            self._clients[key] = client
+            self._stats.setdefault(key, HostPoolStats()).clients_created += 1
+            logger.debug(f"[POOL] Nouveau client {key[1]} pour {key[0]}")
+            return client
+
+    def _resolve_key(self, url: str, http2: bool, proxy: Optional[str]) -> ClientKey:
+        if http2 and self._http2_available is False:
+            http2 = False
+        return self._make_key(url, http2, proxy)
+
+    def _make_trace(self, key: ClientKey):
+        """
+        Callback httpcore (une par requête) qui compte les connexions réellement
+        ouvertes et mesure le TTFB : de l'envoi à la réception des en-têtes de
+        réponse, classé froid si la requête a dû ouvrir sa connexion.
+        """
+        started = time.perf_counter()
+        state = {"cold": False}
+
+        def trace(event_name: str, info: dict) -> None:
+            if event_name == "connection.connect_tcp.complete":
+                state["cold"] = True
+                with self._lock:
+                    self._stats.setdefault(key, HostPoolStats()).new_connections += 1
+            elif event_name == "connection.start_tls.complete":
+                with self._lock:
+                    self._stats.setdefault(key, HostPoolStats()).tls_handshakes += 1
+            elif event_name.endswith(".receive_response_headers.complete"):
+                ttfb = time.perf_counter() - started
+                with self._lock:
+                    self._stats.setdefault(key, HostPoolStats()).record_ttfb(ttfb, state["cold"])
+        return trace
+
+    def get(self, url: str, http2: bool = True, proxy: Optional[str] = None, **kwargs) -> httpx.Response:
+        """
+        GET via le client partagé de l'hôte.
+
+        Les en-têtes (User-Agent, Referer...) et le timeout se passent par
+        requête afin que le client reste partageable.
+        """
+        client = self.get_client(url, http2=http2, proxy=proxy)
+        key = self._resolve_key(url, http2, proxy)
+        with self._lock:
+            self._stats.setdefault(key, HostPoolStats()).requests += 1
+        extensions = dict(kwargs.pop("extensions", None) or {})
+        extensions.setdefault("trace", self._make_trace(key))
+        return client.get(url, extensions=extensions, **kwargs)
+
+    @contextmanager
+    def stream(self, url: str, http2: bool = True, proxy: Optional[str] = None, **kwargs):
+        """
+        GET en streaming via le client partagé (corps lu par morceaux).
+
+        Usage:
+            with pool.stream(url, headers=h, timeout=30) as r:
+                for chunk in r.iter_bytes():
+                    ...
+        """
+        client = self.get_client(url, http2=http2, proxy=proxy)
+        key = self._resolve_key(url, http2, proxy)
+        with self._lock:
+            self._stats.setdefault(key, HostPoolStats()).requests += 1
+        extensions = dict(kwargs.pop("extensions", None) or {})
+        extensions.setdefault("trace", self._make_trace(key))
+        with client.stream("GET", url, extensions=extensions, **kwargs) as response:
+            yield response
+
+    def warm_up(
+        self,
+        urls: Iterable[str],
+        connections: int = 2,
+        http2: bool = True,
+        proxy: Optional[str] = None,
+        timeout: float = 10.0,
+    ) -> Dict[str, Dict]:
+        """
+        Pré-chauffe les hôtes de `urls` : résolution DNS puis ouverture en
+        parallèle de `connections` connexions par hôte (une seule en HTTP/2,
+        multiplexée), laissées en keep-alive pour les téléchargements.
+
+        Une requête HEAD par connexion sur une URL de l'hôte suffit : le statut
+        importe peu, seule la connexion (TCP + TLS) compte.
+
+        Returns:
+            {origine: {"dns_ms", "connect_ms", "connections", "error"}}
+        """
+        samples: Dict[str, str] = {}
+        for url in urls:
+            samples.setdefault(origin_of(url), url)
+        if not samples:
+            return {}
+
+        def warm(origin: str, url: str) -> Dict:
+            report = {"dns_ms": None, "connect_ms": None, "connections": 0, "error": None}
+            parsed = urlparse(url)
+            started = time.perf_counter()
+            try:
+                # Amorce le cache du résolveur système avant les connexions
+                socket.getaddrinfo(parsed.hostname, parsed.port or (443 if parsed.scheme == "https" else 80), proto=socket.IPPROTO_TCP)
+                report["dns_ms"] = round((time.perf_counter() - started) * 1000, 1)
+            except OSError as e:
+                report["error"] = f"DNS : {e}"
+                return report
+
+            client = self.get_client(url, http2=http2, proxy=proxy)
+            key = self._resolve_key(url, http2, proxy)
+            # HTTP/2 (négocié en TLS uniquement) multiplexe tout sur une connexion
+            count = 1 if key[1] == "h2" and parsed.scheme == "https" else max(1, connections)
+
+            def open_one(_):
+                extensions = {"trace": self._make_warmup_trace(key)}
+                client.head(url, timeout=timeout, extensions=extensions)
+
+            started = time.perf_counter()
+            try:
+                with ThreadPoolExecutor(max_workers=count) as executor:
+                    list(executor.map(open_one, range(count)))
+                report["connections"] = count
+            except Exception as e:
+                report["error"] = str(e) or e.__class__.__name__
+            report["connect_ms"] = round((time.perf_counter() - started) * 1000, 1)
+            return report
+
+        with ThreadPoolExecutor(max_workers=min(16, len(samples))) as executor:
+            futures = {origin: executor.submit(warm, origin, url) for origin, url in samples.items()}
+            reports = {origin: future.result() for origin, future in futures.items()}
+
+        for origin, report in reports.items():
+            if report["error"]:
+                logger.warning(f"[POOL] Pré-chauffage {origin} échoué : {report['error']}")
+            else:
+                logger.debug(f"[POOL] {origin} pré-chauffé : DNS {report['dns_ms']} ms, {report['connections']} connexion(s) en {report['connect_ms']} ms")
+        return reports
+
+    def _make_warmup_trace(self, key: ClientKey):
+        """Callback httpcore du pré-chauffage : connexions comptées à part, pas de TTFB."""
+        def trace(event_name: str, info: dict) -> None:
+            if event_name == "connection.connect_tcp.complete":
+                with self._lock:
+                    self._stats.setdefault(key, HostPoolStats()).warmup_connections += 1
+        return trace
+
+    def get_ttfb_report(self) -> Dict[str, Dict]:
+        """
+        TTFB moyen froid/chaud par origine (tous protocoles confondus).
+
+        Returns:
+            {origine: {"cold_ms", "cold_requests", "warm_ms", "warm_requests"}}
+        """
+        merged: Dict[str, HostPoolStats] = {}
+        with self._lock:
+            for (origin, _, _), stats in self._stats.items():
+                total = merged.setdefault(origin, HostPoolStats())
+                total.cold_requests += stats.cold_requests
+                total.warm_requests += stats.warm_requests
+                total.ttfb_cold_total += stats.ttfb_cold_total
+                total.ttfb_warm_total += stats.ttfb_warm_total
+
+        report = {}
+        for origin, stats in merged.items():
+            if stats.cold_requests or stats.warm_requests:
+                report[origin] = {
+                    "cold_ms": round(stats.ttfb_cold_ms, 1) if stats.ttfb_cold_ms is not None else None,
+                    "cold_requests": stats.cold_requests,
+                    "warm_ms": round(stats.ttfb_warm_ms, 1) if stats.ttfb_warm_ms is not None else None,
+                    "warm_requests": stats.warm_requests,
+                }
+        return report
+
+    def invalidate(self, url: str, http2: bool = True, proxy: Optional[str] = None) -> None:
+        """Ferme et oublie le client d'un hôte (ex: pool de connexions corrompu)."""
+        key = self._resolve_key(url, http2, proxy)
+        with self._lock:
+            client = self._clients.pop(key, None)
+        if client is not None:
+            try:
+                client.close()
+            except Exception:
+                pass
+
+    def get_stats(self) -> Dict[str, Dict]:
+        """
+        Compteurs par clé, ex: {"https://cdn.example.com [h2]": {...}}.
+        """
+        with self._lock:
+            out = {}
+            for (origin, proto, proxy), stats in self._stats.items():
+                label = f"{origin} [{proto}]" + (f" via {proxy}" if proxy else "")
+                out[label] = stats.to_dict()
+            return out
+
+    def close_all(self) -> None:
+        """Ferme tous les clients du registre."""
+        with self._lock:
+            clients = list(self._clients.values())
+            self._clients.clear()
+        for client in clients:
+            try:
+                client.close()
+            except Exception:
+                pass
+        logger.info(f"[POOL] {len(clients)} client(s) HTTP fermé(s)")
+
+
+# Instance globale (singleton)
+_global_pool: Optional[HttpClientPool] = None
+_global_pool_lock = threading.Lock()
+
+
+def get_client_pool() -> HttpClientPool:
+    """
+    Retourne le registre global de clients HTTP.
+
+    Returns:
+        HttpClientPool: Instance singleton
+    """
+    global _global_pool
+    if _global_pool is None:
+        with _global_pool_lock:
+            if _global_pool is None:
+                _global_pool = HttpClientPool()
+    return _global_pool
+
+
+def reset_client_pool() -> None:
+    """Ferme tous les clients et repart d'un registre vide."""
+    global _global_pool
+    with _global_pool_lock:
+        if _global_pool is not None:
+            _global_pool.close_all()
+        _global_pool = HttpClientPool()
@@ -7,6 +7,8 @@ Collecte et analyse des métriques :
 - Vitesse de téléchargement
 - Taux de succès/échec
 - Nombre d'images traitées
+- Ratio hit/miss du cache disque des téléchargements
+- Transitions des circuit breakers par hôte
 - Utilisation CPU/Mémoire (optionnel)
 
 Auteur: PANELia Team
@@ -15,7 +17,6 @@ Date: 2025-12-08
 
 import time
 import json
-from pathlib import Path
 from typing import Dict, List, Optional, Any
 from dataclasses import dataclass, asdict
 from datetime import datetime
@@ -35,6 +36,8 @@ class ChapterMetrics:
     images_downloaded: int = 0
     images_processed: int = 0
     download_errors: int = 0
+    cache_hits: int = 0
+    cache_misses: int = 0
     total_bytes: int = 0
     success: bool = False
     error_message: Optional[str] = None
@@ -98,6 +101,11 @@ class MetricsCollector:
         self.total_chapters_succeeded = 0
         self.total_images_downloaded = 0
         self.total_bytes_downloaded = 0
+        self.cache_hits = 0
+        self.cache_misses = 0
+        self.cache_revalidated = 0
+        self.breaker_transitions: List[Dict[str, Any]] = []
+        self.breaker_short_circuits: Dict[str, int] = defaultdict(int)
 
         logger.info("MetricsCollector initialisé")
 
@@ -172,6 +180,63 @@ class MetricsCollector:
         else:
             metrics.download_errors += 1
 
+    def record_cache(
+        self,
+        chapter_num: Optional[float],
+        hit: bool,
+        revalidated: bool = False
+    ) -> None:
+        """
+        Enregistre une consultation du cache disque des téléchargements.
+
+        Args:
+            chapter_num: Numéro du chapitre (optionnel)
+            hit: True si le corps a été servi depuis le cache
+            revalidated: True si le hit a été confirmé par un 304
+        """
+        if hit:
+            self.cache_hits += 1
+            if revalidated:
+                self.cache_revalidated += 1
+        else:
+            self.cache_misses += 1
+
+        if chapter_num in self.chapters:
+            metrics = self.chapters[chapter_num]
+            if hit:
+                metrics.cache_hits += 1
+            else:
+                metrics.cache_misses += 1
+
+    def record_breaker_transition(self, host: str, old_state: str, new_state: str) -> None:
+        """
+        Enregistre un changement d'état du circuit breaker d'un hôte.
+
+        Args:
+            host: Hôte concerné
+            old_state: État quitté (CLOSED, OPEN, HALF_OPEN)
+            new_state: État atteint
+        """
+        self.breaker_transitions.append({
+            'host': host,
+            'from': old_state,
+            'to': new_state,
+            'time': datetime.now().isoformat()
+        })
+        logger.info(f"[METRICS] Breaker {host} : {old_state} -> {new_state}")
+
+    def record_short_circuit(self, host: str) -> None:
+        """Compte une requête non émise parce que le circuit de l'hôte est ouvert."""
+        self.breaker_short_circuits[host] += 1
+
+    @property
+    def cache_hit_ratio(self) -> float:
+        """Part des images servies par le cache (%)."""
+        lookups = self.cache_hits + self.cache_misses
+        if lookups > 0:
+            return (self.cache_hits / lookups) * 100
+        return 0.0
+
     def end_chapter(
         self,
         chapter_num: float,
@@ -273,6 +338,17 @@ class MetricsCollector:
                 'avg_speed_mbps': round(avg_speed_mbps, 2),
                 'total_scraping_time': round(total_duration, 2)
             },
+            'cache': {
+                'hits': self.cache_hits,
+                'misses': self.cache_misses,
+                'revalidated': self.cache_revalidated,
+                'hit_ratio': round(self.cache_hit_ratio, 2)
+            },
+            'circuit_breakers': {
+                'opened': sum(1 for t in self.breaker_transitions if t['to'] == 'OPEN'),
+                'short_circuited': dict(self.breaker_short_circuits),
+                'transitions': list(self.breaker_transitions)
+            },
             'chapter_details': chapter_metrics
         }
 
@@ -364,6 +440,17 @@ class MetricsCollector:
         print(f"  Vitesse moyenne: {stats['performance']['avg_speed_mbps']} MB/s")
         print(f"  Temps de scraping: {stats['performance']['total_scraping_time']}s")
 
+        print(f"\n💾 Cache:")
+        print(f"  Hits: {stats['cache']['hits']} (dont {stats['cache']['revalidated']} revalidés)")
+        print(f"  Misses: {stats['cache']['misses']}")
+        print(f"  Ratio: {stats['cache']['hit_ratio']}%")
+
+        if stats['circuit_breakers']['transitions']:
+            print(f"\n🔌 Circuit breakers:")
+            print(f"  Ouvertures: {stats['circuit_breakers']['opened']}")
+            for host, count in stats['circuit_breakers']['short_circuited'].items():
+                print(f"  {host}: {count} requête(s) évitée(s)")
+
         print("=" * 60 + "\n")
 
     def reset(self) -> None:
@@ -374,6 +461,11 @@ class MetricsCollector:
         self.total_chapters_succeeded = 0
         self.total_images_downloaded = 0
         self.total_bytes_downloaded = 0
+        self.cache_hits = 0
+        self.cache_misses = 0
+        self.cache_revalidated = 0
+        self.breaker_transitions.clear()
+        self.breaker_short_circuits.clear()
         logger.info("[METRICS] Métriques réinitialisées")
 
 
@@ -0,0 +1,233 @@
+# ratelimit.py
+"""
+Limiteur de débit adaptatif par domaine (token bucket + AIMD)
+
+Remplace les pauses aléatoires fixes (80-150 ms avant chaque chapitre,
+0.5-1.5 s après chaque navigation Selenium) :
+- Un seau de jetons par domaine, partagé par les téléchargements HTTP
+  et les navigations Selenium
+- AIMD : le débit monte doucement tant que les réponses sont saines
+  (additive increase), est divisé sur 429/503 (multiplicative decrease)
+- Retry-After respecté : le domaine est gelé jusqu'à l'échéance
+- Débits courants exposés par domaine (get_rates) pour comprendre un lot lent
+
+Usage:
+    limiter = get_rate_limiter()
+    limiter.acquire(url)                       # bloque le temps nécessaire
+    r = client.get(url)
+    limiter.record_response(url, r.status_code, r.headers.get("Retry-After"))
+
+Auteur: PANELia Team
+Date: 2025-12-16
+"""
+
+import asyncio
+import threading
+import time
+from dataclasses import dataclass
+from datetime import datetime, timezone
+from email.utils import parsedate_to_datetime
+from typing import Dict, Optional
+from urllib.parse import urlparse
+
+from loguru import logger
+
+
+# Codes qui signalent une surcharge côté serveur
+THROTTLE_STATUSES = {429, 503}
+
+
+def domain_of(url_or_domain: str) -> str:
+    """Retourne le nom d'hôte d'une URL (ou le domaine tel quel)."""
+    if "://" in url_or_domain:
+        return (urlparse(url_or_domain).hostname or url_or_domain).lower()
+    return url_or_domain.lower()
+
+
+def parse_retry_after(value: Optional[str]) -> Optional[float]:
+    """
+    Convertit un en-tête Retry-After (secondes ou date HTTP) en secondes.
+
+    Returns:
+        Secondes d'attente (>= 0) ou None si absent/illisible
+    """
+    if not value:
+        return None
+    value = value.strip()
+    if value.isdigit():
+        return float(value)
+    try:
+        when = parsedate_to_datetime(value)
+    except (TypeError, ValueError):
+        return None
+    if when.tzinfo is None:
+        when = when.replace(tzinfo=timezone.utc)
+    return max(0.0, (when - datetime.now(timezone.utc)).total_seconds())
+
+
+@dataclass
+class DomainBucket:
+    """État du seau de jetons d'un domaine."""
+    rate: float
+    tokens: float
+    last_refill: float
+    blocked_until: float = 0.0
+    healthy: int = 0
+    throttled: int = 0
+
+
+class AdaptiveRateLimiter:
+    """
+    Token bucket par domaine avec ajustement AIMD, thread-safe.
+
+    Les réservations sont équitables : un appelant qui trouve le seau vide
+    prend un jeton "à crédit" et attend exactement le temps de le rembourser,
+    ce qui ordonne les appels concurrents sans famine.
+    """
+
+    def __init__(
+        self,
+        initial_rate: float = 8.0,
+        min_rate: float = 0.2,
+        max_rate: float = 100.0,
+        increase_step: float = 1.0,
+        decrease_factor: float = 0.5,
+    ):
+        """
+        Args:
+            initial_rate: Requêtes/s de départ pour un domaine inconnu
+            min_rate: Plancher (requêtes/s)
+            max_rate: Plafond (requêtes/s)
+            increase_step: Gain en requêtes/s par seconde de réponses saines
+            decrease_factor: Facteur appliqué au débit sur 429/503
+        """
+        self.initial_rate = initial_rate
+        self.min_rate = min_rate
+        self.max_rate = max_rate
+        self.increase_step = increase_step
+        self.decrease_factor = decrease_factor
+        self._buckets: Dict[str, DomainBucket] = {}
+        self._lock = threading.Lock()
+
+    def _bucket_locked(self, domain: str, now: float) -> DomainBucket:
+        bucket = self._buckets.get(domain)
+        if bucket is None:
+            bucket = DomainBucket(rate=self.initial_rate, tokens=1.0, last_refill=now)
+            self._buckets[domain] = bucket
+        return bucket
+
+    def set_rate(self, url_or_domain: str, rate: float) -> None:
+        """Fixe le débit courant d'un domaine (ex: valeur connue d'un run précédent)."""
+        domain = domain_of(url_or_domain)
+        with self._lock:
+            bucket = self._bucket_locked(domain, time.monotonic())
+            bucket.rate = min(self.max_rate, max(self.min_rate, rate))
+
+    def reserve(self, url_or_domain: str) -> float:
+        """
+        Prend un jeton et retourne le délai (s) à attendre avant d'émettre.
+        Ne bloque pas : acquire / acquire_async font l'attente.
+        """
+        domain = domain_of(url_or_domain)
+        now = time.monotonic()
+        with self._lock:
+            bucket = self._bucket_locked(domain, now)
+            # Rafale max = une seconde de débit (au moins un jeton)
+            burst = max(1.0, bucket.rate)
+            start = max(now, bucket.blocked_until)
+            if start > bucket.last_refill:
+                bucket.tokens = min(burst, bucket.tokens + (start - bucket.last_refill) * bucket.rate)
+                bucket.last_refill = start
+            bucket.tokens -= 1.0
+            deficit = -bucket.tokens / bucket.rate if bucket.tokens < 0 else 0.0
+            return (start - now) + deficit
+
+    def acquire(self, url_or_domain: str) -> float:
+        """Attend (time.sleep) le passage autorisé. Retourne le temps attendu."""
+        delay = self.reserve(url_or_domain)
+        if delay > 0:
+            time.sleep(delay)
+        return delay
+
+    async def acquire_async(self, url_or_domain: str) -> float:
+        """Comme acquire, sans bloquer la boucle asyncio."""
+        delay = self.reserve(url_or_domain)
+        if delay > 0:
+            await asyncio.sleep(delay)
+        return delay
+
+    def record_response(self, url_or_domain: str, status_code: int, retry_after: Optional[str] = None) -> None:
+        """
+        Ajuste le débit d'après une réponse HTTP.
+
+        Args:
+            status_code: Code HTTP reçu
+            retry_after: Valeur brute de l'en-tête Retry-After (optionnelle)
+        """
+        domain = domain_of(url_or_domain)
+        now = time.monotonic()
+        with self._lock:
+            bucket = self._bucket_locked(domain, now)
+
+            if status_code in THROTTLE_STATUSES:
+                old_rate = bucket.rate
+                bucket.rate = max(self.min_rate, bucket.rate * self.decrease_factor)
+                bucket.tokens = min(bucket.tokens, 0.0)
+                bucket.throttled += 1
+                wait = parse_retry_after(retry_after)
+                if wait:
+                    bucket.blocked_until = max(bucket.blocked_until, now + wait)
+                logger.warning(
+                    f"[RATE] {domain} : {status_code} -> débit {old_rate:.2f} -> {bucket.rate:.2f} req/s"
+                    + (f", pause {wait:.0f}s (Retry-After)" if wait else "")
+                )
+            elif status_code < 500:
+                # Réponse saine (y compris 404 : le serveur répond normalement)
+                bucket.rate = min(self.max_rate, bucket.rate + self.increase_step / bucket.rate)
+                bucket.healthy += 1
+
+    def get_rates(self) -> Dict[str, Dict]:
+        """Débit courant et compteurs par domaine."""
+        now = time.monotonic()
+        with self._lock:
+            return {
+                domain: {
+                    "rate": round(b.rate, 2),
+                    "blocked_for": round(max(0.0, b.blocked_until - now), 1),
+                    "healthy": b.healthy,
+                    "throttled": b.throttled,
+                }
+                for domain, b in self._buckets.items()
+            }
+
+
+# Instance globale (singleton)
+_global_limiter: Optional[AdaptiveRateLimiter] = None
+_global_limiter_lock = threading.Lock()
+
+
+def get_rate_limiter() -> AdaptiveRateLimiter:
+    """
+    Retourne le limiteur global (partagé HTTP + Selenium).
+
+    Returns:
+        AdaptiveRateLimiter: Instance singleton
+    """
+    global _global_limiter
+    if _global_limiter is None:
+        with _global_limiter_lock:
+            if _global_limiter is None:
+                _global_limiter = AdaptiveRateLimiter()
+    return _global_limiter
+
+
+def reset_rate_limiter(**settings) -> None:
+    """
+    Oublie tous les débits appris.
+
+    Args:
+        **settings: Paramètres du nouveau limiteur (initial_rate, max_rate...)
+    """
+    global _global_limiter
+    with _global_limiter_lock:
+        _global_limiter = AdaptiveRateLimiter(**settings)
@@ -0,0 +1,151 @@
+# retry.py
+"""
+Politique de retry des téléchargements PANELia
+
+Avant : 8 tentatives avec time.sleep(2**attempt), jusqu'à 128 s sur la
+dernière attente (plus de 4 minutes de thread bloqué par URL morte), et un
+404 retenté exactement comme un timeout.
+
+Maintenant :
+- Classification : codes HTTP et exceptions retentables ou définitifs
+  (404/403/410 abandonnés immédiatement ; timeout, coupure, 429, 5xx retentés)
+- Backoff exponentiel plafonné avec jitter complet, Retry-After respecté
+- Échéances murales par image et par chapitre (Deadline)
+- La politique calcule le délai, elle ne dort pas : l'appelant choisit
+  (time.sleep, asyncio.sleep ou file de minuteries de stream_download_images)
+
+Usage:
+    policy = RetryPolicy(max_attempts=8, max_delay=20)
+    deadline = policy.image_deadline_within(chapter_deadline)
+    delay = policy.next_delay(attempt, exc, deadline)
+    if delay is None:
+        ...  # abandon définitif
+
+Auteur: PANELia Team
+Date: 2025-12-16
+"""
+
+import random
+import time
+from dataclasses import dataclass
+from typing import Optional
+
+import httpx
+
+from panelia.utils.ratelimit import parse_retry_after
+
+
+# Codes HTTP qui valent une nouvelle tentative (surcharge ou panne passagère)
+RETRYABLE_STATUSES = {408, 425, 429, 500, 502, 503, 504}
+
+# Exceptions réseau transitoires (le serveur n'a pas donné de réponse définitive)
+RETRYABLE_EXCEPTIONS = (
+    httpx.TimeoutException,
+    httpx.NetworkError,
+    httpx.RemoteProtocolError,
+)
+
+
+class TransientDownloadError(Exception):
+    """Erreur de téléchargement passagère définie par PANELia (toujours retentée)."""
+    pass
+
+
+def is_host_failure(exc: BaseException) -> bool:
+    """
+    True si l'erreur accuse l'hôte (pas de réponse, coupure, 5xx) et doit
+    compter pour son circuit breaker. Un 404 ou un 429 prouvent au contraire
+    que l'hôte répond.
+    """
+    if isinstance(exc, httpx.HTTPStatusError):
+        return exc.response.status_code >= 500
+    return isinstance(exc, RETRYABLE_EXCEPTIONS + (TransientDownloadError,))
+
+
+class Deadline:
+    """Échéance murale (time.monotonic), éventuellement bornée par une échéance parente."""
+
+    def __init__(self, seconds: Optional[float], parent: Optional["Deadline"] = None):
+        """
+        Args:
+            seconds: Budget en secondes (None = illimité)
+            parent: Échéance englobante (ex: celle du chapitre)
+        """
+        self.expires_at = time.monotonic() + seconds if seconds is not None else None
+        self.parent = parent
+
+    def remaining(self) -> float:
+        """Secondes restantes (inf si illimité, jamais négatif)."""
+        own = self.expires_at - time.monotonic() if self.expires_at is not None else float("inf")
+        if self.parent is not None:
+            own = min(own, self.parent.remaining())
+        return max(0.0, own)
+
+    @property
+    def expired(self) -> bool:
+        return self.remaining() <= 0
+
+    def clip_timeout(self, timeout: float) -> float:
+        """Timeout de requête ramené au budget restant (au moins 1 s)."""
+        return max(1.0, min(timeout, self.remaining()))
+
+
+@dataclass
+class RetryPolicy:
+    """
+    Décide si et quand retenter un téléchargement.
+
+    Attributes:
+        max_attempts: Tentatives max par image (première incluse)
+        base_delay: Délai de base du backoff exponentiel (s)
+        max_delay: Plafond d'un délai entre deux tentatives (s)
+        image_deadline: Budget mural par image, toutes tentatives comprises (s)
+        chapter_deadline: Budget mural par chapitre (s)
+    """
+    max_attempts: int = 8
+    base_delay: float = 0.5
+    max_delay: float = 20.0
+    image_deadline: Optional[float] = 120.0
+    chapter_deadline: Optional[float] = 900.0
+
+    def is_retryable(self, exc: BaseException) -> bool:
+        """True si l'erreur est passagère et mérite une nouvelle tentative."""
+        if isinstance(exc, httpx.HTTPStatusError):
+            return exc.response.status_code in RETRYABLE_STATUSES
+        return isinstance(exc, RETRYABLE_EXCEPTIONS + (TransientDownloadError,))
+
+    def backoff(self, attempt: int, retry_after: Optional[float] = None) -> float:
+        """
+        Délai avant la tentative suivante (attempt = index de la tentative échouée).
+        Jitter complet : uniforme entre 0 et le plafond exponentiel, pour que
+        les images d'un même chapitre ne reviennent pas toutes ensemble.
+        """
+        ceiling = min(self.max_delay, self.base_delay * (2 ** attempt))
+        delay = random.uniform(0, ceiling)
+        if retry_after is not None:
+            delay = max(delay, retry_after)
+        return delay
+
+    def next_delay(self, attempt: int, exc: BaseException, deadline: Optional[Deadline] = None) -> Optional[float]:
+        """
+        Délai avant la prochaine tentative, ou None s'il faut abandonner
+        (erreur définitive, tentatives épuisées, ou échéance dépassée).
+        """
+        if not self.is_retryable(exc) or attempt + 1 >= self.max_attempts:
+            return None
+        retry_after = None
+        if isinstance(exc, httpx.HTTPStatusError):
+            retry_after = parse_retry_after(exc.response.headers.get("Retry-After"))
+        delay = self.backoff(attempt, retry_after)
+        if deadline is not None and delay >= deadline.remaining():
+            return None
+        return delay
+
+    def new_chapter_deadline(self) -> Deadline:
+        return Deadline(self.chapter_deadline)
+
+    def image_deadline_within(self, chapter_deadline: Optional[Deadline] = None) -> Deadline:
+        return Deadline(self.image_deadline, parent=chapter_deadline)
+
+
+DEFAULT_RETRY_POLICY = RetryPolicy()
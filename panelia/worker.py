@@ -0,0 +1,117 @@
+# worker.py
+"""
+Worker de file partagée PANELia (python -m panelia.worker)
+
+Avant : chaque machine traitait ses propres séries (app.py ou CLI) ; pas de
+répartition, et un crash perdait les chapitres en cours.
+
+Maintenant :
+- Un nœud lance un worker sur la file partagée (core/workqueue.py) : il
+  baille des chapitres, les traite avec son ScraperEngine local et
+  acquitte chacun dès sa fin
+- Plusieurs workers (mêmes ou différentes machines) se répartissent la file ;
+  un worker planté perd ses baux, les chapitres reviennent aux autres
+- Résultats, métriques et signes de vie des workers dans la file :
+  --status les affiche (JSON) depuis n'importe quelle machine
+- SIGINT / SIGTERM : le lot en cours est annulé, ses chapitres rendus à la file
+
+Usage:
+    python -m panelia URL1 URL2 --queue sqlite:///srv/panelia/queue.db
+    python -m panelia.worker --queue sqlite:///srv/panelia/queue.db --drivers 3
+    python -m panelia.worker --queue sqlite:///srv/panelia/queue.db --status
+
+Auteur: PANELia Team
+Date: 2025-12-18
+"""
+
+import argparse
+import json
+import sys
+from typing import List, Optional
+
+from panelia.cli import (
+    EXIT_CANCELLED,
+    EXIT_OK,
+    EXIT_USAGE,
+    add_engine_arguments,
+    cancel_on_signals,
+    configure_logging,
+    make_engine,
+    restore_signals,
+)
+from panelia.core.driver_manager import get_driver_manager
+from panelia.core.workqueue import QueueWorker, open_work_queue
+from panelia.utils.cancellation import CancellationToken
+from panelia.utils.validation import ValidationError
+
+
+def build_parser() -> argparse.ArgumentParser:
+    parser = argparse.ArgumentParser(
+        prog="python -m panelia.worker",
+        description="Traite les chapitres d'une file partagée (voir python -m panelia --queue).",
+    )
+    parser.add_argument("--queue", required=True, help="File partagée (sqlite:///chemin.db)")
+    parser.add_argument("--status", action="store_true", help="Affiche l'état de la file (JSON) et quitte")
+    parser.add_argument("--results", metavar="SERIE", nargs="?", const="", help="Avec --status : ajoute les résultats (d'une série)")
+    parser.add_argument("--worker-id", help="Identifiant dans la file (défaut : hôte-pid)")
+    parser.add_argument("--batch-size", type=int, help="Chapitres baillés à la fois (défaut : drivers + prefetch)")
+    parser.add_argument("--visibility-timeout", type=float, default=300, help="Durée d'un bail non prolongé (s)")
+    parser.add_argument("--max-attempts", type=int, default=3, help="Tentatives par chapitre avant abandon")
+    parser.add_argument("--max-idle", type=float, help="Quitte après N secondes de file vide (défaut : attend)")
+    parser.add_argument("--poll-interval", type=float, default=5, help="Attente entre deux consultations d'une file vide (s)")
+    add_engine_arguments(parser)
+    parser.add_argument("--log-level", default="INFO", help="Niveau des logs sur stderr")
+    parser.add_argument("--log-file", help="Fichier de logs supplémentaire (rotation 10 MB)")
+    return parser
+
+
+def main(argv: Optional[List[str]] = None) -> int:
+    parser = build_parser()
+    args = parser.parse_args(argv)
+    configure_logging(args)
+
+    try:
+        queue = open_work_queue(args.queue, visibility_timeout=args.visibility_timeout, max_attempts=args.max_attempts)
+    except ValueError as e:
+        parser.print_usage(sys.stderr)
+        print(f"{parser.prog}: erreur : {e}", file=sys.stderr)
+        return EXIT_USAGE
+
+    if args.status:
+        status = queue.get_stats()
+        if args.results is not None:
+            status["results"] = queue.results(args.results or None)
+        print(json.dumps(status, ensure_ascii=False, indent=2, default=str))
+        queue.close()
+        return EXIT_OK
+
+    try:
+        engine = make_engine(args)
+    except ValidationError as e:
+        parser.print_usage(sys.stderr)
+        print(f"{parser.prog}: erreur : {e}", file=sys.stderr)
+        queue.close()
+        return EXIT_USAGE
+
+    token = CancellationToken()
+    previous = cancel_on_signals(token)
+    worker = QueueWorker(
+        engine,
+        queue,
+        worker_id=args.worker_id,
+        batch_size=args.batch_size,
+        poll_interval=args.poll_interval,
+        cancel_token=token,
+    )
+    try:
+        worker.run(max_idle=args.max_idle)
+    finally:
+        restore_signals(previous)
+        engine.shutdown()
+        get_driver_manager().close_all()
+        queue.close()
+    return EXIT_CANCELLED if token.cancelled else EXIT_OK
+
+
+if __name__ == "__main__":
+    raise SystemExit(main())
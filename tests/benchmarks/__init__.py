@@ -0,0 +1 @@
+# Benchmarks (hors pytest : lancer les scripts bench_*.py directement)
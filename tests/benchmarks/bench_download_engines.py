@@ -0,0 +1,63 @@
+# bench_download_engines.py
+"""
+Banc d'essai : moteur threadé (stream_download_images) vs moteur asyncio
+(stream_download_images_async) sur un CDN local.
+
+Usage:
+    python -m tests.benchmarks.bench_download_engines --images 400 --latency 0.1
+"""
+
+import argparse
+import json
+import time
+
+from loguru import logger
+
+from panelia.utils.http import stream_download_images
+from panelia.utils.async_http import stream_download_images_async
+from panelia.utils.ratelimit import reset_rate_limiter
+from tests.benchmarks.local_cdn import LocalCDN
+
+
+def run_engine(name, download_images, urls, max_workers):
+    start = time.perf_counter()
+    count, total_bytes = 0, 0
+    for img_bytes in download_images(urls, max_workers=max_workers):
+        count += 1
+        total_bytes += len(img_bytes)
+    elapsed = time.perf_counter() - start
+    return {
+        "engine": name,
+        "images": count,
+        "seconds": round(elapsed, 3),
+        "images_per_s": round(count / elapsed, 1) if elapsed > 0 else 0.0,
+        "mb_per_s": round(total_bytes / 1024 / 1024 / elapsed, 2) if elapsed > 0 else 0.0,
+    }
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--images", type=int, default=400)
+    parser.add_argument("--latency", type=float, default=0.1, help="Latence serveur par image (s)")
+    parser.add_argument("--size", type=int, default=200_000, help="Taille d'une image (octets)")
+    parser.add_argument("--threaded-workers", type=int, default=4)
+    parser.add_argument("--async-in-flight", type=int, default=64)
+    args = parser.parse_args()
+
+    # Les logs par image faussent la mesure
+    logger.remove()
+    # On mesure les moteurs, pas la politesse envers le CDN local
+    reset_rate_limiter(initial_rate=100_000, max_rate=100_000)
+
+    with LocalCDN(latency=args.latency, image_size=args.size) as cdn:
+        urls = cdn.urls(args.images)
+        results = [
+            run_engine("threaded", stream_download_images, urls, args.threaded_workers),
+            run_engine("async", stream_download_images_async, urls, args.async_in_flight),
+        ]
+
+    print(json.dumps(results, indent=2))
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,111 @@
+# bench_processing.py
+"""
+Banc d'essai : découpage + encodage JPEG, threads contre processus.
+
+Mêmes bandes synthétiques traitées par les deux chemins du moteur :
+"thread" (slice_panels_precision + save_panel dans un pool de threads) et
+"process" (ProcessImageWorkers : mémoire partagée, processus pré-chauffés,
+renommage des planches dans l'ordre). Le temps de pré-chauffage est mesuré
+à part : il est payé une fois par moteur, pas par chapitre.
+
+Sortie JSON : images/s, planches/s et CPU consommé (en % d'un cœur) par
+chemin. Sur une machine multi-cœurs le chemin processus doit dépasser 100 %.
+
+Usage:
+    python -m tests.benchmarks.bench_processing --images 48 --workers 8
+"""
+
+import argparse
+import json
+import os
+import tempfile
+import time
+from concurrent.futures import ThreadPoolExecutor
+from pathlib import Path
+
+from loguru import logger
+
+from panelia.core.engine import panel_filename, save_panel
+from panelia.core.process_pool import ProcessImageWorkers
+from panelia.scrapers.factory import slice_panels_precision
+from tests.benchmarks.local_cdn import synthetic_strip
+
+
+def cpu_seconds():
+    """CPU de ce processus (user + sys)."""
+    t = os.times()
+    return t.user + t.system
+
+
+def run_threads(strips, out_dir, workers, quality):
+    def work(data):
+        return [save_panel(panel, out_dir / f"{id(panel)}.jpg", quality) for panel in slice_panels_precision(data)]
+
+    with ThreadPoolExecutor(max_workers=workers) as executor:
+        return sum(sum(saved) for saved in executor.map(work, strips))
+
+
+def run_processes(pool, strips, out_dir, quality):
+    futures = [pool.submit_image(data, out_dir, quality) for data in strips]
+    panels = 0
+    for future in futures:
+        for info in future.result():
+            panels += 1
+            info.commit(out_dir / panel_filename(1.0, panels))
+    return panels
+
+
+def measure(name, run, images, warmup_s=0.0, worker_cpu=lambda: 0.0):
+    """worker_cpu() : CPU cumulé des processus de travail (non compté par os.times avant leur fin)."""
+    cpu_start, worker_start, start = cpu_seconds(), worker_cpu(), time.perf_counter()
+    panels = run()
+    elapsed = time.perf_counter() - start
+    cpu = cpu_seconds() - cpu_start + worker_cpu() - worker_start
+    return {
+        "path": name,
+        "images": images,
+        "panels": panels,
+        "seconds": round(elapsed, 3),
+        "images_per_s": round(images / elapsed, 2),
+        "panels_per_s": round(panels / elapsed, 2),
+        "cpu_percent": round(cpu / elapsed * 100),
+        "warmup_s": round(warmup_s, 3),
+    }
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--images", type=int, default=32)
+    parser.add_argument("--workers", type=int, default=os.cpu_count() or 1)
+    parser.add_argument("--quality", type=int, default=92)
+    args = parser.parse_args()
+
+    logger.remove()
+    strips = [synthetic_strip(seed=i) for i in range(args.images)]
+    results = []
+
+    with tempfile.TemporaryDirectory(prefix="panelia_bench_") as tmp:
+        thread_dir = Path(tmp) / "thread"
+        thread_dir.mkdir()
+        results.append(measure("thread", lambda: run_threads(strips, thread_dir, args.workers, args.quality), args.images))
+
+        start = time.perf_counter()
+        pool = ProcessImageWorkers(workers=args.workers)
+        pool.warm_up()
+        warmup_s = time.perf_counter() - start
+        process_dir = Path(tmp) / "process"
+        process_dir.mkdir()
+        try:
+            results.append(measure(
+                "process", lambda: run_processes(pool, strips, process_dir, args.quality), args.images,
+                warmup_s, worker_cpu=lambda: pool.get_stats()["cpu_s"]
+            ))
+        finally:
+            pool.shutdown()
+
+    thread, process = results
+    print(json.dumps({"workers": args.workers, "results": results, "speedup": round(process["images_per_s"] / thread["images_per_s"], 2)}, indent=2))
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,166 @@
+# bench_throughput.py
+"""
+Banc de débit hors ligne : moteurs de téléchargement et ScraperEngine complet
+face au CDN local, dans plusieurs conditions réseau.
+
+Scénarios (voir SCENARIOS) : réseau propre, erreurs 503, rafales de 429,
+lien lent. Cibles : stream_download_images (threadé), stream_download_images_async,
+et ScraperEngine (téléchargement + découpage + sauvegarde d'un chapitre).
+
+Sortie JSON par (scénario, cible) : images/s, MB/s, latence par image
+p50/p95/p99 (vue du serveur, retries compris) et compteurs du CDN.
+Avec --baseline, compare à un résultat précédent et échoue (code 1) si une
+cible perd plus de --max-regression de son débit.
+
+Usage:
+    python -m tests.benchmarks.bench_throughput --out bench.json
+    python -m tests.benchmarks.bench_throughput --baseline bench.json
+    python -m tests.benchmarks.bench_throughput --replay tests/fixtures/recorded
+"""
+
+import argparse
+import json
+import sys
+import tempfile
+import time
+
+from loguru import logger
+
+from panelia.core.engine import ScraperEngine
+from panelia.utils.async_http import stream_download_images_async
+from panelia.utils.errors import reset_error_handler
+from panelia.utils.http import stream_download_images
+from panelia.utils.http_pool import reset_client_pool
+from panelia.utils.ratelimit import reset_rate_limiter
+from tests.benchmarks.local_cdn import LocalCDN, ResponseArchive
+
+# Conditions du CDN local par scénario (paramètres de LocalCDN)
+SCENARIOS = {
+    "clean": {"latency": 0.03},
+    "lossy": {"latency": 0.03, "error_rate": 0.05},
+    "throttled": {"latency": 0.03, "rate_limit_every": 40, "rate_limit_burst": 8},
+    "slow-link": {"latency": 0.05, "bandwidth": 2 * 1024 * 1024},
+}
+
+TARGETS = ("threaded", "async", "engine")
+
+
+def percentile(values, q):
+    """Percentile q (0-100) par interpolation linéaire."""
+    if not values:
+        return 0.0
+    ordered = sorted(values)
+    pos = (len(ordered) - 1) * q / 100
+    low = int(pos)
+    high = min(low + 1, len(ordered) - 1)
+    return ordered[low] + (ordered[high] - ordered[low]) * (pos - low)
+
+
+def consume(source):
+    """Taille d'une image rendue par un moteur (bytes, fichier spoolé)."""
+    if isinstance(source, (bytes, bytearray)):
+        return len(source)
+    source.seek(0, 2)
+    size = source.tell()
+    source.close()
+    return size
+
+
+def run_stream(target, urls, workers):
+    download_images = stream_download_images if target == "threaded" else stream_download_images_async
+    count = 0
+    for source in download_images(urls, max_workers=workers, ordered=True):
+        consume(source)
+        count += 1
+    return count
+
+
+def run_engine(urls, workers):
+    with tempfile.TemporaryDirectory(prefix="panelia_bench_") as work_dir:
+        engine = ScraperEngine(work_dir=work_dir, num_drivers=1, image_workers_per_chap=workers, warm_connections=False)
+        params = {"final_manhwa_name": "bench", "timeout_value": 30, "quality_value": 85}
+        result = engine._process_single_chapter(
+            1.0, "https://bench.local/chapter-1", None, params,
+            image_urls_provider=lambda: (urls, None)
+        )
+        engine.shutdown()
+    return result["downloaded_count"]
+
+
+def run_target(cdn, target, urls, workers):
+    reset_client_pool()
+    reset_error_handler()
+    # On mesure les moteurs : le limiteur part haut et ne s'adapte qu'aux 429 du CDN
+    reset_rate_limiter(initial_rate=100_000, max_rate=100_000)
+    cdn.reset_measurements()
+
+    start = time.perf_counter()
+    count = run_engine(urls, workers) if target == "engine" else run_stream(target, urls, workers)
+    elapsed = time.perf_counter() - start
+
+    stats = cdn.get_stats()
+    latencies = cdn.server_latencies()
+    return {
+        "target": target,
+        "images": count,
+        "seconds": round(elapsed, 3),
+        "images_per_s": round(count / elapsed, 2) if elapsed > 0 else 0.0,
+        "mb_per_s": round(stats["bytes"] / 1024 / 1024 / elapsed, 2) if elapsed > 0 else 0.0,
+        "latency_ms": {f"p{q}": round(percentile(latencies, q) * 1000, 1) for q in (50, 95, 99)},
+        "server": stats,
+    }
+
+
+def compare(results, baseline_path, max_regression):
+    """Affiche l'écart de débit avec la référence ; True si aucune régression."""
+    with open(baseline_path, encoding="utf-8") as f:
+        baseline = {(r["scenario"], r["target"]): r for r in json.load(f)}
+    ok = True
+    for r in results:
+        ref = baseline.get((r["scenario"], r["target"]))
+        if not ref or not ref["images_per_s"]:
+            continue
+        ratio = r["images_per_s"] / ref["images_per_s"]
+        regressed = ratio < 1 - max_regression
+        ok = ok and not regressed
+        flag = "RÉGRESSION" if regressed else "ok"
+        print(f"{r['scenario']:>10} {r['target']:>8} : {ref['images_per_s']:.1f} -> {r['images_per_s']:.1f} img/s ({ratio:.0%}) {flag}", file=sys.stderr)
+    return ok
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--images", type=int, default=120)
+    parser.add_argument("--workers", type=int, default=8)
+    parser.add_argument("--scenarios", default=",".join(SCENARIOS), help="Scénarios séparés par des virgules")
+    parser.add_argument("--targets", default=",".join(TARGETS), help="Cibles séparées par des virgules")
+    parser.add_argument("--replay", help="Dossier d'archive (ResponseArchive) à rejouer au lieu des bandes synthétiques")
+    parser.add_argument("--seed", type=int, default=0)
+    parser.add_argument("--out", help="Écrit les résultats JSON dans ce fichier")
+    parser.add_argument("--baseline", help="Résultats JSON de référence à comparer")
+    parser.add_argument("--max-regression", type=float, default=0.2, help="Perte de débit tolérée (0.2 = 20 %%)")
+    args = parser.parse_args()
+
+    # Les logs par image faussent la mesure
+    logger.remove()
+    archive = ResponseArchive.load(args.replay) if args.replay else None
+
+    results = []
+    for scenario in args.scenarios.split(","):
+        cdn_settings = dict(SCENARIOS[scenario], seed=args.seed)
+        with LocalCDN(images="strip", archive=archive, **cdn_settings) as cdn:
+            urls = cdn.urls(args.images)
+            for target in args.targets.split(","):
+                results.append(dict(scenario=scenario, **run_target(cdn, target, urls, args.workers)))
+
+    output = json.dumps(results, indent=2)
+    print(output)
+    if args.out:
+        with open(args.out, "w", encoding="utf-8") as f:
+            f.write(output)
+    if args.baseline and not compare(results, args.baseline, args.max_regression):
+        sys.exit(1)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,77 @@
+# bench_warmup.py
+"""
+Banc d'essai : TTFB par hôte avec et sans pré-chauffage des connexions.
+
+Deux passes sur un CDN local dont chaque nouvelle connexion coûte
+`--connect-delay` secondes : "cold" (le chapitre ouvre ses connexions au fil
+des téléchargements) puis "warm" (HttpClientPool.warm_up avant le chapitre).
+
+Usage:
+    python -m tests.benchmarks.bench_warmup --images 40 --connect-delay 0.15
+"""
+
+import argparse
+import json
+import time
+
+from loguru import logger
+
+from panelia.utils.http import stream_download_images
+from panelia.utils.http_pool import get_client_pool, origin_of, reset_client_pool
+from panelia.utils.ratelimit import reset_rate_limiter
+from tests.benchmarks.local_cdn import LocalCDN
+
+
+def run_pass(name, urls, max_workers, warm):
+    reset_client_pool()
+    pool = get_client_pool()
+    warmup_s = 0.0
+    if warm:
+        start = time.perf_counter()
+        pool.warm_up(urls, connections=max_workers)
+        warmup_s = time.perf_counter() - start
+
+    start = time.perf_counter()
+    first_image_s = None
+    count = 0
+    for _ in stream_download_images(urls, max_workers=max_workers, ordered=True):
+        if first_image_s is None:
+            first_image_s = time.perf_counter() - start
+        count += 1
+    elapsed = time.perf_counter() - start
+
+    host = origin_of(urls[0])
+    return {
+        "pass": name,
+        "images": count,
+        "warmup_s": round(warmup_s, 3),
+        "first_image_s": round(first_image_s or 0.0, 3),
+        "download_s": round(elapsed, 3),
+        "ttfb": pool.get_ttfb_report().get(host, {}),
+    }
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--images", type=int, default=40)
+    parser.add_argument("--latency", type=float, default=0.02, help="Latence serveur par image (s)")
+    parser.add_argument("--connect-delay", type=float, default=0.15, help="Coût d'une nouvelle connexion (s)")
+    parser.add_argument("--size", type=int, default=100_000, help="Taille d'une image (octets)")
+    parser.add_argument("--workers", type=int, default=4)
+    args = parser.parse_args()
+
+    logger.remove()
+    reset_rate_limiter(initial_rate=100_000, max_rate=100_000)
+
+    with LocalCDN(latency=args.latency, image_size=args.size, connect_delay=args.connect_delay) as cdn:
+        urls = cdn.urls(args.images)
+        results = [
+            run_pass("cold", urls, args.workers, warm=False),
+            run_pass("warm", urls, args.workers, warm=True),
+        ]
+
+    print(json.dumps(results, indent=2))
+
+
+if __name__ == "__main__":
+    main()
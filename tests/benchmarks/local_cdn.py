@@ -0,0 +1,326 @@
+# local_cdn.py
+"""
+Serveur HTTP local qui joue le rôle d'un CDN d'images pour les bancs d'essai.
+
+Chaque requête GET /img/<n>.jpg renvoie `image_size` octets après `latency`
+secondes. Le serveur est multi-thread et garde les connexions ouvertes
+(HTTP/1.1 keep-alive), comme un vrai CDN. `connect_delay` retarde la première
+réponse de chaque nouvelle connexion (coût d'un handshake TLS distant).
+
+Conditions dégradées, reproductibles (tirages avec `seed`) :
+- bandwidth : débit max par réponse (octets/s), corps envoyé par morceaux
+- error_rate : proportion de réponses 503
+- rate_limit_every / rate_limit_burst : après chaque série de N requêtes,
+  les M suivantes reçoivent un 429 avec Retry-After (rafales de limitation)
+
+La panne subie par la k-ième requête d'une image ne dépend que de `seed`, du
+numéro de l'image et de k, pas de l'ordre d'arrivée des requêtes
+concurrentes : deux passes avec plusieurs workers voient les mêmes pannes.
+Les rafales suivent l'ordre source (image n, première requête = rang n) et
+le retry d'une image arrive après la rafale qui l'a refusée.
+
+Contenu servi :
+- images="raw" : octets synthétiques (débit pur, non décodables)
+- images="strip" : vraies bandes JPEG (planches + bandes blanches) découpables
+  par ScraperEngine
+- archive=ResponseArchive : réponses enregistrées depuis un vrai site et
+  rejouées à l'identique sous /replay/<n>
+
+Chaque image garde sa latence vue du serveur : de la première requête reçue
+au dernier octet de la réponse réussie, retries compris (server_latencies()).
+
+Usage:
+    with LocalCDN(latency=0.05, image_size=200_000, error_rate=0.05) as cdn:
+        urls = cdn.urls(100)
+        ...
+        print(cdn.get_stats(), cdn.server_latencies())
+
+    ResponseArchive.record(real_urls, "tests/fixtures/recorded").save()
+    with LocalCDN(archive=ResponseArchive.load("tests/fixtures/recorded")) as cdn:
+        urls = cdn.urls()
+"""
+
+import io
+import json
+import random
+import threading
+import time
+from dataclasses import dataclass
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+from pathlib import Path
+from typing import Dict, List, Optional
+
+# En-têtes de réponse conservés à l'enregistrement (le reste dépend du transport)
+RECORDED_HEADERS = ("content-type", "etag", "last-modified", "cache-control")
+
+
+@dataclass
+class RecordedResponse:
+    url: str
+    status: int
+    headers: Dict[str, str]
+    body: bytes
+
+
+class ResponseArchive:
+    """
+    Réponses HTTP enregistrées sur disque : index.json + un fichier par corps.
+    """
+
+    def __init__(self, directory, responses: Optional[List[RecordedResponse]] = None):
+        self.directory = Path(directory)
+        self.responses = responses or []
+
+    @classmethod
+    def record(cls, urls, directory, referer: Optional[str] = None, timeout: float = 30) -> "ResponseArchive":
+        """Télécharge réellement `urls` (une fois) et garde statut, en-têtes utiles et corps."""
+        import httpx
+
+        headers = {"User-Agent": "Mozilla/5.0 (PANELia bench recorder)"}
+        if referer:
+            headers["Referer"] = referer
+        responses = []
+        with httpx.Client(follow_redirects=True, timeout=timeout) as client:
+            for url in urls:
+                r = client.get(url, headers=headers)
+                kept = {k: v for k, v in r.headers.items() if k.lower() in RECORDED_HEADERS}
+                responses.append(RecordedResponse(url, r.status_code, kept, r.content))
+        return cls(directory, responses)
+
+    def save(self) -> "ResponseArchive":
+        self.directory.mkdir(parents=True, exist_ok=True)
+        index = []
+        for i, resp in enumerate(self.responses):
+            body_name = f"{i:05d}.bin"
+            (self.directory / body_name).write_bytes(resp.body)
+            index.append({"url": resp.url, "status": resp.status, "headers": resp.headers, "body": body_name})
+        (self.directory / "index.json").write_text(json.dumps(index, indent=2), encoding="utf-8")
+        return self
+
+    @classmethod
+    def load(cls, directory) -> "ResponseArchive":
+        directory = Path(directory)
+        index = json.loads((directory / "index.json").read_text(encoding="utf-8"))
+        responses = [
+            RecordedResponse(e["url"], e["status"], e["headers"], (directory / e["body"]).read_bytes())
+            for e in index
+        ]
+        return cls(directory, responses)
+
+
+def synthetic_strip(width: int = 720, height: int = 5000, seed: int = 0, quality: int = 80) -> bytes:
+    """Bande JPEG réaliste : planches bruitées séparées par des bandes blanches."""
+    import numpy as np
+    from PIL import Image
+
+    rng = np.random.default_rng(seed)
+    arr = np.full((height, width, 3), 255, dtype=np.uint8)
+    y = 60
+    while y < height - 400:
+        end = min(height, y + int(rng.integers(500, 1400)))
+        arr[y:end] = rng.integers(0, 200, (end - y, width, 3), dtype=np.uint8)
+        y = end + int(rng.integers(40, 120))
+    buf = io.BytesIO()
+    Image.fromarray(arr).save(buf, "JPEG", quality=quality)
+    return buf.getvalue()
+
+
+class _CDNHandler(BaseHTTPRequestHandler):
+    protocol_version = "HTTP/1.1"
+
+    def setup(self):
+        super().setup()
+        # Une fois par connexion : simule la poignée de main d'un CDN distant
+        time.sleep(self.server.cdn.connect_delay)
+
+    def do_HEAD(self):
+        self.send_response(200)
+        self.send_header("Content-Type", "image/jpeg")
+        self.send_header("Content-Length", str(len(self.server.cdn.payload)))
+        self.end_headers()
+
+    def do_GET(self):
+        cdn = self.server.cdn
+        cdn._seen(self.path)
+        time.sleep(cdn.latency)
+
+        fault = cdn._draw_fault(self.path)
+        if fault is not None:
+            status, headers = fault
+            self.send_response(status)
+            for name, value in headers.items():
+                self.send_header(name, value)
+            self.send_header("Content-Length", "0")
+            self.end_headers()
+            return
+
+        status, headers, body = cdn._response_for(self.path)
+        self.send_response(status)
+        for name, value in headers.items():
+            self.send_header(name, value)
+        self.send_header("Content-Length", str(len(body)))
+        self.end_headers()
+        self._send_body(body, cdn.bandwidth)
+        if 200 <= status < 300:
+            cdn._served(self.path, len(body))
+
+    def _send_body(self, body: bytes, bandwidth: Optional[float]):
+        if not bandwidth:
+            self.wfile.write(body)
+            return
+        # Débit limité : chaque morceau de 16 Ko part quand le lien l'aurait
+        # entièrement transmis (rien n'attend après le dernier octet)
+        chunk = 16 * 1024
+        start = time.perf_counter()
+        for offset in range(0, len(body), chunk):
+            ahead = min(offset + chunk, len(body)) / bandwidth - (time.perf_counter() - start)
+            if ahead > 0:
+                time.sleep(ahead)
+            self.wfile.write(body[offset:offset + chunk])
+
+    def log_message(self, format, *args):
+        pass
+
+
+class LocalCDN:
+    """Serveur d'images synthétiques sur 127.0.0.1 (port libre choisi par l'OS)."""
+
+    def __init__(
+        self,
+        latency: float = 0.05,
+        image_size: int = 200_000,
+        connect_delay: float = 0.0,
+        bandwidth: Optional[float] = None,
+        error_rate: float = 0.0,
+        rate_limit_every: int = 0,
+        rate_limit_burst: int = 0,
+        retry_after: int = 1,
+        images: str = "raw",
+        archive: Optional[ResponseArchive] = None,
+        seed: int = 0,
+    ):
+        self.latency = latency
+        self.connect_delay = connect_delay
+        self.bandwidth = bandwidth
+        self.error_rate = error_rate
+        self.rate_limit_every = rate_limit_every
+        self.rate_limit_burst = rate_limit_burst
+        self.retry_after = retry_after
+        self.archive = archive
+        if images == "strip":
+            # Quelques bandes distinctes suffisent : les URLs tournent dessus
+            self.strips = [synthetic_strip(seed=seed + i) for i in range(4)]
+            self.payload = self.strips[0]
+        else:
+            self.strips = None
+            self.payload = b"\xff\xd8" + b"\x00" * max(0, image_size - 2)
+
+        self.seed = seed
+        self._lock = threading.Lock()
+        # Requêtes déjà reçues par image (rang k de la suivante)
+        self._requests_for: Dict[str, int] = {}
+        self._first_seen: Dict[str, float] = {}
+        self._latencies: Dict[str, float] = {}
+        self.stats = {"requests": 0, "served": 0, "bytes": 0, "errors_injected": 0, "rate_limited": 0}
+
+        self.server = ThreadingHTTPServer(("127.0.0.1", 0), _CDNHandler)
+        self.server.daemon_threads = True
+        # Beaucoup de connexions simultanées en file d'attente
+        self.server.request_queue_size = 1024
+        self.server.cdn = self
+        self.thread = threading.Thread(target=self.server.serve_forever, daemon=True)
+
+    @property
+    def base_url(self) -> str:
+        host, port = self.server.server_address[:2]
+        return f"http://{host}:{port}"
+
+    def urls(self, count: Optional[int] = None):
+        """URLs servies : `count` images synthétiques, ou toute l'archive rejouée."""
+        if self.archive is not None:
+            total = len(self.archive.responses) if count is None else count
+            return [f"{self.base_url}/replay/{i % len(self.archive.responses)}?n={i}" for i in range(total)]
+        return [f"{self.base_url}/img/{i}.jpg" for i in range(count or 0)]
+
+    # --- Côté serveur (appelé par le handler) --------------------------------
+
+    def _seen(self, path: str) -> None:
+        with self._lock:
+            self.stats["requests"] += 1
+            self._first_seen.setdefault(path, time.perf_counter())
+
+    def _served(self, path: str, size: int) -> None:
+        with self._lock:
+            self.stats["served"] += 1
+            self.stats["bytes"] += size
+            self._latencies[path] = time.perf_counter() - self._first_seen[path]
+
+    @staticmethod
+    def _image_number(path: str) -> int:
+        """Numéro d'image d'une URL servie (/img/<n>.jpg, /replay/<i>?n=<n>)."""
+        route, _, query = path.partition("?")
+        if query.startswith("n="):
+            route = query
+        digits = "".join(c for c in route if c.isdigit())
+        return int(digits or 0)
+
+    def _draw_fault(self, path: str):
+        """(statut, en-têtes) d'une réponse dégradée, ou None pour servir l'image."""
+        with self._lock:
+            k = self._requests_for.get(path, 0)
+            self._requests_for[path] = k + 1
+            if self.rate_limit_every and self.rate_limit_burst:
+                rank = self._image_number(path) + k * self.rate_limit_burst
+                if rank % (self.rate_limit_every + self.rate_limit_burst) >= self.rate_limit_every:
+                    self.stats["rate_limited"] += 1
+                    return 429, {"Retry-After": str(self.retry_after)}
+            if self.error_rate and random.Random(f"{self.seed}:{path}:{k}").random() < self.error_rate:
+                self.stats["errors_injected"] += 1
+                return 503, {}
+        return None
+
+    def _response_for(self, path: str):
+        route = path.split("?", 1)[0]
+        if self.archive is not None and route.startswith("/replay/"):
+            try:
+                resp = self.archive.responses[int(route.rsplit("/", 1)[-1])]
+            except (ValueError, IndexError):
+                return 404, {}, b""
+            return resp.status, resp.headers, resp.body
+        if self.strips is not None:
+            digits = "".join(c for c in route if c.isdigit())
+            return 200, {"Content-Type": "image/jpeg"}, self.strips[int(digits or 0) % len(self.strips)]
+        return 200, {"Content-Type": "image/jpeg"}, self.payload
+
+    # --- Mesures --------------------------------------------------------------
+
+    def server_latencies(self) -> List[float]:
+        """Latence par image servie (s) : première requête -> dernier octet réussi."""
+        with self._lock:
+            return list(self._latencies.values())
+
+    def get_stats(self) -> Dict[str, int]:
+        with self._lock:
+            return dict(self.stats)
+
+    def reset_measurements(self) -> None:
+        """Remet à zéro mesures et tirages : chaque passe subit la même séquence de pannes."""
+        with self._lock:
+            self._requests_for.clear()
+            self._first_seen.clear()
+            self._latencies.clear()
+            self.stats = {k: 0 for k in self.stats}
+
+    def start(self):
+        self.thread.start()
+        return self
+
+    def stop(self):
+        self.server.shutdown()
+        self.server.server_close()
+
+    def __enter__(self):
+        return self.start()
+
+    def __exit__(self, exc_type, exc_val, exc_tb):
+        self.stop()
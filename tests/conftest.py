@@ -0,0 +1,87 @@
+"""
+Fixtures partagées des tests PANELia
+
+- fresh_state (autouse) : chaque test repart d'un registre de clients HTTP
+  vide, de circuit breakers neufs et d'un limiteur de débit très large
+  (les tests qui portent sur le débit créent leur propre limiteur)
+- mock_http(handler) : httpx.Client branché sur un MockTransport
+- fake_engine(extract) : ScraperEngine sans navigateur ni réseau (drivers
+  factices, extraction `extract`, CDN simulé, une planche par image)
+"""
+import pytest
+import sys
+import os
+from contextlib import contextmanager
+from unittest.mock import patch
+
+import httpx
+from PIL import Image
+
+sys.path.insert(0, os.path.abspath(os.path.join(os.path.dirname(__file__), '..')))
+
+from panelia.core.driver_pool import DriverPool
+from panelia.utils.errors import reset_error_handler
+from panelia.utils.http_pool import reset_client_pool
+from panelia.utils.ratelimit import reset_rate_limiter
+
+
+@pytest.fixture(autouse=True)
+def fresh_state():
+    reset_client_pool()
+    reset_rate_limiter(initial_rate=10_000, max_rate=10_000)
+    reset_error_handler()
+    yield
+    reset_client_pool()
+
+
+class FakeSession:
+    """WebSession factice : le moteur n'en a besoin que pour la remettre au pool."""
+
+    def quit(self):
+        pass
+
+
+def cdn_response(request):
+    """Image servie par le CDN simulé (corps propre à chaque URL)."""
+    return httpx.Response(200, content=b"img" + request.url.path.encode())
+
+
+def one_panel(source):
+    return [Image.new("L", (10, 10), color=128)]
+
+
+@pytest.fixture
+def mock_http():
+    """mock_http(handler) : patch de httpx.Client, chaque requête passe par handler(request)."""
+    real_client = httpx.Client
+
+    def patcher(handler=cdn_response):
+        return patch('httpx.Client', side_effect=lambda **kw: real_client(transport=httpx.MockTransport(handler), **kw))
+    return patcher
+
+
+@pytest.fixture
+def fake_engine(tmp_path, mock_http):
+    """
+    with fake_engine(extract) as engine : moteur prêt à lancer des lots.
+
+    extract(chap_url, driver_ws, validated_params) -> (URLs d'images, resolver)
+    remplace l'extraction Selenium ; handler répond aux téléchargements
+    (défaut : cdn_response). Le moteur est arrêté en sortie de bloc.
+    """
+    @contextmanager
+    def factory(extract, handler=cdn_response, work_dir=None, num_drivers=1, **engine_kwargs):
+        from panelia.core.engine import ScraperEngine
+
+        engine_kwargs.setdefault("warm_connections", False)
+        engine_kwargs.setdefault("incremental_decode", False)
+        engine = ScraperEngine(work_dir=str(work_dir or tmp_path), num_drivers=num_drivers, **engine_kwargs)
+        engine.driver_pool = DriverPool(FakeSession, size=num_drivers, health_check=None)
+        try:
+            with mock_http(handler), \
+                    patch.object(engine, "_extract_image_urls", side_effect=extract), \
+                    patch('panelia.core.engine.process_image_smart', side_effect=one_panel):
+                yield engine
+        finally:
+            engine.shutdown()
+    return factory
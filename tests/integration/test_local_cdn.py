@@ -0,0 +1,92 @@
+"""
+Tests d'intégration du CDN local des bancs d'essai
+
+Vrais sockets sur 127.0.0.1 : le moteur threadé récupère toutes les images
+malgré les 503 et les rafales de 429, l'archive enregistrée est rejouée à
+l'identique, les latences par image sont mesurées.
+"""
+import pytest
+import sys
+import os
+import time
+
+sys.path.insert(0, os.path.abspath(os.path.join(os.path.dirname(__file__), '../..')))
+
+from panelia.utils.http import stream_download_images
+from panelia.utils.ratelimit import reset_rate_limiter
+from panelia.utils.retry import RetryPolicy
+from tests.benchmarks.bench_throughput import percentile
+from tests.benchmarks.local_cdn import LocalCDN, RecordedResponse, ResponseArchive
+
+FAST_RETRIES = RetryPolicy(max_attempts=6, base_delay=0.01, max_delay=0.05)
+
+
+@pytest.fixture(autouse=True)
+def high_rate_floor():
+    # On teste le CDN, pas le limiteur : débit plancher élevé
+    reset_rate_limiter(initial_rate=10_000, min_rate=1_000, max_rate=10_000)
+    yield
+
+
+@pytest.mark.integration
+def test_all_images_survive_errors_and_429_bursts():
+    with LocalCDN(latency=0, image_size=2000, error_rate=0.1, rate_limit_every=10, rate_limit_burst=3, retry_after=0, seed=1) as cdn:
+        urls = cdn.urls(30)
+        images = list(stream_download_images(urls, max_workers=4, ordered=True, retry_policy=FAST_RETRIES))
+        stats = cdn.get_stats()
+
+    assert len(images) == 30
+    assert stats["served"] == 30
+    assert stats["rate_limited"] >= 3
+    assert stats["requests"] == 30 + stats["rate_limited"] + stats["errors_injected"]
+
+
+@pytest.mark.integration
+def test_fault_sequence_is_reproducible():
+    def run(cdn):
+        cdn.reset_measurements()
+        list(stream_download_images(cdn.urls(20), max_workers=4, ordered=True, retry_policy=FAST_RETRIES))
+        return cdn.get_stats()
+
+    with LocalCDN(latency=0, image_size=500, error_rate=0.2, seed=7) as cdn:
+        assert run(cdn) == run(cdn)
+
+
+@pytest.mark.integration
+def test_bandwidth_limit_and_latency_measurement():
+    with LocalCDN(latency=0, image_size=64 * 1024, bandwidth=512 * 1024) as cdn:
+        list(stream_download_images(cdn.urls(2), max_workers=2))
+        # Le handler note la latence juste après avoir écrit le dernier octet
+        deadline = time.monotonic() + 2
+        while len(cdn.server_latencies()) < 2 and time.monotonic() < deadline:
+            time.sleep(0.01)
+        latencies = cdn.server_latencies()
+
+    # 64 Ko à 512 Ko/s : au moins ~0,1 s par image
+    assert len(latencies) == 2
+    assert min(latencies) >= 0.09
+
+
+@pytest.mark.integration
+def test_archive_round_trip_and_replay(tmp_path):
+    bodies = [b"\xff\xd8premiere", b"\xff\xd8seconde"]
+    archive = ResponseArchive(tmp_path, [
+        RecordedResponse(f"https://real.cdn/{i}.jpg", 200, {"content-type": "image/jpeg", "etag": f'"v{i}"'}, body)
+        for i, body in enumerate(bodies)
+    ]).save()
+
+    loaded = ResponseArchive.load(tmp_path)
+    assert loaded.responses == archive.responses
+    assert [r.body for r in loaded.responses] == bodies
+
+    with LocalCDN(latency=0, archive=loaded) as cdn:
+        images = list(stream_download_images(cdn.urls(), max_workers=2, ordered=True))
+    assert images == bodies
+
+
+@pytest.mark.unit
+def test_percentile_interpolates():
+    values = [0.1 * i for i in range(1, 11)]
+    assert percentile(values, 50) == pytest.approx(0.55)
+    assert percentile(values, 99) == pytest.approx(0.991)
+    assert percentile([], 95) == 0.0
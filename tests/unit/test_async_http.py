@@ -0,0 +1,153 @@
+"""
+Tests unitaires pour async_http.py
+
+Teste le téléchargeur asyncio : plafond par hôte, retry, façade synchrone.
+"""
+import asyncio
+import pytest
+import time
+import httpx
+from unittest.mock import patch
+import sys
+import os
+
+sys.path.insert(0, os.path.abspath(os.path.join(os.path.dirname(__file__), '../..')))
+
+from panelia.utils.async_http import AsyncImageDownloader, configure_async_downloader, stream_download_images_async
+from panelia.utils.errors import ErrorHandler
+
+
+def run(coro):
+    return asyncio.new_event_loop().run_until_complete(coro)
+
+
+@pytest.mark.unit
+def test_download_many_respects_per_host_limit():
+    """Jamais plus de per_host_limit requêtes en vol sur un même hôte"""
+    state = {"in_flight": 0, "peak": 0}
+
+    async def handler(request):
+        state["in_flight"] += 1
+        state["peak"] = max(state["peak"], state["in_flight"])
+        await asyncio.sleep(0.01)
+        state["in_flight"] -= 1
+        return httpx.Response(200, content=b"img")
+
+    downloader = AsyncImageDownloader(per_host_limit=3, transport=httpx.MockTransport(handler))
+
+    async def collect():
+        urls = [f"http://cdn.example.com/{i}.jpg" for i in range(20)]
+        return [b async for b in downloader.download_many(urls)]
+
+    results = run(collect())
+    assert len(results) == 20
+    assert state["peak"] == 3
+
+
+@pytest.mark.unit
+def test_download_retries_without_blocking_thread():
+    """Une erreur transitoire est retentée (asyncio.sleep, pas time.sleep)"""
+    calls = {"n": 0}
+
+    def handler(request):
+        calls["n"] += 1
+        if calls["n"] == 1:
+            return httpx.Response(503)
+        return httpx.Response(200, content=b"ok")
+
+    downloader = AsyncImageDownloader(backoff_base=0.0, transport=httpx.MockTransport(handler))
+    with patch('time.sleep') as mock_sleep:
+        result = run(downloader.download("http://cdn.example.com/a.jpg"))
+
+    assert result == b"ok"
+    assert calls["n"] == 2
+    mock_sleep.assert_not_called()
+
+
+@pytest.mark.unit
+def test_sync_facade_yields_bytes_and_skips_failures():
+    """La façade synchrone se consomme comme stream_download_images"""
+    def handler(request):
+        if "missing" in str(request.url):
+            return httpx.Response(404)
+        return httpx.Response(200, content=b"img")
+
+    configure_async_downloader(AsyncImageDownloader(max_retries=1, transport=httpx.MockTransport(handler)))
+    try:
+        urls = ["http://cdn.example.com/1.jpg", "http://cdn.example.com/missing.jpg", "http://cdn.example.com/2.jpg"]
+        results = list(stream_download_images_async(urls, max_workers=2))
+    finally:
+        configure_async_downloader(AsyncImageDownloader())
+
+    assert results == [b"img", b"img"]
+
+
+@pytest.mark.unit
+def test_sync_facade_cancellation_aborts_in_flight_requests():
+    """Jeton annulé : la tâche asyncio est coupée, le générateur lève sans attendre les réponses"""
+    import threading
+    import time
+    from panelia.utils.cancellation import CancellationToken, OperationCancelled
+
+    async def handler(request):
+        await asyncio.sleep(1)
+        return httpx.Response(200, content=b"img")
+
+    configure_async_downloader(AsyncImageDownloader(transport=httpx.MockTransport(handler)))
+    token = CancellationToken()
+    try:
+        threading.Timer(0.1, token.cancel).start()
+        start = time.monotonic()
+        with pytest.raises(OperationCancelled):
+            list(stream_download_images_async([f"http://cdn.example.com/{i}.jpg" for i in range(8)], max_workers=4, cancel_token=token))
+        elapsed = time.monotonic() - start
+    finally:
+        configure_async_downloader(AsyncImageDownloader())
+
+    assert elapsed < 0.5
+
+
+@pytest.mark.unit
+def test_download_many_ordered_mode():
+    """En mode ordonné, les images sortent dans l'ordre source"""
+    async def handler(request):
+        idx = int(str(request.url).rsplit('/', 1)[1].split('.')[0])
+        await asyncio.sleep(0.01 * (5 - idx))
+        return httpx.Response(200, content=str(idx).encode())
+
+    downloader = AsyncImageDownloader(transport=httpx.MockTransport(handler))
+
+    async def collect():
+        urls = [f"http://cdn.example.com/{i}.jpg" for i in range(5)]
+        return [b async for b in downloader.download_many(urls, ordered=True, window=3)]
+
+    assert run(collect()) == [b"0", b"1", b"2", b"3", b"4"]
+
+
+@pytest.mark.unit
+def test_open_circuit_stops_requests_to_dead_host():
+    """Après l'ouverture du circuit, l'hôte mort ne reçoit plus que les sondes"""
+    dead_calls = []
+    calls = {"alive": 0}
+
+    def handler(request):
+        if request.url.host == "dead.example.com":
+            dead_calls.append(time.monotonic())
+            raise httpx.ConnectError("refused")
+        calls["alive"] += 1
+        return httpx.Response(200, content=b"ok")
+
+    downloader = AsyncImageDownloader(max_retries=3, backoff_base=0.0, transport=httpx.MockTransport(handler))
+
+    async def collect():
+        urls = [f"http://dead.example.com/{i}.jpg" for i in range(10)] + ["http://alive.example.com/a.jpg"]
+        return [b async for b in downloader.download_many(urls, max_in_flight=1)]
+
+    with patch.object(ErrorHandler, 'HOST_BREAKER_TIMEOUT', 0.1):
+        results = run(collect())
+
+    assert results == [b"ok"]
+    # 5 échecs ouvrent le circuit ; ensuite une seule sonde par délai du breaker
+    probes = dead_calls[5:]
+    assert probes
+    assert all(b - a >= 0.08 for a, b in zip(dead_calls[4:], probes))
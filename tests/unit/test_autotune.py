@@ -0,0 +1,176 @@
+"""
+Tests unitaires pour autotune.py
+
+Teste le hill-climbing de la concurrence par hôte : montée tant que le débit
+progresse, recul et plafond sur 429, recul sur erreurs, mémoire des réglages
+entre deux runs et branchement sur DownloadScheduler.
+"""
+import pytest
+import time
+import httpx
+import sys
+import os
+
+sys.path.insert(0, os.path.abspath(os.path.join(os.path.dirname(__file__), '../..')))
+
+from panelia.core.autotune import ConcurrencyTuner, download_succeeded
+from panelia.core.scheduler import DownloadScheduler
+from panelia.utils.ratelimit import get_rate_limiter
+
+HOST = "cdn.test"
+
+
+class FakeClock:
+    def __init__(self):
+        self.now = 1000.0
+
+    def __call__(self):
+        return self.now
+
+
+@pytest.fixture
+def clock(monkeypatch):
+    fake = FakeClock()
+    monkeypatch.setattr("panelia.core.autotune.time.monotonic", fake)
+    return fake
+
+
+def window(tuner, clock, successes, errors=0, seconds=1.0):
+    """Une fenêtre de mesure : `successes` images réussies en `seconds` secondes."""
+    for _ in range(errors):
+        tuner.observe(HOST, (False, 1.0), None, 0.1)
+    for _ in range(successes - 1):
+        tuner.observe(HOST, (True, b"img"), None, 0.1)
+    clock.now += seconds
+    tuner.observe(HOST, (True, b"img"), None, 0.1)
+    return tuner.limit_for(HOST)
+
+
+def make_tuner(**kwargs):
+    kwargs = dict(dict(initial_limit=4, max_limit=16, window_seconds=1.0, min_samples=2), **kwargs)
+    return ConcurrencyTuner(**kwargs)
+
+
+@pytest.mark.unit
+def test_download_succeeded():
+    assert download_succeeded((True, b"img"), None)
+    assert not download_succeeded((True, None), None)
+    assert not download_succeeded((False, 2.0), None)
+    assert not download_succeeded(None, RuntimeError("boom"))
+
+
+@pytest.mark.unit
+def test_climbs_while_throughput_improves_then_holds(clock):
+    tuner = make_tuner()
+    assert tuner.limit_for(HOST) == 4
+    assert window(tuner, clock, 10) == 5
+    assert window(tuner, clock, 14) == 6
+    assert window(tuner, clock, 18) == 7
+    # Plus de gain : on cesse de monter
+    assert window(tuner, clock, 18) == 7
+    assert window(tuner, clock, 18) == 7
+    # Débit en chute : on redescend
+    assert window(tuner, clock, 10) == 6
+    assert tuner.get_stats()[HOST]["best_limit"] == 6
+
+
+@pytest.mark.unit
+def test_throttling_lowers_limit_and_caps_it(clock):
+    tuner = make_tuner(probe_after_windows=3)
+    window(tuner, clock, 10)
+    assert window(tuner, clock, 20) == 6
+    get_rate_limiter().record_response(HOST, 429)
+    assert window(tuner, clock, 30) == 5
+    assert tuner.get_stats()[HOST]["ceiling"] == 5
+    # Le débit remonte, mais le plafond de throttling tient
+    assert window(tuner, clock, 40) == 5
+    assert window(tuner, clock, 50) == 5
+    # Longue période saine : sonde d'un cran au-dessus
+    assert window(tuner, clock, 50) == 6
+
+
+@pytest.mark.unit
+def test_error_rate_steps_down(clock):
+    tuner = make_tuner(max_error_rate=0.2)
+    assert window(tuner, clock, 4, errors=4) == 3
+
+
+@pytest.mark.unit
+def test_best_setting_remembered_between_runs(tmp_path, clock):
+    path = tmp_path / "autotune.json"
+    tuner = make_tuner(state_path=str(path))
+    tuner.save()
+    assert not path.exists()
+    window(tuner, clock, 10)
+    window(tuner, clock, 20)
+    window(tuner, clock, 5)
+    tuner.save()
+
+    scheduler = DownloadScheduler(max_concurrency=16, per_host_limit=4)
+    try:
+        make_tuner(state_path=str(path)).attach(scheduler)
+        assert scheduler.host_limit(HOST) == 5
+        assert scheduler.host_limit("autre.test") == 4
+    finally:
+        scheduler.shutdown()
+
+
+@pytest.mark.unit
+def test_scheduler_observer_applies_new_limit():
+    tuner = ConcurrencyTuner(initial_limit=2, max_limit=8, window_seconds=0, min_samples=3)
+    scheduler = DownloadScheduler(max_concurrency=8, per_host_limit=2)
+    try:
+        tuner.attach(scheduler)
+        futures = [scheduler.submit(1, f"http://{HOST}/{i}.jpg", lambda: (True, b"img")) for i in range(3)]
+        for future in futures:
+            assert future.result(timeout=5) == (True, b"img")
+        deadline = time.monotonic() + 5
+        while scheduler.host_limit(HOST) == 2 and time.monotonic() < deadline:
+            time.sleep(0.01)
+        assert scheduler.host_limit(HOST) == 3
+        assert scheduler.get_stats()["host_limits"][HOST] == 3
+    finally:
+        scheduler.shutdown()
+
+
+@pytest.mark.unit
+def test_mangadex_node_429_throttles_canonical_host(clock, mock_http):
+    """Les 429 d'un nœud MD@Home comptent pour uploads.mangadex.org"""
+    from panelia.scrapers.mangadex import UPLOADS_HOST, MangaDexAtHome
+
+    mdh = MangaDexAtHome(network_reports=False)
+    at_home = httpx.Response(200, json={
+        "result": "ok",
+        "baseUrl": "https://node1.mangadex.network:443",
+        "chapter": {"hash": "abc", "data": ["1.png"], "dataSaver": ["1.jpg"]},
+    })
+    with mock_http(lambda r: at_home):
+        mdh.chapter_images("https://mangadex.org/chapter/0a1b2c3d-0000-1111-2222-333344445555")
+    assert mdh.served_hosts(UPLOADS_HOST) == ["node1.mangadex.network"]
+    assert mdh.served_hosts("cdn.test") == []
+
+    tuner = make_tuner(host_aliases=mdh.served_hosts)
+
+    def canonical_window(successes):
+        for _ in range(successes - 1):
+            tuner.observe(UPLOADS_HOST, (True, b"img"), None, 0.1)
+        clock.now += 1.0
+        tuner.observe(UPLOADS_HOST, (True, b"img"), None, 0.1)
+        return tuner.limit_for(UPLOADS_HOST)
+
+    assert canonical_window(10) == 5
+    get_rate_limiter().record_response("https://node1.mangadex.network:443/data/abc/1.png", 429)
+    assert canonical_window(20) == 4
+    assert tuner.get_stats()[UPLOADS_HOST]["ceiling"] == 4
+
+
+@pytest.mark.unit
+def test_engine_keeps_global_concurrency_cap(tmp_path):
+    from panelia.core.engine import ScraperEngine
+
+    engine = ScraperEngine(work_dir=str(tmp_path), num_drivers=1, image_workers_per_chap=4, warm_connections=False, autotune=True, autotune_state=None)
+    try:
+        assert engine.scheduler.max_concurrency == 4
+        assert engine.tuner.max_limit == 4
+    finally:
+        engine.shutdown()
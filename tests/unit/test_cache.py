@@ -0,0 +1,167 @@
+"""
+Tests unitaires pour cache.py
+
+Teste le cache disque : adressage par contenu, éviction LRU, revalidation 304.
+"""
+import pytest
+import httpx
+from unittest.mock import Mock, patch, MagicMock
+import sys
+import os
+
+sys.path.insert(0, os.path.abspath(os.path.join(os.path.dirname(__file__), '../..')))
+
+from panelia.utils.cache import DownloadCache
+from panelia.utils.http import download_image_smart, download_image_spooled
+from panelia.utils.metrics import get_collector, reset_collector
+from panelia.utils.errors import get_error_handler
+from panelia.utils.retry import RetryPolicy
+
+
+@pytest.fixture
+def cache(tmp_path):
+    c = DownloadCache(str(tmp_path / "cache"), max_bytes=1000)
+    yield c
+    c.close()
+
+
+@pytest.fixture(autouse=True)
+def fresh_collector():
+    reset_collector()
+    yield
+
+
+class TestDownloadCache:
+    """Tests pour DownloadCache"""
+
+    @pytest.mark.unit
+    def test_store_and_read(self, cache):
+        """Un corps stocké se relit à l'identique avec ses validateurs"""
+        cache.store("http://cdn/a.jpg", b"abc", etag='"v1"')
+        entry = cache.lookup("http://cdn/a.jpg")
+
+        assert entry.etag == '"v1"'
+        assert cache.read(entry) == b"abc"
+        assert cache.conditional_headers(entry) == {"If-None-Match": '"v1"'}
+
+    @pytest.mark.unit
+    def test_identical_bodies_share_one_object(self, cache):
+        """Deux URLs, mêmes octets -> un seul objet sur disque"""
+        cache.store("http://cdn/a.jpg", b"same")
+        cache.store("http://mirror/a.jpg", b"same")
+
+        objects = [p for p in cache.objects_dir.rglob("*") if p.is_file()]
+        assert len(objects) == 1
+        assert cache.get_stats()["entries"] == 2
+
+    @pytest.mark.unit
+    def test_lru_eviction(self, cache):
+        """Au-delà de max_bytes, l'entrée la moins récemment utilisée part"""
+        cache.store("http://cdn/old.jpg", b"o" * 400)
+        cache.store("http://cdn/mid.jpg", b"m" * 400)
+        cache.read(cache.lookup("http://cdn/old.jpg"))  # old redevient récent
+        cache.store("http://cdn/new.jpg", b"n" * 400)
+
+        assert cache.lookup("http://cdn/mid.jpg") is None
+        assert cache.lookup("http://cdn/old.jpg") is not None
+        assert cache.lookup("http://cdn/new.jpg") is not None
+
+    @pytest.mark.unit
+    def test_missing_object_forgets_entry(self, cache):
+        """Un objet supprimé à la main ne casse pas la lecture"""
+        entry = cache.store("http://cdn/a.jpg", b"abc")
+        cache._object_path(entry.sha256).unlink()
+
+        assert cache.read(entry) is None
+        assert cache.lookup("http://cdn/a.jpg") is None
+
+
+class TestDownloadWithCache:
+    """Tests de download_image_smart avec cache"""
+
+    def _client(self, responses):
+        mock_client = MagicMock()
+        mock_client.get.side_effect = responses
+        return mock_client
+
+    @pytest.mark.unit
+    def test_miss_then_revalidated_hit(self, cache):
+        """1er passage : 200 stocké. 2e passage : 304 -> corps du cache"""
+        first = Mock(status_code=200, content=b"img", headers={"ETag": '"v1"'})
+        second = Mock(status_code=304, content=b"", headers={})
+        mock_client = self._client([first, second])
+
+        with patch('httpx.Client', return_value=mock_client):
+            assert download_image_smart("http://cdn/a.jpg", cache=cache) == b"img"
+            assert download_image_smart("http://cdn/a.jpg", cache=cache) == b"img"
+
+        sent = mock_client.get.call_args_list[1][1]["headers"]
+        assert sent["If-None-Match"] == '"v1"'
+        collector = get_collector()
+        assert collector.cache_hits == 1
+        assert collector.cache_misses == 1
+        assert collector.cache_revalidated == 1
+
+    @pytest.mark.unit
+    def test_entry_without_validators_served_without_request(self, cache):
+        """Sans ETag ni Last-Modified, l'entrée est servie sans requête"""
+        cache.store("http://cdn/a.jpg", b"img")
+
+        with patch('httpx.Client') as mock_client_class:
+            assert download_image_smart("http://cdn/a.jpg", cache=cache) == b"img"
+            assert not mock_client_class.called
+
+
+class TestMissingObjectAfter304:
+    """304 alors que l'objet du cache a disparu du disque (téléchargements spoolés)"""
+
+    URL = "http://cdn.test/a.jpg"
+
+    def _cache_without_object(self, cache):
+        cache.store(self.URL, b"old", etag='"v1"')
+        for path in cache.objects_dir.rglob("*"):
+            if path.is_file():
+                path.unlink()
+
+    def _handler(self, sent):
+        def handler(request):
+            sent.append(dict(request.headers))
+            if "if-none-match" in request.headers:
+                return httpx.Response(304)
+            return httpx.Response(200, content=b"fresh", headers={"ETag": '"v2"'})
+        return handler
+
+    @pytest.mark.unit
+    def test_spooled_refetches_without_using_attempt(self, cache, mock_http):
+        """Requête refaite sans condition : ni tentative consommée ni échec pour l'hôte"""
+        self._cache_without_object(cache)
+        sent = []
+
+        with mock_http(self._handler(sent)):
+            fp = download_image_spooled(self.URL, cache=cache, retry_policy=RetryPolicy(max_attempts=1))
+
+        assert fp is not None and fp.read() == b"fresh"
+        fp.close()
+        assert len(sent) == 2 and "if-none-match" not in sent[1]
+        assert get_error_handler().get_host_breaker(self.URL).failures == 0
+
+    @pytest.mark.unit
+    def test_async_spooled_refetches_without_using_attempt(self, cache):
+        """Même contrat pour le moteur asyncio"""
+        import asyncio
+        from panelia.utils.async_http import AsyncImageDownloader
+
+        self._cache_without_object(cache)
+        sent = []
+        handle = self._handler(sent)
+
+        async def handler(request):
+            return handle(request)
+
+        downloader = AsyncImageDownloader(retry_policy=RetryPolicy(max_attempts=1), transport=httpx.MockTransport(handler))
+        fp = asyncio.new_event_loop().run_until_complete(downloader.download(self.URL, cache=cache, spool_threshold=1024))
+
+        assert fp is not None and fp.read() == b"fresh"
+        fp.close()
+        assert len(sent) == 2 and "if-none-match" not in sent[1]
+        assert get_error_handler().get_host_breaker(self.URL).failures == 0
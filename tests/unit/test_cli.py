@@ -0,0 +1,159 @@
+"""
+Tests unitaires pour cli.py
+
+Teste la ligne de commande : plages de chapitres, nom de série déduit de
+l'URL, progression JSON lines, codes de sortie (échec, arguments invalides).
+"""
+import pytest
+import io
+import json
+from unittest.mock import MagicMock, patch
+import sys
+import os
+
+sys.path.insert(0, os.path.abspath(os.path.join(os.path.dirname(__file__), '../..')))
+
+from panelia import cli
+from panelia.core.events import CHAPTER_FINISHED, ProgressEvent
+from panelia.scrapers.discovery import series_name_from_url
+
+URL = "https://mangadex.org/title/32d76d19-8a05-4db0-9fc2-e0b0648fe9d0/solo-leveling"
+
+
+@pytest.fixture(autouse=True)
+def keep_test_logging():
+    # Garde les sinks loguru de la session de test
+    with patch.object(cli, "configure_logging"):
+        yield
+
+
+@pytest.mark.unit
+class TestChapterSelection:
+    def test_parse_ranges(self):
+        assert cli.parse_chapter_ranges("1-3, 5,10.5-") == [(1, 3), (5, 5), (10.5, float("inf"))]
+        assert cli.parse_chapter_ranges("-2") == [(0, 2)]
+
+    @pytest.mark.parametrize("spec", ["5-1", "abc", " , "])
+    def test_invalid_ranges(self, spec):
+        with pytest.raises(ValueError):
+            cli.parse_chapter_ranges(spec)
+
+    def test_select(self):
+        chapters = {float(n): f"u{n}" for n in range(1, 8)}
+        assert sorted(cli.select_chapters(chapters, [(2, 3), (6, float("inf"))])) == [2.0, 3.0, 6.0, 7.0]
+        assert cli.select_chapters(chapters, None) == chapters
+
+    def test_series_name_from_url(self):
+        assert series_name_from_url(URL) == "Solo Leveling"
+        assert series_name_from_url("https://site.test/manga/12345/") == "Manga"
+        assert series_name_from_url("https://site.test/") == "site.test"
+
+
+def run_main(argv, results):
+    engine = MagicMock()
+
+    def batch(chapters, params, event_callback=None, **kwargs):
+        for n in chapters:
+            event_callback(ProgressEvent(CHAPTER_FINISHED, n, {"panels_saved": 2}))
+        return [dict(r, chap_num=n) for n, r in zip(chapters, results)]
+
+    engine.run_chapter_batch.side_effect = batch
+    out = io.StringIO()
+    discovered = ({1.0: "https://mangadex.org/chapter/a", 2.0: "https://mangadex.org/chapter/b", 3.0: "https://mangadex.org/chapter/c"}, None)
+    with patch.object(cli, "make_engine", return_value=engine), \
+            patch.object(cli, "discover_chapters", return_value=discovered), \
+            patch.object(sys, "stdout", out):
+        code = cli.main(argv)
+    engine.shutdown.assert_called_once()
+    return code, [json.loads(line) for line in out.getvalue().splitlines()], engine
+
+
+@pytest.mark.unit
+class TestMain:
+    def test_json_lines_progress(self):
+        ok = {"panels_saved": 2, "error": None}
+        code, events, engine = run_main([URL, "--chapters", "2-"], [ok, ok])
+
+        assert code == cli.EXIT_OK
+        params = engine.run_chapter_batch.call_args.args[1]
+        assert sorted(engine.run_chapter_batch.call_args.args[0]) == [2.0, 3.0]
+        assert params["final_manhwa_name"] == "Solo Leveling"
+        assert [e["event"] for e in events] == ["series_discovered", CHAPTER_FINISHED, CHAPTER_FINISHED, "series_finished", "run_finished"]
+        assert events[0]["found"] == 3 and events[0]["selected"] == 2
+        assert events[1]["series"] == "Solo Leveling" and events[1]["chap"] == 2.0
+        assert events[-1]["ok"] == 2 and "series" not in events[-1]
+
+    def test_failed_chapter_exit_code(self):
+        code, events, _ = run_main([URL, "--chapters", "1"], [{"panels_saved": 0, "error": "Timeout"}])
+        assert code == cli.EXIT_FAILED_CHAPTERS
+        assert events[-1]["failed"] == 1
+
+    def test_several_series_on_one_engine(self):
+        ok = {"panels_saved": 2, "error": None}
+        other = "https://mangadex.org/title/0c7c6f9a-3b4e-4a2b-9d3f-2f1e8c5d7a10/omniscient-reader"
+        code, events, engine = run_main([URL, other, "--parallel-series", "2", "--series-downloads", "3"], [ok, ok, ok])
+
+        assert code == cli.EXIT_OK
+        assert engine.run_chapter_batch.call_count == 2
+        assert all(call.kwargs["max_downloads"] == 3 for call in engine.run_chapter_batch.call_args_list)
+        finished = sorted(e["series"] for e in events if e["event"] == "series_finished")
+        assert finished == ["Omniscient Reader", "Solo Leveling"]
+        assert events[-1]["ok"] == 6
+
+    def test_queue_mode_only_enqueues(self, tmp_path):
+        out = io.StringIO()
+        discovered = ({1.0: "https://mangadex.org/chapter/a", 2.0: "https://mangadex.org/chapter/b"}, None)
+        with patch.object(cli, "make_engine") as make_engine, \
+                patch.object(cli, "discover_chapters", return_value=discovered), \
+                patch.object(sys, "stdout", out):
+            code = cli.main([URL, "--queue", f"sqlite://{tmp_path}/q.db", "--priority", "3"])
+        make_engine.assert_not_called()
+        events = [json.loads(line) for line in out.getvalue().splitlines()]
+
+        assert code == cli.EXIT_OK
+        assert events[1]["event"] == "series_enqueued" and events[1]["enqueued"] == 2
+        assert events[-1]["queue"]["pending"] == 2
+
+    def test_fallback_discovery_on_warm_driver(self):
+        """Site sans scraper dédié : le driver chaud (resté sur une autre série) charge la page de la série"""
+        from panelia.core.driver_manager import WarmDriverManager
+
+        series = "https://unknown-site.test/manga/tower-of-god/"
+        pages = {series: '<html><body><h1>Tower of God</h1><ul class="main">'
+                         f'<li><a href="{series}chapter-1/">Chapter 1</a></li>'
+                         f'<li><a href="{series}chapter-2/">Chapter 2</a></li></ul></body></html>'}
+
+        class PageSession:
+            # Encore sur la page de la série découverte juste avant
+            page_source = '<html><body><ul class="main"><li><a href="https://other.test/c-9/">Chapter 9</a></li></ul></body></html>'
+
+            def get(self, url):
+                self.page_source = pages.get(url, "<html></html>")
+
+            def quit(self):
+                pass
+
+        manager = WarmDriverManager(session_factory=lambda headless, profile_id: PageSession, start_delay=0, health_check=None, reap_interval=3600)
+        engine = MagicMock()
+        engine.run_chapter_batch.side_effect = lambda chapters, params, **kwargs: [
+            {"chap_num": n, "panels_saved": 1, "error": None} for n in chapters
+        ]
+        out = io.StringIO()
+        with patch.object(cli, "get_driver_manager", return_value=manager), \
+                patch.object(cli, "make_engine", return_value=engine), \
+                patch.object(sys, "stdout", out):
+            code = cli.main([series])
+        manager.close_all()
+        events = [json.loads(line) for line in out.getvalue().splitlines()]
+
+        assert code == cli.EXIT_OK
+        assert events[0]["event"] == "series_discovered"
+        assert events[0]["title"] == "Tower of God" and events[0]["found"] == 2
+        assert engine.run_chapter_batch.call_args.args[0] == {1.0: f"{series}chapter-1/", 2.0: f"{series}chapter-2/"}
+
+    def test_usage_errors(self, capsys):
+        assert cli.main([URL, "--chapters", "9-1"]) == cli.EXIT_USAGE
+        assert cli.main([URL, URL, "--name", "x"]) == cli.EXIT_USAGE
+        assert cli.main([URL, "--quality", "500"]) == cli.EXIT_USAGE
+        assert cli.main([URL, "--queue", "redis://x", "--sync"]) == cli.EXIT_USAGE
+        assert "erreur" in capsys.readouterr().err
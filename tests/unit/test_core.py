@@ -13,7 +13,7 @@ from pathlib import Path
 # Ajouter le répertoire parent au path
 sys.path.insert(0, os.path.abspath(os.path.join(os.path.dirname(__file__), '../..')))
 
-from panelia.core.driver import WebSession
+from panelia.core.driver import WebSession, page_status
 
 
 class TestWebSessionInit:
@@ -154,6 +154,33 @@ class TestWebSessionMethods:
                 session.driver.set_page_load_timeout.assert_called_once_with(10)
                 session.driver.get.assert_called_once_with("https://example.com")
 
+    @pytest.mark.unit
+    @pytest.mark.parametrize("title, status", [
+        ("Chapitre 12 - Solo Leveling", 200),
+        ("Just a moment...", 503),
+        ("429 Too Many Requests", 429),
+        ("Access denied | site.com used Cloudflare to restrict access", 429),
+        (None, None),
+    ])
+    def test_get_reports_page_outcome_to_limiter(self, title, status):
+        """Le limiteur reçoit le statut déduit de la page (rien si inconnu)"""
+        with patch('platform.system', return_value='Linux'):
+            with patch('panelia.core.driver.WebSession._start_driver'):
+                session = WebSession(headless=True)
+                session.driver = Mock()
+                session.driver.title = title
+                limiter = Mock()
+                limiter.acquire.return_value = 0.0
+
+                with patch('panelia.core.driver.get_rate_limiter', return_value=limiter):
+                    session.get("https://example.com/chap-12")
+
+                assert page_status(title) == status
+                if status is None:
+                    limiter.record_response.assert_not_called()
+                else:
+                    limiter.record_response.assert_called_once_with("https://example.com/chap-12", status)
+
     @pytest.mark.unit
     def test_page_source_property(self):
         """Test propriété page_source"""
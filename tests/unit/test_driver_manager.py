@@ -0,0 +1,145 @@
+"""
+Tests unitaires pour driver_manager.py
+
+Teste le gestionnaire de drivers durables : flotte partagée entre découverte
+et moteur (non fermée par engine.shutdown()), fermeture sur inactivité puis
+redémarrage à la demande, recyclage par âge et agrandissement de la flotte.
+"""
+import pytest
+import time
+import sys
+import os
+
+sys.path.insert(0, os.path.abspath(os.path.join(os.path.dirname(__file__), '../..')))
+
+from panelia.core.driver_manager import WarmDriverManager
+
+
+def madara_page(series_url, numbers):
+    """Page de série Madara minimale listant les chapitres `numbers`."""
+    items = "".join(f'<li><a href="{series_url}chapter-{n}/">Chapter {n}</a></li>' for n in numbers)
+    return f'<html><body><h1>{series_url}</h1><ul class="main">{items}</ul></body></html>'
+
+
+class FakeSession:
+    """WebSession factice, numérotée dans l'ordre de création."""
+    created = []
+    # URL -> HTML servi par get()
+    pages = {}
+
+    def __init__(self, headless, profile_id):
+        self.headless = headless
+        self.profile_id = profile_id
+        self.quit_called = False
+        self.page_source = ""
+        FakeSession.created.append(self)
+
+    def get(self, url):
+        self.page_source = FakeSession.pages.get(url, "<html><body></body></html>")
+
+    def quit(self):
+        self.quit_called = True
+
+
+@pytest.fixture(autouse=True)
+def reset_sessions():
+    FakeSession.created = []
+    FakeSession.pages = {}
+    yield
+
+
+def make_manager(**kwargs):
+    kwargs.setdefault("start_delay", 0)
+    kwargs.setdefault("health_check", None)
+    kwargs.setdefault("reap_interval", 3600)
+    return WarmDriverManager(session_factory=lambda headless, profile_id: lambda: FakeSession(headless, profile_id), **kwargs)
+
+
+@pytest.mark.unit
+def test_discovery_and_engine_share_warm_drivers(tmp_path):
+    from panelia.core.engine import ScraperEngine
+
+    manager = make_manager()
+    with manager.lease(headless=True) as discovery_session:
+        pass
+    assert len(FakeSession.created) == 1
+
+    engine = ScraperEngine(work_dir=str(tmp_path), num_drivers=2, warm_connections=False, driver_manager=manager)
+    engine.start_driver_pool()
+    # Flotte agrandie à 2 : le driver de la découverte est réutilisé
+    assert len(FakeSession.created) == 2
+    assert discovery_session in engine.driver_pool._all
+    engine.shutdown()
+    assert not discovery_session.quit_called
+
+    # Lot suivant : nouveau moteur, mêmes drivers chauds
+    engine = ScraperEngine(work_dir=str(tmp_path), num_drivers=2, warm_connections=False, driver_manager=manager)
+    engine.start_driver_pool()
+    engine.shutdown()
+    assert len(FakeSession.created) == 2
+    assert manager.get_stats()["headless/temp"]["starts"] == 1
+
+    manager.close_all()
+    assert all(s.quit_called for s in FakeSession.created)
+
+
+@pytest.mark.unit
+def test_settings_get_separate_pools():
+    manager = make_manager()
+    with manager.lease(headless=True):
+        pass
+    with manager.lease(headless=False, profile_id="default") as session:
+        assert (session.headless, session.profile_id) == (False, "default")
+    assert set(manager.get_stats()) == {"headless/temp", "visible/default"}
+    manager.close_all()
+
+
+@pytest.mark.unit
+def test_idle_pool_closed_then_restarted_on_demand():
+    manager = make_manager(idle_timeout=0.05)
+    with manager.lease() as first:
+        # Driver prêté : jamais fermé, même au-delà du délai
+        time.sleep(0.1)
+        assert manager.reap() == 0
+    assert manager.reap() == 0
+    time.sleep(0.1)
+    assert manager.reap() == 1
+    assert first.quit_called
+
+    with manager.lease() as second:
+        assert second is not first
+    assert manager.get_stats()["headless/temp"]["starts"] == 2
+    manager.close_all()
+
+
+@pytest.mark.unit
+def test_old_driver_recycled_on_lease():
+    manager = make_manager(max_age=0.05)
+    with manager.lease() as first:
+        pass
+    time.sleep(0.1)
+    with manager.lease() as second:
+        assert second is not first
+    assert first.quit_called
+    assert manager.get_stats()["headless/temp"]["recycled"] == 1
+    manager.close_all()
+
+
+@pytest.mark.unit
+def test_fallback_discovery_loads_series_on_warm_driver():
+    """Driver emprunté encore sur la série précédente : la cascade de repli lit la bonne page"""
+    from panelia.scrapers.discovery import discover_chapters
+
+    previous, series = "https://unknown-a.test/manga/previous/", "https://unknown-b.test/manga/next/"
+    FakeSession.pages = {previous: madara_page(previous, [1, 2, 3]), series: madara_page(series, [7])}
+    manager = make_manager()
+    with manager.lease(headless=True) as session:
+        session.get(previous)
+
+    with manager.lease(headless=True) as session:
+        chapters, title = discover_chapters(series, session)
+
+    assert len(FakeSession.created) == 1
+    assert chapters == {7.0: f"{series}chapter-7/"}
+    assert title == series
+    manager.close_all()
@@ -0,0 +1,216 @@
+"""
+Tests unitaires pour driver_pool.py
+
+Teste le pool de drivers à bail exclusif : attribution LRU, emprunt bloquant
+et métriques d'attente, contrôle de santé et remplacement, fermeture, et
+usage par ScraperEngine (jamais deux chapitres sur le même driver).
+"""
+import pytest
+import threading
+import time
+from unittest.mock import patch
+import sys
+import os
+
+sys.path.insert(0, os.path.abspath(os.path.join(os.path.dirname(__file__), '../..')))
+
+from panelia.core.driver_pool import DriverPool, driver_is_alive
+
+
+class FakeSession:
+    """WebSession factice : numérotée, peut « mourir »."""
+    created = 0
+
+    def __init__(self):
+        FakeSession.created += 1
+        self.id = FakeSession.created
+        self.alive = True
+        self.quit_called = False
+
+    def quit(self):
+        self.quit_called = True
+
+
+@pytest.fixture(autouse=True)
+def reset_counter():
+    FakeSession.created = 0
+    yield
+
+
+def make_pool(size=3, **kwargs):
+    kwargs.setdefault("health_check", lambda ws: ws.alive)
+    pool = DriverPool(FakeSession, size=size, **kwargs)
+    pool.start()
+    return pool
+
+
+@pytest.mark.unit
+class TestDriverPool:
+    def test_least_recently_used_first(self):
+        pool = make_pool(3)
+        order = []
+        for _ in range(6):
+            with pool.lease() as ws:
+                order.append(ws.id)
+        assert order == [1, 2, 3, 1, 2, 3]
+
+    def test_lease_is_exclusive_and_blocks(self):
+        pool = make_pool(1)
+        ws = pool.acquire()
+        got = []
+        waiter = threading.Thread(target=lambda: got.append(pool.acquire()))
+        waiter.start()
+        time.sleep(0.1)
+        assert got == []
+
+        pool.release(ws)
+        waiter.join(timeout=2)
+        assert got == [ws]
+        stats = pool.get_stats()
+        assert stats["checkouts"] == 2
+        assert stats["blocked_checkouts"] == 1
+        assert stats["max_wait_ms"] >= 90
+
+    def test_waiters_served_by_priority(self):
+        pool = make_pool(1)
+        ws = pool.acquire()
+        served = []
+
+        def borrow(label, priority):
+            driver = pool.acquire(priority=priority)
+            served.append(label)
+            pool.release(driver)
+
+        waiters = []
+        for label, priority in (("low", 0), ("high", 5), ("low2", 0)):
+            waiters.append(threading.Thread(target=borrow, args=(label, priority)))
+            waiters[-1].start()
+            time.sleep(0.05)
+        assert pool.get_stats()["waiting"] == 3
+
+        pool.release(ws)
+        for waiter in waiters:
+            waiter.join(timeout=2)
+        assert served == ["high", "low", "low2"]
+
+    def test_acquire_timeout(self):
+        pool = make_pool(1)
+        pool.acquire()
+        with pytest.raises(TimeoutError):
+            pool.acquire(timeout=0.05)
+
+    def test_dead_driver_replaced_on_checkout(self):
+        pool = make_pool(2)
+        with pool.lease() as first:
+            pass
+        first.alive = False
+        with pool.lease() as second:
+            pass
+        with pool.lease() as replacement:
+            pass
+
+        assert first.quit_called
+        assert second.id == 2
+        assert replacement.id == 3
+        stats = pool.get_stats()
+        assert stats["health_failures"] == 1
+        assert stats["replaced"] == 1
+        assert stats["size"] == 2
+
+    def test_failed_replacement_shrinks_pool(self):
+        pool = make_pool(1)
+        with pool.lease() as ws:
+            pass
+        ws.alive = False
+        with patch.object(pool, "factory", side_effect=RuntimeError("chrome absent")):
+            with pytest.raises(RuntimeError):
+                pool.acquire()
+        assert len(pool) == 0
+        with pytest.raises(RuntimeError):
+            pool.acquire(timeout=0.05)
+
+    def test_close_wakes_waiters_and_quits_drivers(self):
+        pool = make_pool(1)
+        ws = pool.acquire()
+        errors = []
+
+        def wait():
+            try:
+                pool.acquire()
+            except RuntimeError as e:
+                errors.append(e)
+
+        waiter = threading.Thread(target=wait)
+        waiter.start()
+        time.sleep(0.05)
+        pool.close()
+        waiter.join(timeout=2)
+
+        assert len(errors) == 1
+        assert ws.quit_called
+        assert not pool.started
+
+    def test_start_failure_closes_created_drivers(self):
+        created = []
+
+        def factory():
+            if len(created) == 2:
+                raise RuntimeError("chrome absent")
+            created.append(FakeSession())
+            return created[-1]
+
+        pool = DriverPool(factory, size=3)
+        with pytest.raises(RuntimeError):
+            pool.start()
+        assert all(ws.quit_called for ws in created)
+        assert not pool.started
+
+    def test_default_health_check(self):
+        class Driver:
+            window_handles = ["w1"]
+
+        class Broken:
+            @property
+            def window_handles(self):
+                raise ConnectionError("session perdue")
+
+        ws = FakeSession()
+        ws.driver = Driver()
+        assert driver_is_alive(ws)
+        ws.driver = Broken()
+        assert not driver_is_alive(ws)
+        ws.driver = None
+        assert not driver_is_alive(ws)
+
+
+@pytest.mark.unit
+def test_engine_leases_driver_only_for_extraction(tmp_path):
+    """Chapitres Selenium : chaque extraction a son driver à elle, tous les drivers servent"""
+    from panelia.core.engine import ScraperEngine
+
+    engine = ScraperEngine(work_dir=str(tmp_path), num_drivers=2, image_workers_per_chap=1, warm_connections=False)
+    engine.driver_pool = DriverPool(FakeSession, size=2, health_check=None)
+
+    busy, used, overlap = set(), [], []
+    lock = threading.Lock()
+
+    def extract(chap_url, driver_ws, validated_params):
+        with lock:
+            if driver_ws.id in busy:
+                overlap.append(driver_ws.id)
+            busy.add(driver_ws.id)
+            used.append(driver_ws.id)
+        time.sleep(0.02)
+        with lock:
+            busy.discard(driver_ws.id)
+        return [], None
+
+    chapters = {float(n): f"https://selenium-only.test/chap-{n}" for n in range(1, 7)}
+    with patch.object(engine, "_extract_image_urls", side_effect=extract):
+        results = engine.run_chapter_batch(chapters, {"final_manhwa_name": "test"})
+    engine.shutdown()
+
+    assert [r["chap_num"] for r in results] == sorted(chapters)
+    assert overlap == []
+    assert sorted(set(used)) == [1, 2]
+    assert len(used) == 6
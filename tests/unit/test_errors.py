@@ -0,0 +1,103 @@
+"""
+Tests unitaires pour errors.py
+
+Teste les circuit breakers : seuil, sonde HALF_OPEN unique, breakers par hôte.
+"""
+import pytest
+import threading
+import time
+import sys
+import os
+
+sys.path.insert(0, os.path.abspath(os.path.join(os.path.dirname(__file__), '../..')))
+
+from panelia.utils.errors import CircuitBreaker, ErrorHandler
+from panelia.utils.metrics import get_collector, reset_collector
+
+
+@pytest.fixture(autouse=True)
+def fresh_collector():
+    reset_collector()
+    yield
+
+
+@pytest.mark.unit
+class TestCircuitBreaker:
+    """Tests du circuit breaker"""
+
+    def test_opens_after_consecutive_failures(self):
+        breaker = CircuitBreaker(threshold=3, timeout=60)
+        breaker.record_failure()
+        breaker.record_failure()
+        breaker.record_success()  # remet le compteur à zéro
+        breaker.record_failure()
+        breaker.record_failure()
+        assert breaker.state == "CLOSED"
+        breaker.record_failure()
+        assert breaker.state == "OPEN"
+        assert not breaker.can_execute()
+        assert breaker.retry_in() > 59
+
+    def test_half_open_allows_single_probe(self):
+        breaker = CircuitBreaker(threshold=1, timeout=0.05)
+        breaker.record_failure()
+        time.sleep(0.06)
+
+        granted = []
+        barrier = threading.Barrier(8)
+
+        def probe():
+            barrier.wait()
+            granted.append(breaker.can_execute())
+
+        threads = [threading.Thread(target=probe) for _ in range(8)]
+        for t in threads:
+            t.start()
+        for t in threads:
+            t.join()
+
+        assert granted.count(True) == 1
+        assert breaker.state == "HALF_OPEN"
+
+        breaker.record_success()
+        assert breaker.state == "CLOSED"
+        assert breaker.can_execute()
+
+    def test_failed_probe_reopens(self):
+        breaker = CircuitBreaker(threshold=1, timeout=0.01)
+        breaker.record_failure()
+        time.sleep(0.02)
+        assert breaker.can_execute()
+        breaker.record_failure()
+        assert breaker.state == "OPEN"
+
+    def test_transitions_callback(self):
+        seen = []
+        breaker = CircuitBreaker(threshold=1, timeout=0.01, name="h", on_transition=lambda *t: seen.append(t))
+        breaker.record_failure()
+        time.sleep(0.02)
+        breaker.can_execute()
+        breaker.record_success()
+        assert seen == [("h", "CLOSED", "OPEN"), ("h", "OPEN", "HALF_OPEN"), ("h", "HALF_OPEN", "CLOSED")]
+
+
+@pytest.mark.unit
+class TestHostBreakers:
+    """Tests des breakers par hôte"""
+
+    def test_one_breaker_per_host(self):
+        handler = ErrorHandler()
+        a = handler.get_host_breaker("https://cdn-a.example.com/1.jpg")
+        assert handler.get_host_breaker("https://CDN-A.example.com/2.jpg") is a
+        assert handler.get_host_breaker("https://cdn-b.example.com/1.jpg") is not a
+
+    def test_transitions_reach_metrics(self):
+        handler = ErrorHandler()
+        breaker = handler.get_host_breaker("https://cdn.example.com/x.jpg")
+        for _ in range(handler.HOST_BREAKER_THRESHOLD):
+            breaker.record_failure()
+
+        stats = get_collector().get_stats()['circuit_breakers']
+        assert stats['opened'] == 1
+        assert stats['transitions'][0]['host'] == "cdn.example.com"
+        assert handler.get_host_breaker_states() == {"cdn.example.com": "OPEN"}
@@ -0,0 +1,162 @@
+"""
+Tests unitaires pour events.py et cancellation.py
+
+Teste le jeton d'annulation, le flux d'événements, l'arrêt rapide de
+stream_download_images, et run_chapter_batch : callbacks dans l'ordre de
+complétion, cycle d'événements par chapitre, annulation d'un lot.
+"""
+import pytest
+import threading
+import time
+import httpx
+import sys
+import os
+
+sys.path.insert(0, os.path.abspath(os.path.join(os.path.dirname(__file__), '../..')))
+
+from panelia.core.events import CHAPTER_FINISHED, CHAPTER_STARTED, IMAGE_DOWNLOADED, IMAGE_SAVED, IMAGES_FOUND, EventStream
+from panelia.utils.cancellation import CancellationToken, OperationCancelled
+from panelia.utils.http import stream_download_images
+
+
+def slow_cdn(delay):
+    """Handler de CDN simulé : chaque image répond après `delay` secondes."""
+    def handler(request):
+        time.sleep(delay)
+        return httpx.Response(200, content=b"img" + request.url.path.encode())
+    return handler
+
+
+@pytest.mark.unit
+class TestCancellationToken:
+    def test_cancel_once_and_callbacks(self):
+        token = CancellationToken()
+        calls = []
+        token.add_callback(lambda: calls.append("a"))
+        remove = token.add_callback(lambda: calls.append("b"))
+        remove()
+
+        assert not token.cancelled
+        token.raise_if_cancelled()
+        assert token.cancel("stop")
+        assert not token.cancel("encore")
+        assert token.cancelled and token.reason == "stop"
+        assert calls == ["a"]
+        with pytest.raises(OperationCancelled):
+            token.raise_if_cancelled()
+
+    def test_callback_after_cancel_runs_immediately(self):
+        token = CancellationToken()
+        token.cancel()
+        calls = []
+        token.add_callback(lambda: calls.append(1))
+        assert calls == [1]
+
+    def test_wait_and_future(self):
+        token = CancellationToken()
+        assert not token.wait(0.01)
+        threading.Timer(0.05, token.cancel).start()
+        assert token.wait(2)
+        assert token.future.done()
+
+
+@pytest.mark.unit
+def test_event_stream_get_timeout():
+    events = EventStream()
+    assert events.get(timeout=0.01) is None
+    events.emit(IMAGES_FOUND, 3.0, count=12)
+    event = events.get(timeout=0.01)
+    assert (event.kind, event.chap_num, event.data) == (IMAGES_FOUND, 3.0, {"count": 12})
+
+
+@pytest.mark.unit
+def test_stream_download_stops_quickly_on_cancel(mock_http):
+    """Annulation pendant des téléchargements lents : le générateur lève sans attendre la fin des requêtes"""
+    token = CancellationToken()
+    urls = [f"http://cdn.test/{i}.jpg" for i in range(20)]
+    received = []
+    with mock_http(slow_cdn(0.5)):
+        threading.Timer(0.1, token.cancel).start()
+        start = time.monotonic()
+        with pytest.raises(OperationCancelled):
+            for img in stream_download_images(urls, max_workers=2, ordered=True, cancel_token=token):
+                received.append(img)
+        elapsed = time.monotonic() - start
+
+    assert received == []
+    assert elapsed < 0.4
+
+
+@pytest.mark.unit
+def test_batch_reports_in_completion_order(fake_engine):
+    """Chapitre 1 lent, chapitre 2 rapide : le 2 est rapporté d'abord, les résultats restent dans l'ordre"""
+    def extract(chap_url, driver_ws, validated_params):
+        if chap_url.endswith("chap-1"):
+            time.sleep(0.3)
+        return [f"http://cdn.test/{chap_url[-1]}/{i}.jpg" for i in range(3)], None
+
+    finished_order, events = [], []
+    chapters = {1.0: "https://selenium-only.test/chap-1", 2.0: "https://selenium-only.test/chap-2"}
+    with fake_engine(extract, num_drivers=2, image_workers_per_chap=2) as engine:
+        results = engine.run_chapter_batch(
+            chapters, {"final_manhwa_name": "serie"},
+            ui_progress_callback=lambda done, total, result: finished_order.append(result["chap_num"]),
+            event_callback=events.append
+        )
+
+    assert finished_order == [2.0, 1.0]
+    assert [r["chap_num"] for r in results] == [1.0, 2.0]
+    assert all(r["panels_saved"] == 3 and r["error"] is None for r in results)
+
+    kinds = [e.kind for e in events if e.chap_num == 1.0]
+    assert kinds[0] == CHAPTER_STARTED and kinds[1] == IMAGES_FOUND and kinds[-1] == CHAPTER_FINISHED
+    assert kinds.count(IMAGE_DOWNLOADED) == 3 and kinds.count(IMAGE_SAVED) == 3
+    saved = [e.data for e in events if e.chap_num == 1.0 and e.kind == IMAGE_SAVED]
+    assert saved == [{"index": i, "panels": 1} for i in (1, 2, 3)]
+
+
+@pytest.mark.unit
+def test_image_events_carry_source_index(fake_engine):
+    """Image 2 en échec : index = ordre source (1, 3), downloaded = compteur (1, 2)"""
+    def handler(request):
+        if request.url.path.endswith("/1.jpg"):
+            return httpx.Response(404)
+        return httpx.Response(200, content=b"img" + request.url.path.encode())
+
+    def extract(chap_url, driver_ws, validated_params):
+        return [f"http://cdn.test/{i}.jpg" for i in range(3)], None
+
+    events = []
+    with fake_engine(extract, handler, num_drivers=2, image_workers_per_chap=2) as engine:
+        engine.run_chapter_batch({1.0: "https://selenium-only.test/chap-1"}, {"final_manhwa_name": "serie"}, event_callback=events.append)
+
+    downloaded = [e.data for e in events if e.kind == IMAGE_DOWNLOADED]
+    assert downloaded == [{"index": 1, "downloaded": 1, "found": 3}, {"index": 3, "downloaded": 2, "found": 3}]
+    assert [e.data["index"] for e in events if e.kind == IMAGE_SAVED] == [1, 3]
+
+
+@pytest.mark.unit
+def test_batch_cancellation_stops_queued_and_running_chapters(fake_engine):
+    """Annulé au premier téléchargement : chapitres en file retirés, chapitre en cours interrompu"""
+    from panelia.core.engine import CANCELLED_MESSAGE
+
+    token = CancellationToken()
+
+    def extract(chap_url, driver_ws, validated_params):
+        return [f"http://cdn.test/{chap_url[-1]}/{i}.jpg" for i in range(10)], None
+
+    def on_event(event):
+        if event.kind == IMAGE_DOWNLOADED:
+            token.cancel("test")
+
+    chapters = {float(n): f"https://selenium-only.test/chap-{n}" for n in range(1, 5)}
+    with fake_engine(extract, slow_cdn(0.2), image_workers_per_chap=2) as engine:
+        start = time.monotonic()
+        results = engine.run_chapter_batch(chapters, {"final_manhwa_name": "serie"}, event_callback=on_event, cancel_token=token)
+        elapsed = time.monotonic() - start
+
+    assert [r["chap_num"] for r in results] == [1.0, 2.0, 3.0, 4.0]
+    assert all(r["error"] == CANCELLED_MESSAGE for r in results)
+    assert results[0]["downloaded_count"] < 10
+    # 10 images x 0.2 s par chapitre sans annulation
+    assert elapsed < 1.5
@@ -12,7 +12,9 @@ import os
 # Ajouter le répertoire parent au path
 sys.path.insert(0, os.path.abspath(os.path.join(os.path.dirname(__file__), '../..')))
 
-from panelia.utils.http import download_image_smart, download_all_images, USER_AGENTS
+from panelia.utils.http import download_image_smart, download_image_spooled, download_all_images, stream_download_images, USER_AGENTS, _ImageJob
+from panelia.utils.retry import Deadline, RetryPolicy
+from panelia.utils.http_pool import HttpClientPool
 
 
 class TestDownloadImageSmart:
@@ -21,7 +23,7 @@ class TestDownloadImageSmart:
     @pytest.mark.unit
     def test_download_success_first_attempt(self):
         """Test téléchargement réussi du premier coup"""
-        mock_response = Mock()
+        mock_response = Mock(status_code=200, headers={})
         mock_response.content = b"fake_image_data"
         mock_response.raise_for_status = Mock()
 
@@ -46,15 +48,65 @@ class TestDownloadImageSmart:
             mock_client_class.return_value = mock_client
 
             with patch('time.sleep'):  # Mock sleep pour accélérer
-                result = download_image_smart("http://example.com/image.jpg", timeout=10)
+                result = download_image_smart("http://example.com/image.jpg", timeout=10, deadline=Deadline(10))
 
             assert result is None
-            assert mock_client.get.call_count == 8  # max_retries = 8
+            # 8 tentatives, mais le circuit de l'hôte s'ouvre après 5 échecs consécutifs
+            # et sa prochaine sonde (30 s) tombe après l'échéance de l'image
+            assert mock_client.get.call_count == 5
+
+    @pytest.mark.unit
+    def test_half_open_wait_does_not_use_attempts(self, mock_http):
+        """Attendre la sonde d'un autre téléchargement ne consomme pas de tentative"""
+        import threading
+        from datetime import datetime, timedelta
+        from panelia.utils.errors import get_error_handler
+
+        breaker = get_error_handler().get_host_breaker("example.com")
+        breaker.timeout = 10
+        for _ in range(breaker.threshold):
+            breaker.record_failure()
+        # Sonde d'un autre téléchargement en cours (HALF_OPEN)
+        breaker.last_failure_time = datetime.now() - timedelta(seconds=11)
+        assert breaker.can_execute() and breaker.state == "HALF_OPEN"
+
+        # La sonde réussit après plus de max_attempts × 1 s
+        probe = threading.Timer(2.5, breaker.record_success)
+        probe.start()
+        handler = lambda request: httpx.Response(200, content=b"ok")
+        try:
+            with mock_http(handler):
+                result = download_image_smart("http://example.com/image.jpg", retry_policy=RetryPolicy(max_attempts=2, base_delay=0.0))
+        finally:
+            probe.cancel()
+
+        assert result == b"ok"
+        assert breaker.state == "CLOSED"
+
+    @pytest.mark.unit
+    def test_download_does_not_retry_404(self):
+        """Une erreur définitive (404) n'est pas retentée"""
+        mock_response = Mock(status_code=404, headers={})
+        mock_response.raise_for_status.side_effect = httpx.HTTPStatusError(
+            "404", request=Mock(), response=mock_response
+        )
+
+        with patch('httpx.Client') as mock_client_class:
+            mock_client = MagicMock()
+            mock_client.get.return_value = mock_response
+            mock_client_class.return_value = mock_client
+
+            with patch('time.sleep') as mock_sleep:
+                result = download_image_smart("http://example.com/missing.jpg", timeout=10)
+
+            assert result is None
+            assert mock_client.get.call_count == 1
+            mock_sleep.assert_not_called()
 
     @pytest.mark.unit
     def test_download_with_referer(self):
         """Test que le referer est bien passé"""
-        mock_response = Mock()
+        mock_response = Mock(status_code=200, headers={})
         mock_response.content = b"image_data"
         mock_response.raise_for_status = Mock()
 
@@ -71,14 +123,14 @@ class TestDownloadImageSmart:
             )
 
             assert result == b"image_data"
-            # Vérifier headers Referer
-            call_kwargs = mock_client_class.call_args[1]
+            # Vérifier headers Referer (passés par requête, le client est partagé)
+            call_kwargs = mock_client.get.call_args[1]
             assert 'Referer' in call_kwargs['headers']
 
     @pytest.mark.unit
     def test_user_agent_in_headers(self):
         """Test que User-Agent est utilisé"""
-        mock_response = Mock()
+        mock_response = Mock(status_code=200, headers={})
         mock_response.content = b"data"
         mock_response.raise_for_status = Mock()
 
@@ -90,11 +142,201 @@ class TestDownloadImageSmart:
 
             download_image_smart("http://example.com/image.jpg", timeout=10)
 
-            call_kwargs = mock_client_class.call_args[1]
+            call_kwargs = mock_client.get.call_args[1]
             used_ua = call_kwargs['headers']['User-Agent']
             assert used_ua in USER_AGENTS
 
 
+class TestHttpClientPool:
+    """Tests pour le registre de clients partagés"""
+
+    @pytest.mark.unit
+    def test_same_host_reuses_client(self):
+        """Deux images du même CDN passent par le même client"""
+        with patch('httpx.Client') as mock_client_class:
+            pool = HttpClientPool()
+            c1 = pool.get_client("https://cdn.example.com/a.jpg")
+            c2 = pool.get_client("https://cdn.example.com/b.jpg")
+
+            assert c1 is c2
+            assert mock_client_class.call_count == 1
+
+    @pytest.mark.unit
+    def test_key_includes_host_protocol_and_proxy(self):
+        """Hôte, protocole et proxy distincts -> clients distincts"""
+        with patch('httpx.Client') as mock_client_class:
+            mock_client_class.side_effect = lambda **kw: MagicMock()
+            pool = HttpClientPool()
+            base = pool.get_client("https://cdn.example.com/a.jpg")
+
+            assert pool.get_client("https://other.example.com/a.jpg") is not base
+            assert pool.get_client("https://cdn.example.com/a.jpg", http2=False) is not base
+            assert pool.get_client("https://cdn.example.com/a.jpg", proxy="http://proxy:8080") is not base
+            assert mock_client_class.call_count == 4
+
+    @pytest.mark.unit
+    def test_fallback_http1_when_h2_missing(self):
+        """Sans h2, une demande HTTP/2 retombe sur le client HTTP/1.1"""
+        def fake_client(**kwargs):
+            if kwargs.get("http2"):
+                raise ImportError("h2 manquant")
+            return MagicMock()
+
+        with patch('httpx.Client', side_effect=fake_client):
+            pool = HttpClientPool()
+            c1 = pool.get_client("https://cdn.example.com/a.jpg", http2=True)
+            c2 = pool.get_client("https://cdn.example.com/b.jpg", http2=False)
+
+            assert c1 is c2
+
+    @pytest.mark.unit
+    def test_reuse_counters(self):
+        """Les compteurs distinguent connexions neuves et réutilisées"""
+        mock_client = MagicMock()
+
+        def fake_get(url, extensions=None, **kwargs):
+            # Seule la première requête ouvre une connexion TCP
+            if mock_client.get.call_count == 1:
+                extensions["trace"]("connection.connect_tcp.complete", {})
+            return Mock()
+
+        mock_client.get.side_effect = fake_get
+
+        with patch('httpx.Client', return_value=mock_client):
+            pool = HttpClientPool()
+            for i in range(3):
+                pool.get(f"https://cdn.example.com/{i}.jpg")
+
+        stats = pool.get_stats()["https://cdn.example.com [h2]"]
+        assert stats["requests"] == 3
+        assert stats["new_connections"] == 1
+        assert stats["reused_connections"] == 2
+
+    @pytest.mark.unit
+    def test_ttfb_split_between_cold_and_warm(self):
+        """Le TTFB d'une requête qui ouvre sa connexion est classé froid"""
+        mock_client = MagicMock()
+
+        def fake_get(url, extensions=None, **kwargs):
+            if mock_client.get.call_count == 1:
+                extensions["trace"]("connection.connect_tcp.complete", {})
+            extensions["trace"]("http11.receive_response_headers.complete", {})
+            return Mock()
+
+        mock_client.get.side_effect = fake_get
+
+        with patch('httpx.Client', return_value=mock_client):
+            pool = HttpClientPool()
+            for i in range(3):
+                pool.get(f"https://cdn.example.com/{i}.jpg")
+
+        report = pool.get_ttfb_report()["https://cdn.example.com"]
+        assert report["cold_requests"] == 1
+        assert report["warm_requests"] == 2
+        assert report["cold_ms"] is not None and report["warm_ms"] is not None
+
+    @pytest.mark.unit
+    def test_warm_up_opens_connections_per_host(self):
+        """Pré-chauffage : DNS puis N connexions par hôte HTTP/1.1, une seule en HTTP/2"""
+        clients = {}
+
+        def fake_client(**kwargs):
+            client = MagicMock()
+
+            def fake_head(url, extensions=None, **kw):
+                extensions["trace"]("connection.connect_tcp.complete", {})
+                return Mock(status_code=200)
+
+            client.head.side_effect = fake_head
+            clients[kwargs["http2"]] = client
+            return client
+
+        urls = ["https://cdn.example.com/1.jpg", "https://cdn.example.com/2.jpg", "http://img.example.org/1.jpg"]
+        with patch('httpx.Client', side_effect=fake_client), \
+             patch('panelia.utils.http_pool.socket.getaddrinfo', return_value=[]) as dns:
+            pool = HttpClientPool()
+            report = pool.warm_up(urls, connections=3)
+
+        assert dns.call_count == 2
+        assert report["https://cdn.example.com"]["connections"] == 1
+        assert report["http://img.example.org"]["connections"] == 3
+        assert report["http://img.example.org"]["error"] is None
+        # Connexions de chauffe comptées à part : les vraies requêtes les réutilisent
+        stats = pool.get_stats()["http://img.example.org [h2]"]
+        assert stats["warmup_connections"] == 3
+        assert stats["new_connections"] == 0
+
+    @pytest.mark.unit
+    def test_warm_up_reports_dns_failure(self):
+        """Un hôte introuvable est signalé sans bloquer les autres"""
+        import socket
+
+        with patch('httpx.Client', side_effect=lambda **kw: MagicMock()), \
+             patch('panelia.utils.http_pool.socket.getaddrinfo', side_effect=socket.gaierror("inconnu")):
+            pool = HttpClientPool()
+            report = pool.warm_up(["https://nowhere.invalid/1.jpg"])
+
+        assert report["https://nowhere.invalid"]["connections"] == 0
+        assert "DNS" in report["https://nowhere.invalid"]["error"]
+
+
+class TestDownloadImageSpooled:
+    """Tests pour le téléchargement streamé vers fichier temporaire"""
+
+    @pytest.mark.unit
+    def test_small_image_stays_in_memory_file(self, mock_http):
+        """Sous le seuil, le corps est rendu dans un fichier rembobiné"""
+        def handler(request):
+            return httpx.Response(200, content=b"x" * 100)
+
+        with mock_http(handler):
+            fp = download_image_spooled("http://example.com/a.jpg", spool_threshold=1024)
+
+        assert fp.read() == b"x" * 100
+        fp.close()
+
+    @pytest.mark.unit
+    def test_interrupted_transfer_resumes_with_range(self, mock_http):
+        """Un transfert coupé reprend à l'octet près (Range + If-Range)"""
+        full = bytes(range(100))
+        seen = []
+
+        def handler(request):
+            seen.append(dict(request.headers))
+            if "range" not in request.headers:
+                # Coupure après 40 octets sur 100 annoncés
+                return httpx.Response(200, headers={"Content-Length": "100", "ETag": '"v1"'}, content=full[:40])
+            return httpx.Response(206, headers={"Content-Range": "bytes 40-99/100", "ETag": '"v1"'}, content=full[40:])
+
+        with mock_http(handler):
+            with patch('time.sleep'):
+                fp = download_image_spooled("http://example.com/big.jpg", spool_threshold=16)
+
+        assert fp.read() == full
+        assert seen[1]["range"] == "bytes=40-"
+        assert seen[1]["if-range"] == '"v1"'
+        fp.close()
+
+    @pytest.mark.unit
+    def test_server_ignoring_range_restarts_cleanly(self, mock_http):
+        """Si le serveur renvoie 200 au lieu de 206, on repart de zéro"""
+        full = b"abcdefghij"
+        calls = {"n": 0}
+
+        def handler(request):
+            calls["n"] += 1
+            if calls["n"] == 1:
+                return httpx.Response(200, headers={"Content-Length": "10"}, content=full[:4])
+            return httpx.Response(200, headers={"Content-Length": "10"}, content=full)
+
+        with mock_http(handler):
+            with patch('time.sleep'):
+                fp = download_image_spooled("http://example.com/big.jpg")
+
+        assert fp.read() == full
+        fp.close()
+
+
 class TestDownloadAllImages:
     """Tests pour download_all_images()"""
 
@@ -107,8 +349,8 @@ class TestDownloadAllImages:
             "http://example.com/img3.jpg"
         ]
 
-        with patch('panelia.utils.http.download_image_smart') as mock_download:
-            mock_download.side_effect = [b"img1", b"img2", b"img3"]
+        with patch.object(_ImageJob, 'step', autospec=True) as mock_download:
+            mock_download.side_effect = [(True, b"img1"), (True, b"img2"), (True, b"img3")]
 
             results = download_all_images(urls, chapter_num=1, timeout=10, max_workers=2)
 
@@ -120,8 +362,8 @@ class TestDownloadAllImages:
         """Test que les images échouées (None) sont filtrées"""
         urls = ["http://example.com/img1.jpg", "http://example.com/img2.jpg"]
 
-        with patch('panelia.utils.http.download_image_smart') as mock_download:
-            mock_download.side_effect = [b"img1", None]  # img2 échoue
+        with patch.object(_ImageJob, 'step', autospec=True) as mock_download:
+            mock_download.side_effect = [(True, b"img1"), (True, None)]  # img2 échoue
 
             results = download_all_images(urls, timeout=10)
 
@@ -135,6 +377,98 @@ class TestDownloadAllImages:
         assert results == []
 
 
+class TestStreamDownloadImagesOrdered:
+    """Tests pour le mode ordonné et la fenêtre bornée"""
+
+    @pytest.mark.unit
+    def test_ordered_mode_yields_source_order(self):
+        """Les images sortent dans l'ordre des URLs même si elles finissent dans le désordre"""
+        import time as _time
+        urls = [f"http://example.com/{i}.jpg" for i in range(6)]
+        delays = {0: 0.05, 1: 0.0, 2: 0.03, 3: 0.0, 4: 0.02, 5: 0.0}
+
+        def fake_step(job):
+            idx = int(job.url.rsplit('/', 1)[1].split('.')[0])
+            _time.sleep(delays[idx])
+            return True, str(idx).encode()
+
+        with patch.object(_ImageJob, 'step', autospec=True, side_effect=fake_step):
+            results = list(stream_download_images(urls, max_workers=4, ordered=True))
+
+        assert results == [b"0", b"1", b"2", b"3", b"4", b"5"]
+
+    @pytest.mark.unit
+    def test_ordered_mode_skips_failed_images(self):
+        """Une image échouée ne bloque pas la suite"""
+        urls = ["http://example.com/a.jpg", "http://example.com/b.jpg", "http://example.com/c.jpg"]
+
+        with patch.object(_ImageJob, 'step', autospec=True, side_effect=[(True, b"a"), (True, None), (True, b"c")]):
+            results = list(stream_download_images(urls, max_workers=1, ordered=True))
+
+        assert results == [b"a", b"c"]
+
+    @pytest.mark.unit
+    def test_retry_does_not_block_worker(self, mock_http):
+        """Pendant l'attente d'un retry, l'unique worker télécharge les autres images"""
+        import time as _time
+        calls = {"a": 0}
+
+        def handler(request):
+            if request.url.path == "/a.jpg":
+                calls["a"] += 1
+                if calls["a"] == 1:
+                    return httpx.Response(503, headers={"Retry-After": "0"})
+            return httpx.Response(200, content=request.url.path.encode())
+
+        policy = RetryPolicy(base_delay=0.3, max_delay=0.3)
+        urls = ["http://example.com/a.jpg", "http://example.com/b.jpg", "http://example.com/c.jpg"]
+        with mock_http(handler):
+            with patch('random.uniform', return_value=0.3):
+                start = _time.monotonic()
+                results = list(stream_download_images(urls, max_workers=1, retry_policy=policy))
+                elapsed = _time.monotonic() - start
+
+        # b et c passent pendant que a attend son retry
+        assert results == [b"/b.jpg", b"/c.jpg", b"/a.jpg"]
+        assert calls["a"] == 2
+        assert elapsed < 1.0
+
+    @pytest.mark.unit
+    def test_chapter_deadline_abandons_pending_retries(self, mock_http):
+        """Un retry qui dépasserait le budget du chapitre est abandonné"""
+        def handler(request):
+            return httpx.Response(503)
+
+        policy = RetryPolicy(base_delay=5.0, max_delay=5.0, chapter_deadline=0.5)
+        with mock_http(handler):
+            with patch('random.uniform', return_value=5.0):
+                results = list(stream_download_images(["http://example.com/a.jpg"], retry_policy=policy))
+
+        assert results == []
+
+    @pytest.mark.unit
+    def test_window_applies_backpressure(self):
+        """Tant que le consommateur n'avance pas, pas plus de `window` téléchargements lancés"""
+        import threading
+        urls = [f"http://example.com/{i}.jpg" for i in range(20)]
+        started = []
+        lock = threading.Lock()
+
+        def fake_step(job):
+            with lock:
+                started.append(job.url)
+            return True, b"x"
+
+        with patch.object(_ImageJob, 'step', autospec=True, side_effect=fake_step):
+            gen = stream_download_images(urls, max_workers=2, ordered=True, window=4)
+            next(gen)
+            import time as _time
+            _time.sleep(0.05)
+            # 4 lancés au départ + 1 relancé après la première émission
+            assert len(started) == 5
+            gen.close()
+
+
 @pytest.mark.unit
 def test_user_agents_list_not_empty():
     """Test que USER_AGENTS contient des agents"""
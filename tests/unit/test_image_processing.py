@@ -8,7 +8,7 @@ import os
 # Ajouter le répertoire racine au path pour les imports
 sys.path.insert(0, os.path.abspath(os.path.join(os.path.dirname(__file__), '../..')))
 
-from panelia.scrapers.factory import trim_borders_smart
+from panelia.scrapers.factory import trim_borders_smart, slice_panels_precision
 
 @pytest.mark.unit
 def test_trim_white_borders():
@@ -60,3 +60,44 @@ def test_trim_already_tight():
     img = Image.new('RGB', (10, 10), color='red')
     trimmed = trim_borders_smart(img, padding=0)
     assert trimmed.size == (10, 10)
+
+@pytest.mark.unit
+def test_slice_accepts_file_source(tmp_path):
+    """Le découpage lit aussi un fichier (téléchargement spoolé) sans le charger en bytes."""
+    img = Image.new('RGB', (200, 1000), color='white')
+    for y in list(range(50, 400)) + list(range(600, 950)):
+        for x in range(20, 180, 4):
+            img.putpixel((x, y), (0, 0, 0))
+    buf = io.BytesIO()
+    img.save(buf, format='PNG')
+
+    path = tmp_path / "strip.png"
+    path.write_bytes(buf.getvalue())
+
+    from_bytes = slice_panels_precision(buf.getvalue())
+    with open(path, 'rb') as fp:
+        from_file = slice_panels_precision(fp)
+
+    assert len(from_bytes) == len(from_file) == 2
+    assert [p.size for p in from_bytes] == [p.size for p in from_file]
+
+
+@pytest.mark.unit
+def test_slice_fallback_survives_closed_file(tmp_path, monkeypatch):
+    """Le repli (découpage en échec) renvoie une image chargée, lisible après fermeture du fichier."""
+    import panelia.scrapers.factory as factory
+
+    img = Image.new('RGB', (120, 300), color='white')
+    path = tmp_path / "page.png"
+    img.save(path, format='PNG')
+
+    def broken_trim(_panel):
+        raise ValueError("découpage impossible")
+
+    monkeypatch.setattr(factory, "trim_borders_smart", broken_trim)
+    with open(path, 'rb') as fp:
+        panels = slice_panels_precision(fp, min_panel_height=10)
+
+    assert len(panels) == 1
+    assert panels[0].size == (120, 300)
+    assert panels[0].tobytes()
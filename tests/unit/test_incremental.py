@@ -0,0 +1,126 @@
+"""
+Tests unitaires pour incremental.py
+
+Teste le découpage pendant le téléchargement : mêmes planches que
+slice_panels_precision, planches disponibles avant la fin du flux, repli
+pour les formats non incrémentaux, reprise depuis l'octet 0.
+"""
+import io
+import pytest
+import httpx
+import numpy as np
+from PIL import Image
+import sys
+import os
+
+sys.path.insert(0, os.path.abspath(os.path.join(os.path.dirname(__file__), '../..')))
+
+from panelia.scrapers.factory import slice_panels_precision
+from panelia.scrapers.incremental import IncrementalSlicer, SlicedImage
+from panelia.utils.http import stream_download_images
+
+
+def make_strip(fmt="JPEG", mode="RGB", height=4000, width=300, **save_kwargs):
+    """Bande verticale : planches bruitées séparées par des bandes blanches."""
+    rng = np.random.default_rng(42)
+    arr = np.full((height, width, 3), 255, dtype=np.uint8)
+    y = 40
+    while y < height - 300:
+        panel_height = int(rng.integers(300, 700))
+        end = min(height, y + panel_height)
+        arr[y:end] = rng.integers(0, 200, (end - y, width, 3), dtype=np.uint8)
+        y = end + int(rng.integers(25, 60))
+    buf = io.BytesIO()
+    Image.fromarray(arr).convert(mode).save(buf, fmt, **save_kwargs)
+    return buf.getvalue()
+
+
+def feed_all(slicer, data, chunk=32 * 1024):
+    for i in range(0, len(data), chunk):
+        slicer.feed(data[i:i + chunk])
+
+
+def assert_same_panels(panels, reference):
+    assert len(panels) == len(reference)
+    for a, b in zip(panels, reference):
+        assert a.size == b.size
+        assert np.array_equal(np.asarray(a), np.asarray(b))
+
+
+@pytest.mark.unit
+class TestIncrementalSlicer:
+    @pytest.mark.parametrize("fmt,mode", [("JPEG", "RGB"), ("JPEG", "L"), ("PNG", "RGB"), ("PNG", "P")])
+    def test_same_cuts_as_full_decode(self, fmt, mode):
+        data = make_strip(fmt, mode)
+        slicer = IncrementalSlicer()
+        feed_all(slicer, data)
+        result = slicer.finish(data)
+
+        assert result.incremental
+        assert_same_panels(result.panels, slice_panels_precision(data))
+
+    def test_panels_ready_before_last_byte(self):
+        data = make_strip("JPEG")
+        slicer = IncrementalSlicer()
+        feed_all(slicer, data[:len(data) // 2])
+
+        assert slicer.rows_ready > 0
+        assert len(slicer.panels) >= 1
+
+    @pytest.mark.parametrize("fmt,kwargs", [("WEBP", {}), ("JPEG", {"progressive": True})])
+    def test_non_incremental_formats_fall_back(self, fmt, kwargs):
+        data = make_strip(fmt, **kwargs)
+        slicer = IncrementalSlicer()
+        feed_all(slicer, data)
+        result = slicer.finish(data)
+
+        assert not result.incremental
+        assert_same_panels(result.panels, slice_panels_precision(data))
+
+    def test_reset_restarts_from_first_byte(self):
+        data = make_strip("PNG")
+        slicer = IncrementalSlicer()
+        feed_all(slicer, data[:len(data) // 3])
+        slicer.reset()
+        feed_all(slicer, data)
+        result = slicer.finish(data)
+
+        assert result.incremental
+        assert_same_panels(result.panels, slice_panels_precision(data))
+
+    def test_truncated_stream_uses_full_decode_fallback(self):
+        data = make_strip("JPEG")
+        slicer = IncrementalSlicer()
+        feed_all(slicer, data[:len(data) // 2])
+        result = slicer.finish(data)
+
+        assert not result.incremental
+        assert_same_panels(result.panels, slice_panels_precision(data))
+
+    def test_garbage_never_raises(self):
+        slicer = IncrementalSlicer()
+        slicer.feed(b"\xff\xd8\xff" + b"\x00" * 100)
+        slicer.feed(os.urandom(1000))
+        result = slicer.finish(io.BytesIO(b"pas une image"))
+        assert isinstance(result, SlicedImage)
+
+
+@pytest.mark.unit
+def test_stream_download_yields_sliced_images(mock_http):
+    """En mode spool, le flux rend des planches déjà découpées"""
+    data = make_strip("JPEG")
+
+    def handler(request):
+        return httpx.Response(200, headers={"Content-Length": str(len(data))}, content=data)
+
+    with mock_http(handler):
+        results = list(stream_download_images(
+            ["http://cdn.test/1.jpg", "http://cdn.test/2.jpg"],
+            ordered=True, spool_threshold=1024 * 1024, slicer_factory=IncrementalSlicer
+        ))
+
+    assert len(results) == 2
+    for sliced in results:
+        assert isinstance(sliced, SlicedImage)
+        assert_same_panels(sliced.panels, slice_panels_precision(data))
+        sliced.close()
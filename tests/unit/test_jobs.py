@@ -0,0 +1,137 @@
+"""
+Tests unitaires pour jobs.py
+
+Teste l'ordonnanceur multi-séries : ordre par priorité, quotas transmis au
+lot, une seule exécution à la fois par série, annulation d'un job en file,
+et plusieurs séries sur un même ScraperEngine.
+"""
+import pytest
+import threading
+import time
+from pathlib import Path
+import sys
+import os
+
+sys.path.insert(0, os.path.abspath(os.path.join(os.path.dirname(__file__), '../..')))
+
+from panelia.core.jobs import CANCELLED, DONE, SeriesScheduler
+
+
+class FakeEngine:
+    """Moteur factice : note les lots lancés, bloque tant que `gate` n'est pas ouverte."""
+
+    def __init__(self):
+        self.gate = threading.Event()
+        self.gate.set()
+        self.lock = threading.Lock()
+        self.calls = []
+        self.active = set()
+        self.overlap = False
+
+    def series_dir(self, name):
+        return Path("output") / name
+
+    def run_chapter_batch(self, chapters, params, **kwargs):
+        name = params["final_manhwa_name"]
+        with self.lock:
+            self.overlap |= name in self.active
+            self.active.add(name)
+            self.calls.append((name, kwargs))
+        self.gate.wait(timeout=5)
+        time.sleep(0.01)
+        with self.lock:
+            self.active.discard(name)
+        return [{"chap_num": n, "panels_saved": 1, "error": None} for n in sorted(chapters)]
+
+    def sync_series(self, chapters, params, force=False, **kwargs):
+        return "plan", self.run_chapter_batch(chapters, params, **kwargs)
+
+
+def series(name):
+    return {"final_manhwa_name": name}
+
+
+@pytest.mark.unit
+class TestSeriesScheduler:
+    def test_pending_jobs_start_by_priority(self):
+        engine = FakeEngine()
+        engine.gate.clear()
+        jobs = SeriesScheduler(engine, max_active_series=1)
+        try:
+            first = jobs.submit({1.0: "u"}, series("a"))
+            time.sleep(0.05)
+            low = jobs.submit({1.0: "u"}, series("b"), priority=0)
+            high = jobs.submit({1.0: "u"}, series("c"), priority=10)
+            engine.gate.set()
+            for job in (first, low, high):
+                job.result(timeout=5)
+        finally:
+            jobs.shutdown()
+        assert [name for name, _ in engine.calls] == ["a", "c", "b"]
+        assert high.state == DONE and jobs.get_stats()["done"] == 3
+
+    def test_quotas_and_priority_passed_to_batch(self):
+        engine = FakeEngine()
+        jobs = SeriesScheduler(engine, max_active_series=2, max_downloads=4)
+        try:
+            default = jobs.submit({1.0: "u"}, series("a"))
+            custom = jobs.submit({1.0: "u"}, series("b"), priority=3, max_parallel_chapters=1, max_downloads=2, sync=True)
+            default.result(timeout=5)
+            custom.result(timeout=5)
+        finally:
+            jobs.shutdown()
+        kwargs = dict(engine.calls)
+        assert kwargs["a"]["max_downloads"] == 4 and kwargs["a"]["max_parallel_chapters"] is None
+        assert kwargs["b"]["priority"] == 3 and kwargs["b"]["max_parallel_chapters"] == 1 and kwargs["b"]["max_downloads"] == 2
+        assert custom.plan == "plan"
+
+    def test_same_series_never_runs_twice_at_once(self):
+        engine = FakeEngine()
+        jobs = SeriesScheduler(engine, max_active_series=3)
+        try:
+            submitted = [jobs.submit({float(i): "u"}, series("a")) for i in range(3)]
+            submitted.append(jobs.submit({1.0: "u"}, series("b")))
+            for job in submitted:
+                job.result(timeout=5)
+        finally:
+            jobs.shutdown()
+        assert not engine.overlap
+        assert len(engine.calls) == 4
+
+    def test_cancel_pending_job(self):
+        engine = FakeEngine()
+        engine.gate.clear()
+        jobs = SeriesScheduler(engine, max_active_series=1)
+        try:
+            running = jobs.submit({1.0: "u"}, series("a"))
+            time.sleep(0.05)
+            queued = jobs.submit({1.0: "u"}, series("b"))
+            queued.cancel()
+            assert queued.state == CANCELLED
+            engine.gate.set()
+            running.result(timeout=5)
+        finally:
+            jobs.shutdown()
+        assert [name for name, _ in engine.calls] == ["a"]
+        assert jobs.get_stats()["cancelled"] == 1
+
+
+@pytest.mark.unit
+def test_series_share_one_engine(tmp_path, fake_engine):
+    """Deux séries en même temps : un pool de drivers, un ordonnanceur, un journal chacune"""
+    def extract(chap_url, driver_ws, validated_params):
+        return [f"http://cdn.test/{chap_url.rsplit('/', 1)[-1]}/{i}.jpg" for i in range(3)], None
+
+    with fake_engine(extract) as engine:
+        jobs = SeriesScheduler(engine, max_active_series=2)
+        submitted = [
+            jobs.submit({float(n): f"https://selenium-only.test/{name}-{n}" for n in (1, 2)}, series(name), priority=p, max_downloads=2)
+            for name, p in (("alpha", 0), ("beta", 5))
+        ]
+        results = [job.result(timeout=30) for job in submitted]
+        jobs.shutdown()
+
+    for name, chapter_results in zip(("alpha", "beta"), results):
+        assert [r["panels_saved"] for r in chapter_results] == [3, 3]
+        assert (tmp_path / name / ".panelia_journal.jsonl").exists()
+    assert engine._active_batches == 0
@@ -0,0 +1,127 @@
+"""
+Tests unitaires pour journal.py
+
+Teste le journal de lot : relecture après crash (ligne tronquée), vérification
+des planches (taille, SHA-256), réglages de sortie, compaction, et la reprise
+par ScraperEngine (chapitres vérifiés non refaits, chapitre abîmé refait).
+"""
+import pytest
+import json
+import sys
+import os
+
+sys.path.insert(0, os.path.abspath(os.path.join(os.path.dirname(__file__), '../..')))
+
+from panelia.core.journal import JOURNAL_FILENAME, BatchJournal, content_digest
+
+SETTINGS = {"quality_value": 92}
+URL = "https://site.test/chap-1"
+
+
+def write_chapter(journal, chap_num, url=URL, panels=2, done=True):
+    """Chapitre journalisé avec ses planches réellement écrites sur disque."""
+    chap_dir = journal.root / str(chap_num).replace(".", "_")
+    chap_dir.mkdir(exist_ok=True)
+    journal.chapter_started(chap_num, url)
+    journal.images_found(chap_num, [f"http://cdn.test/{i}.jpg" for i in range(panels)])
+    for i in range(panels):
+        journal.image_downloaded(chap_num, i + 1, content_digest(b"image%d" % i))
+        path = chap_dir / f"P{i:03d}.jpg"
+        path.write_bytes(b"panel%d" % i)
+        journal.image_saved(chap_num, i + 1, [path])
+    if done:
+        journal.chapter_done(chap_num, url, {"chap_num": chap_num, "panels_saved": panels, "error": None}, SETTINGS)
+    return chap_dir
+
+
+@pytest.mark.unit
+class TestBatchJournal:
+    def test_replay_after_crash(self, tmp_path):
+        path = tmp_path / JOURNAL_FILENAME
+        journal = BatchJournal(path)
+        write_chapter(journal, 1.0)
+        write_chapter(journal, 2.0, done=False)
+        journal.close()
+        # Crash pendant l'écriture d'un enregistrement
+        with open(path, "a") as f:
+            f.write('{"type": "image_saved", "chap": 2.0, "ind')
+
+        journal = BatchJournal(path)
+        result = journal.verified_result(1.0, URL, SETTINGS)
+        assert result["panels_saved"] == 2 and result["resumed"] is True
+        assert journal.verified_result(2.0, URL, SETTINGS) is None
+        assert journal.chapters[1.0].images[1] == content_digest(b"image0")
+        journal.close()
+
+    def test_compaction_keeps_done_chapters_only(self, tmp_path):
+        path = tmp_path / JOURNAL_FILENAME
+        journal = BatchJournal(path)
+        write_chapter(journal, 1.0)
+        write_chapter(journal, 2.0, done=False)
+        journal.close()
+
+        BatchJournal(path).close()
+        records = [json.loads(line) for line in path.read_text().splitlines()]
+        assert [(r["type"], r["chap"]) for r in records] == [("chapter_done", 1.0)]
+        assert len(records[0]["panels"]) == 2
+        journal = BatchJournal(path)
+        assert journal.verified_result(1.0, URL, SETTINGS) is not None
+        journal.close()
+
+    def test_rejects_changed_url_settings_or_panels(self, tmp_path):
+        journal = BatchJournal(tmp_path / JOURNAL_FILENAME)
+        chap_dir = write_chapter(journal, 1.0)
+
+        assert journal.verified_result(1.0, "https://site.test/autre", SETTINGS) is None
+        assert journal.verified_result(1.0, URL, {"quality_value": 80}) is None
+        (chap_dir / "P001.jpg").write_bytes(b"tronque")
+        assert journal.verified_result(1.0, URL, SETTINGS) is None
+        assert journal.get_stats()["rejected"] == 2
+        journal.close()
+
+    def test_sha256_mode_detects_same_size_corruption(self, tmp_path):
+        path = tmp_path / JOURNAL_FILENAME
+        journal = BatchJournal(path)
+        chap_dir = write_chapter(journal, 1.0)
+        journal.close()
+        (chap_dir / "P000.jpg").write_bytes(b"panelX")
+
+        quick = BatchJournal(path, verify="size")
+        assert quick.verified_result(1.0, URL, SETTINGS) is not None
+        quick.close()
+        full = BatchJournal(path, verify="sha256")
+        assert full.verified_result(1.0, URL, SETTINGS) is None
+        full.close()
+
+    def test_unknown_verify_mode(self, tmp_path):
+        with pytest.raises(ValueError):
+            BatchJournal(tmp_path / JOURNAL_FILENAME, verify="mtime")
+
+
+def run_batch(fake_engine, chapters, extracted):
+    def extract(chap_url, driver_ws, validated_params):
+        extracted.append(chap_url)
+        return [f"http://cdn.test/{chap_url[-1]}/{i}.jpg" for i in range(3)], None
+
+    with fake_engine(extract) as engine:
+        return engine.run_chapter_batch(chapters, {"final_manhwa_name": "serie", "quality_value": 90})
+
+
+@pytest.mark.unit
+def test_engine_resumes_verified_chapters(tmp_path, fake_engine):
+    """Deuxième lot : chapitres vérifiés repris sans extraction, chapitre abîmé refait"""
+    chapters = {float(n): f"https://selenium-only.test/chap-{n}" for n in range(1, 4)}
+    extracted = []
+    first = run_batch(fake_engine, chapters, extracted)
+    assert all(r["panels_saved"] == 3 for r in first)
+    assert len(extracted) == 3
+
+    (tmp_path / "serie" / "2_0" / "Ch2_0_P002.jpg").unlink()
+    extracted.clear()
+    second = run_batch(fake_engine, chapters, extracted)
+
+    assert extracted == ["https://selenium-only.test/chap-2"]
+    assert [r["chap_num"] for r in second] == [1.0, 3.0, 2.0]
+    assert [r.get("resumed", False) for r in second] == [True, True, False]
+    assert all(r["panels_saved"] == 3 for r in second)
+    assert (tmp_path / "serie" / "2_0" / "Ch2_0_P002.jpg").exists()
@@ -0,0 +1,132 @@
+"""
+Tests unitaires pour mangadex.py
+
+Teste le failover MangaDex@Home : nœud résolu par tentative, rafraîchissement,
+repli sur l'origine uploads, dataSaver, débit par nœud.
+"""
+import pytest
+import time
+import httpx
+from unittest.mock import patch
+import sys
+import os
+
+sys.path.insert(0, os.path.abspath(os.path.join(os.path.dirname(__file__), '../..')))
+
+from panelia.scrapers.mangadex import MangaDexAtHome, UPLOADS_ORIGIN
+from panelia.utils.http import stream_download_images
+from panelia.utils.retry import RetryPolicy
+
+CHAPTER_ID = "0a1b2c3d-0000-1111-2222-333344445555"
+CHAPTER_URL = f"https://mangadex.org/chapter/{CHAPTER_ID}"
+HASH = "abcdef0123"
+
+
+def at_home(base_url):
+    return httpx.Response(200, json={
+        "result": "ok",
+        "baseUrl": base_url,
+        "chapter": {"hash": HASH, "data": ["1.png", "2.png"], "dataSaver": ["1.jpg", "2.jpg"]},
+    })
+
+
+
+@pytest.mark.unit
+class TestMangaDexAtHome:
+    """Tests du résolveur MD@Home"""
+
+    def test_canonical_urls_and_resolution(self, mock_http):
+        mdh = MangaDexAtHome(network_reports=False)
+        with mock_http(lambda r: at_home("https://node1.mangadex.network:443")):
+            urls = mdh.chapter_images(CHAPTER_URL)
+
+        assert urls == [f"{UPLOADS_ORIGIN}/data/{HASH}/1.png", f"{UPLOADS_ORIGIN}/data/{HASH}/2.png"]
+        assert mdh.resolve(urls[0]) == f"https://node1.mangadex.network:443/data/{HASH}/1.png"
+
+    def test_data_saver_rendition(self, mock_http):
+        mdh = MangaDexAtHome(network_reports=False)
+        with mock_http(lambda r: at_home("https://node1.mangadex.network")):
+            urls = mdh.chapter_images(CHAPTER_URL, data_saver=True)
+
+        assert urls[0] == f"{UPLOADS_ORIGIN}/data-saver/{HASH}/1.jpg"
+        assert mdh.resolve(urls[0]) == f"https://node1.mangadex.network/data-saver/{HASH}/1.jpg"
+
+    def test_unknown_chapter_url(self):
+        assert MangaDexAtHome(network_reports=False).chapter_images("https://mangadex.org/title/x") == []
+
+    def test_failed_node_is_replaced_mid_chapter(self, mock_http):
+        """Un nœud en panne est remplacé et le chapitre se termine sur le nouveau"""
+        servers = iter(["https://dead.mangadex.network", "https://good.mangadex.network"])
+
+        def handler(request):
+            if request.url.host == "api.mangadex.org":
+                return at_home(next(servers))
+            if request.url.host == "dead.mangadex.network":
+                raise httpx.ConnectError("refused")
+            return httpx.Response(200, content=request.url.path.encode())
+
+        mdh = MangaDexAtHome(refresh_interval=0, network_reports=False)
+        policy = RetryPolicy(base_delay=0.0)
+        with mock_http(handler):
+            urls = mdh.chapter_images(CHAPTER_URL)
+            results = list(stream_download_images(urls, max_workers=1, ordered=True, retry_policy=policy, url_resolver=mdh))
+
+        assert results == [f"/data/{HASH}/1.png".encode(), f"/data/{HASH}/2.png".encode()]
+        stats = mdh.get_node_stats()
+        assert stats["https://dead.mangadex.network"]["failures"] == 1
+        assert stats["https://good.mangadex.network"]["failures"] == 0
+        assert mdh.resolve(urls[0]).startswith("https://good.mangadex.network/")
+
+    def test_falls_back_to_uploads_origin(self, mock_http):
+        """Si at-home ne propose que des nœuds mauvais, on passe par l'origine"""
+        def handler(request):
+            if request.url.host == "api.mangadex.org":
+                return at_home("https://dead.mangadex.network")
+            if request.url.host == "dead.mangadex.network":
+                raise httpx.ConnectError("refused")
+            return httpx.Response(200, content=b"origin")
+
+        mdh = MangaDexAtHome(refresh_interval=0, max_node_attempts=2, network_reports=False)
+        policy = RetryPolicy(base_delay=0.0)
+        with mock_http(handler):
+            urls = mdh.chapter_images(CHAPTER_URL)
+            results = list(stream_download_images(urls[:1], max_workers=1, retry_policy=policy, url_resolver=mdh))
+
+        assert results == [b"origin"]
+        assert mdh.resolve(urls[0]).startswith(UPLOADS_ORIGIN)
+
+    def test_slow_node_is_avoided(self, mock_http):
+        mdh = MangaDexAtHome(min_throughput_bps=100_000, network_reports=False)
+        with mock_http(lambda r: at_home("https://slow.mangadex.network")):
+            mdh.chapter_images(CHAPTER_URL)
+
+        for _ in range(3):
+            mdh.report(f"https://slow.mangadex.network/data/{HASH}/1.png", True, size=10_000, seconds=1.0)
+
+        assert mdh.get_node_stats()["https://slow.mangadex.network"]["avoided"] is True
+
+    def test_rate_limiter_wait_not_counted_as_node_transfer(self, mock_http):
+        """Un nœud rapide mais bridé par le limiteur n'est pas jugé lent"""
+        class SlowLimiter:
+            def acquire(self, url):
+                time.sleep(0.2)
+                return 0.2
+
+            def record_response(self, url, status_code, retry_after=None):
+                pass
+
+        mdh = MangaDexAtHome(min_throughput_bps=100_000, network_reports=False)
+        policy = RetryPolicy(base_delay=0.0)
+
+        def handler(request):
+            if request.url.host == "api.mangadex.org":
+                return at_home("https://fast.mangadex.network")
+            return httpx.Response(200, content=b"x" * 10_000)
+
+        with mock_http(handler), patch('panelia.utils.http.get_rate_limiter', return_value=SlowLimiter()):
+            urls = mdh.chapter_images(CHAPTER_URL)
+            for _ in range(2):
+                assert len(list(stream_download_images(urls, max_workers=1, retry_policy=policy, url_resolver=mdh))) == 2
+
+        stats = mdh.get_node_stats()["https://fast.mangadex.network"]
+        assert stats["requests"] == 4 and stats["avoided"] is False
@@ -0,0 +1,117 @@
+"""
+Tests unitaires pour pipeline.py
+
+Teste les étages du pipeline : file bornée et contre-pression, chaînage
+entre étages, statistiques d'occupation, et la numérotation des planches
+par ScraperEngine quand les découpages finissent dans le désordre.
+"""
+import pytest
+import threading
+import time
+import httpx
+from PIL import Image
+from unittest.mock import patch
+import sys
+import os
+
+sys.path.insert(0, os.path.abspath(os.path.join(os.path.dirname(__file__), '../..')))
+
+from panelia.core.pipeline import Stage, StagedPipeline
+
+
+@pytest.mark.unit
+class TestStage:
+    def test_submit_blocks_when_queue_full(self):
+        stage = Stage("test", workers=1, queue_size=1)
+        gate = threading.Event()
+        stage.submit(gate.wait)          # occupe le worker
+        time.sleep(0.05)
+        stage.submit(lambda: None)       # remplit la file
+
+        submitted = threading.Event()
+        threading.Thread(target=lambda: (stage.submit(lambda: None), submitted.set())).start()
+        assert not submitted.wait(0.1)
+
+        gate.set()
+        assert submitted.wait(2)
+        stage.shutdown()
+        assert stage.get_stats()["blocked_submit_ms"] >= 90
+
+    def test_results_and_errors(self):
+        stage = Stage("test", workers=2)
+        ok = stage.submit(lambda x: x * 2, 21)
+        bad = stage.submit(lambda: 1 / 0)
+        assert ok.result(timeout=2) == 42
+        with pytest.raises(ZeroDivisionError):
+            bad.result(timeout=2)
+        stage.shutdown()
+        stats = stage.get_stats()
+        assert stats["completed"] == 2
+        assert stats["failed"] == 1
+
+    def test_chain_runs_on_downstream_stage(self):
+        upstream, downstream = Stage("up", 1), Stage("down", 1)
+        first = upstream.submit(lambda: threading.current_thread().name)
+        second = downstream.chain(first, lambda name: (name, threading.current_thread().name))
+        assert second.result(timeout=2) == ("panelia-up-0", "panelia-down-0")
+
+        failed = downstream.chain(upstream.submit(lambda: 1 / 0), lambda value: value)
+        with pytest.raises(ZeroDivisionError):
+            failed.result(timeout=2)
+        upstream.shutdown()
+        downstream.shutdown()
+
+    def test_utilisation_reflects_busy_time(self):
+        stage = Stage("test", workers=1)
+        stage.submit(time.sleep, 0.2).result()
+        stats = stage.get_stats()
+        assert 0.5 < stats["utilisation"] <= 1.0
+        assert stats["avg_service_ms"] >= 190
+        stage.shutdown()
+
+
+@pytest.mark.unit
+def test_pipeline_reports_internal_and_external_stages():
+    pipeline = StagedPipeline({"slice": 2, "encode": 1})
+    pipeline.attach("network", lambda: {"active": 3})
+    pipeline.attach("broken", lambda: 1 / 0)
+    stats = pipeline.get_stats()
+    pipeline.shutdown()
+
+    assert list(stats) == ["network", "slice", "encode"]
+    assert stats["slice"]["workers"] == 2
+
+
+@pytest.mark.unit
+def test_engine_numbers_panels_in_source_order(tmp_path, mock_http):
+    """Découpages terminés dans le désordre : ChXX_PXXX suit quand même l'ordre des pages"""
+    from panelia.core.engine import ScraperEngine
+
+
+    def handler(request):
+        return httpx.Response(200, content=request.url.path.encode())
+
+    def slow_first_slice(source):
+        data = source if isinstance(source, bytes) else source.read()
+        page = int(data.decode().strip("/").split(".")[0])
+        # Les premières pages finissent en dernier
+        time.sleep(0.02 * (5 - page))
+        return [Image.new("L", (10, 10), color=page * 10), Image.new("L", (10, 10), color=page * 10 + 1)]
+
+    engine = ScraperEngine(work_dir=str(tmp_path), image_workers_per_chap=4, warm_connections=False, cpu_workers=4, incremental_decode=False)
+    urls = [f"http://cdn.test/{page}.jpg" for page in range(5)]
+    with mock_http(handler), \
+            patch('panelia.core.engine.process_image_smart', side_effect=slow_first_slice):
+        result = engine._process_single_chapter(
+            1.0, "https://site.test/chap-1", None, {"final_manhwa_name": "serie", "quality_value": 100},
+            image_urls_provider=lambda: (urls, None)
+        )
+    engine.shutdown()
+
+    assert result["downloaded_count"] == 5
+    assert result["panels_saved"] == 10
+    files = sorted((tmp_path / "serie" / "1_0").iterdir())
+    assert [f.name for f in files] == [f"Ch1_0_P{i:03d}.jpg" for i in range(1, 11)]
+    colors = [Image.open(f).convert("L").getpixel((5, 5)) for f in files]
+    expected = [page * 10 + k for page in range(5) for k in (0, 1)]
+    assert all(abs(c - e) <= 2 for c, e in zip(colors, expected))
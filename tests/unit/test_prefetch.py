@@ -0,0 +1,178 @@
+"""
+Tests unitaires pour prefetch.py
+
+Teste l'extraction anticipée des listes d'images : profondeur de look-ahead,
+ordre, exceptions propagées, invalidation des URLs expirées.
+"""
+import pytest
+import threading
+import time
+import sys
+import os
+
+sys.path.insert(0, os.path.abspath(os.path.join(os.path.dirname(__file__), '../..')))
+
+from panelia.core.prefetch import ImageListPrefetcher, signed_url_expiry
+
+CHAPTERS = [(float(n), f"https://site.test/chap-{n}") for n in range(1, 7)]
+
+
+class RecordingExtractor:
+    """Extraction factice : note les appels, détecte tout appel concurrent."""
+
+    def __init__(self, urls_for=None):
+        self.calls = []
+        self.concurrent = False
+        self._busy = threading.Lock()
+        self.urls_for = urls_for or (lambda num, url: [f"{url}/1.jpg", f"{url}/2.jpg"])
+
+    def __call__(self, chap_num, chap_url):
+        if not self._busy.acquire(blocking=False):
+            self.concurrent = True
+            return []
+        try:
+            self.calls.append(chap_num)
+            time.sleep(0.01)
+            return self.urls_for(chap_num, chap_url)
+        finally:
+            self._busy.release()
+
+
+def wait_for(predicate, timeout=2.0):
+    end = time.monotonic() + timeout
+    while time.monotonic() < end:
+        if predicate():
+            return True
+        time.sleep(0.005)
+    return predicate()
+
+
+@pytest.mark.unit
+class TestSignedUrlExpiry:
+    def test_expires_param(self):
+        assert signed_url_expiry("https://cdn.test/a.jpg?expires=1700000000&sig=x") == 1700000000.0
+
+    def test_amz_presigned(self):
+        url = "https://s3.test/a.jpg?X-Amz-Date=20250101T000000Z&X-Amz-Expires=600"
+        assert signed_url_expiry(url) == 1735689600.0 + 600
+
+    def test_plain_url(self):
+        assert signed_url_expiry("https://cdn.test/a.jpg") is None
+
+
+@pytest.mark.unit
+class TestImageListPrefetcher:
+    def test_lookahead_bounded_by_depth(self):
+        extract = RecordingExtractor()
+        prefetcher = ImageListPrefetcher(CHAPTERS, extract, depth=2)
+        prefetcher.start()
+        try:
+            # Chapitre courant 0 : au plus les chapitres 0, 1 et 2 sont extraits
+            assert wait_for(lambda: len(extract.calls) == 3)
+            time.sleep(0.05)
+            assert extract.calls == [1.0, 2.0, 3.0]
+
+            prefetcher.get(0)
+            prefetcher.get(1)
+            assert wait_for(lambda: len(extract.calls) == 4)
+            time.sleep(0.05)
+            assert extract.calls == [1.0, 2.0, 3.0, 4.0]
+        finally:
+            prefetcher.close()
+        assert not extract.concurrent
+
+    def test_lists_returned_in_order(self):
+        extract = RecordingExtractor()
+        prefetcher = ImageListPrefetcher(CHAPTERS, extract, depth=1)
+        prefetcher.start()
+        try:
+            lists = [prefetcher.get(i) for i in range(len(CHAPTERS))]
+        finally:
+            prefetcher.close()
+        assert [l[0] for l in lists] == [f"{url}/1.jpg" for _, url in CHAPTERS]
+        assert extract.calls == [num for num, _ in CHAPTERS]
+
+    def test_depth_zero_extracts_only_current(self):
+        extract = RecordingExtractor()
+        prefetcher = ImageListPrefetcher(CHAPTERS, extract, depth=0)
+        prefetcher.start()
+        try:
+            assert wait_for(lambda: len(extract.calls) == 1)
+            time.sleep(0.05)
+            assert extract.calls == [1.0]
+            prefetcher.get(0)
+        finally:
+            prefetcher.close()
+
+    def test_extraction_error_raised_by_get(self):
+        def extract(chap_num, chap_url):
+            if chap_num == 2.0:
+                raise ValueError("page introuvable")
+            return [f"{chap_url}/1.jpg"]
+
+        prefetcher = ImageListPrefetcher(CHAPTERS[:3], extract, depth=2)
+        prefetcher.start()
+        try:
+            prefetcher.get(0)
+            with pytest.raises(ValueError):
+                prefetcher.get(1)
+            assert prefetcher.get(2) == [f"{CHAPTERS[2][1]}/1.jpg"]
+        finally:
+            prefetcher.close()
+
+    def test_expired_signed_urls_are_re_extracted(self):
+        issued = []
+
+        def urls_for(chap_num, chap_url):
+            # Premier jeton déjà expiré, le suivant valable une heure
+            expires = int(time.time()) + (3600 if issued.count(chap_num) else -10)
+            issued.append(chap_num)
+            return [f"{chap_url}/1.jpg?expires={expires}"]
+
+        extract = RecordingExtractor(urls_for)
+        prefetcher = ImageListPrefetcher(CHAPTERS[:2], extract, depth=1)
+        prefetcher.start()
+        try:
+            urls = prefetcher.get(0)
+        finally:
+            prefetcher.close()
+
+        assert signed_url_expiry(urls[0]) > time.time()
+        assert extract.calls.count(1.0) == 2
+        assert prefetcher.get_stats()["invalidations"] == 1
+
+    def test_max_age_invalidates_stale_lists(self):
+        extract = RecordingExtractor()
+        prefetcher = ImageListPrefetcher(CHAPTERS[:2], extract, depth=1, max_age=0.05, expiry_margin=0)
+        prefetcher.start()
+        try:
+            assert wait_for(lambda: len(extract.calls) == 2)
+            time.sleep(0.1)
+            prefetcher.get(0)
+            prefetcher.get(1)
+        finally:
+            prefetcher.close()
+        assert prefetcher.get_stats()["invalidations"] >= 1
+        assert extract.calls.count(1.0) >= 2
+
+    def test_workers_extract_in_parallel_within_window(self):
+        active, peak, lock = [0], [0], threading.Lock()
+
+        def extract(chap_num, chap_url):
+            with lock:
+                active[0] += 1
+                peak[0] = max(peak[0], active[0])
+            time.sleep(0.05)
+            with lock:
+                active[0] -= 1
+            return [f"{chap_url}/1.jpg"]
+
+        prefetcher = ImageListPrefetcher(CHAPTERS, extract, depth=1, workers=3)
+        prefetcher.start()
+        try:
+            lists = [prefetcher.get(i) for i in range(len(CHAPTERS))]
+        finally:
+            prefetcher.close()
+        assert lists == [[f"{url}/1.jpg"] for _, url in CHAPTERS]
+        # Fenêtre courant + 1 : deux extractions simultanées au plus
+        assert peak[0] == 2
@@ -0,0 +1,123 @@
+"""
+Tests unitaires pour process_pool.py
+
+Teste le découpage/encodage en processus : mêmes planches que le chemin
+threadé, transfert par mémoire partagée (libérée après usage), pré-chauffage
+des processus, et moteur en mode processus (planches renommées dans l'ordre).
+"""
+import io
+import pytest
+import httpx
+import numpy as np
+from PIL import Image
+from multiprocessing.shared_memory import SharedMemory
+from unittest.mock import patch
+import sys
+import os
+
+sys.path.insert(0, os.path.abspath(os.path.join(os.path.dirname(__file__), '../..')))
+
+from panelia.core.process_pool import PanelInfo, ProcessImageWorkers
+from panelia.scrapers.factory import slice_panels_precision
+
+
+def make_strip(seed=0, height=2400, width=200):
+    rng = np.random.default_rng(seed)
+    arr = np.full((height, width, 3), 255, dtype=np.uint8)
+    for start in range(40, height - 500, 700):
+        arr[start:start + 500] = rng.integers(0, 200, (500, width, 3), dtype=np.uint8)
+    buf = io.BytesIO()
+    Image.fromarray(arr).save(buf, "JPEG", quality=90)
+    return buf.getvalue()
+
+
+@pytest.fixture(scope="module")
+def workers():
+    pool = ProcessImageWorkers(workers=2)
+    yield pool
+    pool.shutdown()
+
+
+@pytest.mark.unit
+class TestProcessImageWorkers:
+    def test_warm_up_starts_every_process(self, workers):
+        assert workers.warm_up() == 2
+
+    def test_slice_and_encode_matches_thread_path(self, workers, tmp_path):
+        data = make_strip()
+        infos = workers.submit_image(data, tmp_path, quality=90).result(timeout=30)
+        reference = slice_panels_precision(data)
+
+        assert len(infos) == len(reference) == 3
+        for info, panel in zip(infos, reference):
+            assert os.path.basename(info.path).startswith(".")
+            assert (info.width, info.height) == panel.size
+            assert os.path.getsize(info.path) == info.size_bytes
+
+        final = tmp_path / "Ch1_0_P001.jpg"
+        infos[0].commit(final)
+        assert final.exists() and infos[0].path == str(final)
+
+    def test_spooled_file_source(self, workers, tmp_path):
+        source = io.BytesIO(make_strip(seed=1))
+        source.seek(123)
+        infos = workers.submit_image(source, tmp_path).result(timeout=30)
+        assert len(infos) == 3
+
+    @pytest.mark.parametrize("mode", ["RGB", "L", "RGBA", "P"])
+    def test_encode_panel_pixels(self, workers, tmp_path, mode):
+        img = Image.new("RGB", (64, 32), (200, 30, 30)).convert(mode)
+        path = tmp_path / f"panel_{mode}.jpg"
+        info = workers.submit_panel(img, path).result(timeout=30)
+
+        assert isinstance(info, PanelInfo)
+        assert (info.width, info.height) == (64, 32)
+        with Image.open(path) as saved:
+            assert saved.size == (64, 32)
+
+    def test_shared_memory_released(self, workers, tmp_path):
+        created = []
+        real_share = SharedMemory.__init__
+
+        def spy(self, *args, **kwargs):
+            real_share(self, *args, **kwargs)
+            if kwargs.get("create"):
+                created.append(self.name)
+
+        with patch.object(SharedMemory, "__init__", spy):
+            workers.submit_image(make_strip(), tmp_path).result(timeout=30)
+        assert len(created) == 1
+        with pytest.raises(FileNotFoundError):
+            SharedMemory(name=created[0])
+
+    def test_invalid_image_raises(self, workers, tmp_path):
+        with pytest.raises(Exception):
+            workers.submit_image(b"pas une image", tmp_path).result(timeout=30)
+        assert workers.get_stats()["failed"] >= 1
+
+
+@pytest.mark.unit
+def test_engine_process_backend_saves_panels_in_order(tmp_path, mock_http):
+    from panelia.core.engine import ScraperEngine
+
+    strips = [make_strip(seed=i) for i in range(3)]
+
+    def handler(request):
+        return httpx.Response(200, content=strips[int(request.url.path.strip("/").split(".")[0])])
+
+    engine = ScraperEngine(work_dir=str(tmp_path), warm_connections=False, processing_backend="process", process_workers=2)
+    urls = [f"http://cdn.test/{i}.jpg" for i in range(3)]
+    try:
+        with mock_http(handler):
+            result = engine._process_single_chapter(
+                2.0, "https://site.test/chap-2", None, {"final_manhwa_name": "serie"},
+                image_urls_provider=lambda: (urls, None)
+            )
+        stats = engine.process_workers.get_stats()
+    finally:
+        engine.shutdown()
+
+    assert result["panels_saved"] == 9
+    out = tmp_path / "serie" / "2_0"
+    assert sorted(p.name for p in out.iterdir()) == [f"Ch2_0_P{i:03d}.jpg" for i in range(1, 10)]
+    assert stats["completed"] == 3
@@ -0,0 +1,55 @@
+"""
+Tests unitaires pour ratelimit.py
+
+Teste le limiteur adaptatif : seau de jetons, AIMD, Retry-After.
+"""
+import pytest
+import sys
+import os
+
+sys.path.insert(0, os.path.abspath(os.path.join(os.path.dirname(__file__), '../..')))
+
+from panelia.utils.ratelimit import AdaptiveRateLimiter, domain_of, parse_retry_after
+
+
+@pytest.mark.unit
+class TestAdaptiveRateLimiter:
+    """Tests du limiteur par domaine"""
+
+    def test_domain_of(self):
+        assert domain_of("https://CDN.Example.com:443/a.jpg") == "cdn.example.com"
+        assert domain_of("mangadex.org") == "mangadex.org"
+
+    def test_parse_retry_after(self):
+        assert parse_retry_after("5") == 5.0
+        assert parse_retry_after(None) is None
+        assert parse_retry_after("n'importe quoi") is None
+        assert parse_retry_after("Wed, 21 Oct 2015 07:28:00 GMT") == 0.0
+
+    def test_burst_then_spacing(self):
+        limiter = AdaptiveRateLimiter(initial_rate=10)
+        # Premier jeton disponible immédiatement, le suivant attend ~1/rate
+        assert limiter.reserve("https://a.com/1") == 0.0
+        assert limiter.reserve("https://a.com/2") == pytest.approx(0.1, abs=0.02)
+        # Les domaines sont indépendants
+        assert limiter.reserve("https://b.com/1") == 0.0
+
+    def test_throttle_halves_rate_and_honours_retry_after(self):
+        limiter = AdaptiveRateLimiter(initial_rate=8)
+        limiter.record_response("https://a.com/x", 429, "3")
+
+        rates = limiter.get_rates()["a.com"]
+        assert rates["rate"] == 4.0
+        assert rates["throttled"] == 1
+        assert limiter.reserve("https://a.com/y") >= 2.9
+
+    def test_healthy_responses_increase_rate(self):
+        limiter = AdaptiveRateLimiter(initial_rate=2, max_rate=3)
+        for _ in range(10):
+            limiter.record_response("https://a.com/x", 200)
+        assert limiter.get_rates()["a.com"]["rate"] == 3.0
+
+    def test_server_errors_do_not_increase_rate(self):
+        limiter = AdaptiveRateLimiter(initial_rate=2)
+        limiter.record_response("https://a.com/x", 500)
+        assert limiter.get_rates()["a.com"]["rate"] == 2.0
@@ -0,0 +1,76 @@
+"""
+Tests unitaires pour retry.py
+
+Teste la politique de retry : classification, backoff plafonné, échéances.
+"""
+import pytest
+import httpx
+from unittest.mock import Mock, patch
+import sys
+import os
+
+sys.path.insert(0, os.path.abspath(os.path.join(os.path.dirname(__file__), '../..')))
+
+from panelia.utils.retry import Deadline, RetryPolicy, TransientDownloadError
+
+
+def status_error(code, headers=None):
+    response = httpx.Response(code, headers=headers or {})
+    return httpx.HTTPStatusError(str(code), request=Mock(), response=response)
+
+
+@pytest.mark.unit
+class TestRetryPolicy:
+    """Tests de la politique de retry"""
+
+    def test_classification(self):
+        policy = RetryPolicy()
+        assert policy.is_retryable(status_error(503))
+        assert policy.is_retryable(status_error(429))
+        assert not policy.is_retryable(status_error(404))
+        assert not policy.is_retryable(status_error(403))
+        assert policy.is_retryable(httpx.ReadTimeout("timeout"))
+        assert policy.is_retryable(httpx.ConnectError("refused"))
+        assert policy.is_retryable(TransientDownloadError("coupure"))
+        assert not policy.is_retryable(ValueError("bug"))
+
+    def test_backoff_is_capped(self):
+        policy = RetryPolicy(base_delay=1.0, max_delay=5.0)
+        with patch('random.uniform', side_effect=lambda a, b: b):
+            assert policy.backoff(0) == 1.0
+            assert policy.backoff(2) == 4.0
+            assert policy.backoff(10) == 5.0
+
+    def test_retry_after_is_a_floor(self):
+        policy = RetryPolicy(base_delay=1.0, max_delay=5.0, image_deadline=None)
+        delay = policy.next_delay(0, status_error(429, {"Retry-After": "7"}))
+        assert delay == 7.0
+
+    def test_gives_up_after_max_attempts(self):
+        policy = RetryPolicy(max_attempts=3)
+        assert policy.next_delay(1, httpx.ConnectError("x")) is not None
+        assert policy.next_delay(2, httpx.ConnectError("x")) is None
+
+    def test_gives_up_when_delay_exceeds_deadline(self):
+        policy = RetryPolicy(base_delay=10.0, max_delay=10.0)
+        with patch('random.uniform', return_value=10.0):
+            assert policy.next_delay(0, httpx.ConnectError("x"), Deadline(1.0)) is None
+            assert policy.next_delay(0, httpx.ConnectError("x"), Deadline(60.0)) == 10.0
+
+
+@pytest.mark.unit
+class TestDeadline:
+    """Tests des échéances"""
+
+    def test_child_is_bounded_by_parent(self):
+        chapter = Deadline(1.0)
+        image = Deadline(100.0, parent=chapter)
+        assert image.remaining() <= 1.0
+
+    def test_unbounded(self):
+        assert Deadline(None).remaining() == float("inf")
+        assert not Deadline(None).expired
+
+    def test_clip_timeout(self):
+        assert Deadline(5.0).clip_timeout(30) <= 5.0
+        assert Deadline(None).clip_timeout(30) == 30
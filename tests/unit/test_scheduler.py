@@ -0,0 +1,175 @@
+"""
+Tests unitaires pour scheduler.py
+
+Teste l'ordonnanceur global : plafonds global et par hôte, tour de rôle
+entre chapitres, annulation, statistiques de file.
+"""
+import pytest
+import threading
+import time
+from concurrent.futures import wait
+from unittest.mock import patch
+import sys
+import os
+
+sys.path.insert(0, os.path.abspath(os.path.join(os.path.dirname(__file__), '../..')))
+
+from panelia.core.scheduler import DownloadScheduler
+from panelia.utils.http import stream_download_images, _ImageJob
+
+
+class ConcurrencyProbe:
+    """Tâche factice qui note la concurrence maximale observée (globale et par hôte)."""
+
+    def __init__(self, duration=0.02):
+        self.duration = duration
+        self.lock = threading.Lock()
+        self.active = 0
+        self.peak = 0
+        self.by_host = {}
+        self.peak_by_host = {}
+        self.order = []
+
+    def __call__(self, host, label):
+        with self.lock:
+            self.active += 1
+            self.peak = max(self.peak, self.active)
+            self.by_host[host] = self.by_host.get(host, 0) + 1
+            self.peak_by_host[host] = max(self.peak_by_host.get(host, 0), self.by_host[host])
+            self.order.append(label)
+        time.sleep(self.duration)
+        with self.lock:
+            self.active -= 1
+            self.by_host[host] -= 1
+        return label
+
+
+@pytest.mark.unit
+class TestDownloadScheduler:
+    def test_global_limit_enforced(self):
+        probe = ConcurrencyProbe()
+        scheduler = DownloadScheduler(max_concurrency=3, per_host_limit=10)
+        try:
+            futures = [
+                scheduler.submit(chap, f"https://h{i % 5}.test/{i}.jpg", probe, f"h{i % 5}", (chap, i))
+                for chap in range(4) for i in range(6)
+            ]
+            wait(futures)
+        finally:
+            scheduler.shutdown()
+        assert probe.peak == 3
+        assert all(f.result() is not None for f in futures)
+
+    def test_per_host_limit_enforced(self):
+        probe = ConcurrencyProbe()
+        scheduler = DownloadScheduler(max_concurrency=8, per_host_limit=2)
+        try:
+            futures = [scheduler.submit(chap, f"https://cdn.test/{i}.jpg", probe, "cdn", (chap, i)) for chap in range(3) for i in range(5)]
+            futures += [scheduler.submit(9, f"https://other.test/{i}.jpg", probe, "other", (9, i)) for i in range(4)]
+            wait(futures)
+        finally:
+            scheduler.shutdown()
+        assert probe.peak_by_host["cdn"] == 2
+        assert probe.peak_by_host["other"] == 2
+
+    def test_chapters_served_round_robin(self):
+        probe = ConcurrencyProbe(duration=0.005)
+        scheduler = DownloadScheduler(max_concurrency=1, per_host_limit=1)
+        try:
+            # Le premier chapitre soumet tout avant que les autres n'arrivent
+            gate = threading.Event()
+            blocker = scheduler.submit("gate", "https://cdn.test/gate.jpg", gate.wait)
+            futures = [scheduler.submit("big", f"https://cdn.test/b{i}.jpg", probe, "cdn", "big") for i in range(6)]
+            futures += [scheduler.submit("small", f"https://cdn.test/s{i}.jpg", probe, "cdn", "small") for i in range(2)]
+            gate.set()
+            wait(futures + [blocker])
+        finally:
+            scheduler.shutdown()
+        assert probe.order[:4] == ["big", "small", "big", "small"]
+
+    def test_priority_lane_served_first(self):
+        probe = ConcurrencyProbe(duration=0.005)
+        scheduler = DownloadScheduler(max_concurrency=1, per_host_limit=1)
+        try:
+            gate = threading.Event()
+            blocker = scheduler.submit("gate", "https://cdn.test/gate.jpg", gate.wait)
+            urgent = scheduler.lane(priority=5)
+            futures = [scheduler.submit("backlog", f"https://cdn.test/b{i}.jpg", probe, "cdn", "backlog") for i in range(3)]
+            futures += [urgent.submit("urgent", f"https://cdn.test/u{i}.jpg", probe, "cdn", "urgent") for i in range(3)]
+            gate.set()
+            wait(futures + [blocker])
+        finally:
+            scheduler.shutdown()
+        assert probe.order == ["urgent"] * 3 + ["backlog"] * 3
+
+    def test_lane_quota_enforced(self):
+        probe = ConcurrencyProbe()
+        scheduler = DownloadScheduler(max_concurrency=6, per_host_limit=6)
+        lane = scheduler.lane(limit=2)
+        try:
+            futures = [lane.submit(i, f"https://cdn{i}.test/x.jpg", probe, f"cdn{i}", "quota") for i in range(6)]
+            wait(futures)
+            assert probe.peak == 2
+            # Les autres lots ne sont pas concernés par le quota
+            others = [scheduler.submit(i, f"https://cdn{i}.test/y.jpg", probe, f"cdn{i}", "free") for i in range(6)]
+            wait(others)
+            assert probe.peak > 2
+        finally:
+            scheduler.release_lane(lane)
+            scheduler.shutdown()
+
+    def test_cancelled_task_never_runs(self):
+        probe = ConcurrencyProbe()
+        scheduler = DownloadScheduler(max_concurrency=1, per_host_limit=1)
+        try:
+            gate = threading.Event()
+            blocker = scheduler.submit(1, "https://cdn.test/gate.jpg", gate.wait)
+            doomed = scheduler.submit(1, "https://cdn.test/x.jpg", probe, "cdn", "doomed")
+            kept = scheduler.submit(1, "https://cdn.test/y.jpg", probe, "cdn", "kept")
+            assert doomed.cancel()
+            gate.set()
+            assert kept.result(timeout=2) == "kept"
+            blocker.result(timeout=2)
+        finally:
+            scheduler.shutdown()
+        assert probe.order == ["kept"]
+        assert scheduler.get_stats()["queue_depth"] == 0
+
+    def test_exception_set_on_future(self):
+        def boom():
+            raise ValueError("échec")
+
+        scheduler = DownloadScheduler(max_concurrency=1)
+        try:
+            future = scheduler.submit(1, "https://cdn.test/a.jpg", boom)
+            with pytest.raises(ValueError):
+                future.result(timeout=2)
+        finally:
+            scheduler.shutdown()
+
+    def test_queue_stats(self):
+        probe = ConcurrencyProbe(duration=0.01)
+        scheduler = DownloadScheduler(max_concurrency=1)
+        try:
+            wait([scheduler.submit(1, f"https://cdn.test/{i}.jpg", probe, "cdn", i) for i in range(5)])
+            stats = scheduler.get_stats()
+        finally:
+            scheduler.shutdown()
+        assert stats["completed"] == 5
+        assert stats["peak_queue_depth"] >= 4
+        assert stats["queue_depth"] == 0
+        assert stats["max_wait_ms"] >= stats["avg_wait_ms"] > 0
+
+
+@pytest.mark.unit
+def test_stream_download_images_through_scheduler():
+    """Le générateur rend les images dans l'ordre en passant par l'ordonnanceur partagé"""
+    scheduler = DownloadScheduler(max_concurrency=2, per_host_limit=2)
+    try:
+        with patch.object(_ImageJob, "step", autospec=True, side_effect=lambda job: (True, job.url.encode())):
+            urls = [f"https://cdn.test/{i}.jpg" for i in range(6)]
+            result = list(stream_download_images(urls, ordered=True, scheduler=scheduler))
+    finally:
+        scheduler.shutdown()
+    assert result == [u.encode() for u in urls]
+    assert scheduler.get_stats()["completed"] == 6
@@ -0,0 +1,100 @@
+"""
+Tests unitaires pour sync.py
+
+Teste la synchronisation incrémentale : empreinte de la liste, classement
+des chapitres (à jour, modifiés, manquants, dossiers hors journal), série
+sautée quand la liste n'a pas changé, et ScraperEngine.sync_series.
+"""
+import pytest
+import sys
+import os
+
+sys.path.insert(0, os.path.abspath(os.path.join(os.path.dirname(__file__), '../..')))
+
+from panelia.core.journal import JOURNAL_FILENAME, BatchJournal
+from panelia.core.sync import SeriesSync, chapter_list_fingerprint
+
+SETTINGS = {"quality_value": 92}
+
+
+def chap_url(n):
+    return f"https://site.test/chap-{n}"
+
+
+def journal_chapter(journal, chap_num, done=True):
+    chap_dir = journal.root / str(chap_num).replace(".", "_")
+    chap_dir.mkdir(exist_ok=True)
+    panel = chap_dir / "P001.jpg"
+    panel.write_bytes(b"panel")
+    journal.chapter_started(chap_num, chap_url(int(chap_num)))
+    journal.image_saved(chap_num, 1, [panel])
+    if done:
+        journal.chapter_done(chap_num, chap_url(int(chap_num)), {"chap_num": chap_num, "panels_saved": 1, "error": None}, SETTINGS)
+
+
+@pytest.mark.unit
+class TestSeriesSync:
+    def test_fingerprint(self):
+        a = chapter_list_fingerprint({1.0: chap_url(1), 2.0: chap_url(2)}, SETTINGS)
+        assert a == chapter_list_fingerprint({2.0: chap_url(2), 1.0: chap_url(1)}, SETTINGS)
+        assert a != chapter_list_fingerprint({1.0: chap_url(1), 2.0: "https://site.test/autre"}, SETTINGS)
+        assert a != chapter_list_fingerprint({1.0: chap_url(1), 2.0: chap_url(2)}, {"quality_value": 80})
+
+    def test_plan_classifies_chapters(self, tmp_path):
+        journal = BatchJournal(tmp_path / JOURNAL_FILENAME)
+        journal_chapter(journal, 1.0)
+        journal_chapter(journal, 2.0)
+        # Chapitre interrompu : planches partielles sur disque, jamais terminé
+        journal_chapter(journal, 3.0, done=False)
+        journal.close()
+        # Dossier rempli par un lot antérieur au journal
+        (tmp_path / "4_0").mkdir()
+        (tmp_path / "4_0" / "Ch4_0_P001.jpg").write_bytes(b"old")
+
+        discovered = {n: chap_url(int(n)) for n in (1.0, 2.0, 3.0, 4.0, 5.0)}
+        discovered[2.0] = "https://site.test/chap-2-v2"
+        plan = SeriesSync(tmp_path, SETTINGS).plan(discovered)
+
+        assert plan.up_to_date == [1.0]
+        assert plan.changed == {2.0: "https://site.test/chap-2-v2"}
+        assert plan.untracked == [4.0]
+        assert sorted(plan.to_process) == [2.0, 3.0, 5.0]
+
+    def test_unchanged_list_skipped_only_after_complete_sync(self, tmp_path):
+        sync = SeriesSync(tmp_path, SETTINGS)
+        discovered = {1.0: chap_url(1), 2.0: chap_url(2)}
+
+        plan = sync.plan(discovered)
+        assert not sync.record(plan, [{"chap_num": 1.0, "panels_saved": 3, "error": None}, {"chap_num": 2.0, "panels_saved": 0, "error": "Timeout"}])
+        assert not sync.plan(discovered).unchanged
+
+        assert sync.record(plan, [{"chap_num": 1.0, "panels_saved": 3, "error": None}, {"chap_num": 2.0, "panels_saved": 2, "error": None}])
+        assert sync.plan(discovered).unchanged
+        assert not sync.plan({**discovered, 3.0: chap_url(3)}).unchanged
+        assert not sync.plan(discovered, force=True).unchanged
+
+
+@pytest.mark.unit
+def test_engine_sync_series_processes_only_new_chapters(fake_engine):
+    extracted = []
+
+    def extract(url, driver_ws, validated_params):
+        extracted.append(url)
+        return [f"http://cdn.test/{url[-1]}/{i}.jpg" for i in range(2)], None
+
+    params = {"final_manhwa_name": "serie", "quality_value": 90}
+    discovered = {float(n): f"https://selenium-only.test/chap-{n}" for n in (1, 2)}
+    with fake_engine(extract) as engine:
+        plan, results = engine.sync_series(discovered, params)
+        assert sorted(plan.missing) == [1.0, 2.0] and len(results) == 2
+
+        plan, results = engine.sync_series(discovered, params)
+        assert plan.unchanged and results == []
+
+        discovered[3.0] = "https://selenium-only.test/chap-3"
+        extracted.clear()
+        plan, results = engine.sync_series(discovered, params)
+
+    assert plan.up_to_date == [1.0, 2.0]
+    assert extracted == ["https://selenium-only.test/chap-3"]
+    assert [r["chap_num"] for r in results] == [3.0]
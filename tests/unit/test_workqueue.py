@@ -0,0 +1,143 @@
+"""
+Tests unitaires pour workqueue.py
+
+Teste la file de chapitres SQLite : bail exclusif (même entre connexions),
+acquittement, bail expiré réattribué et jeton périmé refusé, échecs et
+abandon après max_attempts, et QueueWorker avec un ScraperEngine.
+"""
+import pytest
+import threading
+import time
+import sys
+import os
+
+sys.path.insert(0, os.path.abspath(os.path.join(os.path.dirname(__file__), '../..')))
+
+from panelia.core.workqueue import DEAD, DONE, QueueWorker, SQLiteWorkQueue, WorkQueue, open_work_queue
+
+PARAMS = {"final_manhwa_name": "serie", "quality_value": 90}
+
+
+def chapters(*nums):
+    return {float(n): f"https://selenium-only.test/chap-{n}" for n in nums}
+
+
+@pytest.mark.unit
+class TestSQLiteWorkQueue:
+    def test_lease_ack_and_no_double_lease(self, tmp_path):
+        queue = SQLiteWorkQueue(tmp_path / "q.db")
+        assert queue.enqueue("serie", chapters(1, 2, 3), dict(PARAMS, cleaner_instance=object())) == 3
+        # Déjà en file : pas de doublon
+        assert queue.enqueue("serie", chapters(1), PARAMS) == 0
+
+        first = queue.lease("a", limit=2)
+        second = queue.lease("b", limit=2)
+        assert [l.task.chap_num for l in first] == [1.0, 2.0]
+        assert [l.task.chap_num for l in second] == [3.0]
+        assert "cleaner_instance" not in first[0].task.params
+        assert queue.lease("c") == []
+
+        assert queue.ack(first[0], {"panels_saved": 4})
+        stats = queue.get_stats()
+        assert stats["done"] == 1 and stats["leased"] == 2
+        assert queue.results("serie")[0]["result"] == {"panels_saved": 4}
+
+    def test_expired_lease_reassigned_and_stale_ack_refused(self, tmp_path):
+        queue = SQLiteWorkQueue(tmp_path / "q.db")
+        queue.enqueue("serie", chapters(1), PARAMS)
+        crashed = queue.lease("a", visibility_timeout=0.05)[0]
+        time.sleep(0.1)
+
+        retaken = queue.lease("b")[0]
+        assert retaken.task.chap_num == 1.0 and retaken.task.attempts == 2
+        assert not queue.ack(crashed, {"panels_saved": 1})
+        assert not queue.extend(crashed)
+        assert queue.ack(retaken, {"panels_saved": 1})
+        assert queue.results()[0]["worker"] == "b"
+
+    def test_failures_retry_then_dead(self, tmp_path):
+        queue = SQLiteWorkQueue(tmp_path / "q.db", max_attempts=2, retry_delay=0)
+        queue.enqueue("serie", chapters(1), PARAMS)
+        assert queue.fail(queue.lease("a")[0], "Timeout")
+        assert queue.fail(queue.lease("a")[0], "Timeout")
+        assert queue.lease("a") == []
+        result = queue.results()[0]
+        assert result["status"] == DEAD and result["error"] == "Timeout"
+
+        # Remise en file explicite d'une série terminée
+        assert queue.enqueue("serie", chapters(1), PARAMS, requeue=True) == 1
+        assert queue.lease("a")[0].task.attempts == 1
+
+    def test_release_does_not_count_attempt(self, tmp_path):
+        queue = SQLiteWorkQueue(tmp_path / "q.db", max_attempts=1)
+        queue.enqueue("serie", chapters(1), PARAMS)
+        queue.release(queue.lease("a")[0])
+        assert queue.lease("b")[0].task.attempts == 1
+
+    def test_priority_and_one_series_per_lease(self, tmp_path):
+        queue = SQLiteWorkQueue(tmp_path / "q.db")
+        queue.enqueue("backlog", chapters(1, 2), dict(PARAMS, final_manhwa_name="backlog"))
+        queue.enqueue("urgent", chapters(1, 2), dict(PARAMS, final_manhwa_name="urgent"), priority=5)
+        leased = queue.lease("a", limit=4)
+        assert {l.task.series for l in leased} == {"urgent"} and len(leased) == 2
+
+    def test_concurrent_connections_never_share_a_task(self, tmp_path):
+        SQLiteWorkQueue(tmp_path / "q.db").enqueue("serie", chapters(*range(1, 41)), PARAMS)
+        taken = []
+        lock = threading.Lock()
+
+        def drain(name):
+            # Une connexion par worker, comme deux processus
+            queue = SQLiteWorkQueue(tmp_path / "q.db")
+            while True:
+                leases = queue.lease(name, limit=3)
+                if not leases:
+                    break
+                with lock:
+                    taken.extend(l.task.chap_num for l in leases)
+                for lease in leases:
+                    queue.ack(lease, {"panels_saved": 1})
+            queue.close()
+
+        workers = [threading.Thread(target=drain, args=(f"w{i}",)) for i in range(4)]
+        for worker in workers:
+            worker.start()
+        for worker in workers:
+            worker.join(timeout=30)
+        assert sorted(taken) == [float(n) for n in range(1, 41)]
+
+    def test_open_work_queue(self, tmp_path):
+        assert isinstance(open_work_queue(f"sqlite://{tmp_path}/a.db"), SQLiteWorkQueue)
+        assert open_work_queue(str(tmp_path / "b.db")).path == tmp_path / "b.db"
+        with pytest.raises(ValueError):
+            open_work_queue("redis://localhost/0")
+
+    def test_incomplete_backend_fails_at_construction(self):
+        class LeaseOnlyQueue(WorkQueue):
+            def lease(self, worker, limit=1, visibility_timeout=None):
+                return []
+
+        with pytest.raises(TypeError):
+            LeaseOnlyQueue()
+
+
+@pytest.mark.unit
+def test_queue_worker_processes_and_reports(tmp_path, fake_engine):
+    def extract(chap_url, driver_ws, validated_params):
+        if chap_url.endswith("chap-3"):
+            return [], None
+        return [f"http://cdn.test/{chap_url[-1]}/{i}.jpg" for i in range(2)], None
+
+    queue = SQLiteWorkQueue(tmp_path / "q.db", max_attempts=1)
+    queue.enqueue("serie", chapters(1, 2, 3), PARAMS)
+    with fake_engine(extract, work_dir=tmp_path / "out") as engine:
+        worker = QueueWorker(engine, queue, worker_id="node-a", batch_size=2, poll_interval=0.01)
+        worker.run(max_idle=0)
+
+    results = {r["chap_num"]: r for r in queue.results("serie")}
+    assert results[1.0]["status"] == DONE and results[1.0]["result"]["panels_saved"] == 2
+    assert results[1.0]["result"]["worker"] == "node-a" and "metrics" in results[1.0]["result"]
+    assert results[3.0]["status"] == DEAD
+    stats = queue.get_stats()
+    assert stats["done"] == 2 and stats["dead"] == 1 and "node-a" in stats["workers"]
+    assert worker.get_stats()["batches"] == 2